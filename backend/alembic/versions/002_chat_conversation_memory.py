@@ -0,0 +1,41 @@
+"""Add rolling memory columns to chat conversations
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '002'
+down_revision = '001'
+branch_labels = None
+depends_on = None
+
+
+def _has_table(name: str) -> bool:
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade() -> None:
+    # chat_conversations is created by Base.metadata.create_all on startup,
+    # so it may not exist yet on a fresh database
+    if not _has_table('chat_conversations'):
+        return
+    existing = {c['name'] for c in sa.inspect(op.get_bind()).get_columns('chat_conversations')}
+    with op.batch_alter_table('chat_conversations') as batch_op:
+        if 'memory_summary' not in existing:
+            batch_op.add_column(sa.Column('memory_summary', sa.Text(), nullable=True))
+        if 'memory_turns' not in existing:
+            batch_op.add_column(sa.Column('memory_turns', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    if not _has_table('chat_conversations'):
+        return
+    with op.batch_alter_table('chat_conversations') as batch_op:
+        batch_op.drop_column('memory_turns')
+        batch_op.drop_column('memory_summary')
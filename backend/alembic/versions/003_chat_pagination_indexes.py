@@ -0,0 +1,44 @@
+"""Add keyset pagination indexes for chat conversations and messages
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_chat_conversations_user_updated', 'chat_conversations', ['user_id', 'updated_at', 'id']),
+    ('ix_chat_messages_conversation_timestamp', 'chat_messages', ['conversation_id', 'timestamp', 'id']),
+]
+
+
+def _existing_indexes(table: str):
+    inspector = sa.inspect(op.get_bind())
+    # Chat tables are created by Base.metadata.create_all on startup, so they
+    # may not exist yet on a fresh database
+    if not inspector.has_table(table):
+        return None
+    return {index['name'] for index in inspector.get_indexes(table)}
+
+
+def upgrade() -> None:
+    for name, table, columns in INDEXES:
+        existing = _existing_indexes(table)
+        if existing is not None and name not in existing:
+            op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        existing = _existing_indexes(table)
+        if existing is not None and name in existing:
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,53 @@
+"""Add a full-text search index on chat message content
+
+SQLite gets an FTS5 table maintained by triggers; PostgreSQL gets a
+generated tsvector column with a GIN index. See services/chat_search.py.
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.services.chat_search import (
+    POSTGRES_INDEX_DDL,
+    POSTGRES_INDEX_DROP,
+    SQLITE_INDEX_DDL,
+    SQLITE_INDEX_DROP,
+    SQLITE_INDEX_REBUILD,
+)
+
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    # chat_messages is created by Base.metadata.create_all on startup,
+    # so it may not exist yet on a fresh database
+    if not sa.inspect(bind).has_table('chat_messages'):
+        return
+    if bind.dialect.name == 'sqlite':
+        for statement in SQLITE_INDEX_DDL:
+            op.execute(statement)
+        # Index the messages written before the triggers existed
+        op.execute(SQLITE_INDEX_REBUILD)
+    elif bind.dialect.name == 'postgresql':
+        for statement in POSTGRES_INDEX_DDL:
+            op.execute(statement)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        for statement in SQLITE_INDEX_DROP:
+            op.execute(statement)
+    elif bind.dialect.name == 'postgresql':
+        for statement in POSTGRES_INDEX_DROP:
+            op.execute(statement)
@@ -0,0 +1,81 @@
+"""Add sidebar summary columns to chat conversations and backfill them
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+# Conversations backfilled per UPDATE statement
+BACKFILL_BATCH_SIZE = 1000
+# Must match services/chat_summary.PREVIEW_LENGTH
+PREVIEW_LENGTH = 120
+
+# Existing history counts as read, so the sidebar does not light up on deploy
+BACKFILL = sa.text(f"""
+UPDATE chat_conversations SET
+    message_count = (
+        SELECT COUNT(*) FROM chat_messages m WHERE m.conversation_id = chat_conversations.id
+    ),
+    last_message_at = (
+        SELECT MAX(m.timestamp) FROM chat_messages m WHERE m.conversation_id = chat_conversations.id
+    ),
+    last_read_at = (
+        SELECT MAX(m.timestamp) FROM chat_messages m WHERE m.conversation_id = chat_conversations.id
+    ),
+    last_message_preview = (
+        SELECT substr(m.content, 1, {PREVIEW_LENGTH}) FROM chat_messages m
+        WHERE m.conversation_id = chat_conversations.id
+        ORDER BY m.timestamp DESC, m.id DESC LIMIT 1
+    )
+WHERE id > :after AND id <= :upto
+""")
+
+
+def _has_table(name: str) -> bool:
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade() -> None:
+    # chat_conversations is created by Base.metadata.create_all on startup,
+    # so it may not exist yet on a fresh database
+    if not _has_table('chat_conversations'):
+        return
+    existing = {c['name'] for c in sa.inspect(op.get_bind()).get_columns('chat_conversations')}
+    with op.batch_alter_table('chat_conversations') as batch_op:
+        if 'last_message_preview' not in existing:
+            batch_op.add_column(sa.Column('last_message_preview', sa.String(length=PREVIEW_LENGTH), nullable=True))
+        if 'message_count' not in existing:
+            batch_op.add_column(sa.Column('message_count', sa.Integer(), nullable=False, server_default='0'))
+        if 'last_message_at' not in existing:
+            batch_op.add_column(sa.Column('last_message_at', sa.DateTime(), nullable=True))
+        if 'last_read_at' not in existing:
+            batch_op.add_column(sa.Column('last_read_at', sa.DateTime(), nullable=True))
+
+    if not _has_table('chat_messages'):
+        return
+    # Walk the id range in fixed-size slices so no single statement touches
+    # every conversation at once
+    bind = op.get_bind()
+    max_id = bind.execute(sa.text('SELECT MAX(id) FROM chat_conversations')).scalar() or 0
+    for after in range(0, max_id, BACKFILL_BATCH_SIZE):
+        bind.execute(BACKFILL, {'after': after, 'upto': after + BACKFILL_BATCH_SIZE})
+
+
+def downgrade() -> None:
+    if not _has_table('chat_conversations'):
+        return
+    with op.batch_alter_table('chat_conversations') as batch_op:
+        batch_op.drop_column('last_read_at')
+        batch_op.drop_column('last_message_at')
+        batch_op.drop_column('message_count')
+        batch_op.drop_column('last_message_preview')
@@ -0,0 +1,67 @@
+"""Store generated report versions and report schedules
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+
+def _has_table(name: str) -> bool:
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade() -> None:
+    # Both tables are also created by Base.metadata.create_all on startup
+    if not _has_table('generated_reports'):
+        op.create_table(
+            'generated_reports',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('project_id', sa.String(), nullable=False),
+            sa.Column('report_type', sa.String(), nullable=False),
+            sa.Column('output_format', sa.String(), nullable=False),
+            sa.Column('version', sa.Integer(), nullable=False),
+            sa.Column('data_hash', sa.String(length=64), nullable=False),
+            sa.Column('report', sa.Text(), nullable=False),
+            sa.Column('generated_at', sa.DateTime(), nullable=True),
+            sa.UniqueConstraint('project_id', 'report_type', 'output_format', 'version',
+                                name='uq_generated_reports_version'),
+        )
+        op.create_index('ix_generated_reports_id', 'generated_reports', ['id'])
+        op.create_index('ix_generated_reports_key_hash', 'generated_reports',
+                        ['project_id', 'report_type', 'output_format', 'data_hash'])
+
+    if not _has_table('scheduled_reports'):
+        op.create_table(
+            'scheduled_reports',
+            sa.Column('id', sa.String(length=36), primary_key=True),
+            sa.Column('project_id', sa.String(), nullable=False),
+            sa.Column('report_type', sa.String(), nullable=False),
+            sa.Column('output_format', sa.String(), nullable=False),
+            sa.Column('schedule', sa.String(), nullable=False),
+            sa.Column('recipients', sa.Text(), nullable=True),
+            sa.Column('project_data', sa.Text(), nullable=True),
+            sa.Column('active', sa.Boolean(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('next_run_at', sa.DateTime(), nullable=False),
+            sa.Column('last_run_at', sa.DateTime(), nullable=True),
+            sa.Column('last_job_id', sa.String(length=36), nullable=True),
+        )
+        op.create_index('ix_scheduled_reports_project_id', 'scheduled_reports', ['project_id'])
+        op.create_index('ix_scheduled_reports_next_run_at', 'scheduled_reports', ['next_run_at'])
+
+
+def downgrade() -> None:
+    if _has_table('scheduled_reports'):
+        op.drop_table('scheduled_reports')
+    if _has_table('generated_reports'):
+        op.drop_table('generated_reports')
@@ -0,0 +1,61 @@
+"""Store vision batch jobs and their per-image results
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-20 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+
+def _has_table(name: str) -> bool:
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade() -> None:
+    # Both tables are also created by Base.metadata.create_all on startup
+    if not _has_table('vision_batch_jobs'):
+        op.create_table(
+            'vision_batch_jobs',
+            sa.Column('id', sa.String(length=36), primary_key=True),
+            sa.Column('project_id', sa.String(), nullable=False),
+            sa.Column('aspects', sa.Text(), nullable=False),
+            sa.Column('status', sa.String(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('started_at', sa.DateTime(), nullable=True),
+            sa.Column('completed_at', sa.DateTime(), nullable=True),
+        )
+        op.create_index('ix_vision_batch_jobs_project_id', 'vision_batch_jobs', ['project_id'])
+        op.create_index('ix_vision_batch_jobs_created_at', 'vision_batch_jobs', ['created_at'])
+
+    if not _has_table('vision_batch_images'):
+        op.create_table(
+            'vision_batch_images',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('job_id', sa.String(length=36),
+                      sa.ForeignKey('vision_batch_jobs.id', ondelete='CASCADE'), nullable=False),
+            sa.Column('position', sa.Integer(), nullable=False),
+            sa.Column('filename', sa.String(), nullable=False),
+            sa.Column('status', sa.String(), nullable=False),
+            sa.Column('analysis', sa.Text(), nullable=True),
+            sa.Column('error', sa.Text(), nullable=True),
+            sa.Column('started_at', sa.DateTime(), nullable=True),
+            sa.Column('completed_at', sa.DateTime(), nullable=True),
+            sa.UniqueConstraint('job_id', 'position', name='uq_vision_batch_images_position'),
+        )
+        op.create_index('ix_vision_batch_images_id', 'vision_batch_images', ['id'])
+
+
+def downgrade() -> None:
+    if _has_table('vision_batch_images'):
+        op.drop_table('vision_batch_images')
+    if _has_table('vision_batch_jobs'):
+        op.drop_table('vision_batch_jobs')
@@ -17,16 +17,24 @@ from pydantic import BaseModel, EmailStr
 import hashlib
 import hmac
 
-from ..database import SessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import SessionLocal, get_async_db
 from ..models import User, OnboardingEvent, EmailNotification
 from ..auth import (
     authenticate_user, 
+    authenticate_user_async,
     create_access_token, 
     get_current_active_user, 
     get_password_hash,
+    get_password_hash_async,
     get_current_user,
+    password_hasher,
+    token_claims,
+    user_cache,
     verify_password
 )
+from ..services.rate_limiter import rate_limiter
 from ..integrations.email_service import send_welcome_email
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
@@ -119,7 +127,7 @@ async def signup(
         )
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     new_user = User(
         email=user_data.email,
         hashed_password=hashed_password,
@@ -172,12 +180,12 @@ async def signup(
 @router.post("/login", response_model=dict)
 async def login(
     user_credentials: UserLogin,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Authenticate user and return access token (JSON format)
     """
-    user = authenticate_user(db, user_credentials.email, user_credentials.password)
+    user = await authenticate_user_async(db, user_credentials.email, user_credentials.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -193,12 +201,12 @@ async def login(
     
     # Update last login
     user.last_login = datetime.utcnow()
-    db.commit()
+    await db.commit()
     
     # Create access token
     access_token_expires = timedelta(minutes=30)
     access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data=token_claims(user), expires_delta=access_token_expires
     )
     
     return {
@@ -217,12 +225,12 @@ async def login(
 @router.post("/token", response_model=dict)
 async def login_oauth2(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Authenticate user and return access token (OAuth2 format)
     """
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user_async(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -238,12 +246,12 @@ async def login_oauth2(
     
     # Update last login
     user.last_login = datetime.utcnow()
-    db.commit()
+    await db.commit()
     
     # Create access token
     access_token_expires = timedelta(minutes=30)
     access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data=token_claims(user), expires_delta=access_token_expires
     )
     
     return {
@@ -272,6 +280,19 @@ async def read_users_me(current_user: User = Depends(get_current_active_user)):
         "role": current_user.role
     }
 
+@router.get("/metrics", response_model=dict)
+async def auth_metrics():
+    """
+    Get password hashing pool load (queue depth, waits, rejections),
+    authenticated-user cache hit rates and rate limiter counts
+    """
+    return {
+        "status": "success",
+        "password_hashing": password_hasher.stats(),
+        "user_cache": user_cache.stats(),
+        "rate_limiter": rate_limiter.stats()
+    }
+
 @router.post("/forgot-password")
 async def forgot_password(
     reset_request: PasswordResetRequest,
@@ -542,7 +563,7 @@ async def create_demo_account(
     
     demo_user = User(
         email=demo_email,
-        hashed_password=get_password_hash(demo_password),
+        hashed_password=await get_password_hash_async(demo_password),
         full_name=f"Demo {account_type.title()} Manager",
         company=company_names[account_type],
         role="project_manager",
@@ -3,22 +3,43 @@ Chat API endpoints for managing conversations and messages.
 """
 
 from typing import List, Optional, Dict
-from fastapi import APIRouter, Depends, HTTPException, status, Body, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Body, Query, Response, WebSocket, WebSocketDisconnect
 from fastapi import WebSocket
 from pydantic import BaseModel, Field
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError, jwt
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import uuid
 import json
+import asyncio
 
-from ..auth import get_current_active_user, SECRET_KEY, ALGORITHM
-from ..database import get_db
+from ..auth import get_current_active_user, get_current_user, SECRET_KEY, ALGORITHM
+from ..database import get_async_db, AsyncSessionLocal
 from ..models import User, ChatConversation, ChatMessage
 from ..services.ai_service import ai_service
+from ..services.usage_logger import track_usage_endpoint
+from ..services.conversation_memory import conversation_memory
+from ..services.chat_pubsub import chat_connections
+from ..services.chat_turns import ChatTurnQueue
+from ..services.chat_search import chat_search_index
+from ..services.chat_summary import is_unread, summary_params, summary_updates
+from ..services.pagination import NEXT_CURSOR_HEADER, decode_cursor, keyset_after, page_with_cursor
+
+# Messages read to seed memory for conversations that have none stored yet
+MEMORY_SEED_MESSAGES = 20
+
+# Longest chat message accepted over REST or WebSocket
+MAX_MESSAGE_LENGTH = 1000
+
+# Page sizes for conversation and message listing (default, maximum)
+CONVERSATION_PAGE_SIZE = 50
+MAX_CONVERSATION_PAGE_SIZE = 100
+MESSAGE_PAGE_SIZE = 50
+MAX_MESSAGE_PAGE_SIZE = 200
 
 # Create router
-router = APIRouter(prefix="/chat", tags=["chat"])
+router = APIRouter(prefix="/chat", tags=["chat"], dependencies=[Depends(track_usage_endpoint)])
 
 # Pydantic models for request/response
 class ConversationResponse(BaseModel):
@@ -26,6 +47,10 @@ class ConversationResponse(BaseModel):
     user_id: int
     created_at: datetime
     updated_at: datetime
+    last_message_preview: Optional[str] = None
+    message_count: int = 0
+    last_message_at: Optional[datetime] = None
+    unread: bool = False
 
 class MessageResponse(BaseModel):
     id: int
@@ -36,7 +61,7 @@ class MessageResponse(BaseModel):
 
 class MessageCreate(BaseModel):
     session_id: Optional[str] = None
-    content: str = Field(..., min_length=1, max_length=1000)
+    content: str = Field(..., min_length=1, max_length=MAX_MESSAGE_LENGTH)
     role: str = Field(default="user", pattern="^(user|assistant)$")
 
 class MessageCreateResponse(BaseModel):
@@ -83,23 +108,85 @@ def get_simple_response(user_message: str) -> str:
     else:
         return random.choice(SIMPLE_RESPONSES)
 
+def _answer_cache_tenant(user: User) -> str:
+    # Per user: `company` is free text typed at signup, so two accounts
+    # sharing a company name are not necessarily the same organisation
+    return f"user:{user.id}"
+
+def _parse_cursor(cursor: Optional[str]):
+    if not cursor:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+async def _get_conversation(db: AsyncSession, session_id: str, user_id: int) -> Optional[ChatConversation]:
+    """A conversation by session id, only if it belongs to the user."""
+    result = await db.execute(select(ChatConversation).where(
+        ChatConversation.session_id == session_id,
+        ChatConversation.user_id == user_id
+    ))
+    return result.scalars().first()
+
+async def _recent_messages(db: AsyncSession, conversation_id: int, limit: int, before=None) -> List[ChatMessage]:
+    """A conversation's latest messages (newest first), optionally older than a cursor."""
+    query = select(ChatMessage).where(ChatMessage.conversation_id == conversation_id)
+    condition = keyset_after(ChatMessage.timestamp, ChatMessage.id, before)
+    if condition is not None:
+        query = query.where(condition)
+    query = query.order_by(ChatMessage.timestamp.desc(), ChatMessage.id.desc()).limit(limit)
+    return list((await db.execute(query)).scalars().all())
+
+async def _load_memory(db: AsyncSession, conversation: ChatConversation):
+    """Conversation memory (rolling summary + recent turns) for AI context."""
+    memory = conversation_memory.load(conversation)
+    if memory is None:
+        # Conversation predates persisted memory: seed from its latest messages once
+        previous_messages = await _recent_messages(db, conversation.id, MEMORY_SEED_MESSAGES)
+        memory = conversation_memory.from_messages(list(reversed(previous_messages)))
+    return memory
+
 @router.get("/conversations", response_model=List[ConversationResponse])
 async def get_conversations(
+    response: Response,
+    limit: int = Query(default=CONVERSATION_PAGE_SIZE, ge=1, le=MAX_CONVERSATION_PAGE_SIZE),
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get all conversations for the authenticated user."""
+    """Get the authenticated user's conversations, most recently updated first,
+    with the sidebar summary (last message preview, message count, unread).
+
+    Paginated by keyset: when more remain, the X-Next-Cursor response header
+    holds the cursor to pass for the next page.
+    """
+    after = _parse_cursor(cursor)
     try:
-        conversations = db.query(ChatConversation).filter(
+        query = select(ChatConversation).where(
             ChatConversation.user_id == current_user.id
-        ).order_by(ChatConversation.updated_at.desc()).all()
+        )
+        condition = keyset_after(ChatConversation.updated_at, ChatConversation.id, after)
+        if condition is not None:
+            query = query.where(condition)
+        query = query.order_by(
+            ChatConversation.updated_at.desc(), ChatConversation.id.desc()
+        ).limit(limit + 1)
+        rows = (await db.execute(query)).scalars().all()
+        conversations, next_cursor = page_with_cursor(rows, limit, "updated_at")
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
         
         return [
             ConversationResponse(
                 session_id=conv.session_id,
                 user_id=conv.user_id,
                 created_at=conv.created_at,
-                updated_at=conv.updated_at
+                updated_at=conv.updated_at,
+                last_message_preview=conv.last_message_preview,
+                message_count=conv.message_count or 0,
+                last_message_at=conv.last_message_at,
+                unread=is_unread(conv)
             )
             for conv in conversations
         ]
@@ -112,16 +199,22 @@ async def get_conversations(
 @router.get("/conversations/{session_id}/messages", response_model=List[MessageResponse])
 async def get_messages(
     session_id: str,
+    response: Response,
+    limit: int = Query(default=MESSAGE_PAGE_SIZE, ge=1, le=MAX_MESSAGE_PAGE_SIZE),
+    before: Optional[str] = None,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get all messages for a specific conversation."""
+    """Get a page of messages for a conversation, oldest first.
+
+    Returns the latest `limit` messages, or those just before the `before`
+    cursor. When older messages remain, the X-Next-Cursor response header
+    holds the cursor to pass as `before` to load them.
+    """
+    older_than = _parse_cursor(before)
     try:
         # Verify conversation belongs to authenticated user
-        conversation = db.query(ChatConversation).filter(
-            ChatConversation.session_id == session_id,
-            ChatConversation.user_id == current_user.id
-        ).first()
+        conversation = await _get_conversation(db, session_id, current_user.id)
         
         if not conversation:
             raise HTTPException(
@@ -129,10 +222,22 @@ async def get_messages(
                 detail="Conversation not found"
             )
         
-        # Get messages for the conversation
-        messages = db.query(ChatMessage).filter(
-            ChatMessage.conversation_id == conversation.id  # Use actual conversation ID
-        ).order_by(ChatMessage.timestamp.asc()).all()
+        # Newest first down the (conversation_id, timestamp, id) index, then reversed
+        rows = await _recent_messages(db, conversation.id, limit + 1, older_than)
+        messages, next_cursor = page_with_cursor(rows, limit, "timestamp")
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        
+        # Opening the latest page marks the conversation read. updated_at is
+        # pinned so reading neither reorders the sidebar nor moves it under
+        # the /conversations keyset cursors
+        if older_than is None and is_unread(conversation):
+            await db.execute(
+                update(ChatConversation)
+                .where(ChatConversation.id == conversation.id)
+                .values(last_read_at=conversation.last_message_at, updated_at=ChatConversation.updated_at)
+            )
+            await db.commit()
         
         return [
             MessageResponse(
@@ -142,7 +247,7 @@ async def get_messages(
                 role=msg.role,
                 timestamp=msg.timestamp
             )
-            for msg in messages
+            for msg in reversed(messages)
         ]
     except HTTPException:
         raise
@@ -152,13 +257,32 @@ async def get_messages(
             detail=f"Error retrieving messages: {str(e)}"
         )
 
+async def _compact_memory(conversation_id: int, memory) -> None:
+    """Compact a conversation's memory after the response and store the result."""
+    try:
+        if await conversation_memory.compact(memory):
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    update(ChatConversation)
+                    .where(ChatConversation.id == conversation_id)
+                    # Not a change the user made: keep the sidebar order
+                    .values(**conversation_memory.columns(memory), updated_at=ChatConversation.updated_at)
+                )
+                await db.commit()
+    except Exception as e:
+        print(f"Conversation memory compaction failed: {e}")
+    finally:
+        conversation_memory.release(conversation_id)
+
 @router.post("/messages", response_model=MessageCreateResponse)
 async def send_message(
     message_data: MessageCreate,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Send a new message and generate bot response."""
+    memory_conversation_id = None
     try:
         session_id = message_data.session_id
         
@@ -170,13 +294,10 @@ async def send_message(
                 user_id=current_user.id
             )
             db.add(conversation)
-            db.commit()
+            await db.flush()
         else:
             # Verify conversation exists and belongs to user
-            conversation = db.query(ChatConversation).filter(
-                ChatConversation.session_id == session_id,
-                ChatConversation.user_id == current_user.id
-            ).first()
+            conversation = await _get_conversation(db, session_id, current_user.id)
             
             if not conversation:
                 raise HTTPException(
@@ -184,48 +305,63 @@ async def send_message(
                     detail="Conversation not found"
                 )
         
-        # Save user message
-        user_message = ChatMessage(
-            conversation_id=conversation.id,  # Use actual conversation ID, not session_id
-            content=message_data.content,
-            role="user"
-        )
-        db.add(user_message)
+        # Conversation memory (rolling summary + recent turns) for context,
+        # shared with any socket open on this conversation in this worker
+        memory = conversation_memory.acquire(conversation.id, await _load_memory(db, conversation))
+        memory_conversation_id = conversation.id
+        # Return the connection to the pool while the model runs
+        await db.commit()
         
-        # Get conversation history for context
-        conversation_history = []
-        if session_id:
-            previous_messages = db.query(ChatMessage).filter(
-                ChatMessage.conversation_id == conversation.id
-            ).order_by(ChatMessage.timestamp.asc()).all()
-            conversation_history = [
-                {"role": msg.role, "content": msg.content}
-                for msg in previous_messages[-10:]  # Last 10 messages for context
-            ]
+        user_sent_at = datetime.now(timezone.utc)
         
         # Generate AI-enhanced bot response
         try:
             bot_response_content = await ai_service.generate_response(
                 message_data.content,
-                conversation_history
+                memory.history(),
+                tenant=_answer_cache_tenant(current_user)
             )
         except Exception as e:
             print(f"AI service error: {e}")
             bot_response_content = get_simple_response(message_data.content)
         
+        bot_sent_at = datetime.now(timezone.utc)
+        
+        # Save user and bot messages
+        user_message = ChatMessage(
+            conversation_id=conversation.id,  # Use actual conversation ID, not session_id
+            content=message_data.content,
+            role="user",
+            timestamp=user_sent_at
+        )
         bot_message = ChatMessage(
             conversation_id=conversation.id,  # Use actual conversation ID, not session_id
             content=bot_response_content,
-            role="assistant"
+            role="assistant",
+            timestamp=bot_sent_at
         )
-        db.add(bot_message)
+        db.add_all([user_message, bot_message])
         
-        # Update conversation timestamp
+        # Summarising older turns may need a model call, so it runs after
+        # the response (see _compact_memory); the new turn is stored now
+        await conversation_memory.add_turn(memory, message_data.content, bot_response_content, compact=False)
+        conversation_memory.save(conversation, memory)
+        
+        # Update conversation timestamp; the reply is returned, so it has been seen
         conversation.updated_at = datetime.utcnow()
+        conversation.last_read_at = bot_sent_at
+        
+        # Sidebar summary in the same transaction as the messages
+        await db.execute(summary_updates(), summary_params([
+            {"conversation_id": conversation.id, "content": m.content, "timestamp": m.timestamp}
+            for m in (user_message, bot_message)
+        ]))
+        await db.commit()
         
-        db.commit()
-        db.refresh(user_message)
-        db.refresh(bot_message)
+        if conversation_memory.needs_compaction(memory):
+            # The task releases the memory once it is done with it
+            background_tasks.add_task(_compact_memory, memory_conversation_id, memory)
+            memory_conversation_id = None
         
         return MessageCreateResponse(
             user_message=MessageResponse(
@@ -246,17 +382,20 @@ async def send_message(
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error sending message: {str(e)}"
         )
+    finally:
+        if memory_conversation_id is not None:
+            conversation_memory.release(memory_conversation_id)
 
 @router.post("/conversations", response_model=ConversationCreateResponse)
 async def create_conversation(
     conversation_data: ConversationCreate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new conversation."""
     try:
@@ -266,8 +405,7 @@ async def create_conversation(
             user_id=current_user.id
         )
         db.add(conversation)
-        db.commit()
-        db.refresh(conversation)
+        await db.commit()
         
         return ConversationCreateResponse(
             session_id=conversation.session_id,
@@ -275,98 +413,115 @@ async def create_conversation(
             created_at=conversation.created_at
         )
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error creating conversation: {str(e)}"
         )
 
-# WebSocket support for real-time messaging
-from fastapi import WebSocket, WebSocketDisconnect
-
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[str, WebSocket] = {}
-        self.user_connections: Dict[int, str] = {}  # user_id -> session_id mapping
-
-    async def connect(self, websocket: WebSocket, session_id: str, user_id: int):
-        await websocket.accept()
-        self.active_connections[session_id] = websocket
-        self.user_connections[user_id] = session_id
-
-    def disconnect(self, session_id: str, user_id: int):
-        if session_id in self.active_connections:
-            del self.active_connections[session_id]
-        if user_id in self.user_connections:
-            del self.user_connections[user_id]
+# WebSocket support for real-time messaging. Frames fan out through
+# chat_connections, so every socket on a session or user gets them
+# whichever worker holds it.
+manager = chat_connections
 
-    async def send_personal_message(self, message: str, user_id: int):
-        if user_id in self.user_connections:
-            session_id = self.user_connections[user_id]
-            if session_id in self.active_connections:
-                await self.active_connections[session_id].send_text(message)
-
-    async def broadcast_message(self, message: str, session_id: str):
-        if session_id in self.active_connections:
-            await self.active_connections[session_id].send_text(message)
+def _authenticate_websocket_token(token: str) -> Optional[User]:
+    try:
+        return get_current_user(token)
+    except HTTPException:
+        return None
 
-manager = ConnectionManager()
+async def _load_websocket_conversation(session_id: str, user_id: int):
+    """(conversation id, memory) for a user's conversation, or None if it is not theirs."""
+    async with AsyncSessionLocal() as db:
+        conversation = await _get_conversation(db, session_id, user_id)
+        if not conversation:
+            return None
+        return conversation.id, await _load_memory(db, conversation)
 
 @router.websocket("/ws/{session_id}")
 async def websocket_endpoint(websocket: WebSocket, session_id: str, token: str):
-    """WebSocket endpoint for real-time chat messaging."""
+    """WebSocket endpoint for real-time chat messaging.
+
+    Client frames: {"type": "message", "content": ..., "client_id": ...}
+    and {"type": "ping"}. Each message is acknowledged with its sequence
+    number, then answered in order with the user message echo, token frames
+    as the reply streams, and the final assistant message, published to
+    every socket on the session. Messages are persisted write-behind.
+    """
+    user = await asyncio.to_thread(_authenticate_websocket_token, token)
+    if not user:
+        await websocket.close(code=4401)
+        return
+    loaded = await _load_websocket_conversation(session_id, user.id)
+    if loaded is None:
+        await websocket.close(code=4404)
+        return
+    conversation_id, memory = loaded
+    
+    # Connect user; a socket that cannot be subscribed is closed with 1011
     try:
-        # Verify token (simplified - in production use proper JWT verification)
-        from ..auth import verify_token
-        user = verify_token(token)
-        if not user:
-            await websocket.close(code=4401)
-            return
-        
-        # Connect user
-        await manager.connect(websocket, session_id, user.id)
-        
-        # Send welcome message
-        await manager.send_personal_message(
-            json.dumps({
-                "type": "connected",
-                "message": "Connected to chat",
-                "session_id": session_id
-            }), user.id
-        )
+        connection = await manager.connect(websocket, session_id, user.id)
+    except Exception as e:
+        print(f"WebSocket connect error: {e}")
+        return
+    turns = ChatTurnQueue(
+        session_id,
+        user.id,
+        conversation_id,
+        memory,
+        publish=manager.send_to_session,
+        tenant=_answer_cache_tenant(user),
+        fallback=get_simple_response,
+    )
+    try:
+        # Send welcome message to this socket only
+        connection.enqueue(json.dumps({
+            "type": "connected",
+            "message": "Connected to chat",
+            "session_id": session_id
+        }))
         
-        # Listen for messages
+        # Listen for messages. Nothing here waits on the database or the
+        # model: replies are generated by the turn queue's own task.
         while True:
             data = await websocket.receive_text()
-            message_data = json.loads(data)
+            try:
+                message_data = json.loads(data)
+            except json.JSONDecodeError:
+                connection.enqueue(json.dumps({"type": "error", "detail": "Invalid JSON"}))
+                continue
+            frame_type = message_data.get("type") if isinstance(message_data, dict) else None
             
-            if message_data["type"] == "message":
-                # Send typing indicator
-                await manager.send_personal_message(
-                    json.dumps({
-                        "type": "typing",
-                        "user_id": user.id,
-                        "is_typing": True
-                    }), user.id
-                )
-                
-                # Process message (reuse existing logic)
-                # This would integrate with the existing send_message logic
-                
-                # Send response
-                await manager.send_personal_message(
-                    json.dumps({
-                        "type": "message",
-                        "content": "Bot response received",
-                        "timestamp": datetime.utcnow().isoformat()
-                    }), user.id
-                )
+            if frame_type == "message":
+                content = message_data.get("content")
+                client_id = message_data.get("client_id")
+                if not isinstance(content, str) or not 1 <= len(content) <= MAX_MESSAGE_LENGTH:
+                    connection.enqueue(json.dumps({
+                        "type": "error", "client_id": client_id,
+                        "detail": f"content must be 1-{MAX_MESSAGE_LENGTH} characters"
+                    }))
+                    continue
+                turn = turns.submit(content, client_id)
+                if turn is None:
+                    connection.enqueue(json.dumps({
+                        "type": "error", "client_id": client_id,
+                        "detail": "Too many messages in flight; wait for a reply"
+                    }))
+                    continue
+                connection.enqueue(json.dumps({
+                    "type": "ack", "seq": turn.seq, "client_id": client_id, "pending": len(turns.pending)
+                }))
+            elif frame_type == "ping":
+                connection.enqueue(json.dumps({"type": "pong"}))
                 
     except WebSocketDisconnect:
-        manager.disconnect(session_id, user.id)
+        pass
     except Exception as e:
         print(f"WebSocket error: {e}")
-        manager.disconnect(session_id, user.id)
+    finally:
+        # Queued turns still finish and are persisted after the socket goes
+        turns.close()
+        await manager.disconnect(connection)
 
 # Enhanced endpoints with pagination and search
 class ConversationSearch(BaseModel):
@@ -378,34 +533,20 @@ class ConversationSearch(BaseModel):
 async def search_conversations(
     search_data: ConversationSearch,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Search conversations by content or keywords."""
+    """Search conversations by content or keywords.
+
+    Uses the full-text index on message content: conversations are ranked by
+    their best-matching message, each with a highlighted snippet and the
+    number of its messages that matched. limit/offset page over
+    conversations, and total_found counts all of them.
+    """
     try:
-        # Search in conversation messages for the query
-        messages = db.query(ChatMessage).join(ChatConversation).filter(
-            ChatConversation.user_id == current_user.id,
-            ChatMessage.content.ilike(f"%{search_data.query}%")
-        ).order_by(ChatMessage.timestamp.desc()).offset(search_data.offset).limit(search_data.limit).all()
-        
-        # Group by conversation
-        conversation_sessions = {}
-        for msg in messages:
-            conv_id = msg.conversation_id
-            if conv_id not in conversation_sessions:
-                conversation_sessions[conv_id] = {
-                    "session_id": msg.conversation.session_id,
-                    "last_message": msg.content,
-                    "last_timestamp": msg.timestamp,
-                    "message_count": 0
-                }
-            conversation_sessions[conv_id]["message_count"] += 1
-        
-        return {
-            "conversations": list(conversation_sessions.values()),
-            "total_found": len(conversation_sessions),
-            "query": search_data.query
-        }
+        results = await chat_search_index.search_async(
+            db, current_user.id, search_data.query, limit=search_data.limit, offset=search_data.offset
+        )
+        return {**results, "query": search_data.query}
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -21,15 +21,39 @@ from fastapi import APIRouter, HTTPException, UploadFile, File, Depends, Backgro
 from fastapi.responses import HTMLResponse, StreamingResponse
 from pydantic import BaseModel, Field
 from typing import Dict, List, Optional, Any
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from enum import Enum
 import logging
+import math
 import io
 import json
 from sqlalchemy.orm import Session
-from sqlalchemy import func, case
+from sqlalchemy import func, case, or_
 from ..database import SessionLocal
 from ..models import MLUsageLog
+from ..services.vision_jobs import (
+    VISION_BATCH_MAX_BYTES,
+    VISION_BATCH_MAX_IMAGE_BYTES,
+    VisionBatchBusyError,
+    extract_images_from_zip,
+    read_upload,
+    vision_job_manager,
+)
+from ..services.report_jobs import report_job_manager, REPORT_WAIT_SECONDS
+from ..services.model_router import model_router
+from ..services.resilience import circuit_breakers
+from ..services.usage_logger import usage_log_buffer, track_usage_endpoint
+from ..services.semantic_cache import semantic_cache
+from ..ml.local_nlp import local_nlp
+from ..ml.nlp_batch import (
+    NLP_BATCH_MAX_DOCUMENTS,
+    nlp_batch_runner,
+    classification_to_dict,
+    entities_to_list,
+    sentiment_to_dict,
+    risks_to_list,
+    action_items_to_list,
+)
 
 # ML module imports
 from ..ml import (
@@ -38,6 +62,7 @@ from ..ml import (
     SafetyComplianceDetector,
     EquipmentTracker,
     WorkplaceOrganizationAnalyzer,
+    CombinedSiteAnalyzer,
     
     # Waste Detection
     WasteDetectionEngine,
@@ -62,6 +87,7 @@ from ..ml import (
     
     # Phase 3 - NLP
     nlp_system,
+    nlp_keyword_scanners,
     DocumentType,
     
     # Phase 3 - Resource Optimization
@@ -102,13 +128,14 @@ from ..integrations import (
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/ml", tags=["Machine Learning"])
+router = APIRouter(prefix="/ml", tags=["Machine Learning"], dependencies=[Depends(track_usage_endpoint)])
 
 # Initialize ML components (lazy loading in production)
 _progress_pipeline = None
 _safety_detector = None
 _equipment_tracker = None
 _workplace_analyzer = None
+_combined_analyzer = None
 _waste_engine = None
 _forecast_system = None
 _reporting_system = None
@@ -138,6 +165,14 @@ def get_safety_detector():
     return _safety_detector
 
 
+def get_combined_analyzer():
+    """Lazy load combined multi-aspect site analyzer"""
+    global _combined_analyzer
+    if _combined_analyzer is None:
+        _combined_analyzer = CombinedSiteAnalyzer()
+    return _combined_analyzer
+
+
 def get_waste_engine():
     """Lazy load waste detection engine"""
     global _waste_engine
@@ -245,6 +280,33 @@ class ReportScheduleRequest(BaseModel):
     report_type: ReportTypeEnum = Field(..., description="Type of report")
     schedule: str = Field("daily", description="Schedule: daily, weekly, monthly")
     recipients: List[str] = Field(default_factory=list, description="Email recipients")
+    output_format: ReportFormatEnum = Field(ReportFormatEnum.json, description="Output format")
+    project_data: Optional[Dict[str, Any]] = Field(
+        None, description="Data to report on; defaults to the project's latest submitted data"
+    )
+
+
+class NLPBatchOperationEnum(str, Enum):
+    classify = "classify"
+    entities = "entities"
+    sentiment = "sentiment"
+    risks = "risks"
+
+
+class NLPBatchDocument(BaseModel):
+    """A single document in an NLP batch"""
+    id: Optional[str] = Field(None, description="Caller's document identifier, echoed in the result")
+    text: str = Field(..., description="Document text content")
+
+
+class NLPBatchRequest(BaseModel):
+    """Request model for batch NLP analysis"""
+    documents: List[NLPBatchDocument] = Field(..., description="Documents to analyze")
+    operations: List[NLPBatchOperationEnum] = Field(
+        default_factory=lambda: list(NLPBatchOperationEnum),
+        description="Analyses to run on every document"
+    )
+    sector: Optional[str] = Field(None, description="Industry sector whose keywords extend sentiment and risk analysis")
 
 
 # ============================================
@@ -256,7 +318,8 @@ async def analyze_progress(
     file: UploadFile = File(...),
     project_id: str = "default",
     include_activities: bool = True,
-    include_safety: bool = False
+    include_safety: bool = False,
+    include_5s: bool = False
 ):
     """
     Analyze construction progress from site image
@@ -265,22 +328,26 @@ async def analyze_progress(
     - **project_id**: Project identifier for tracking
     - **include_activities**: Include activity detection
     - **include_safety**: Include safety compliance check
+    - **include_5s**: Include 5S workplace organization check
+    
+    Extra aspects are analyzed in the same model call as progress.
     """
     try:
         # Read image data
         image_data = await file.read()
         
-        # Get pipeline
-        pipeline = get_progress_pipeline()
-        
-        # Analyze image
-        result = await pipeline.analyze_image(image_data)
-        
-        # Add safety analysis if requested
-        if include_safety:
-            safety_detector = get_safety_detector()
-            safety_result = await safety_detector.analyze(image_data)
-            result['safety_analysis'] = safety_result
+        if include_safety or include_5s:
+            # One combined call instead of one round-trip per aspect
+            aspects = ("progress",) + (("safety",) if include_safety else ()) + (("5s",) if include_5s else ())
+            combined = await get_combined_analyzer().analyze(image_data, aspects=aspects)
+            result = combined["progress"]
+            if include_safety:
+                result['safety_analysis'] = combined["safety"]
+            if include_5s:
+                result['workplace_analysis'] = combined["5s"]
+        else:
+            pipeline = get_progress_pipeline()
+            result = await pipeline.analyze_image(image_data)
         
         return ProgressAnalysisResponse(
             status="success",
@@ -355,6 +422,157 @@ async def analyze_workplace_organization(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/analyze-site")
+async def analyze_site(
+    file: UploadFile = File(...),
+    project_id: str = "default",
+    include_progress: bool = True,
+    include_safety: bool = True,
+    include_5s: bool = True
+):
+    """
+    Analyze progress, safety and 5S from one site image in a single model call
+    
+    - **file**: Site image (JPEG, PNG)
+    - **project_id**: Project identifier
+    - **include_progress**: Include progress analysis
+    - **include_safety**: Include safety compliance check
+    - **include_5s**: Include 5S workplace organization check
+    
+    Each section has the same shape as the corresponding single-aspect endpoint.
+    """
+    aspects = tuple(
+        aspect for aspect, wanted in (
+            ("progress", include_progress),
+            ("safety", include_safety),
+            ("5s", include_5s),
+        ) if wanted
+    )
+    if not aspects:
+        raise HTTPException(status_code=400, detail="At least one analysis aspect must be requested")
+    
+    try:
+        image_data = await file.read()
+        
+        combined = await get_combined_analyzer().analyze(image_data, aspects=aspects)
+        
+        response = {
+            "status": "success",
+            "project_id": project_id,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        if "progress" in combined:
+            response["analysis"] = combined["progress"]
+        if "safety" in combined:
+            response["safety_analysis"] = combined["safety"]
+        if "5s" in combined:
+            response["workplace_analysis"] = combined["5s"]
+        return response
+    
+    except Exception as e:
+        logger.error(f"Combined site analysis error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/vision/batch")
+async def create_vision_batch_job(
+    files: List[UploadFile] = File(...),
+    project_id: str = "default",
+    include_progress: bool = True,
+    include_safety: bool = True,
+    include_5s: bool = True
+):
+    """
+    Submit a batch of site photos for background analysis
+    
+    - **files**: Site images (JPEG, PNG) and/or zip archives of images
+    - **project_id**: Project identifier
+    - **include_progress / include_safety / include_5s**: Aspects to analyze per image
+    
+    Returns a job id; poll /vision/batch/{job_id} for progress. Answers 429
+    while this worker is already running its maximum number of batch jobs
+    (see services/vision_jobs.py).
+    """
+    aspects = tuple(
+        aspect for aspect, wanted in (
+            ("progress", include_progress),
+            ("safety", include_safety),
+            ("5s", include_5s),
+        ) if wanted
+    )
+    if not aspects:
+        raise HTTPException(status_code=400, detail="At least one analysis aspect must be requested")
+    if vision_job_manager.busy:
+        raise HTTPException(status_code=429, detail="Too many batch jobs are running; retry later")
+    
+    try:
+        images = []
+        total_bytes = 0
+        for upload in files:
+            filename = upload.filename or f"image_{len(images)}"
+            is_zip = filename.lower().endswith(".zip") or upload.content_type in ("application/zip", "application/x-zip-compressed")
+            # Read in chunks, stopping at the batch (or per-image) byte limit
+            remaining = VISION_BATCH_MAX_BYTES - total_bytes
+            data = await read_upload(upload, remaining if is_zip else min(VISION_BATCH_MAX_IMAGE_BYTES, remaining))
+            if is_zip:
+                extracted = extract_images_from_zip(
+                    data,
+                    max_images=vision_job_manager.max_images - len(images),
+                    max_bytes=VISION_BATCH_MAX_BYTES - total_bytes,
+                )
+                images.extend(extracted)
+                total_bytes += sum(len(image) for _, image in extracted)
+            else:
+                images.append((filename, data))
+                total_bytes += len(data)
+        
+        job = await vision_job_manager.submit(images, project_id=project_id, aspects=aspects)
+        
+        return {
+            "status": "accepted",
+            "job": job.progress(),
+            "timestamp": datetime.utcnow().isoformat()
+        }
+    
+    except VisionBatchBusyError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Vision batch submission error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/vision/batch")
+async def list_vision_batch_jobs(project_id: Optional[str] = None):
+    """List vision batch jobs, newest first"""
+    jobs = await vision_job_manager.list_jobs(project_id=project_id)
+    return {"status": "success", "jobs": jobs, "count": len(jobs)}
+
+
+@router.get("/vision/batch/{job_id}")
+async def get_vision_batch_progress(job_id: str):
+    """Get progress of a vision batch job"""
+    job = await vision_job_manager.get_job(job_id, with_results=False)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"status": "success", "job": job.progress()}
+
+
+@router.get("/vision/batch/{job_id}/results")
+async def get_vision_batch_results(job_id: str, only_failed: bool = False):
+    """Get per-image results of a vision batch job"""
+    job = await vision_job_manager.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    results = job.results()
+    if only_failed:
+        results = [r for r in results if r["status"] == "failed"]
+    
+    return {"status": "success", "job": job.progress(), "results": results}
+
+
 # ============================================
 # Waste Detection Endpoints
 # ============================================
@@ -552,53 +770,53 @@ async def forecast_cost(request: ForecastRequest):
 # ============================================
 
 @router.post("/reports/generate")
-async def generate_report(request: ReportGenerationRequest):
+async def generate_report(request: ReportGenerationRequest, wait: bool = False):
     """
     Generate a construction analytics report
     
     Report types: daily, weekly, monthly, executive, comprehensive
     Output formats: json, html, markdown
+    
+    Unchanged project data returns the stored report immediately. Otherwise
+    a job is queued for the report workers: poll `/reports/jobs/{job_id}`, or
+    pass `wait=true` to hold the request until the report is ready.
     """
     try:
-        system = get_reporting_system()
-        
-        # Map enum values
-        report_type_map = {
-            "daily": ReportType.DAILY,
-            "weekly": ReportType.WEEKLY,
-            "monthly": ReportType.MONTHLY,
-            "executive": ReportType.EXECUTIVE,
-            "comprehensive": ReportType.COMPREHENSIVE,
-            "waste_analysis": ReportType.WASTE_ANALYSIS,
-            "progress": ReportType.PROGRESS,
-            "safety": ReportType.SAFETY,
-            "forecast": ReportType.FORECAST
-        }
-        
-        format_map = {
-            "json": ReportFormat.JSON,
-            "html": ReportFormat.HTML,
-            "markdown": ReportFormat.MARKDOWN
-        }
-        
         # Add project_id to data
         project_data = {
             **request.project_data,
             'project_id': request.project_id
         }
         
-        report = system.generate_report(
+        job = report_job_manager.submit(
             project_data,
-            report_type=report_type_map[request.report_type],
-            output_format=format_map[request.output_format]
+            project_id=request.project_id,
+            report_type=request.report_type.value,
+            output_format=request.output_format.value
         )
+        if wait:
+            await report_job_manager.wait(job, timeout=REPORT_WAIT_SECONDS)
+        
+        if job.status == "failed":
+            raise HTTPException(status_code=502, detail=job.error)
+        if job.status != "completed":
+            return {
+                "status": "accepted",
+                "job": job.progress(),
+                "timestamp": datetime.utcnow().isoformat()
+            }
         
+        stored = report_job_manager.get_report(job)
         return {
             "status": "success",
-            "report": report,
+            "report": stored.report,
+            "version": stored.version,
+            "cached": job.cached,
             "timestamp": datetime.utcnow().isoformat()
         }
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Report generation error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -608,78 +826,117 @@ async def generate_report(request: ReportGenerationRequest):
 async def generate_html_report(request: ReportGenerationRequest):
     """
     Generate HTML report and return as renderable HTML
+    
+    Waits for the report workers (or the stored version for unchanged data).
     """
     try:
-        system = get_reporting_system()
-        
-        report_type_map = {
-            "daily": ReportType.DAILY,
-            "weekly": ReportType.WEEKLY,
-            "monthly": ReportType.MONTHLY,
-            "executive": ReportType.EXECUTIVE,
-            "comprehensive": ReportType.COMPREHENSIVE,
-            "waste_analysis": ReportType.WASTE_ANALYSIS,
-            "progress": ReportType.PROGRESS,
-            "safety": ReportType.SAFETY,
-            "forecast": ReportType.FORECAST
-        }
-        
         project_data = {
             **request.project_data,
             'project_id': request.project_id
         }
         
-        report = system.generate_report(
+        job = report_job_manager.submit(
             project_data,
-            report_type=report_type_map[request.report_type],
-            output_format=ReportFormat.HTML
+            project_id=request.project_id,
+            report_type=request.report_type.value,
+            output_format=ReportFormatEnum.html.value
         )
+        if not await report_job_manager.wait(job, timeout=REPORT_WAIT_SECONDS):
+            raise HTTPException(
+                status_code=504,
+                detail=f"Report is still generating; poll /ml/reports/jobs/{job.id}"
+            )
         
-        return report.get('html_content', '<html><body>Report generation error</body></html>')
+        stored = report_job_manager.get_report(job)
+        if not stored:
+            return '<html><body>Report generation error</body></html>'
+        return stored.report.get('content', '<html><body>Report generation error</body></html>')
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"HTML report error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/reports/jobs")
+async def list_report_jobs(project_id: Optional[str] = None, limit: int = 50):
+    """List report generation jobs, newest first"""
+    jobs = report_job_manager.list_jobs(project_id=project_id, limit=limit)
+    return {"status": "success", "jobs": jobs, "count": len(jobs), "stats": report_job_manager.stats()}
+
+
+@router.get("/reports/jobs/{job_id}")
+async def get_report_job(job_id: str):
+    """Get a report job, with the report once it has completed"""
+    job = report_job_manager.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    stored = report_job_manager.get_report(job)
+    return {
+        "status": "success",
+        "job": job.progress(),
+        "report": stored.report if stored else None
+    }
+
+
+@router.get("/reports/versions/{project_id}/{report_type}/{output_format}")
+async def get_report_version(project_id: str, report_type: str, output_format: str, version: Optional[int] = None):
+    """Get the latest stored report, or a specific version"""
+    stored = report_job_manager.store.get((project_id, report_type, output_format), version)
+    if not stored:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return {"status": "success", **stored.summary(), "report": stored.report}
+
+
 @router.post("/reports/schedule")
 async def schedule_report(request: ReportScheduleRequest):
     """
     Schedule automated report generation
+    
+    Reports are produced by the report workers in the off-peak window. Each
+    run uses `project_data` if given, else the project's latest submitted
+    data, so an unchanged project is served from the stored version.
     """
     try:
-        system = get_reporting_system()
-        
-        report_type_map = {
-            "daily": ReportType.DAILY,
-            "weekly": ReportType.WEEKLY,
-            "monthly": ReportType.MONTHLY,
-            "executive": ReportType.EXECUTIVE,
-            "comprehensive": ReportType.COMPREHENSIVE,
-            "waste_analysis": ReportType.WASTE_ANALYSIS,
-            "progress": ReportType.PROGRESS,
-            "safety": ReportType.SAFETY,
-            "forecast": ReportType.FORECAST
-        }
-        
-        schedule_config = system.schedule_report(
+        schedule_config = report_job_manager.schedule(
             project_id=request.project_id,
-            report_type=report_type_map[request.report_type],
+            report_type=request.report_type.value,
+            output_format=request.output_format.value,
             schedule=request.schedule,
-            recipients=request.recipients
+            recipients=request.recipients,
+            project_data=request.project_data
         )
         
         return {
             "status": "success",
-            "schedule": schedule_config,
+            "schedule": schedule_config.to_dict(),
             "timestamp": datetime.utcnow().isoformat()
         }
     
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Report scheduling error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/reports/schedules")
+async def list_report_schedules(project_id: Optional[str] = None):
+    """List scheduled reports"""
+    schedules = report_job_manager.list_schedules(project_id=project_id)
+    return {"status": "success", "schedules": schedules, "count": len(schedules)}
+
+
+@router.delete("/reports/schedules/{schedule_id}")
+async def cancel_report_schedule(schedule_id: str):
+    """Cancel a scheduled report"""
+    if not report_job_manager.cancel_schedule(schedule_id):
+        raise HTTPException(status_code=404, detail="Schedule not found")
+    return {"status": "success", "schedule_id": schedule_id}
+
+
 @router.get("/reports/history")
 async def get_report_history(
     project_id: Optional[str] = None,
@@ -687,25 +944,12 @@ async def get_report_history(
     limit: int = 50
 ):
     """
-    Get report generation history
+    Get report generation history (stored report versions, newest first)
     """
     try:
-        system = get_reporting_system()
-        
-        rt = None
-        if report_type:
-            report_type_map = {
-                "daily": ReportType.DAILY,
-                "weekly": ReportType.WEEKLY,
-                "monthly": ReportType.MONTHLY,
-                "executive": ReportType.EXECUTIVE,
-                "comprehensive": ReportType.COMPREHENSIVE
-            }
-            rt = report_type_map.get(report_type)
-        
-        history = system.get_report_history(
+        history = report_job_manager.history(
             project_id=project_id,
-            report_type=rt,
+            report_type=report_type,
             limit=limit
         )
         
@@ -817,6 +1061,108 @@ async def get_model_metrics(
         # This prevents crashing if migrations haven't run
         return {"metrics": [], "error": str(e)}
 
+@router.get("/models/usage")
+async def get_model_usage(
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    model_name: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Get per-model and per-endpoint p50/p95 latency and token spend from the
+    ML usage log (defaults to the last 24 hours)
+    """
+    end_date = end_date or datetime.now(timezone.utc)
+    start_date = start_date or end_date - timedelta(hours=24)
+    try:
+        filters = [MLUsageLog.created_at >= start_date, MLUsageLog.created_at <= end_date]
+        if model_name:
+            filters.append(MLUsageLog.model_name == model_name)
+
+        # Totals per (model, endpoint) are aggregated in SQL, then rolled up
+        # to each dimension; no individual log rows are loaded
+        rows = db.query(
+            MLUsageLog.model_name,
+            MLUsageLog.endpoint,
+            func.count(MLUsageLog.id).label("calls"),
+            func.sum(case((MLUsageLog.error_occurred == True, 1), else_=0)).label("errors"),
+            func.sum(MLUsageLog.tokens_input).label("tokens_input"),
+            func.sum(MLUsageLog.tokens_output).label("tokens_output")
+        ).filter(*filters).group_by(MLUsageLog.model_name, MLUsageLog.endpoint).all()
+
+        groups: Dict[str, Dict[str, Dict[str, Any]]] = {"by_model": {}, "by_endpoint": {}}
+        for row in rows:
+            for group, key in (("by_model", row.model_name), ("by_endpoint", row.endpoint)):
+                bucket = groups[group].setdefault(key or "unknown", {
+                    "keys": set(), "calls": 0, "errors": 0, "tokens_input": 0, "tokens_output": 0, "cost_usd": 0.0
+                })
+                bucket["keys"].add(key)
+                bucket["calls"] += row.calls
+                bucket["errors"] += row.errors or 0
+                bucket["tokens_input"] += row.tokens_input or 0
+                bucket["tokens_output"] += row.tokens_output or 0
+                bucket["cost_usd"] += model_router.estimate_cost(
+                    row.model_name, row.tokens_input or 0, row.tokens_output or 0
+                )
+
+        latency = func.coalesce(MLUsageLog.latency_ms, 0)
+
+        def latency_percentile(column, keys, calls: int, pct: float) -> float:
+            # Nearest rank, read as a single row with ORDER BY ... OFFSET
+            rank = min(calls, max(math.ceil(pct / 100 * calls), 1))
+            named = [k for k in keys if k is not None]
+            match = or_(column.in_(named), column.is_(None)) if None in keys else column.in_(named)
+            value = db.query(latency).filter(*filters, match).order_by(latency).offset(rank - 1).limit(1).scalar()
+            return float(value or 0)
+
+        def summarize(column, bucket: Dict[str, Any]) -> Dict[str, Any]:
+            calls = bucket["calls"]
+            return {
+                "total_calls": calls,
+                "error_rate": round(bucket["errors"] / calls, 4) if calls else 0,
+                "p50_latency_ms": round(latency_percentile(column, bucket["keys"], calls, 50), 1),
+                "p95_latency_ms": round(latency_percentile(column, bucket["keys"], calls, 95), 1),
+                "tokens_input": bucket["tokens_input"],
+                "tokens_output": bucket["tokens_output"],
+                "estimated_cost_usd": round(bucket["cost_usd"], 6)
+            }
+
+        return {
+            "start_date": start_date,
+            "end_date": end_date,
+            "by_model": {k: summarize(MLUsageLog.model_name, v) for k, v in groups["by_model"].items()},
+            "by_endpoint": {k: summarize(MLUsageLog.endpoint, v) for k, v in groups["by_endpoint"].items()},
+            "buffer": usage_log_buffer.stats()
+        }
+
+    except Exception as e:
+        logger.error(f"Model usage error: {e}")
+        return {"by_model": {}, "by_endpoint": {}, "buffer": usage_log_buffer.stats(), "error": str(e)}
+
+@router.get("/models/routing")
+async def get_model_routing():
+    """
+    Get Gemini model routing policy, per-route latency/token/cost stats and
+    circuit breaker states
+    """
+    return {
+        "status": "success",
+        "routing": model_router.get_stats(),
+        "circuits": circuit_breakers.snapshot()
+    }
+
+@router.get("/models/semantic-cache")
+async def get_semantic_cache_stats():
+    """
+    Get chat semantic cache size and hit rate (aggregates only; tenants are
+    per user, so no per-tenant figures are exposed)
+    """
+    return {
+        "status": "success",
+        "cache": semantic_cache.stats()
+    }
+
+
 # ============================================
 # Health Check & Status
 # ============================================
@@ -1146,16 +1492,8 @@ async def classify_document(text: str):
     Returns document type (RFI, submittal, change order, etc.)
     """
     try:
-        classification = nlp_system.classifier.classify(text)
-        return {
-            "status": "success",
-            "classification": {
-                "document_type": classification.document_type.value,
-                "confidence": classification.confidence,
-                "secondary_type": classification.secondary_type.value if classification.secondary_type else None,
-                "keywords": classification.keywords
-            }
-        }
+        classification = await nlp_system.classifier.classify(text)
+        return {"status": "success", "classification": classification_to_dict(classification)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1164,37 +1502,38 @@ async def classify_document(text: str):
 async def extract_entities(text: str):
     """Extract named entities from text"""
     try:
-        entities = nlp_system.ner.extract_entities(text)
-        return {
-            "status": "success",
-            "entities": [
-                {
-                    "text": e.text,
-                    "type": e.entity_type.value,
-                    "confidence": e.confidence
-                }
-                for e in entities
-            ]
-        }
+        entities = await nlp_system.ner.extract_entities(text)
+        return {"status": "success", "entities": entities_to_list(entities)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/nlp/fast-path/stats")
+async def get_nlp_fast_path_stats():
+    """
+    Get local NLP fast path thresholds and escalation rates to Gemini
+    """
+    return {"status": "success", "fast_path": local_nlp.get_stats()}
+
+
+def _nlp_sector(sector: Optional[str]) -> Optional[str]:
+    """Validate an optional industry sector for keyword-based NLP analysis"""
+    if sector and sector not in {s.value for s in IndustrySector}:
+        raise HTTPException(status_code=404, detail="Industry sector not found")
+    return sector
+
+
 @router.post("/nlp/analyze-sentiment")
-async def analyze_sentiment(text: str):
-    """Analyze communication sentiment and urgency"""
+async def analyze_sentiment(text: str, sector: Optional[str] = None):
+    """Analyze communication sentiment and urgency, with optional sector keywords"""
+    hits = nlp_keyword_scanners.scan(text, _nlp_sector(sector))
     try:
-        sentiment = nlp_system.sentiment_analyzer.analyze_sentiment(text)
-        urgency = nlp_system.sentiment_analyzer.analyze_urgency(text)
+        sentiment = nlp_system.sentiment_analyzer.analyze_sentiment(text, hits=hits)
+        urgency = nlp_system.sentiment_analyzer.analyze_urgency(text, hits=hits)
         
         return {
             "status": "success",
-            "sentiment": {
-                "level": sentiment.sentiment.value,
-                "score": sentiment.score,
-                "positive_indicators": sentiment.positive_indicators,
-                "negative_indicators": sentiment.negative_indicators
-            },
+            "sentiment": sentiment_to_dict(sentiment),
             "urgency": urgency.value
         }
     except Exception as e:
@@ -1202,37 +1541,54 @@ async def analyze_sentiment(text: str):
 
 
 @router.post("/nlp/extract-risks")
-async def extract_risks(text: str):
-    """Extract risks and action items from document"""
+async def extract_risks(text: str, sector: Optional[str] = None):
+    """Extract risks and action items from document, with optional sector keywords"""
+    hits = nlp_keyword_scanners.scan(text, _nlp_sector(sector))
     try:
-        risks = nlp_system.risk_extractor.extract_risks(text)
-        actions = nlp_system.risk_extractor.extract_action_items(text)
+        risks = nlp_system.risk_extractor.extract_risks(text, hits=hits)
+        actions = nlp_system.risk_extractor.extract_action_items(text, hits=hits)
         
         return {
             "status": "success",
-            "risks": [
-                {
-                    "description": r.description,
-                    "category": r.category,
-                    "severity": r.severity,
-                    "confidence": r.confidence
-                }
-                for r in risks
-            ],
-            "action_items": [
-                {
-                    "description": a.description,
-                    "assignee": a.assignee,
-                    "due_date": a.due_date,
-                    "priority": a.priority
-                }
-                for a in actions
-            ]
+            "risks": risks_to_list(risks),
+            "action_items": action_items_to_list(actions)
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/nlp/batch")
+async def analyze_batch(request: NLPBatchRequest):
+    """
+    Analyze many documents in one request, streamed back as NDJSON
+    
+    Each line is one document's result with its batch `index` and `id`, in
+    completion order. Sentiment and risk analysis run locally; classification
+    and entity extraction escalate to Gemini concurrently. The final line is
+    a `{"done": true, ...}` summary.
+    """
+    if not request.documents:
+        raise HTTPException(status_code=400, detail="At least one document is required")
+    if len(request.documents) > NLP_BATCH_MAX_DOCUMENTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch exceeds the limit of {NLP_BATCH_MAX_DOCUMENTS} documents"
+        )
+    
+    documents = [{"id": d.id, "text": d.text} for d in request.documents]
+    operations = [op.value for op in request.operations]
+    sector = _nlp_sector(request.sector)
+    
+    async def stream():
+        errors = 0
+        async for result in nlp_batch_runner.run(documents, operations, sector=sector):
+            errors += "error" in result
+            yield json.dumps(result) + "\n"
+        yield json.dumps({"done": True, "documents": len(documents), "errors": errors}) + "\n"
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
 @router.post("/nlp/analyze-contract")
 async def analyze_contract(text: str):
     """Analyze contract document for key clauses and risks"""
@@ -2153,6 +2509,41 @@ async def get_industry_benchmarks(sector: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/industry/keywords/{sector}")
+async def get_industry_keywords(sector: str):
+    """Get the keyword categories used by NLP sentiment, urgency and risk analysis for a sector"""
+    sector_map = {s.value: s for s in IndustrySector}
+    industry_sector = sector_map.get(sector)
+    
+    if not industry_sector:
+        raise HTTPException(status_code=404, detail="Industry sector not found")
+    
+    return {"status": "success", "keywords": industry_customization_system.get_keywords(industry_sector)}
+
+
+@router.post("/industry/keywords/{sector}")
+async def add_industry_keywords(sector: str, keywords: Dict[str, List[str]]):
+    """
+    Extend a sector's NLP keywords
+    
+    - **keywords**: Category to keywords, e.g. `{"risk": ["cofferdam"], "urgent": ["outage"]}`.
+      Categories: positive, negative, urgent, risk, action
+    """
+    sector_map = {s.value: s for s in IndustrySector}
+    industry_sector = sector_map.get(sector)
+    
+    if not industry_sector:
+        raise HTTPException(status_code=404, detail="Industry sector not found")
+    
+    try:
+        updated = industry_customization_system.add_keywords(industry_sector, keywords)
+        return {"status": "success", "keywords": updated}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/industry/configure-project")
 async def configure_project_for_industry(
     project_id: str,
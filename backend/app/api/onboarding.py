@@ -5,6 +5,8 @@ Handles user registration, onboarding flow, demo accounts, and email notificatio
 """
 
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from typing import List, Optional
@@ -13,9 +15,9 @@ import secrets
 import string
 from pydantic import BaseModel
 
-from ..database import SessionLocal
+from ..database import SessionLocal, get_async_db
 from ..models import User, Project, Task, WasteLog, OnboardingEvent, EmailNotification
-from ..auth import get_password_hash, get_current_active_user
+from ..auth import get_password_hash_async, get_current_active_user, invalidate_user
 
 router = APIRouter(prefix="/onboarding", tags=["onboarding"])
 
@@ -62,7 +64,7 @@ async def register_user(user_data: UserRegistration, background_tasks: Backgroun
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     new_user = User(
         email=user_data.email,
         hashed_password=hashed_password,
@@ -124,7 +126,7 @@ async def verify_email(verification: EmailVerification, db: Session = Depends(ge
     return {"message": "Email verified successfully", "next_step": "profile_completion"}
 
 @router.get("/progress")
-async def get_onboarding_progress(current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
+async def get_onboarding_progress(current_user: User = Depends(get_current_active_user), db: AsyncSession = Depends(get_async_db)):
     """Get user's onboarding progress"""
     
     completed_steps = []
@@ -133,7 +135,8 @@ async def get_onboarding_progress(current_user: User = Depends(get_current_activ
     features_explored = []
     
     # Check completed steps
-    events = db.query(OnboardingEvent).filter(OnboardingEvent.user_id == current_user.id).all()
+    result = await db.execute(select(OnboardingEvent).where(OnboardingEvent.user_id == current_user.id))
+    events = result.scalars().all()
     
     for event in events:
         if event.event_type == "signup":
@@ -161,9 +164,11 @@ async def get_onboarding_progress(current_user: User = Depends(get_current_activ
     )
 
 @router.post("/complete-profile")
-async def complete_profile(current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
+async def complete_profile(current_user: User = Depends(get_current_active_user), db: AsyncSession = Depends(get_async_db)):
     """Mark profile as completed"""
     
+    # current_user comes from a closed session, so update the row directly
+    await db.execute(update(User).where(User.id == current_user.id).values(onboarding_step=3))
     current_user.onboarding_step = 3
     
     # Track event
@@ -173,7 +178,8 @@ async def complete_profile(current_user: User = Depends(get_current_active_user)
         event_data=json.dumps({"completed_at": datetime.utcnow().isoformat()})
     )
     db.add(event)
-    db.commit()
+    await db.commit()
+    invalidate_user(current_user.email)
     
     return {"message": "Profile completed", "next_step": "create_first_project"}
 
@@ -193,7 +199,7 @@ async def create_demo_account(request: DemoAccountRequest, background_tasks: Bac
     # Create demo user
     demo_user = User(
         email=demo_email,
-        hashed_password=get_password_hash(demo_password),
+        hashed_password=await get_password_hash_async(demo_password),
         full_name=f"Demo {request.account_type.title()} Contractor",
         company=request.company_name or f"Demo {request.account_type.title()} Construction",
         role="manager",
@@ -250,7 +256,7 @@ async def track_onboarding_event(
     event_type: str,
     event_data: dict,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Track onboarding events for analytics"""
     
@@ -260,17 +266,20 @@ async def track_onboarding_event(
         event_data=json.dumps(event_data)
     )
     db.add(event)
-    db.commit()
     
     # Update user's onboarding step based on event
+    changes = {}
     if event_type == "first_project_created" and current_user.onboarding_step < 4:
-        current_user.onboarding_step = 4
+        changes = {"onboarding_step": 4}
     elif event_type == "feature_explored" and current_user.onboarding_step < 5:
-        current_user.onboarding_step = 5
-        current_user.is_onboarded = True
-        current_user.onboarding_completed_at = datetime.utcnow()
-    
-    db.commit()
+        changes = {"onboarding_step": 5, "is_onboarded": True, "onboarding_completed_at": datetime.utcnow()}
+    if changes:
+        # current_user comes from a closed session, so update the row directly
+        await db.execute(update(User).where(User.id == current_user.id).values(**changes))
+    
+    await db.commit()
+    if changes:
+        invalidate_user(current_user.email)
     
     return {"message": "Event tracked successfully"}
 
@@ -1,18 +1,45 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Dict, Optional, Tuple
+from collections import OrderedDict
+import os
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
 from .database import SessionLocal
 from .models import User
+from .services.usage_logger import usage_user_id
 
 SECRET_KEY = "your-secret-key-here"  # In production, use environment variable
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Authenticated-user cache: how long a user row is reused before it is
+# re-read, and how many users are kept per process
+AUTH_USER_CACHE_TTL_SECONDS = float(os.getenv("AUTH_USER_CACHE_TTL_SECONDS", "30"))
+AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", "10000"))
+
+# bcrypt cost factor. Hashes made with any other cost are rehashed on the
+# user's next successful login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Password hashing threads per process, and how many more calls may wait for
+# one before new logins are turned away with a 503
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "64"))
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 def verify_password(plain_password, hashed_password):
@@ -21,6 +48,104 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+
+class PasswordHasher:
+    """Runs bcrypt on a small dedicated thread pool so async handlers never
+    spend its CPU time on the event loop.
+
+    The pool is separate from the default executor (used by sync routes and
+    asyncio.to_thread), so a burst of logins cannot starve other work, and it
+    is bounded: once max_queue calls are waiting, further ones fail fast with
+    503 instead of piling up behind each other.
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_queue: int = PASSWORD_HASH_MAX_QUEUE):
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.running = 0
+        self._pending = 0
+        self._wait_ms_total = 0.0
+        self._wait_ms_max = 0.0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        return self._executor
+
+    async def _run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many sign-in attempts in progress, please retry",
+                    headers={"Retry-After": "1"},
+                )
+            self._pending += 1
+        submitted = time.perf_counter()
+
+        def call():
+            waited_ms = (time.perf_counter() - submitted) * 1000
+            with self._lock:
+                self.running += 1
+                self._wait_ms_total += waited_ms
+                self._wait_ms_max = max(self._wait_ms_max, waited_ms)
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self.running -= 1
+                    self._pending -= 1
+                    self.completed += 1
+
+        return await asyncio.get_running_loop().run_in_executor(self.executor, call)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(pwd_context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """(matches, new_hash): new_hash is set when the stored hash should be
+        replaced because the cost settings changed."""
+        valid, new_hash = await self._run(pwd_context.verify_and_update, password, hashed_password)
+        if new_hash:
+            self.rehashed += 1
+        return valid, new_hash
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "running": self.running,
+                "queued": self._pending - self.running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "rehashed": self.rehashed,
+                "avg_wait_ms": round(self._wait_ms_total / self.completed, 2) if self.completed else 0,
+                "max_wait_ms": round(self._wait_ms_max, 2),
+                "bcrypt_rounds": BCRYPT_ROUNDS,
+            }
+
+
+# Global password hashing pool
+password_hasher = PasswordHasher()
+
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash off the event loop."""
+    return await password_hasher.hash(password)
+
 def authenticate_user(db: Session, email: str, password: str):
     user = db.query(User).filter(User.email == email).first()
     if not user:
@@ -29,6 +154,38 @@ def authenticate_user(db: Session, email: str, password: str):
         return False
     return user
 
+async def authenticate_user_async(db, email: str, password: str):
+    """authenticate_user for an AsyncSession, with bcrypt off the event loop.
+
+    A hash made with outdated cost settings is replaced on the user; the
+    caller's commit saves it.
+    """
+    from sqlalchemy import select
+
+    result = await db.execute(select(User).where(User.email == email))
+    user = result.scalars().first()
+    if not user:
+        return False
+    valid, new_hash = await password_hasher.verify(password, user.hashed_password)
+    if not valid:
+        return False
+    if new_hash:
+        user.hashed_password = new_hash
+    return user
+
+def rate_limit_tier(user: User) -> str:
+    """Tenant tier used to pick rate limits (see services/rate_limiter.py)."""
+    if user.demo_account:
+        return "demo"
+    if user.company_size in ("small", "medium", "enterprise"):
+        return user.company_size
+    return "small"
+
+def token_claims(user: User) -> dict:
+    """Access token claims for a user: the subject plus the rate limit tier,
+    so the limiter can pick limits without a database lookup."""
+    return {"sub": user.email, "tier": rate_limit_tier(user)}
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -39,6 +196,86 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+class AuthUserCache:
+    """Short-TTL, per-process cache of user rows keyed by token subject (email).
+
+    Saves the user lookup on every authenticated request. Entries are
+    dropped when the user row changes (see invalidate_user); other worker
+    processes keep theirs until the TTL runs out, which bounds how long a
+    role or active-status change takes to apply everywhere.
+    """
+
+    def __init__(self, ttl_seconds: float = AUTH_USER_CACHE_TTL_SECONDS,
+                 max_size: int = AUTH_USER_CACHE_SIZE, clock=time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max(1, max_size)
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, email: str) -> Optional[User]:
+        """A fresh detached User for `email`, or None if not cached."""
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is None or entry[0] <= self._clock():
+                if entry is not None:
+                    del self._entries[email]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(email)
+            self.hits += 1
+            values = entry[1]
+        # A new instance per request, so one request changing its
+        # current_user cannot leak into another's
+        user = User(**values)
+        make_transient_to_detached(user)
+        return user
+
+    def put(self, user: User) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        values = {column.key: getattr(user, column.key) for column in inspect(User).column_attrs}
+        with self._lock:
+            self._entries[user.email] = (self._clock() + self.ttl_seconds, values)
+            self._entries.move_to_end(user.email)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, email: Optional[str] = None) -> None:
+        """Drop one user, or every user when no email is given."""
+        with self._lock:
+            if email is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(email, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "ttl_seconds": self.ttl_seconds}
+
+
+# Global authenticated-user cache
+user_cache = AuthUserCache()
+
+
+def invalidate_user(email: Optional[str] = None) -> None:
+    """Call after changing a user row with a bulk UPDATE; ORM updates to a
+    User invalidate automatically."""
+    user_cache.invalidate(email)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target):
+    user_cache.invalidate(target.email)
+    # A changed email leaves the old key behind
+    history = inspect(target).attrs.email.history
+    for email in history.deleted or ():
+        user_cache.invalidate(email)
+
+
 def get_current_user(token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -52,14 +289,21 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
             raise credentials_exception
     except JWTError:
         raise credentials_exception
+    user = user_cache.get(email)
+    if user is not None:
+        return user
     db = SessionLocal()
     user = db.query(User).filter(User.email == email).first()
     db.close()
     if user is None:
         raise credentials_exception
+    user_cache.put(user)
     return user
 
-def get_current_active_user(current_user: User = Depends(get_current_user)):
+async def get_current_active_user(current_user: User = Depends(get_current_user)):
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
+    # Async so the context variable is set in the request's own context and
+    # AI calls made while serving it are logged against this user
+    usage_user_id.set(current_user.id)
     return current_user
@@ -4,12 +4,15 @@ from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.staticfiles import StaticFiles
 from sqlalchemy.orm import Session
 from datetime import timedelta
-from .database import SessionLocal, engine
+from sqlalchemy.ext.asyncio import AsyncSession
+from .database import SessionLocal, engine, get_async_db, dispose_async_engine
 from .models import Base, User, Project, Task, WasteLog
-from .auth import authenticate_user, create_access_token, get_current_active_user, get_password_hash
+from .auth import authenticate_user, authenticate_user_async, create_access_token, get_current_active_user, get_password_hash, password_hasher, token_claims
 from .integrations.procore import ProcoreClient, analyze_procore_data_for_waste
 from .tasks.data_ingestion import ingest_external_data
 from .api.ml_routes import router as ml_router
+from .services.chat_search import chat_search_index
+from .middleware.security import RateLimitMiddleware
 from pydantic import BaseModel
 import os
 
@@ -33,12 +36,19 @@ cors_credentials = os.getenv("CORS_ALLOW_CREDENTIALS", "true").lower() == "true"
 cors_methods = os.getenv("CORS_ALLOW_METHODS", "*").split(",") if os.getenv("CORS_ALLOW_METHODS") else ["*"]
 cors_headers = os.getenv("CORS_ALLOW_HEADERS", "*").split(",") if os.getenv("CORS_ALLOW_HEADERS") else ["*"]
 
+# Rate limiting by client, route class and tenant tier (opt-in with
+# RATE_LIMIT_ENABLED=true). Added before CORS so 429 responses still carry
+# CORS headers
+if os.getenv("RATE_LIMIT_ENABLED", "false").lower() == "true":
+    app.add_middleware(RateLimitMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=cors_origins,
     allow_credentials=cors_credentials,
     allow_methods=cors_methods,
     allow_headers=cors_headers,
+    expose_headers=["X-Next-Cursor", "X-RateLimit-Limit", "X-RateLimit-Remaining"],
 )
 
 # Include ML API routes
@@ -64,6 +74,46 @@ app.include_router(payments_router)
 from .api.chat import router as chat_router
 app.include_router(chat_router, prefix="/api/v1")
 
+# Flush queued ML usage records and chat messages and stop background workers before the process exits
+from .services.usage_logger import usage_log_buffer
+from .services.report_jobs import report_job_manager
+from .services.chat_pubsub import chat_connections
+from .services.chat_persistence import chat_write_behind
+
+@app.on_event("startup")
+def create_chat_search_index():
+    # Only where it is cheap: PostgreSQL tables with messages get theirs from migration 004
+    chat_search_index.ensure(engine)
+
+@app.on_event("startup")
+async def start_report_scheduler():
+    # Schedules are stored in the database and outlive the process that made them
+    report_job_manager.start()
+
+@app.on_event("shutdown")
+async def flush_usage_logs():
+    await usage_log_buffer.stop()
+
+@app.on_event("shutdown")
+async def stop_report_workers():
+    await report_job_manager.stop()
+
+@app.on_event("shutdown")
+async def close_chat_connections():
+    await chat_connections.close()
+
+@app.on_event("shutdown")
+async def flush_chat_messages():
+    await chat_write_behind.stop()
+
+@app.on_event("shutdown")
+async def close_async_database():
+    await dispose_async_engine()
+
+@app.on_event("shutdown")
+async def stop_password_hashing():
+    password_hasher.shutdown()
+
 # Dependency to get DB session
 def get_db():
     db = SessionLocal()
@@ -100,17 +150,19 @@ class WasteLogCreate(BaseModel):
     impact_time: float
 
 @app.post("/token")
-async def login(form_data: OAuth2PasswordRequestForm = Depends(OAuth2PasswordRequestForm), db: Session = Depends(get_db)):
-    user = authenticate_user(db, form_data.username, form_data.password)
+async def login(form_data: OAuth2PasswordRequestForm = Depends(OAuth2PasswordRequestForm), db: AsyncSession = Depends(get_async_db)):
+    user = await authenticate_user_async(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=400,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    # Saves a rehashed password when the bcrypt cost has changed
+    await db.commit()
     access_token_expires = timedelta(minutes=30)
     access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data=token_claims(user), expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -351,26 +403,11 @@ frontend_build_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirnam
 if os.path.isdir(frontend_build_dir):
     app.mount("/dashboard", StaticFiles(directory=frontend_build_dir, html=True), name="frontend")
 
-# Proxy root path to Next.js website (port 3001)
-from fastapi.responses import Response
-import httpx
-
-NEXTJS_URL = "http://localhost:3001"
-
-@app.middleware("http")
-async def proxy_website(request, call_next):
-    path = request.url.path
-    # Let these paths through to FastAPI
-    fastapi_prefixes = ("/api/", "/dashboard", "/docs", "/redoc", "/openapi.json",
-                        "/token", "/auth/", "/users/", "/projects/", "/integrations/")
-    if path.startswith(fastapi_prefixes):
-        return await call_next(request)
-    # Everything else -> Next.js (preserve query string from request.url)
-    async with httpx.AsyncClient() as client:
-        try:
-            # Replace scheme+host+port with Next.js URL, preserve path+query
-            next_url = str(request.url).replace(str(request.base_url), NEXTJS_URL + "/")
-            resp = await client.get(next_url)
-            return Response(content=resp.content, status_code=resp.status_code, media_type=resp.headers.get("content-type", "text/html"))
-        except httpx.ConnectError:
-            return Response(content="Website is starting up...", status_code=503)
+# Proxy everything outside the API to the Next.js website (port 3001)
+from .middleware.website_proxy import WebsiteProxyMiddleware, website_proxy
+
+app.add_middleware(WebsiteProxyMiddleware, proxy=website_proxy)
+
+@app.on_event("shutdown")
+async def close_website_proxy():
+    await website_proxy.aclose()
@@ -3,6 +3,7 @@ Security and middleware modules for FastAPI backend.
 """
 
 from .security import (
+    SecurityMiddleware,
     SecurityHeadersMiddleware,
     RateLimitMiddleware,
     RequestLoggingMiddleware,
@@ -12,8 +13,10 @@ from .security import (
     validate_content_type,
     generate_nonce
 )
+from .website_proxy import ReverseProxy, WebsiteProxyMiddleware
 
 __all__ = [
+    "SecurityMiddleware",
     "SecurityHeadersMiddleware",
     "RateLimitMiddleware", 
     "RequestLoggingMiddleware",
@@ -21,5 +24,7 @@ __all__ = [
     "add_security_middleware",
     "sanitize_input",
     "validate_content_type",
-    "generate_nonce"
+    "generate_nonce",
+    "ReverseProxy",
+    "WebsiteProxyMiddleware",
 ]
\ No newline at end of file
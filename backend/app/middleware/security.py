@@ -3,149 +3,192 @@ Security middleware for FastAPI backend.
 Implements security headers and other protective measures.
 """
 
-from fastapi import Request, Response
+from fastapi import Request
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+import math
 import time
 import logging
 
+from ..services.rate_limiter import RateLimiter, identify, rate_limiter, route_class
+
 logger = logging.getLogger(__name__)
 
 
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
+DEFAULT_CSP_POLICY = "default-src 'self'; script-src 'self' 'unsafe-inline' 'unsafe-eval'; style-src 'self' 'unsafe-inline' https://fonts.googleapis.com; font-src 'self' https://fonts.gstatic.com; img-src 'self' data: https:; connect-src 'self' http://localhost:* https://*.leanconstruction.ai; frame-ancestors 'self'; form-action 'self'; base-uri 'self';"
+
+
+def security_headers(csp_policy: str = None) -> list:
     """
-    Middleware to add security headers to all responses.
+    Security headers added to every response, as raw ASGI header tuples.
     """
-    
-    def __init__(self, app: ASGIApp, csp_policy: str = None):
-        super().__init__(app)
-        # Default Content Security Policy
-        if csp_policy:
-            self.csp_policy = csp_policy
-        else:
-            self.csp_policy = "default-src 'self'; script-src 'self' 'unsafe-inline' 'unsafe-eval'; style-src 'self' 'unsafe-inline' https://fonts.googleapis.com; font-src 'self' https://fonts.gstatic.com; img-src 'self' data: https:; connect-src 'self' http://localhost:* https://*.leanconstruction.ai; frame-ancestors 'self'; form-action 'self'; base-uri 'self';"
-    
-    async def dispatch(self, request: Request, call_next) -> Response:
-        start_time = time.time()
-        
-        # Process the request
-        response = await call_next(request)
-        
-        # Add security headers
+    headers = {
         # Prevent clickjacking
-        response.headers["X-Frame-Options"] = "SAMEORIGIN"
-        
+        "X-Frame-Options": "SAMEORIGIN",
         # Prevent MIME type sniffing
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        
+        "X-Content-Type-Options": "nosniff",
         # Enable XSS filter (legacy browsers)
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        
+        "X-XSS-Protection": "1; mode=block",
         # Control referrer information
-        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-        
+        "Referrer-Policy": "strict-origin-when-cross-origin",
         # Content Security Policy
-        response.headers["Content-Security-Policy"] = self.csp_policy
-        
+        "Content-Security-Policy": csp_policy or DEFAULT_CSP_POLICY,
         # Permissions Policy (formerly Feature-Policy)
-        response.headers["Permissions-Policy"] = "accelerometer=(), camera=(), geolocation=(), gyroscope=(), magnetometer=(), microphone=(), payment=(), usb=()"
-        
+        "Permissions-Policy": "accelerometer=(), camera=(), geolocation=(), gyroscope=(), magnetometer=(), microphone=(), payment=(), usb=()",
         # Prevent caching of sensitive data
-        response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, proxy-revalidate"
-        response.headers["Pragma"] = "no-cache"
-        response.headers["Expires"] = "0"
-        
+        "Cache-Control": "no-store, no-cache, must-revalidate, proxy-revalidate",
+        "Pragma": "no-cache",
+        "Expires": "0",
         # Cross-Origin policies
-        response.headers["Cross-Origin-Embedder-Policy"] = "require-corp"
-        response.headers["Cross-Origin-Opener-Policy"] = "same-origin"
-        response.headers["Cross-Origin-Resource-Policy"] = "same-origin"
-        
-        # Add custom server timing header (helpful for debugging)
-        process_time = time.time() - start_time
-        response.headers["X-Process-Time"] = str(process_time)
-        
-        # Remove server header to hide implementation details
-        if "server" in response.headers:
-            del response.headers["server"]
-        
-        return response
+        "Cross-Origin-Embedder-Policy": "require-corp",
+        "Cross-Origin-Opener-Policy": "same-origin",
+        "Cross-Origin-Resource-Policy": "same-origin",
+    }
+    return [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers.items()]
 
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
+class SecurityMiddleware:
     """
-    Simple rate limiting middleware.
-    Production should use Redis-based rate limiting.
+    Security headers, request logging and rate limiting as one pure ASGI
+    middleware.
+    
+    Runs before routing, without the per-request task and response stream
+    wrapping of BaseHTTPMiddleware, so streaming responses pass straight
+    through. Header tuples are built once; each response only has them
+    appended when it starts. Rate limiting uses the GCRA limiter in
+    services/rate_limiter.py, shared by all workers through Redis when it
+    is configured.
     """
     
-    def __init__(self, app: ASGIApp, requests_per_minute: int = 60):
-        super().__init__(app)
-        self.requests_per_minute = requests_per_minute
-        self.requests = {}  # In-memory storage (use Redis in production)
+    def __init__(
+        self,
+        app: ASGIApp,
+        csp_policy: str = None,
+        add_headers: bool = True,
+        log_requests: bool = True,
+        rate_limit: bool = True,
+        requests_per_minute: int = None,
+        limiter=None,
+    ):
+        self.app = app
+        self.log_requests = log_requests
+        self.headers = security_headers(csp_policy) if add_headers else []
+        # Headers this middleware sets replace any the app set itself
+        self.replaced = {name for name, _ in self.headers} | {
+            b"server", b"x-process-time", b"x-ratelimit-limit", b"x-ratelimit-remaining"
+        }
+        self.limiter = (limiter or rate_limiter) if rate_limit else None
+        # Overrides the anonymous default-route limit, on a limiter of this
+        # middleware's own so the shared one keeps its policy
+        if self.limiter is not None and requests_per_minute:
+            policy = {tier: dict(limits) for tier, limits in self.limiter.policy.items()}
+            policy["anonymous"]["default"] = requests_per_minute
+            self.limiter = RateLimiter(redis_url=self.limiter.redis_url, policy=policy)
     
-    async def dispatch(self, request: Request, call_next) -> Response:
-        # Get client IP
-        client_ip = request.client.host if request.client else "unknown"
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
         
-        # Get current timestamp
-        current_minute = int(time.time() / 60)
-        key = f"{client_ip}:{current_minute}"
+        started = time.perf_counter()
+        client = scope.get("client")
+        client_host = client[0] if client else None
         
-        # Count requests
-        if key not in self.requests:
-            self.requests[key] = 0
-            # Clean old entries
-            old_keys = [k for k in self.requests if not k.endswith(f":{current_minute}")]
-            for old_key in old_keys:
-                del self.requests[old_key]
+        extra_headers = self.headers
+        if self.limiter is not None:
+            authorization = None
+            for name, value in scope["headers"]:
+                if name == b"authorization":
+                    authorization = value.decode("latin-1")
+                    break
+            identity, tier = identify(authorization, client_host)
+            result = await self.limiter.hit(identity, tier, route_class(scope["path"]))
+            rate_headers = [
+                (b"x-ratelimit-limit", str(result.limit).encode()),
+                (b"x-ratelimit-remaining", str(result.remaining).encode()),
+            ]
+            if not result.allowed:
+                await self._reject(send, result, started)
+                self._log(scope, client_host, 429, started)
+                return
+            extra_headers = extra_headers + rate_headers
         
-        self.requests[key] += 1
+        status_code = 500
         
-        # Check rate limit
-        if self.requests[key] > self.requests_per_minute:
-            return Response(
-                content='{"error": "Rate limit exceeded"}',
-                status_code=429,
-                media_type="application/json",
-                headers={
-                    "Retry-After": "60",
-                    "X-RateLimit-Limit": str(self.requests_per_minute),
-                    "X-RateLimit-Remaining": "0",
-                }
-            )
+        async def send_with_headers(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = [h for h in message.get("headers", ()) if h[0].lower() not in self.replaced]
+                headers.extend(extra_headers)
+                headers.append((b"x-process-time", f"{time.perf_counter() - started:.6f}".encode()))
+                message = {**message, "headers": headers}
+            await send(message)
         
-        # Process request
-        response = await call_next(request)
-        
-        # Add rate limit headers
-        response.headers["X-RateLimit-Limit"] = str(self.requests_per_minute)
-        response.headers["X-RateLimit-Remaining"] = str(
-            max(0, self.requests_per_minute - self.requests[key])
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            self._log(scope, client_host, status_code, started)
+    
+    async def _reject(self, send: Send, result, started: float) -> None:
+        body = b'{"error": "Rate limit exceeded"}'
+        headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(result.retry_after))).encode()),
+            (b"x-ratelimit-limit", str(result.limit).encode()),
+            (b"x-ratelimit-remaining", b"0"),
+        ]
+        headers.extend(self.headers)
+        headers.append((b"x-process-time", f"{time.perf_counter() - started:.6f}".encode()))
+        await send({"type": "http.response.start", "status": 429, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+    
+    def _log(self, scope: Scope, client_host, status_code: int, started: float) -> None:
+        # One record per request, formatted only if INFO is enabled; the
+        # fields are also attached for structured log handlers
+        if not (self.log_requests and logger.isEnabledFor(logging.INFO)):
+            return
+        duration_ms = (time.perf_counter() - started) * 1000
+        logger.info(
+            "%s %s %s %.1fms client=%s",
+            scope["method"], scope["path"], status_code, duration_ms, client_host,
+            extra={"http": {
+                "method": scope["method"],
+                "path": scope["path"],
+                "status": status_code,
+                "duration_ms": round(duration_ms, 3),
+                "client": client_host,
+            }},
         )
-        
-        return response
 
 
-class RequestLoggingMiddleware(BaseHTTPMiddleware):
+class SecurityHeadersMiddleware(SecurityMiddleware):
     """
-    Middleware for logging all requests for audit purposes.
+    Security headers only.
     """
     
-    async def dispatch(self, request: Request, call_next) -> Response:
-        # Log request
-        client_host = request.client.host if request.client else "unknown"
-        user_agent = request.headers.get("user-agent", "unknown")
-        logger.info(f"Request: {request.method} {request.url.path} Client: {client_host} User-Agent: {user_agent}")
-        
-        # Process request
-        start_time = time.time()
-        response = await call_next(request)
-        process_time = time.time() - start_time
-        
-        # Log response
-        logger.info(f"Response: {request.method} {request.url.path} Status: {response.status_code} Duration: {process_time:.3f}s")
-        
-        return response
+    def __init__(self, app: ASGIApp, csp_policy: str = None):
+        super().__init__(app, csp_policy=csp_policy, log_requests=False, rate_limit=False)
+
+
+class RateLimitMiddleware(SecurityMiddleware):
+    """
+    Rate limiting only (per client and route class, with limits by tenant tier).
+    """
+    
+    def __init__(self, app: ASGIApp, requests_per_minute: int = None, limiter=None):
+        super().__init__(app, add_headers=False, log_requests=False,
+                         requests_per_minute=requests_per_minute, limiter=limiter)
+
+
+class RequestLoggingMiddleware(SecurityMiddleware):
+    """
+    Request logging only, for audit purposes.
+    """
+    
+    def __init__(self, app: ASGIApp):
+        super().__init__(app, add_headers=False, rate_limit=False)
 
 
 def configure_cors(app, allowed_origins: list = None):
@@ -181,12 +224,13 @@ def configure_cors(app, allowed_origins: list = None):
             "X-Process-Time",
             "X-RateLimit-Limit",
             "X-RateLimit-Remaining",
+            "X-Next-Cursor",
         ],
         max_age=86400,  # Cache preflight for 24 hours
     )
 
 
-def add_security_middleware(app, enable_rate_limit: bool = True, rate_limit: int = 100):
+def add_security_middleware(app, enable_rate_limit: bool = True, rate_limit: int = None):
     """
     Add all security middleware to the FastAPI application.
     
@@ -196,18 +240,12 @@ def add_security_middleware(app, enable_rate_limit: bool = True, rate_limit: int
         app = FastAPI()
         add_security_middleware(app)
     """
-    # Configure CORS first
-    configure_cors(app)
-    
-    # Add security headers
-    app.add_middleware(SecurityHeadersMiddleware)
+    # Security headers, audit logging and rate limiting in one layer,
+    # added first so CORS wraps it and 429 responses carry CORS headers
+    app.add_middleware(SecurityMiddleware, rate_limit=enable_rate_limit, requests_per_minute=rate_limit)
     
-    # Add request logging (for audit)
-    app.add_middleware(RequestLoggingMiddleware)
-    
-    # Add rate limiting
-    if enable_rate_limit:
-        app.add_middleware(RateLimitMiddleware, requests_per_minute=rate_limit)
+    # Configure CORS
+    configure_cors(app)
     
     logger.info("Security middleware configured successfully")
 
@@ -0,0 +1,366 @@
+"""
+Reverse proxy to the Next.js marketing website.
+
+Requests outside the API are forwarded to the website (NEXTJS_URL) over one
+shared, keep-alive connection pool. Request and response bodies are
+streamed rather than buffered, every method is forwarded, and headers pass
+through except the hop-by-hop ones. Static assets are kept in a small
+in-process cache and served with cache headers browsers and CDNs can use.
+"""
+
+import os
+import re
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from starlette.requests import ClientDisconnect
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+NEXTJS_URL = os.getenv("NEXTJS_URL", "http://localhost:3001")
+WEBSITE_PROXY_CONNECT_TIMEOUT = float(os.getenv("WEBSITE_PROXY_CONNECT_TIMEOUT", "2"))
+WEBSITE_PROXY_READ_TIMEOUT = float(os.getenv("WEBSITE_PROXY_READ_TIMEOUT", "30"))
+WEBSITE_PROXY_WRITE_TIMEOUT = float(os.getenv("WEBSITE_PROXY_WRITE_TIMEOUT", "30"))
+# Seconds to wait for a free pooled connection before answering 503
+WEBSITE_PROXY_POOL_TIMEOUT = float(os.getenv("WEBSITE_PROXY_POOL_TIMEOUT", "5"))
+WEBSITE_PROXY_MAX_CONNECTIONS = int(os.getenv("WEBSITE_PROXY_MAX_CONNECTIONS", "100"))
+WEBSITE_PROXY_MAX_KEEPALIVE = int(os.getenv("WEBSITE_PROXY_MAX_KEEPALIVE", "20"))
+WEBSITE_PROXY_KEEPALIVE_EXPIRY = float(os.getenv("WEBSITE_PROXY_KEEPALIVE_EXPIRY", "30"))
+# Static asset cache; 0 bytes disables it
+WEBSITE_STATIC_CACHE_BYTES = int(os.getenv("WEBSITE_STATIC_CACHE_BYTES", str(32 * 1024 * 1024)))
+WEBSITE_STATIC_CACHE_MAX_ENTRY_BYTES = int(os.getenv("WEBSITE_STATIC_CACHE_MAX_ENTRY_BYTES", str(2 * 1024 * 1024)))
+# Freshness for static assets whose response has no Cache-Control of its own
+WEBSITE_STATIC_TTL_SECONDS = int(os.getenv("WEBSITE_STATIC_TTL_SECONDS", "3600"))
+
+# Paths served by FastAPI itself; everything else goes to the website
+API_PREFIXES = ("/api/", "/dashboard", "/docs", "/redoc", "/openapi.json",
+                "/token", "/auth/", "/users/", "/projects/", "/integrations/")
+
+# Next.js build output: file names carry a content hash, so never change
+IMMUTABLE_PREFIXES = ("/_next/static/",)
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+STATIC_EXTENSIONS = (".js", ".css", ".map", ".png", ".jpg", ".jpeg", ".gif", ".webp", ".avif", ".svg",
+                     ".ico", ".woff", ".woff2", ".ttf", ".otf", ".txt", ".xml", ".webmanifest")
+
+# RFC 9110 7.6.1: meaningful for a single connection only
+HOP_BY_HOP_HEADERS = {b"connection", b"keep-alive", b"proxy-authenticate", b"proxy-authorization",
+                      b"proxy-connection", b"te", b"trailer", b"transfer-encoding", b"upgrade"}
+
+_MAX_AGE = re.compile(r"(?:s-maxage|max-age)\s*=\s*(\d+)")
+
+
+def is_static_asset(path: str) -> bool:
+    return path.startswith(IMMUTABLE_PREFIXES) or path.lower().endswith(STATIC_EXTENSIONS)
+
+
+def _hop_by_hop(headers: List[Tuple[bytes, bytes]]) -> set:
+    """Hop-by-hop header names, including any the Connection header lists."""
+    names = set(HOP_BY_HOP_HEADERS)
+    for name, value in headers:
+        if name == b"connection":
+            names.update(token.strip().lower() for token in value.split(b","))
+    return names
+
+
+def _header(headers: List[Tuple[bytes, bytes]], name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key == name:
+            return value
+    return None
+
+
+def _encoding_key(accept_encoding: Optional[bytes]) -> str:
+    """The part of Accept-Encoding a cached (still encoded) body depends on."""
+    if not accept_encoding:
+        return ""
+    offered = {token.split(b";")[0].strip().lower() for token in accept_encoding.split(b",")}
+    return ",".join(sorted(e.decode() for e in offered & {b"br", b"gzip", b"deflate"}))
+
+
+def cache_policy(path: str, headers: List[Tuple[bytes, bytes]]) -> Tuple[int, Optional[bytes]]:
+    """(seconds a static response may be cached, Cache-Control to send to the
+    client or None to keep the website's). 0 seconds means do not cache."""
+    if path.startswith(IMMUTABLE_PREFIXES):
+        return 31536000, IMMUTABLE_CACHE_CONTROL.encode()
+    if _header(headers, b"set-cookie") is not None:
+        return 0, None
+    vary = _header(headers, b"vary")
+    if vary and any(v.strip().lower() not in (b"accept-encoding", b"") for v in vary.split(b",")):
+        return 0, None
+    cache_control = _header(headers, b"cache-control")
+    if cache_control is None:
+        return WEBSITE_STATIC_TTL_SECONDS, f"public, max-age={WEBSITE_STATIC_TTL_SECONDS}".encode()
+    directives = cache_control.decode("latin-1").lower()
+    if any(d in directives for d in ("no-store", "no-cache", "private")):
+        return 0, None
+    match = _MAX_AGE.search(directives)
+    return (int(match.group(1)) if match else 0), None
+
+
+class StaticAssetCache:
+    """LRU cache of complete static asset responses, bounded by total bytes."""
+
+    def __init__(self, max_bytes: int = WEBSITE_STATIC_CACHE_BYTES,
+                 max_entry_bytes: int = WEBSITE_STATIC_CACHE_MAX_ENTRY_BYTES, clock=time.monotonic):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = min(max_entry_bytes, max_bytes)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        # key -> (expires at, stored at, status, headers, body)
+        self._entries: "OrderedDict[str, Tuple[float, float, int, List[Tuple[bytes, bytes]], bytes]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Tuple[int, List[Tuple[bytes, bytes]], bytes, int]]:
+        """(status, headers, body, age in seconds) of a fresh entry, or None."""
+        entry = self._entries.get(key)
+        now = self._clock()
+        if entry is None or entry[0] <= now:
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[2], entry[3], entry[4], int(now - entry[1])
+
+    def put(self, key: str, ttl: int, status: int, headers: List[Tuple[bytes, bytes]], body: bytes) -> None:
+        if ttl <= 0 or len(body) > self.max_entry_bytes:
+            return
+        self._remove(key)
+        now = self._clock()
+        self._entries[key] = (now + ttl, now, status, headers, body)
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[4])
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "bytes": self.size, "hits": self.hits, "misses": self.misses}
+
+
+class ReverseProxy:
+    """
+    Streaming HTTP reverse proxy to one upstream, as an ASGI app.
+
+    One AsyncClient (and its keep-alive pool) is shared by all requests and
+    created on first use; call aclose() on shutdown.
+    """
+
+    def __init__(self, upstream: str = NEXTJS_URL, cache: Optional[StaticAssetCache] = None,
+                 timeout: Optional[httpx.Timeout] = None, limits: Optional[httpx.Limits] = None,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.upstream = upstream.rstrip("/")
+        self.cache = cache if cache is not None else StaticAssetCache()
+        self.timeout = timeout or httpx.Timeout(
+            connect=WEBSITE_PROXY_CONNECT_TIMEOUT,
+            read=WEBSITE_PROXY_READ_TIMEOUT,
+            write=WEBSITE_PROXY_WRITE_TIMEOUT,
+            pool=WEBSITE_PROXY_POOL_TIMEOUT,
+        )
+        self.limits = limits or httpx.Limits(
+            max_connections=WEBSITE_PROXY_MAX_CONNECTIONS,
+            max_keepalive_connections=WEBSITE_PROXY_MAX_KEEPALIVE,
+            keepalive_expiry=WEBSITE_PROXY_KEEPALIVE_EXPIRY,
+        )
+        self.transport = transport
+        self.requests = 0
+        self.upstream_errors = 0
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            # Redirects and compressed bodies are passed to the browser as they are
+            self._client = httpx.AsyncClient(base_url=self.upstream, timeout=self.timeout, limits=self.limits,
+                                             transport=self.transport, follow_redirects=False)
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.requests += 1
+        method = scope["method"]
+        path = scope["path"]
+        headers = list(scope["headers"])
+        # Some servers leave the query string on raw_path
+        target = (scope.get("raw_path") or path.encode()).split(b"?", 1)[0]
+        if scope.get("query_string"):
+            target += b"?" + scope["query_string"]
+
+        cache_key = None
+        if method in ("GET", "HEAD") and self.cache.max_bytes > 0 and is_static_asset(path):
+            cache_key = f"{target.decode('latin-1')}|{_encoding_key(_header(headers, b'accept-encoding'))}"
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                await self._send_cached(scope, headers, send, *cached)
+                return
+
+        request = self.client.build_request(
+            method,
+            target.decode("latin-1"),
+            headers=self._upstream_headers(scope, headers),
+            content=self._request_body(receive) if self._has_body(headers) else None,
+        )
+        try:
+            response = await self.client.send(request, stream=True)
+        except ClientDisconnect:
+            return
+        except httpx.ConnectError:
+            self.upstream_errors += 1
+            await self._send_error(send, 503, b"Website is starting up...")
+            return
+        except httpx.PoolTimeout:
+            self.upstream_errors += 1
+            await self._send_error(send, 503, b"Website is busy")
+            return
+        except httpx.TimeoutException:
+            self.upstream_errors += 1
+            await self._send_error(send, 504, b"Website timed out")
+            return
+        except httpx.HTTPError as e:
+            self.upstream_errors += 1
+            logger.warning(f"Website proxy error for {method} {path}: {e}")
+            await self._send_error(send, 502, b"Website unavailable")
+            return
+
+        try:
+            await self._stream_response(scope, response, send, cache_key)
+        finally:
+            await response.aclose()
+
+    @staticmethod
+    def _has_body(headers: List[Tuple[bytes, bytes]]) -> bool:
+        length = _header(headers, b"content-length")
+        return (length is not None and length.strip() != b"0") or _header(headers, b"transfer-encoding") is not None
+
+    @staticmethod
+    async def _request_body(receive: Receive):
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                raise ClientDisconnect()
+            body = message.get("body", b"")
+            if body:
+                yield body
+            if not message.get("more_body", False):
+                return
+
+    @staticmethod
+    def _upstream_headers(scope: Scope, headers: List[Tuple[bytes, bytes]]) -> List[Tuple[bytes, bytes]]:
+        dropped = _hop_by_hop(headers) | {b"host", b"x-forwarded-for"}
+        forwarded = [(name, value) for name, value in headers if name not in dropped]
+        if _header(headers, b"accept-encoding") is None:
+            # Otherwise the client's default would ask for gzip, which is
+            # passed through undecoded to a browser that did not ask for it
+            forwarded.append((b"accept-encoding", b"identity"))
+        client = scope.get("client")
+        prior = _header(headers, b"x-forwarded-for")
+        if client:
+            address = client[0].encode()
+            forwarded.append((b"x-forwarded-for", prior + b", " + address if prior else address))
+        elif prior is not None:
+            forwarded.append((b"x-forwarded-for", prior))
+        host = _header(headers, b"host")
+        if host is not None and _header(headers, b"x-forwarded-host") is None:
+            forwarded.append((b"x-forwarded-host", host))
+        if _header(headers, b"x-forwarded-proto") is None:
+            forwarded.append((b"x-forwarded-proto", scope.get("scheme", "http").encode()))
+        return forwarded
+
+    async def _stream_response(self, scope: Scope, response: httpx.Response, send: Send,
+                               cache_key: Optional[str]) -> None:
+        upstream_headers = [(name.lower(), value) for name, value in response.headers.raw]
+        dropped = _hop_by_hop(upstream_headers)
+        headers = [(name, value) for name, value in upstream_headers if name not in dropped]
+
+        ttl, cache_control = (0, None)
+        if cache_key is not None and response.status_code == 200:
+            ttl, cache_control = cache_policy(scope["path"], headers)
+            if cache_control is not None:
+                headers = [(n, v) for n, v in headers if n != b"cache-control"]
+                headers.append((b"cache-control", cache_control))
+
+        sent_headers = headers + [(b"x-cache", b"MISS")] if cache_key is not None else headers
+        await send({"type": "http.response.start", "status": response.status_code, "headers": sent_headers})
+
+        # Raw bytes: any Content-Encoding and Content-Length stay valid
+        chunks: Optional[List[bytes]] = [] if ttl > 0 and scope["method"] == "GET" else None
+        size = 0
+        async for chunk in response.aiter_raw():
+            if not chunk:
+                continue
+            if chunks is not None:
+                size += len(chunk)
+                if size <= self.cache.max_entry_bytes:
+                    chunks.append(chunk)
+                else:
+                    chunks = None
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+        if chunks is not None:
+            self.cache.put(cache_key, ttl, response.status_code, headers, b"".join(chunks))
+
+    async def _send_cached(self, scope: Scope, request_headers: List[Tuple[bytes, bytes]], send: Send,
+                           status: int, headers: List[Tuple[bytes, bytes]], body: bytes, age: int) -> None:
+        etag = _header(headers, b"etag")
+        if etag is not None and _header(request_headers, b"if-none-match") in (etag, b"*"):
+            kept = {b"etag", b"cache-control", b"vary", b"expires", b"last-modified"}
+            await send({"type": "http.response.start", "status": 304,
+                        "headers": [h for h in headers if h[0] in kept] + [(b"age", str(age).encode())]})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        await send({"type": "http.response.start", "status": status,
+                    "headers": headers + [(b"age", str(age).encode()), (b"x-cache", b"HIT")]})
+        await send({"type": "http.response.body", "body": b"" if scope["method"] == "HEAD" else body})
+
+    @staticmethod
+    async def _send_error(send: Send, status: int, body: bytes) -> None:
+        await send({"type": "http.response.start", "status": status, "headers": [
+            (b"content-type", b"text/plain; charset=utf-8"),
+            (b"content-length", str(len(body)).encode()),
+            (b"cache-control", b"no-store"),
+        ]})
+        await send({"type": "http.response.body", "body": body})
+
+    def stats(self) -> Dict[str, Any]:
+        return {"upstream": self.upstream, "requests": self.requests,
+                "upstream_errors": self.upstream_errors, "static_cache": self.cache.stats()}
+
+
+class WebsiteProxyMiddleware:
+    """
+    Sends every HTTP request outside the API prefixes to the website proxy
+    and lets the rest (and websockets) through to the app.
+    """
+
+    def __init__(self, app: ASGIApp, proxy: Optional[ReverseProxy] = None, api_prefixes: Tuple[str, ...] = API_PREFIXES):
+        self.app = app
+        self.proxy = proxy or website_proxy
+        self.api_prefixes = api_prefixes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(self.api_prefixes):
+            await self.app(scope, receive, send)
+            return
+        await self.proxy(scope, receive, send)
+
+
+# Global website proxy
+website_proxy = ReverseProxy()
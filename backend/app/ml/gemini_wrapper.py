@@ -15,6 +15,8 @@ from typing import Dict, List, Optional, Any, Tuple, Union
 from enum import Enum
 from dataclasses import dataclass, field
 
+from .local_nlp import KeywordScanner, local_nlp
+
 
 # =============================================================================
 # Enums & Dataclasses (reused across all modules)
@@ -576,6 +578,17 @@ class WorkplaceOrganizationAnalyzer:
         return result
 
 
+class CombinedSiteAnalyzer:
+    """Gemini-powered multi-aspect site analysis.
+    Runs progress, safety and 5S checks on one image in a single model call."""
+    
+    async def analyze(self, image_data: bytes,
+                      aspects: Tuple[str, ...] = ("progress", "safety", "5s")) -> Dict[str, Dict[str, Any]]:
+        """Analyze image for the requested aspects, keyed by aspect name."""
+        service = _get_ai_service()
+        return await service.analyze_site_combined(image_data, aspects=aspects)
+
+
 class EquipmentTracker:
     """Simple in-memory equipment tracking.
     Replaces torchvision-based equipment detector."""
@@ -790,15 +803,15 @@ class AutomatedReportingSystem:
         schedule: str = "daily",
         recipients: Optional[List[str]] = None
     ) -> Dict[str, Any]:
-        """Schedule automated report generation (in-memory)."""
-        return {
-            "project_id": project_id,
-            "report_type": report_type.value if isinstance(report_type, ReportType) else str(report_type),
-            "schedule": schedule,
-            "recipients": recipients or [],
-            "scheduled_at": datetime.utcnow().isoformat(),
-            "active": True
-        }
+        """Schedule automated report generation on the report job workers."""
+        from ..services.report_jobs import report_job_manager
+        entry = report_job_manager.schedule(
+            project_id=project_id,
+            report_type=report_type.value if isinstance(report_type, ReportType) else str(report_type),
+            schedule=schedule,
+            recipients=recipients
+        )
+        return entry.to_dict()
 
     async def generate_from_generators(
         self, data: Dict[str, Any], generators: List[str]
@@ -1197,62 +1210,139 @@ lean_tools = LeanToolsIntegration()
 # 6. NLP Analysis System
 # =============================================================================
 
+# Keyword categories shared by the in-memory communication and risk analyzers
+NLP_KEYWORDS: Dict[str, List[str]] = {
+    "positive": ["good", "great", "excellent", "on track", "completed", "ahead", "safe"],
+    "negative": ["delay", "overrun", "problem", "issue", "risk", "concern", "violation"],
+    "urgent": ["urgent", "immediately", "asap", "critical", "emergency", "deadline"],
+    "risk": ["risk", "danger", "hazard", "concern", "issue", "problem", "delay", "safety"],
+    "action": ["must", "should", "need to", "required", "action", "complete", "assign"],
+}
+
+
+class NLPKeywordScanners:
+    """Compiled keyword scanners: the base lexicon plus per-sector extensions."""
+    
+    def __init__(self, keywords: Dict[str, List[str]]):
+        self.base = KeywordScanner(keywords)
+        self._sector_keywords: Dict[str, Dict[str, List[str]]] = {}
+        self._scanners: Dict[str, KeywordScanner] = {}
+    
+    def register(self, sector: str, keywords: Dict[str, List[str]]) -> None:
+        """Add keywords for a sector; the sector's scanner is recompiled on next use.
+
+        Raises ValueError for a category the analyzers do not read or a blank
+        keyword, which would compile to an empty alternative matching everywhere.
+        """
+        sector = getattr(sector, "value", sector)
+        unknown = sorted(set(keywords) - set(self.base.keywords))
+        if unknown:
+            raise ValueError(f"Unknown keyword categories: {', '.join(unknown)} "
+                             f"(expected one of: {', '.join(self.base.keywords)})")
+        cleaned = {category: [" ".join(str(w).split()) for w in words] for category, words in keywords.items()}
+        if any(not w for words in cleaned.values() for w in words):
+            raise ValueError("Keywords must not be blank")
+        current = self._sector_keywords.setdefault(sector, {})
+        for category, words in cleaned.items():
+            known = current.setdefault(category, [])
+            known.extend(w for w in words if w.lower() not in {k.lower() for k in known})
+        self._scanners.pop(sector, None)
+    
+    def get(self, sector: Optional[str] = None) -> KeywordScanner:
+        sector = getattr(sector, "value", sector)
+        if not sector or sector not in self._sector_keywords:
+            return self.base
+        if sector not in self._scanners:
+            self._scanners[sector] = self.base.extend(self._sector_keywords[sector])
+        return self._scanners[sector]
+    
+    def scan(self, text: str, sector: Optional[str] = None) -> Dict[str, List[str]]:
+        """Category -> distinct keywords found in text, in one pass."""
+        return self.get(sector).categorize(text)
+
+
+# Singleton instance
+nlp_keyword_scanners = NLPKeywordScanners(NLP_KEYWORDS)
+
+
 class DocumentClassifier:
-    """Gemini-powered document classifier."""
+    """Document classifier: local fast path, Gemini for low-confidence documents."""
     
     async def classify(self, text: str) -> ClassificationResult:
         """Classify a construction document."""
-        service = _get_ai_service()
-        result = await service.analyze_document(text)
+        local, escalate = local_nlp.timed("classify", local_nlp.classify, text)
+        dt_map = {e.value: e for e in DocumentType}
+        local_result = ClassificationResult(
+            document_type=dt_map.get(local["document_type"], DocumentType.OTHER),
+            confidence=local["confidence"],
+            secondary_type=dt_map.get(local["secondary_type"]),
+            keywords=local["keywords"]
+        )
+        if not escalate:
+            return local_result
         
-        if not result:
-            return ClassificationResult()
+        service = _get_ai_service()
+        result = await service.analyze_document(text, route="classification")
         
-        dt_map = {e.value: e for e in DocumentType}
-        doc_type = dt_map.get(result.get("document_type", ""), DocumentType.OTHER)
+        if not result or result.get("document_type") not in dt_map:
+            return local_result
         
+        doc_type = dt_map[result["document_type"]]
         return ClassificationResult(
             document_type=doc_type,
             confidence=0.85,
-            secondary_type=None,
+            secondary_type=local_result.document_type if local_result.document_type != doc_type else None,
             keywords=result.get("key_entities", [])[:5]
         )
 
 
 class ConstructionNER:
-    """Gemini-powered named entity recognition."""
+    """Named entity recognition: local patterns, Gemini when they explain too little."""
     
     async def extract_entities(self, text: str) -> List[Entity]:
         """Extract named entities from construction text."""
+        local, escalate = local_nlp.timed("extract_entities", local_nlp.extract_entities, text)
+        et_map = {e.value: e for e in EntityType}
+        entities = [
+            Entity(text=e["text"], entity_type=et_map[e["type"]], confidence=e["confidence"])
+            for e in local["entities"]
+        ]
+        if not escalate:
+            return entities[:20]
+        
         service = _get_ai_service()
-        result = await service.analyze_document(text)
+        result = await service.analyze_document(text, route="classification")
         
-        entities = []
+        known = {e.text.lower() for e in entities}
         key_entities = result.get("key_entities", []) if result else []
-        for ent in key_entities[:20]:
-            entities.append(Entity(
-                text=ent if isinstance(ent, str) else ent.get("text", str(ent)),
-                entity_type=EntityType.PERSON,
-                confidence=0.8
-            ))
+        for ent in key_entities:
+            ent_text = ent if isinstance(ent, str) else ent.get("text", str(ent))
+            if ent_text.lower() not in known:
+                known.add(ent_text.lower())
+                entities.append(Entity(text=ent_text, entity_type=EntityType.PERSON, confidence=0.8))
         
         if not entities:
             entities = [Entity(text="Sample Entity", entity_type=EntityType.ORGANIZATION, confidence=0.5)]
         
-        return entities
+        return entities[:20]
 
 
 class CommunicationAnalyzer:
     """In-memory communication sentiment analyzer."""
     
-    def analyze_sentiment(self, text: str) -> SentimentResult:
-        """Analyze sentiment of construction communication text."""
-        positive_words = ["good", "great", "excellent", "on track", "completed", "ahead", "safe"]
-        negative_words = ["delay", "overrun", "problem", "issue", "risk", "concern", "violation"]
+    def analyze_sentiment(
+        self, text: str, sector: Optional[str] = None, hits: Optional[Dict[str, List[str]]] = None
+    ) -> SentimentResult:
+        """Analyze sentiment of construction communication text.
         
-        text_lower = text.lower()
-        pos_count = sum(1 for w in positive_words if w in text_lower)
-        neg_count = sum(1 for w in negative_words if w in text_lower)
+        `hits` is a precomputed nlp_keyword_scanners.scan() result, so one
+        scan can be shared by all the in-memory analyzers.
+        """
+        hits = hits if hits is not None else nlp_keyword_scanners.scan(text, sector)
+        positive = hits.get("positive", [])
+        negative = hits.get("negative", [])
+        pos_count = len(positive)
+        neg_count = len(negative)
         
         if pos_count > neg_count:
             sentiment = SentimentLevel.POSITIVE
@@ -1267,15 +1357,16 @@ class CommunicationAnalyzer:
         return SentimentResult(
             sentiment=sentiment,
             score=score,
-            positive_indicators=[w for w in positive_words if w in text_lower],
-            negative_indicators=[w for w in negative_words if w in text_lower]
+            positive_indicators=positive,
+            negative_indicators=negative
         )
     
-    def analyze_urgency(self, text: str) -> UrgencyLevel:
+    def analyze_urgency(
+        self, text: str, sector: Optional[str] = None, hits: Optional[Dict[str, List[str]]] = None
+    ) -> UrgencyLevel:
         """Analyze urgency level of communication."""
-        text_lower = text.lower()
-        urgent_words = ["urgent", "immediately", "asap", "critical", "emergency", "deadline"]
-        count = sum(1 for w in urgent_words if w in text_lower)
+        hits = hits if hits is not None else nlp_keyword_scanners.scan(text, sector)
+        count = len(hits.get("urgent", []))
         
         if count >= 3:
             return UrgencyLevel.CRITICAL
@@ -1292,52 +1383,55 @@ class DocumentSummarizer:
     async def summarize(self, text: str, max_length: int = 200) -> str:
         """Summarize a document."""
         service = _get_ai_service()
-        result = await service.analyze_document(text)
+        result = await service.analyze_document(text, route="summary")
         return result.get("summary", "Could not summarize document.") if result else "Could not summarize document."
 
 
 class RiskIssueExtractor:
     """In-memory risk and issue extractor."""
     
-    def extract_risks(self, text: str) -> List[Risk]:
+    def extract_risks(
+        self, text: str, sector: Optional[str] = None, hits: Optional[Dict[str, List[str]]] = None
+    ) -> List[Risk]:
         """Extract risks from text."""
-        risk_keywords = ["risk", "danger", "hazard", "concern", "issue", "problem", "delay", "safety"]
-        text_lower = text.lower()
+        hits = hits if hits is not None else nlp_keyword_scanners.scan(text, sector)
         
-        risks = []
-        for keyword in risk_keywords:
-            if keyword in text_lower:
-                risks.append(Risk(
-                    description=f"Identified {keyword} in document analysis",
-                    category="general",
-                    severity="medium",
-                    confidence=0.7
-                ))
+        risks = [
+            Risk(
+                description=f"Identified {keyword} in document analysis",
+                category="general",
+                severity="medium",
+                confidence=0.7
+            )
+            for keyword in hits.get("risk", [])
+        ]
         
         if not risks:
             risks.append(Risk(description="No specific risks identified", category="general", severity="low", confidence=0.9))
         
         return risks
     
-    def extract_action_items(self, text: str) -> List[ActionItem]:
+    def extract_action_items(
+        self, text: str, sector: Optional[str] = None, hits: Optional[Dict[str, List[str]]] = None
+    ) -> List[ActionItem]:
         """Extract action items from text."""
-        action_keywords = ["must", "should", "need to", "required", "action", "complete", "assign"]
-        text_lower = text.lower()
+        hits = hits if hits is not None else nlp_keyword_scanners.scan(text, sector)
+        due_date = (datetime.utcnow() + timedelta(days=7)).strftime("%Y-%m-%d")
         
-        items = []
-        for keyword in action_keywords:
-            if keyword in text_lower:
-                items.append(ActionItem(
-                    description=f"Action needed: review {keyword} items in document",
-                    assignee="project_manager",
-                    due_date=(datetime.utcnow() + timedelta(days=7)).strftime("%Y-%m-%d"),
-                    priority="medium"
-                ))
+        items = [
+            ActionItem(
+                description=f"Action needed: review {keyword} items in document",
+                assignee="project_manager",
+                due_date=due_date,
+                priority="medium"
+            )
+            for keyword in hits.get("action", [])
+        ]
         
         if not items:
             items.append(ActionItem(description="Review document for action items",
                                     assignee="project_manager",
-                                    due_date=(datetime.utcnow() + timedelta(days=7)).strftime("%Y-%m-%d"),
+                                    due_date=due_date,
                                     priority="low"))
         
         return items
@@ -2294,6 +2388,41 @@ class ComplianceConfigManager:
     }
 
 
+class IndustryKeywordManager:
+    """Static sector keywords layered on the shared NLP keyword lexicon."""
+    
+    _keywords = {
+        IndustrySector.RESIDENTIAL: {
+            "negative": ["snag", "defect", "warranty claim"],
+            "risk": ["defect", "damp", "subsidence"],
+        },
+        IndustrySector.INDUSTRIAL: {
+            "risk": ["confined space", "hot work", "lockout", "chemical"],
+            "action": ["permit to work"],
+        },
+        IndustrySector.INFRASTRUCTURE: {
+            "risk": ["utility strike", "settlement", "traffic management", "possession"],
+            "urgent": ["road closure"],
+        },
+        IndustrySector.HEAVY_CIVIL: {
+            "risk": ["dewatering", "ground movement", "scour", "cofferdam"],
+        },
+        IndustrySector.ENERGY: {
+            "risk": ["arc flash", "energized", "energised", "pressure test", "h2s"],
+            "urgent": ["outage", "trip"],
+        },
+        IndustrySector.HEALTHCARE: {
+            "risk": ["infection control", "icra", "medical gas", "live ward"],
+            "action": ["infection control permit"],
+        },
+    }
+
+
+# Registered once at import, not per IndustryCustomizationSystem
+for _sector, _sector_keywords in IndustryKeywordManager._keywords.items():
+    nlp_keyword_scanners.register(_sector, _sector_keywords)
+
+
 class IndustryCustomizationSystem:
     """Industry customization system with static configuration data."""
     
@@ -2302,6 +2431,7 @@ class IndustryCustomizationSystem:
         self.workflow_manager = IndustryWorkflowManager()
         self.template_manager = IndustryTemplateManager()
         self.compliance_manager = ComplianceConfigManager()
+        self.keyword_manager = IndustryKeywordManager()
         self.project_configs: Dict[str, Dict[str, Any]] = {}
     
     def get_available_sectors(self) -> List[Dict[str, Any]]:
@@ -2357,6 +2487,16 @@ class IndustryCustomizationSystem:
             {"category": "safety", "industry_average": 3.5, "top_quartile": 1.0, "unit": "incidents_per_year"},
         ]
     
+    def get_keywords(self, sector: IndustrySector) -> Dict[str, List[str]]:
+        """Keyword categories the NLP analyzers scan for in this sector."""
+        return nlp_keyword_scanners.get(sector).keywords
+    
+    def add_keywords(self, sector: IndustrySector, keywords: Dict[str, List[str]]) -> Dict[str, List[str]]:
+        """Extend a sector's NLP keyword categories (e.g. "risk", "urgent").
+        Raises ValueError for unknown categories and blank keywords."""
+        nlp_keyword_scanners.register(sector, keywords)
+        return self.get_keywords(sector)
+    
     def configure_project(
         self, project_id: str, sector: IndustrySector,
         subsector: Optional[str] = None, custom_settings: Optional[Dict[str, Any]] = None
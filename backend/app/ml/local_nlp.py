@@ -0,0 +1,390 @@
+"""
+Local NLP Fast Path
+===================
+Answers routine document classification and entity extraction in-process,
+so only low-confidence documents are escalated to Gemini.
+
+- Document type: a compiled keyword-pattern matcher combined with a small
+  multinomial logistic regression over word unigrams/bigrams. The model is
+  trained from data/document_classifier_seed.jsonl and shipped as
+  data/document_classifier.json; retrain with
+  `python -m app.ml.local_nlp train`.
+- Entities: compiled regular expressions for costs, dates, durations,
+  organizations, people, locations, materials and equipment. Confidence is
+  the share of proper-noun spans in the text that those patterns explain.
+- Keywords: a compiled scanner that reports every keyword hit, with its
+  position, for a set of keyword categories in one pass over the text.
+
+Works on plain strings (document type and entity type values) so it has no
+dependency on the Gemini wrapper.
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import time
+import random
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+MODEL_PATH = os.path.join(DATA_DIR, "document_classifier.json")
+SEED_PATH = os.path.join(DATA_DIR, "document_classifier_seed.jsonl")
+
+NLP_LOCAL_ENABLED = os.getenv("NLP_LOCAL_ENABLED", "true").lower() == "true"
+NLP_LOCAL_CLASSIFY_THRESHOLD = float(os.getenv("NLP_LOCAL_CLASSIFY_THRESHOLD", "0.8"))
+NLP_LOCAL_NER_THRESHOLD = float(os.getenv("NLP_LOCAL_NER_THRESHOLD", "0.7"))
+
+# Logit added per distinct pattern hit for a document type (capped)
+PATTERN_WEIGHT = 1.5
+PATTERN_CAP = 3
+
+DOCUMENT_TYPE_PATTERNS: Dict[str, List[str]] = {
+    "rfi": [r"\brfi\b", r"\brequest for information\b", r"\bplease (?:clarify|confirm|advise)\b"],
+    "submittal": [r"\b(?:re)?submittals?\b", r"\bshop drawings?\b", r"\bproduct data\b", r"\bresubmit\b",
+                  r"\bapproved as noted\b"],
+    "change_order": [r"\bchange orders?\b", r"\bvariation (?:order|instruction)\b", r"\bco-?\d+\b",
+                     r"\bcontract sum\b", r"\btime extension\b"],
+    "safety_report": [r"\bincident report\b", r"\bnear miss\b", r"\bppe\b", r"\btoolbox talk\b",
+                      r"\bsafety (?:inspection|audit|observation)\b", r"\binjur(?:y|ies)\b", r"\bhazard\b"],
+    "daily_log": [r"\bdaily (?:log|report)\b", r"\bsite diary\b", r"\bcrews? (?:on site|count)\b",
+                  r"\bmanpower\b", r"\bweather\b", r"\blabou?r hours\b"],
+    "meeting_minutes": [r"\bminutes\b", r"\battendees\b", r"\bagenda\b", r"\bnext meeting\b",
+                        r"\bapologies\b", r"\baction items?\b"],
+    "contract": [r"\bagreement\b", r"\bliquidated damages\b", r"\bindemnif", r"\btermination\b",
+                 r"\bthe parties\b", r"\bretention\b", r"\bherein\b"],
+    "specification": [r"\bsection \d{2} ?\d{2} ?\d{2}\b", r"\bpart [123]\b", r"\bastm\b",
+                      r"\bmanufacturer'?s instructions\b", r"\bshall comply\b", r"\bperformance requirements\b"],
+}
+
+MONTHS = r"(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)"
+WEEKDAYS = r"(?:monday|tuesday|wednesday|thursday|friday|saturday|sunday)"
+
+MATERIALS = [
+    "concrete", "rebar", "reinforcement", "structural steel", "steel", "timber", "lumber", "drywall",
+    "plasterboard", "gypsum board", "brick", "blockwork", "masonry", "glass", "glazing", "insulation",
+    "membrane", "asphalt", "aggregate", "cement", "mortar", "formwork", "precast", "tile", "paint",
+]
+EQUIPMENT = [
+    "tower crane", "mobile crane", "crane", "excavator", "bulldozer", "backhoe", "forklift", "telehandler",
+    "scaffold", "scaffolding", "pump truck", "concrete pump", "compactor", "generator", "scissor lift",
+    "boom lift", "dump truck", "loader", "hoist",
+]
+
+# entity type -> (pattern, flags)
+ENTITY_PATTERNS: Dict[str, Tuple[str, int]] = {
+    "cost": (r"[$£€]\s?\d[\d,]*(?:\.\d+)?(?:\s?(?:k|m|million|thousand|bn))?\b"
+             r"|\b\d[\d,]*(?:\.\d+)?\s?(?:usd|gbp|eur|dollars|pounds)\b", re.IGNORECASE),
+    "date": (rf"\b\d{{4}}-\d{{2}}-\d{{2}}\b|\b\d{{1,2}}[/.-]\d{{1,2}}[/.-]\d{{2,4}}\b"
+             rf"|\b\d{{1,2}}(?:st|nd|rd|th)?\s+{MONTHS}\b\.?(?:,?\s+\d{{4}})?"
+             rf"|\b{MONTHS}\.?\s+\d{{1,2}}(?:st|nd|rd|th)?\b(?:,?\s+\d{{4}})?|\b{WEEKDAYS}\b", re.IGNORECASE),
+    "schedule": (r"\b\d+\s+(?:calendar\s+|working\s+|business\s+)?(?:days?|weeks?|months?)\b", re.IGNORECASE),
+    "organization": (r"\b(?:[A-Z][\w&'-]*\s+){0,3}(?:Ltd|Limited|Inc|LLC|Corp|Corporation|Construction|"
+                     r"Contractors|Builders|Engineering|Group|plc|Architects|Consultants)\b\.?", 0),
+    "person": (r"\b(?:Mr|Mrs|Ms|Miss|Dr|Eng|Ir)\.?\s+[A-Z][a-z]+(?:\s+[A-Z][a-z]+)?", 0),
+    "location": (r"\b(?:level|floor|grid(?:\s?line)?|room|zone|block|bay|podium|basement)\s+[A-Z0-9][\w.-]*\b",
+                 re.IGNORECASE),
+    "material": (r"\b(?:" + "|".join(re.escape(m) for m in MATERIALS) + r")\b", re.IGNORECASE),
+    "equipment": (r"\b(?:" + "|".join(re.escape(e) for e in EQUIPMENT) + r")\b", re.IGNORECASE),
+}
+
+# Capitalised words that are not names on their own
+COMMON_CAPITALISED = frozenset(
+    "the a an this that these we i please rfi co hse ppe osha pm qs mep oac hvac ahu part section article "
+    "level floor room grid zone block monday tuesday wednesday thursday friday saturday sunday january "
+    "february march april may june july august september october november december owner contractor "
+    "architect engineer subcontractor client agreement contract minutes attendees".split()
+)
+PROPER_NOUN = re.compile(r"(?<![.!?]\s)(?<!^)\b[A-Z][a-zA-Z&'-]+(?:\s+[A-Z][a-zA-Z&'-]+)*")
+
+TOKEN_PATTERN = re.compile(r"[a-z][a-z0-9']+|\d+")
+
+
+def text_features(text: str) -> List[str]:
+    """Distinct lowercase unigram and bigram features of a document."""
+    tokens = TOKEN_PATTERN.findall(text.lower())
+    features = set(tokens)
+    features.update(f"{a}_{b}" for a, b in zip(tokens, tokens[1:]))
+    return list(features)
+
+
+def _softmax(logits: Dict[str, float]) -> Dict[str, float]:
+    top = max(logits.values())
+    exp = {k: math.exp(v - top) for k, v in logits.items()}
+    total = sum(exp.values())
+    return {k: v / total for k, v in exp.items()}
+
+
+class PatternMatcher:
+    """Single compiled alternation over named patterns; one pass per text."""
+
+    def __init__(self, patterns: Dict[str, List[str]], flags: int = re.IGNORECASE):
+        self.names: Dict[str, str] = {}
+        groups = []
+        for label, label_patterns in patterns.items():
+            for i, pattern in enumerate(label_patterns):
+                group = f"g{len(self.names)}"
+                self.names[group] = label
+                groups.append(f"(?P<{group}>{pattern})")
+        self.regex = re.compile("|".join(groups), flags)
+
+    def scan(self, text: str) -> Dict[str, List[str]]:
+        """Label -> distinct matched strings (lowercased), in order of appearance."""
+        hits: Dict[str, List[str]] = defaultdict(list)
+        for match in self.regex.finditer(text):
+            label = self.names[match.lastgroup]
+            found = match.group().lower()
+            if found not in hits[label]:
+                hits[label].append(found)
+        return hits
+
+
+class KeywordHit(NamedTuple):
+    category: str
+    keyword: str
+    start: int
+    end: int
+
+
+class KeywordScanner:
+    """Compiled scanner over category keyword lists; all hits in one pass.
+
+    Keywords match case-insensitively at the start of a word, so "delay"
+    also hits "delayed" but "safe" does not hit "unsafe". Keywords that are
+    prefixes of a longer match ("complete" inside "completed") are reported
+    for the same span, as are keywords listed under several categories.
+    """
+
+    def __init__(self, keywords: Dict[str, Iterable[str]]):
+        self.keywords: Dict[str, List[str]] = {
+            # Blank keywords are dropped: they would compile to an empty alternative
+            category: list(dict.fromkeys(w for w in (" ".join(k.lower().split()) for k in words) if w))
+            for category, words in keywords.items()
+        }
+        categories: Dict[str, List[str]] = defaultdict(list)
+        for category, words in self.keywords.items():
+            for word in words:
+                categories[word].append(category)
+        ordered = sorted(categories, key=len, reverse=True)
+        self._hits_for = {
+            word: [(prefix, categories[prefix]) for prefix in ordered if word.startswith(prefix)]
+            for word in ordered
+        }
+        alternation = "|".join(r"\s+".join(re.escape(part) for part in word.split()) for word in ordered)
+        self.regex = re.compile(rf"\b(?:{alternation})", re.IGNORECASE) if ordered else None
+
+    def extend(self, keywords: Dict[str, Iterable[str]]) -> "KeywordScanner":
+        """New scanner with extra keywords merged into (or added as) categories."""
+        merged = {category: list(words) for category, words in self.keywords.items()}
+        for category, words in keywords.items():
+            merged.setdefault(category, []).extend(words)
+        return KeywordScanner(merged)
+
+    def scan(self, text: str) -> List[KeywordHit]:
+        """Every keyword hit with its character span, in order of appearance."""
+        if self.regex is None:
+            return []
+        hits = []
+        for match in self.regex.finditer(text):
+            start = match.start()
+            matched = " ".join(match.group().lower().split())
+            for keyword, categories in self._hits_for[matched]:
+                end = match.end() if keyword == matched else start + len(keyword)
+                hits.extend(KeywordHit(category, keyword, start, end) for category in categories)
+        return hits
+
+    def categorize(self, text: str) -> Dict[str, List[str]]:
+        """Category -> distinct keywords found, in order of first appearance."""
+        found: Dict[str, List[str]] = {category: [] for category in self.keywords}
+        for hit in self.scan(text):
+            if hit.keyword not in found[hit.category]:
+                found[hit.category].append(hit.keyword)
+        return found
+
+
+class LinearTextClassifier:
+    """Multinomial logistic regression over binary text features."""
+
+    def __init__(self, classes: List[str], weights: Dict[str, Dict[str, float]], bias: Dict[str, float]):
+        self.classes = classes
+        self.weights = weights
+        self.bias = bias
+
+    def logits(self, features: Iterable[str]) -> Dict[str, float]:
+        features = list(features)
+        return {
+            c: self.bias.get(c, 0.0) + sum(self.weights[c].get(f, 0.0) for f in features)
+            for c in self.classes
+        }
+
+    @classmethod
+    def train(
+        cls,
+        examples: List[Tuple[str, str]],
+        epochs: int = 40,
+        learning_rate: float = 0.3,
+        l2: float = 1e-3,
+        seed: int = 13,
+    ) -> "LinearTextClassifier":
+        """Fit with plain SGD; small enough for the seed corpus to train in seconds."""
+        classes = sorted({label for _, label in examples})
+        model = cls(classes, {c: defaultdict(float) for c in classes}, {c: 0.0 for c in classes})
+        data = [(text_features(text), label) for text, label in examples]
+        rng = random.Random(seed)
+        for _ in range(epochs):
+            rng.shuffle(data)
+            for features, label in data:
+                probs = _softmax(model.logits(features))
+                for c in classes:
+                    grad = probs[c] - (1.0 if c == label else 0.0)
+                    model.bias[c] -= learning_rate * grad
+                    weights = model.weights[c]
+                    for f in features:
+                        weights[f] -= learning_rate * (grad + l2 * weights[f])
+        # Drop near-zero weights to keep the shipped file small
+        model.weights = {c: {f: round(w, 3) for f, w in ws.items() if abs(w) >= 0.05} for c, ws in model.weights.items()}
+        model.bias = {c: round(b, 4) for c, b in model.bias.items()}
+        return model
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"classes": self.classes, "bias": self.bias, "weights": self.weights}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LinearTextClassifier":
+        return cls(data["classes"], data["weights"], data["bias"])
+
+
+class FastPathStats:
+    """Counts local answers vs Gemini escalations per task."""
+
+    def __init__(self):
+        self.counts: Dict[str, Counter] = defaultdict(Counter)
+        self.local_seconds: Dict[str, float] = defaultdict(float)
+
+    def record(self, task: str, escalated: bool, seconds: float) -> None:
+        self.counts[task]["escalated" if escalated else "local"] += 1
+        self.local_seconds[task] += seconds
+
+    def summary(self) -> Dict[str, Any]:
+        tasks = {}
+        for task, counts in self.counts.items():
+            total = counts["local"] + counts["escalated"]
+            tasks[task] = {
+                "total": total,
+                "local": counts["local"],
+                "escalated": counts["escalated"],
+                "escalation_rate": round(counts["escalated"] / total, 4) if total else 0.0,
+                "avg_local_latency_us": round(self.local_seconds[task] / total * 1e6, 1) if total else 0.0,
+            }
+        return tasks
+
+
+class LocalNLP:
+    """Local document classifier and entity extractor with confidence scores."""
+
+    def __init__(
+        self,
+        model: Optional[LinearTextClassifier] = None,
+        classify_threshold: float = NLP_LOCAL_CLASSIFY_THRESHOLD,
+        ner_threshold: float = NLP_LOCAL_NER_THRESHOLD,
+        enabled: bool = NLP_LOCAL_ENABLED,
+    ):
+        self._model = model
+        self.classify_threshold = classify_threshold
+        self.ner_threshold = ner_threshold
+        self.enabled = enabled
+        self.type_matcher = PatternMatcher(DOCUMENT_TYPE_PATTERNS)
+        self.entity_patterns = {name: re.compile(p, f) for name, (p, f) in ENTITY_PATTERNS.items()}
+        self.stats = FastPathStats()
+
+    @property
+    def model(self) -> Optional[LinearTextClassifier]:
+        if self._model is None and os.path.exists(MODEL_PATH):
+            with open(MODEL_PATH) as f:
+                self._model = LinearTextClassifier.from_dict(json.load(f))
+        return self._model
+
+    def classify(self, text: str) -> Dict[str, Any]:
+        """Return document_type, confidence, secondary_type and matched keywords."""
+        hits = self.type_matcher.scan(text)
+        classes = list(DOCUMENT_TYPE_PATTERNS) + ["other"]
+        model = self.model
+        logits = model.logits(text_features(text)) if model else {c: 0.0 for c in classes}
+        for label, matched in hits.items():
+            logits[label] = logits.get(label, 0.0) + PATTERN_WEIGHT * min(len(matched), PATTERN_CAP)
+
+        ranked = sorted(_softmax(logits).items(), key=lambda kv: kv[1], reverse=True)
+        (best, confidence), (second, _) = ranked[0], ranked[1]
+        return {
+            "document_type": best,
+            "confidence": round(confidence, 4),
+            "secondary_type": second,
+            "keywords": hits.get(best, [])[:5],
+        }
+
+    def extract_entities(self, text: str) -> Dict[str, Any]:
+        """Return typed entities and the share of proper-noun spans they explain."""
+        entities = []
+        spans = []
+        seen = set()
+        for entity_type, pattern in self.entity_patterns.items():
+            for match in pattern.finditer(text):
+                value = match.group().strip()
+                key = (value.lower(), entity_type)
+                spans.append(match.span())
+                if key not in seen:
+                    seen.add(key)
+                    entities.append({"text": value, "type": entity_type, "confidence": 0.9, "start": match.start()})
+        entities.sort(key=lambda e: e["start"])
+
+        candidates = [
+            m.span() for m in PROPER_NOUN.finditer(text)
+            if m.group().split()[0].lower() not in COMMON_CAPITALISED
+        ]
+        covered = sum(1 for a, b in candidates if any(s <= a and b <= e or a <= s < b for s, e in spans))
+        coverage = covered / len(candidates) if candidates else 1.0
+        return {"entities": entities, "confidence": round(coverage, 4)}
+
+    def is_confident(self, task: str, confidence: float) -> bool:
+        threshold = self.classify_threshold if task == "classify" else self.ner_threshold
+        return self.enabled and confidence >= threshold
+
+    def timed(self, task: str, func, text: str) -> Tuple[Dict[str, Any], bool]:
+        """Run a local task; return (result, escalate) and record the outcome."""
+        started = time.perf_counter()
+        result = func(text)
+        escalate = not self.is_confident(task, result["confidence"])
+        self.stats.record(task, escalate, time.perf_counter() - started)
+        return result, escalate
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "model_loaded": self.model is not None,
+            "classify_threshold": self.classify_threshold,
+            "ner_threshold": self.ner_threshold,
+            "tasks": self.stats.summary(),
+        }
+
+
+def train_and_save(seed_path: str = SEED_PATH, model_path: str = MODEL_PATH) -> LinearTextClassifier:
+    with open(seed_path) as f:
+        examples = [(row["text"], row["label"]) for row in (json.loads(line) for line in f if line.strip())]
+    model = LinearTextClassifier.train(examples)
+    with open(model_path, "w") as f:
+        json.dump(model.to_dict(), f, separators=(",", ":"), sort_keys=True)
+    return model
+
+
+# Singleton instance
+local_nlp = LocalNLP()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["train"]:
+        trained = train_and_save()
+        print(f"Trained {len(trained.classes)} classes -> {MODEL_PATH}")
+    else:
+        print("Usage: python -m app.ml.local_nlp train")
@@ -0,0 +1,181 @@
+"""
+Batch NLP Analysis
+Runs the NLP system over many documents in one request. The in-memory
+analyzers (sentiment, urgency, risks, action items) run in a worker thread
+one chunk of documents at a time; Gemini-backed steps (classification and
+entity extraction) fan out concurrently per document and are bounded by the
+AIService document semaphore. Results are yielded as each document
+completes, so callers can stream them back as NDJSON.
+"""
+
+import os
+import asyncio
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Sequence
+
+NLP_BATCH_MAX_DOCUMENTS = int(os.getenv("NLP_BATCH_MAX_DOCUMENTS", "5000"))
+NLP_BATCH_CHUNK_SIZE = int(os.getenv("NLP_BATCH_CHUNK_SIZE", "100"))
+NLP_BATCH_CONCURRENCY = int(os.getenv("NLP_BATCH_CONCURRENCY", "16"))
+
+LOCAL_OPERATIONS = ("sentiment", "risks")
+AI_OPERATIONS = ("classify", "entities")
+BATCH_OPERATIONS = AI_OPERATIONS + LOCAL_OPERATIONS
+
+
+def classification_to_dict(classification) -> Dict[str, Any]:
+    return {
+        "document_type": classification.document_type.value,
+        "confidence": classification.confidence,
+        "secondary_type": classification.secondary_type.value if classification.secondary_type else None,
+        "keywords": classification.keywords,
+    }
+
+
+def entities_to_list(entities) -> List[Dict[str, Any]]:
+    return [
+        {"text": e.text, "type": e.entity_type.value, "confidence": e.confidence}
+        for e in entities
+    ]
+
+
+def sentiment_to_dict(sentiment) -> Dict[str, Any]:
+    return {
+        "level": sentiment.sentiment.value,
+        "score": sentiment.score,
+        "positive_indicators": sentiment.positive_indicators,
+        "negative_indicators": sentiment.negative_indicators,
+    }
+
+
+def risks_to_list(risks) -> List[Dict[str, Any]]:
+    return [
+        {"description": r.description, "category": r.category, "severity": r.severity, "confidence": r.confidence}
+        for r in risks
+    ]
+
+
+def action_items_to_list(actions) -> List[Dict[str, Any]]:
+    return [
+        {"description": a.description, "assignee": a.assignee, "due_date": a.due_date, "priority": a.priority}
+        for a in actions
+    ]
+
+
+class NLPBatchRunner:
+    """Streams per-document NLP results for a batch of documents."""
+
+    def __init__(
+        self,
+        system=None,
+        chunk_size: int = NLP_BATCH_CHUNK_SIZE,
+        concurrency: int = NLP_BATCH_CONCURRENCY,
+    ):
+        self._system = system
+        self.chunk_size = max(1, chunk_size)
+        self.concurrency = max(1, concurrency)
+
+    @property
+    def system(self):
+        if self._system is None:
+            from .gemini_wrapper import nlp_system
+            self._system = nlp_system
+        return self._system
+
+    def _local_pass(
+        self, texts: Sequence[str], operations: Iterable[str], sector: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Run the in-memory analyzers over a chunk of documents.
+
+        Each text is scanned for keywords once and the hits are shared by
+        the sentiment, urgency, risk and action-item analyzers.
+        """
+        from .gemini_wrapper import nlp_keyword_scanners
+
+        scanner = nlp_keyword_scanners.get(sector)
+        analyzer = self.system.sentiment_analyzer if "sentiment" in operations else None
+        extractor = self.system.risk_extractor if "risks" in operations else None
+        results = []
+        for text in texts:
+            hits = scanner.categorize(text)
+            result: Dict[str, Any] = {}
+            if analyzer:
+                result["sentiment"] = sentiment_to_dict(analyzer.analyze_sentiment(text, hits=hits))
+                result["urgency"] = analyzer.analyze_urgency(text, hits=hits).value
+            if extractor:
+                result["risks"] = risks_to_list(extractor.extract_risks(text, hits=hits))
+                result["action_items"] = action_items_to_list(extractor.extract_action_items(text, hits=hits))
+            results.append(result)
+        return results
+
+    async def _ai_pass(self, text: str, operations: Iterable[str]) -> Dict[str, Any]:
+        result: Dict[str, Any] = {}
+        if "classify" in operations:
+            result["classification"] = classification_to_dict(await self.system.classifier.classify(text))
+        if "entities" in operations:
+            result["entities"] = entities_to_list(await self.system.ner.extract_entities(text))
+        return result
+
+    async def run(
+        self,
+        documents: Sequence[Dict[str, Any]],
+        operations: Optional[Sequence[str]] = None,
+        sector: Optional[str] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield one result per document, in completion order.
+
+        Each document is a dict with "text" and an optional "id". Every
+        yielded result carries the document's "index" in the batch so
+        callers can reassemble the original order. `sector` selects the
+        industry keyword lexicon for the in-memory analyzers.
+        """
+        operations = set(operations or BATCH_OPERATIONS)
+        ai_operations = operations & set(AI_OPERATIONS)
+        local_operations = operations & set(LOCAL_OPERATIONS)
+        queue: asyncio.Queue = asyncio.Queue()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def finish(index: int, document: Dict[str, Any], result: Dict[str, Any]) -> None:
+            result = {"index": index, "id": document.get("id"), **result}
+            try:
+                if ai_operations:
+                    async with semaphore:
+                        result.update(await self._ai_pass(document["text"], ai_operations))
+            except Exception as e:
+                result["error"] = str(e) or type(e).__name__
+            await queue.put(result)
+
+        async def produce() -> None:
+            tasks = []
+            try:
+                for start in range(0, len(documents), self.chunk_size):
+                    chunk = documents[start:start + self.chunk_size]
+                    local = [{} for _ in chunk]
+                    if local_operations:
+                        texts = [d["text"] for d in chunk]
+                        try:
+                            local = await asyncio.to_thread(self._local_pass, texts, local_operations, sector)
+                        except Exception as e:
+                            local = [{"error": str(e) or type(e).__name__} for _ in chunk]
+                    for offset, (document, result) in enumerate(zip(chunk, local)):
+                        tasks.append(asyncio.create_task(finish(start + offset, document, result)))
+                await asyncio.gather(*tasks)
+            except asyncio.CancelledError:
+                for task in tasks:
+                    task.cancel()
+                raise
+            finally:
+                await queue.put(None)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                yield item
+        finally:
+            # Client went away mid-stream: stop scheduling further work
+            producer.cancel()
+
+
+# Singleton instance
+nlp_batch_runner = NLPBatchRunner()
@@ -1,10 +1,28 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float, Text, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Float, Text, ForeignKey, Boolean, Index, UniqueConstraint
 from sqlalchemy.orm import relationship, Mapped
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.types import TypeDecorator
 from datetime import datetime, timezone
 
 Base = declarative_base()
 
+
+class UTCDateTime(TypeDecorator):
+    """Naive DateTime column that stores aware values as naive UTC.
+
+    The columns are TIMESTAMP WITHOUT TIME ZONE; asyncpg refuses aware
+    datetimes for them, so they are converted before binding.
+    """
+
+    impl = DateTime
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is not None and value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -14,20 +32,20 @@ class User(Base):
     full_name: Mapped[str] = Column(String)
     company: Mapped[str] = Column(String)
     role: Mapped[str] = Column(String)  # e.g., 'admin', 'manager', 'worker'
-    created_at: Mapped[datetime] = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    created_at: Mapped[datetime] = Column(UTCDateTime, default=lambda: datetime.now(timezone.utc))
     is_active: Mapped[int] = Column(Integer, default=1)
 
     # Onboarding fields
     is_onboarded: Mapped[bool] = Column(Boolean, default=False)
-    onboarding_completed_at: Mapped[datetime | None] = Column(DateTime, nullable=True)
+    onboarding_completed_at: Mapped[datetime | None] = Column(UTCDateTime, nullable=True)
     company_size: Mapped[str] = Column(String)  # 'small' (3-10), 'medium' (10-50), 'enterprise' (50+)
     construction_type: Mapped[str] = Column(String)  # 'residential', 'commercial', 'infrastructure', 'industrial'
     phone_number: Mapped[str | None] = Column(String, nullable=True)
     onboarding_step: Mapped[int] = Column(Integer, default=0)  # Track onboarding progress (0-5)
     email_verified: Mapped[bool] = Column(Boolean, default=False)
-    last_login: Mapped[datetime | None] = Column(DateTime, nullable=True)
+    last_login: Mapped[datetime | None] = Column(UTCDateTime, nullable=True)
     demo_account: Mapped[bool] = Column(Boolean, default=False)  # Mark as demo account
-    trial_expires_at: Mapped[datetime | None] = Column(DateTime, nullable=True)
+    trial_expires_at: Mapped[datetime | None] = Column(UTCDateTime, nullable=True)
 
     projects = relationship("Project", back_populates="owner")
     onboarding_events = relationship("OnboardingEvent", back_populates="user")
@@ -43,9 +61,9 @@ class Project(Base):
     owner_id = Column(Integer, ForeignKey("users.id"))
     status = Column(String, default="active")  # 'active', 'completed', 'on_hold'
     budget = Column(Float)
-    start_date = Column(DateTime)
-    end_date = Column(DateTime)
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    start_date = Column(UTCDateTime)
+    end_date = Column(UTCDateTime)
+    created_at = Column(UTCDateTime, default=lambda: datetime.now(timezone.utc))
 
     owner = relationship("User", back_populates="projects")
     tasks = relationship("Task", back_populates="project")
@@ -63,8 +81,8 @@ class Task(Base):
     assigned_to = Column(Integer, ForeignKey("users.id"))
     estimated_hours = Column(Float)
     actual_hours = Column(Float)
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
-    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+    created_at = Column(UTCDateTime, default=lambda: datetime.now(timezone.utc))
+    updated_at = Column(UTCDateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
 
     project = relationship("Project", back_populates="tasks")
 
@@ -77,8 +95,8 @@ class WasteLog(Base):
     description = Column(Text)
     impact_cost = Column(Float)
     impact_time = Column(Float)  # in hours
-    detected_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
-    resolved_at = Column(DateTime, nullable=True)
+    detected_at = Column(UTCDateTime, default=lambda: datetime.now(timezone.utc))
+    resolved_at = Column(UTCDateTime, nullable=True)
 
     project = relationship("Project", back_populates="waste_logs")
 
@@ -89,7 +107,7 @@ class OnboardingEvent(Base):
     user_id = Column(Integer, ForeignKey("users.id"))
     event_type = Column(String)  # 'signup', 'email_verified', 'profile_completed', 'first_project', 'feature_used'
     event_data = Column(Text)  # JSON string with event details
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    created_at = Column(UTCDateTime, default=lambda: datetime.now(timezone.utc))
 
     user = relationship("User", back_populates="onboarding_events")
 
@@ -101,9 +119,9 @@ class EmailNotification(Base):
     email_type = Column(String)  # 'welcome', 'onboarding_guide', 'progress_update', 'feature_announcement', 'reengagement'
     subject = Column(String)
     content = Column(Text)
-    sent_at = Column(DateTime, nullable=True)
-    opened_at = Column(DateTime, nullable=True)
-    clicked_at = Column(DateTime, nullable=True)
+    sent_at = Column(UTCDateTime, nullable=True)
+    opened_at = Column(UTCDateTime, nullable=True)
+    clicked_at = Column(UTCDateTime, nullable=True)
     status = Column(String, default="pending")  # 'pending', 'sent', 'opened', 'clicked', 'bounced'
 
     user = relationship("User")
@@ -116,12 +134,12 @@ class Appointment(Base):
     lead_name = Column(String)
     lead_email = Column(String)
     lead_phone = Column(String, nullable=True)
-    start_time = Column(DateTime)
-    end_time = Column(DateTime)
+    start_time = Column(UTCDateTime)
+    end_time = Column(UTCDateTime)
     status = Column(String, default="scheduled")  # 'scheduled', 'cancelled', 'completed'
     notes = Column(Text, nullable=True)
     meeting_link = Column(String, nullable=True)
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    created_at = Column(UTCDateTime, default=lambda: datetime.now(timezone.utc))
     
     user = relationship("User")
 
@@ -131,12 +149,25 @@ class ChatConversation(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     session_id = Column(String, index=True)
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
-    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+    created_at = Column(UTCDateTime, default=lambda: datetime.now(timezone.utc))
+    updated_at = Column(UTCDateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+    # Rolling conversation memory (see services/conversation_memory.py)
+    memory_summary = Column(Text, nullable=True)
+    memory_turns = Column(Text, nullable=True)  # JSON list of recent {role, content} turns
+    # Sidebar summary, kept in step with chat_messages (see services/chat_summary.py)
+    last_message_preview = Column(String(120), nullable=True)
+    message_count = Column(Integer, nullable=False, default=0, server_default="0")
+    last_message_at = Column(UTCDateTime, nullable=True)
+    last_read_at = Column(UTCDateTime, nullable=True)
 
     user = relationship("User", back_populates="chat_conversations")
     messages = relationship("ChatMessage", back_populates="conversation")
 
+    # Keyset pagination of a user's conversations by (updated_at, id)
+    __table_args__ = (
+        Index("ix_chat_conversations_user_updated", "user_id", "updated_at", "id"),
+    )
+
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
 
@@ -144,11 +175,16 @@ class ChatMessage(Base):
     conversation_id = Column(Integer, ForeignKey("chat_conversations.id"))
     role = Column(String)  # 'user' or 'bot'
     content = Column(Text)
-    timestamp = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    timestamp = Column(UTCDateTime, default=lambda: datetime.now(timezone.utc))
     intent_classification = Column(String, nullable=True)
 
     conversation = relationship("ChatConversation", back_populates="messages")
 
+    # Keyset pagination of a conversation's messages by (timestamp, id)
+    __table_args__ = (
+        Index("ix_chat_messages_conversation_timestamp", "conversation_id", "timestamp", "id"),
+    )
+
 class MLUsageLog(Base):
     __tablename__ = "ml_usage_logs"
 
@@ -160,5 +196,71 @@ class MLUsageLog(Base):
     latency_ms = Column(Float)
     error_occurred = Column(Boolean, default=False)
     error_message = Column(Text, nullable=True)
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    created_at = Column(UTCDateTime, default=lambda: datetime.now(timezone.utc))
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+
+class GeneratedReport(Base):
+    __tablename__ = "generated_reports"
+
+    id = Column(Integer, primary_key=True, index=True)
+    project_id = Column(String, nullable=False)
+    report_type = Column(String, nullable=False)
+    output_format = Column(String, nullable=False)
+    version = Column(Integer, nullable=False)
+    data_hash = Column(String(64), nullable=False)  # See services/report_jobs.project_data_hash
+    report = Column(Text, nullable=False)  # JSON report body
+    generated_at = Column(UTCDateTime, default=datetime.utcnow)
+
+    # One row per version of a (project, report type, format); lookups by data hash
+    __table_args__ = (
+        UniqueConstraint("project_id", "report_type", "output_format", "version", name="uq_generated_reports_version"),
+        Index("ix_generated_reports_key_hash", "project_id", "report_type", "output_format", "data_hash"),
+    )
+
+class ScheduledReport(Base):
+    __tablename__ = "scheduled_reports"
+
+    id = Column(String(36), primary_key=True)
+    project_id = Column(String, index=True, nullable=False)
+    report_type = Column(String, nullable=False)
+    output_format = Column(String, nullable=False)
+    schedule = Column(String, nullable=False)  # 'daily', 'weekly', 'monthly'
+    recipients = Column(Text, nullable=True)  # JSON list of addresses
+    project_data = Column(Text, nullable=True)  # JSON; None means the project's latest data
+    active = Column(Boolean, default=True)
+    created_at = Column(UTCDateTime, default=datetime.utcnow)
+    next_run_at = Column(UTCDateTime, index=True, nullable=False)
+    last_run_at = Column(UTCDateTime, nullable=True)
+    last_job_id = Column(String(36), nullable=True)
+
+class VisionJob(Base):
+    __tablename__ = "vision_batch_jobs"
+
+    id = Column(String(36), primary_key=True)
+    project_id = Column(String, index=True, nullable=False)
+    aspects = Column(Text, nullable=False)  # JSON list, e.g. ["progress", "safety"]
+    status = Column(String, nullable=False, default="queued")  # 'queued', 'running', 'completed', 'failed'
+    created_at = Column(UTCDateTime, default=datetime.utcnow, index=True)
+    started_at = Column(UTCDateTime, nullable=True)
+    completed_at = Column(UTCDateTime, nullable=True)
+
+    images = relationship("VisionJobImage", back_populates="job", cascade="all, delete-orphan")
+
+class VisionJobImage(Base):
+    __tablename__ = "vision_batch_images"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(String(36), ForeignKey("vision_batch_jobs.id", ondelete="CASCADE"), nullable=False)
+    position = Column(Integer, nullable=False)  # Index of the image in the submitted batch
+    filename = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="pending")  # 'pending', 'processing', 'completed', 'failed'
+    analysis = Column(Text, nullable=True)  # JSON analysis result
+    error = Column(Text, nullable=True)
+    started_at = Column(UTCDateTime, nullable=True)
+    completed_at = Column(UTCDateTime, nullable=True)
+
+    job = relationship("VisionJob", back_populates="images")
+
+    __table_args__ = (
+        UniqueConstraint("job_id", "position", name="uq_vision_batch_images_position"),
+    )
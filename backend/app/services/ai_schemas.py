@@ -0,0 +1,224 @@
+"""
+Structured Output Schemas for AIService
+Pydantic models describing every JSON response requested from Gemini.
+Each model is sent to the API as the native responseSchema and is then used
+to validate the returned JSON in a single pass.
+"""
+
+from functools import lru_cache
+from typing import Any, Dict, List, Literal, Tuple, Type
+
+from pydantic import BaseModel, Field, create_model
+
+
+# ============================================================
+# Vision
+# ============================================================
+
+class SiteProgressAnalysis(BaseModel):
+    stage: str = Field(..., description="Current construction stage (foundation, framing, rough-in, drywall, interior finish, exterior, landscaping, etc.)")
+    completion_percentage: float = Field(..., description="Estimated completion percentage, 0-100")
+    activities: List[str] = Field(..., description="Visible activities and equipment")
+    safety_concerns: List[str] = Field(..., description="Safety concerns or hazards visible")
+    site_organization_score: float = Field(..., description="Overall site organization score, 1-10")
+    notes: str
+
+
+class SafetyAnalysis(BaseModel):
+    ppe_compliance: List[str] = Field(..., description="PPE observations (helmets, vests, gloves, boots, harnesses)")
+    violations: List[str]
+    hazards: List[str]
+    housekeeping_score: float = Field(..., description="Housekeeping and site tidiness, 1-10")
+    overall_safety_score: float = Field(..., description="Overall safety score, 1-10")
+    recommendations: List[str]
+
+
+class FiveSAnalysis(BaseModel):
+    sort_score: float = Field(..., description="Sort (Seiri), 1-10")
+    set_in_order_score: float = Field(..., description="Set in Order (Seiton), 1-10")
+    shine_score: float = Field(..., description="Shine (Seiso), 1-10")
+    standardize_score: float = Field(..., description="Standardize (Seiketsu), 1-10")
+    sustain_score: float = Field(..., description="Sustain (Shitsuke), 1-10")
+    overall_score: float = Field(..., description="Overall 5S score, 1-10")
+    observations: List[str]
+    improvement_suggestions: List[str]
+
+
+# ============================================================
+# Waste Detection
+# ============================================================
+
+class WasteTypeAnalysis(BaseModel):
+    detected: bool
+    severity_score: float = Field(..., description="1-10")
+    estimated_cost_impact: float = Field(..., description="GBP")
+    estimated_time_impact: float = Field(..., description="Days")
+    root_causes: List[str]
+    recommendations: List[str]
+
+
+class WasteBreakdown(BaseModel):
+    defects: WasteTypeAnalysis
+    overproduction: WasteTypeAnalysis
+    waiting: WasteTypeAnalysis
+    non_utilized_talent: WasteTypeAnalysis
+    transportation: WasteTypeAnalysis
+    inventory: WasteTypeAnalysis
+    motion: WasteTypeAnalysis
+    extra_processing: WasteTypeAnalysis
+
+
+class WasteDetectionResult(BaseModel):
+    waste_analysis: WasteBreakdown
+    overall_waste_score: float = Field(..., description="1-100")
+    total_estimated_waste_cost: float = Field(..., description="GBP")
+    priority_actions: List[str] = Field(..., description="Top 5 priority recommendations")
+
+
+# ============================================================
+# Forecasting
+# ============================================================
+
+class ScheduleForecast(BaseModel):
+    predicted_completion_date: str = Field(..., description="YYYY-MM-DD")
+    confidence_level: Literal["high", "medium", "low"]
+    schedule_variance_days: float
+    risk_factors: List[str]
+    recommendations: List[str]
+
+
+class CostForecast(BaseModel):
+    predicted_final_cost: float = Field(..., description="GBP")
+    original_budget: float = Field(..., description="GBP")
+    cost_variance_percentage: float
+    risk_factors: List[str]
+    recommendations: List[str]
+
+
+class OverallRiskAssessment(BaseModel):
+    risk_level: Literal["critical", "high", "medium", "low"]
+    key_concerns: List[str]
+    mitigation_strategies: List[str]
+
+
+class ForecastResult(BaseModel):
+    schedule_forecast: ScheduleForecast
+    cost_forecast: CostForecast
+    overall_risk_assessment: OverallRiskAssessment
+
+
+# ============================================================
+# NLP Document Analysis
+# ============================================================
+
+class DocumentAnalysisResult(BaseModel):
+    document_type: Literal[
+        "rfi", "submittal", "change_order", "safety_report", "daily_log",
+        "meeting_minutes", "contract", "specification", "other",
+    ]
+    summary: str = Field(..., description="2-3 sentence summary")
+    key_entities: List[str] = Field(..., description="People, organizations, locations and dates mentioned")
+    risks_and_issues: List[str]
+    action_items: List[str]
+    sentiment: Literal["positive", "negative", "neutral"]
+    priority: Literal["high", "medium", "low"]
+
+
+# ============================================================
+# Lean Tools
+# ============================================================
+
+class ValueStreamCurrentState(BaseModel):
+    total_lead_time_days: float
+    total_value_added_time_days: float
+    total_non_value_added_time_days: float
+    process_efficiency_percentage: float
+    bottlenecks: List[str]
+    wastes_identified: List[str]
+
+
+class ImprovementOpportunity(BaseModel):
+    recommendation: str
+    expected_impact: str
+
+
+class ValueStreamAnalysis(BaseModel):
+    current_state: ValueStreamCurrentState
+    improvement_opportunities: List[ImprovementOpportunity]
+    future_state_projection: str = Field(..., description="Brief description of the optimized process")
+
+
+# ============================================================
+# Gemini responseSchema conversion
+# ============================================================
+
+# JSON Schema keywords the Gemini OpenAPI subset does not accept
+_UNSUPPORTED_KEYWORDS = {"title", "default", "examples", "additionalProperties", "$defs"}
+
+
+@lru_cache(maxsize=None)
+def gemini_response_schema(model: Type[BaseModel]) -> Dict[str, Any]:
+    """Convert a Pydantic model into Gemini's responseSchema format.
+
+    References are inlined, Optional fields become nullable and property
+    order follows the model's field order.
+    """
+    schema = model.model_json_schema()
+    definitions = schema.get("$defs", {})
+
+    def convert(node: Dict[str, Any]) -> Dict[str, Any]:
+        if "$ref" in node:
+            converted = convert(definitions[node["$ref"].rsplit("/", 1)[-1]])
+            if "description" in node:
+                converted["description"] = node["description"]
+            return converted
+
+        if "anyOf" in node:
+            variants = [v for v in node["anyOf"] if v.get("type") != "null"]
+            if len(variants) == 1:
+                converted = convert(variants[0])
+            else:
+                converted = {"anyOf": [convert(v) for v in variants]}
+            if len(variants) < len(node["anyOf"]):
+                converted["nullable"] = True
+            if "description" in node:
+                converted["description"] = node["description"]
+            return converted
+
+        converted: Dict[str, Any] = {}
+        for key, value in node.items():
+            if key in _UNSUPPORTED_KEYWORDS:
+                continue
+            if key == "type":
+                converted["type"] = value.upper()
+            elif key == "properties":
+                converted["properties"] = {name: convert(prop) for name, prop in value.items()}
+                converted["propertyOrdering"] = list(value)
+            elif key == "items":
+                converted["items"] = convert(value)
+            elif key == "const":
+                converted["enum"] = [value]
+            else:
+                converted[key] = value
+        return converted
+
+    return convert(schema)
+
+
+# Vision aspect name -> result model, in the order used by combined analysis
+VISION_ASPECT_MODELS: Dict[str, Type[BaseModel]] = {
+    "progress": SiteProgressAnalysis,
+    "safety": SafetyAnalysis,
+    "5s": FiveSAnalysis,
+}
+
+
+@lru_cache(maxsize=None)
+def combined_vision_model(aspects: Tuple[str, ...]) -> Type[BaseModel]:
+    """Build the merged response model for a combined vision request."""
+    # Aspect names such as "5s" are not identifiers, so they are used as aliases
+    fields = {
+        f"aspect_{i}": (VISION_ASPECT_MODELS[aspect], Field(..., alias=aspect))
+        for i, aspect in enumerate(aspects)
+    }
+    return create_model("CombinedSiteAnalysis", **fields)
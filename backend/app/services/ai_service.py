@@ -5,15 +5,112 @@ Supports text chat, vision analysis, and structured data extraction.
 """
 
 import os
+import copy
+import asyncio
 import json
+import time
 import base64
+import logging
 import httpx
-from typing import List, Dict, Any, Optional, Tuple
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple, Type
 from datetime import datetime
+from pydantic import BaseModel, ValidationError
+
+from .ai_schemas import (
+    SiteProgressAnalysis,
+    SafetyAnalysis,
+    FiveSAnalysis,
+    WasteDetectionResult,
+    ForecastResult,
+    DocumentAnalysisResult,
+    ValueStreamAnalysis,
+    combined_vision_model,
+    gemini_response_schema,
+)
+from .model_router import model_router, parse_usage
+from .resilience import circuit_breakers, hedged_call
+from .semantic_cache import semantic_cache
+from .document_chunking import (
+    DOC_CHUNK_CONCURRENCY,
+    ChunkResultCache,
+    chunk_document,
+    merge_chunk_results,
+)
+from .usage_logger import usage_log_buffer
+
+logger = logging.getLogger(__name__)
 
 GEMINI_API_KEY = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY", "")
 GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta")
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-pro")
+GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "60"))
+
+# Routes whose calls are short and idempotent enough to hedge by default
+GEMINI_HEDGED_ROUTES = {
+    r.strip() for r in os.getenv("GEMINI_HEDGED_ROUTES", "chat,classification,summary").split(",") if r.strip()
+}
+GEMINI_HEDGE_MIN_DELAY_MS = float(os.getenv("GEMINI_HEDGE_MIN_DELAY_MS", "500"))
+
+REPORT_GENERATION_FAILED = "Report generation failed."
+
+# Vision aspects that can be requested together in a single combined call.
+# Each entry holds the prompt section, the response model and the fallback
+# shape returned when the model gives nothing usable for that aspect.
+VISION_ASPECTS: Dict[str, Dict[str, Any]] = {
+    "progress": {
+        "instructions": """Progress monitoring:
+1. Current construction stage (foundation, framing, rough-in, drywall, interior finish, exterior, landscaping, etc.)
+2. Estimated completion percentage
+3. Visible activities and equipment
+4. Any safety concerns or hazards visible
+5. Overall site organization score (1-10)""",
+        "model": SiteProgressAnalysis,
+        "default": {
+            "stage": "unknown",
+            "completion_percentage": 0,
+            "activities": [],
+            "safety_concerns": [],
+            "site_organization_score": 5,
+            "notes": "Could not analyze image",
+        },
+    },
+    "safety": {
+        "instructions": """Safety compliance:
+1. PPE compliance (helmets, vests, gloves, boots, harnesses)
+2. Any safety violations or hazards visible
+3. Housekeeping and site tidiness
+4. Overall safety score (1-10)
+5. Recommendations for improvement""",
+        "model": SafetyAnalysis,
+        "default": {
+            "ppe_compliance": [],
+            "violations": [],
+            "hazards": [],
+            "housekeeping_score": 5,
+            "overall_safety_score": 5,
+            "recommendations": ["Could not analyze image"],
+        },
+    },
+    "5s": {
+        "instructions": """5S workplace organization, scoring each S from 1-10:
+1. Sort (Seiri) - Are unnecessary items removed?
+2. Set in Order (Seiton) - Are tools and materials organized?
+3. Shine (Seiso) - Is the workplace clean?
+4. Standardize (Seiketsu) - Are standards visible?
+5. Sustain (Shitsuke) - Is discipline maintained?""",
+        "model": FiveSAnalysis,
+        "default": {
+            "sort_score": 5,
+            "set_in_order_score": 5,
+            "shine_score": 5,
+            "standardize_score": 5,
+            "sustain_score": 5,
+            "overall_score": 5,
+            "observations": [],
+            "improvement_suggestions": [],
+        },
+    },
+}
 
 
 class AIService:
@@ -23,12 +120,25 @@ class AIService:
         self.api_key = GEMINI_API_KEY
         self.base_url = GEMINI_BASE_URL
         self.model = GEMINI_MODEL
+        self.router = model_router
+        self.breakers = circuit_breakers
+        self.answer_cache = semantic_cache
+        self.document_chunk_cache = ChunkResultCache()
+        self._document_semaphore: Optional[asyncio.Semaphore] = None
+        self.hedged_routes = GEMINI_HEDGED_ROUTES
         self._http_client = None
 
+    @property
+    def document_semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the running event loop
+        if self._document_semaphore is None:
+            self._document_semaphore = asyncio.Semaphore(DOC_CHUNK_CONCURRENCY)
+        return self._document_semaphore
+
     @property
     def http_client(self):
         if self._http_client is None:
-            self._http_client = httpx.AsyncClient(timeout=60.0)
+            self._http_client = httpx.AsyncClient(timeout=GEMINI_TIMEOUT_SECONDS)
         return self._http_client
 
     def get_construction_system_prompt(self) -> str:
@@ -88,20 +198,49 @@ If the user asks about topics outside construction, politely redirect them to co
         system_prompt: Optional[str] = None,
         temperature: float = 0.7,
         max_output_tokens: int = 1024,
+        response_model: Optional[Type[BaseModel]] = None,
+        route: str = "chat",
+        latency_budget_ms: Optional[float] = None,
+        history: Optional[List[Dict[str, str]]] = None,
     ) -> Optional[str]:
-        """Call Gemini API with a text prompt."""
+        """Call Gemini API with a text prompt.
+
+        When response_model is given, Gemini's native structured output mode
+        is requested with the model's schema. The model is chosen by the
+        router for the given route. Earlier user/assistant turns in history
+        are sent as prior conversation turns.
+        """
         if not self.api_key:
             return None
 
-        url = f"{self.base_url}/models/{self.model}:generateContent?key={self.api_key}"
+        payload = self._build_payload(prompt, system_prompt, temperature, max_output_tokens, history)
+        if response_model is not None:
+            payload["generationConfig"].update(self._structured_output_config(response_model))
 
-        contents = []
-        if system_prompt:
+        return await self._generate(payload, route=route, latency_budget_ms=latency_budget_ms)
+
+    def _build_payload(
+        self,
+        prompt: str,
+        system_prompt: Optional[str],
+        temperature: float,
+        max_output_tokens: int,
+        history: Optional[List[Dict[str, str]]] = None,
+    ) -> Dict[str, Any]:
+        """generateContent payload for a text prompt after earlier conversation turns."""
+        contents = [
+            {"role": "model" if turn["role"] == "assistant" else "user", "parts": [{"text": turn["content"]}]}
+            for turn in history or []
+        ]
+        if system_prompt and contents:
+            contents[0]["parts"][0]["text"] = f"{system_prompt}\n\n{contents[0]['parts'][0]['text']}"
+            contents.append({"role": "user", "parts": [{"text": prompt}]})
+        elif system_prompt:
             contents.append({"role": "user", "parts": [{"text": f"{system_prompt}\n\n{prompt}"}]})
         else:
             contents.append({"role": "user", "parts": [{"text": prompt}]})
 
-        payload = {
+        return {
             "contents": contents,
             "generationConfig": {
                 "temperature": temperature,
@@ -111,22 +250,6 @@ If the user asks about topics outside construction, politely redirect them to co
             },
         }
 
-        try:
-            response = await self.http_client.post(url, json=payload)
-            response.raise_for_status()
-            data = response.json()
-
-            candidates = data.get("candidates", [])
-            if candidates and "content" in candidates[0]:
-                parts = candidates[0]["content"].get("parts", [])
-                if parts:
-                    return parts[0].get("text", "").strip()
-
-            return None
-        except Exception as e:
-            print(f"Gemini API error: {e}")
-            return None
-
     async def _call_gemini_vision(
         self,
         prompt: str,
@@ -134,13 +257,15 @@ If the user asks about topics outside construction, politely redirect them to co
         mime_type: str = "image/jpeg",
         system_prompt: Optional[str] = None,
         temperature: float = 0.4,
+        max_output_tokens: int = 2048,
+        response_model: Optional[Type[BaseModel]] = None,
+        route: str = "vision",
+        latency_budget_ms: Optional[float] = None,
     ) -> Optional[str]:
         """Call Gemini with a text prompt + image for vision analysis."""
         if not self.api_key:
             return None
 
-        url = f"{self.base_url}/models/{self.model}:generateContent?key={self.api_key}"
-
         image_b64 = base64.b64encode(image_data).decode("utf-8")
 
         parts = [
@@ -155,16 +280,54 @@ If the user asks about topics outside construction, politely redirect them to co
             "contents": [{"role": "user", "parts": parts}],
             "generationConfig": {
                 "temperature": temperature,
-                "maxOutputTokens": 2048,
+                "maxOutputTokens": max_output_tokens,
                 "topP": 0.9,
                 "topK": 40,
             },
         }
+        if response_model is not None:
+            payload["generationConfig"].update(self._structured_output_config(response_model))
 
-        try:
+        return await self._generate(payload, route=route, latency_budget_ms=latency_budget_ms)
+
+    async def _generate(
+        self,
+        payload: Dict[str, Any],
+        route: str,
+        latency_budget_ms: Optional[float] = None,
+        hedge: Optional[bool] = None,
+    ) -> Optional[str]:
+        """POST a generateContent payload to the routed model and return the text.
+
+        Returns None without calling upstream when the circuit for the model is
+        open, so callers drop straight to their rule-based or default path.
+        Hedged requests are used for routes in GEMINI_HEDGED_ROUTES unless
+        hedge is given explicitly.
+        """
+        model, breaker = self._select_model(route, latency_budget_ms)
+        if model is None:
+            return None
+
+        url = f"{self.base_url}/models/{model}:generateContent?key={self.api_key}"
+
+        async def post() -> Dict[str, Any]:
             response = await self.http_client.post(url, json=payload)
             response.raise_for_status()
-            data = response.json()
+            return response.json()
+
+        if hedge is None:
+            hedge = route in self.hedged_routes
+        hedge_delay_ms = self._hedge_delay_ms(route, model) if hedge else None
+
+        started = time.perf_counter()
+        data: Dict[str, Any] = {}
+        error_message: Optional[str] = None
+        cancelled = False
+        try:
+            if hedge_delay_ms is not None:
+                data, _ = await hedged_call(post, hedge_delay_ms / 1000)
+            else:
+                data = await post()
 
             candidates = data.get("candidates", [])
             if candidates and "content" in candidates[0]:
@@ -173,43 +336,154 @@ If the user asks about topics outside construction, politely redirect them to co
                     return parts[0].get("text", "").strip()
 
             return None
+        except asyncio.CancelledError:
+            # The caller went away; the call is neither a success nor a failure
+            cancelled = True
+            raise
+        except Exception as e:
+            error_message = str(e) or type(e).__name__
+            print(f"Gemini API error ({route}, {model}): {e}")
+            return None
+        finally:
+            if cancelled:
+                breaker.release()
+            else:
+                self._record_call(route, model, breaker, started, data.get("usageMetadata"), error_message)
+
+    async def _generate_stream(
+        self,
+        payload: Dict[str, Any],
+        route: str,
+        latency_budget_ms: Optional[float] = None,
+    ) -> AsyncIterator[str]:
+        """Stream a generateContent payload from the routed model, yielding text as it arrives.
+
+        Routing, circuit breaking and usage logging match _generate; streams
+        are never hedged. Yields nothing when the circuit is open or the call
+        fails before the first chunk; a failure after text has been yielded is
+        raised, so callers can tell a cut-off answer from a complete one.
+        """
+        model, breaker = self._select_model(route, latency_budget_ms)
+        if model is None:
+            return
+
+        url = f"{self.base_url}/models/{model}:streamGenerateContent?alt=sse&key={self.api_key}"
+
+        started = time.perf_counter()
+        usage: Optional[Dict[str, Any]] = None
+        error_message: Optional[str] = None
+        yielded = False
+        cancelled = False
+        try:
+            async with self.http_client.stream("POST", url, json=payload) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = json.loads(line[len("data:"):])
+                    usage = data.get("usageMetadata", usage)
+                    candidates = data.get("candidates", [])
+                    if candidates and "content" in candidates[0]:
+                        for part in candidates[0]["content"].get("parts", []):
+                            if part.get("text"):
+                                yielded = True
+                                yield part["text"]
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
         except Exception as e:
-            print(f"Gemini Vision API error: {e}")
+            error_message = str(e) or type(e).__name__
+            print(f"Gemini API stream error ({route}, {model}): {e}")
+            if yielded:
+                raise
+        finally:
+            if cancelled:
+                breaker.release()
+            else:
+                self._record_call(route, model, breaker, started, usage, error_message)
+
+    def _select_model(self, route: str, latency_budget_ms: Optional[float]) -> Tuple[Optional[str], Any]:
+        """Routed model and its breaker, falling back to the fast tier when its
+        circuit is open. (None, None) when no model will take the call."""
+        model = self.router.select(route, latency_budget_ms)
+        breaker = self.breakers.get(model)
+        if not breaker.allow_request():
+            fast_model = self.router.tiers["fast"]
+            if model == fast_model or not self.breakers.get(fast_model).allow_request():
+                print(f"Gemini circuit open for {model}; skipping {route} call")
+                return None, None
+            model, breaker = fast_model, self.breakers.get(fast_model)
+        return model, breaker
+
+    def _record_call(
+        self,
+        route: str,
+        model: str,
+        breaker: Any,
+        started: float,
+        usage: Optional[Dict[str, Any]],
+        error_message: Optional[str],
+    ) -> None:
+        """Feed one finished call to the breaker, the router and the usage log."""
+        latency_ms = (time.perf_counter() - started) * 1000
+        error = error_message is not None
+        breaker.record(latency_ms, failed=error)
+        self.router.record(route, model, latency_ms, usage=usage, error=error)
+        tokens_input, tokens_output = parse_usage(usage)
+        usage_log_buffer.log(
+            model_name=model,
+            endpoint=f"ai:{route}",
+            latency_ms=latency_ms,
+            tokens_input=tokens_input,
+            tokens_output=tokens_output,
+            error_message=error_message,
+        )
+
+    def _hedge_delay_ms(self, route: str, model: str) -> Optional[float]:
+        """Delay before a hedged second attempt, from the route's observed p95."""
+        stats = self.router.stats.get(route, {}).get(model)
+        if stats is None or len(stats.latencies_ms) < self.router.min_samples:
             return None
+        return max(stats.p95(), GEMINI_HEDGE_MIN_DELAY_MS)
 
     async def _call_gemini_structured(
         self,
         prompt: str,
+        response_model: Type[BaseModel],
         system_prompt: Optional[str] = None,
         temperature: float = 0.2,
+        route: str = "document",
+        latency_budget_ms: Optional[float] = None,
     ) -> Optional[Dict[str, Any]]:
-        """Call Gemini and parse the response as JSON."""
-        full_prompt = prompt
-        if system_prompt:
-            full_prompt = f"{system_prompt}\n\n{prompt}"
-
-        full_prompt += "\n\nRespond ONLY with valid JSON. No markdown, no code fences, no explanation."
-
+        """Call Gemini in structured output mode and validate against response_model."""
         result = await self._call_gemini(
-            prompt=full_prompt,
+            prompt=prompt,
+            system_prompt=system_prompt,
             temperature=temperature,
             max_output_tokens=4096,
+            response_model=response_model,
+            route=route,
+            latency_budget_ms=latency_budget_ms,
         )
 
         if not result:
             return None
 
-        # Strip any markdown code fences
-        result = result.strip()
-        if result.startswith("```"):
-            result = result.split("\n", 1)[-1] if "\n" in result else result[3:]
-        if result.endswith("```"):
-            result = result[:-3].strip()
+        return self._validate_structured(result, response_model)
+
+    def _structured_output_config(self, response_model: Type[BaseModel]) -> Dict[str, Any]:
+        """generationConfig entries for Gemini's native JSON output mode."""
+        return {
+            "responseMimeType": "application/json",
+            "responseSchema": gemini_response_schema(response_model),
+        }
 
+    def _validate_structured(self, text: str, response_model: Type[BaseModel]) -> Optional[Dict[str, Any]]:
+        """Parse and validate a structured response in one pass."""
         try:
-            return json.loads(result)
-        except json.JSONDecodeError:
-            print(f"Failed to parse Gemini structured response as JSON: {result[:200]}")
+            return response_model.model_validate_json(text).model_dump(by_alias=True)
+        except ValidationError as e:
+            print(f"Gemini structured response failed {response_model.__name__} validation: {e.error_count()} errors")
             return None
 
     # ============================================================
@@ -217,19 +491,110 @@ If the user asks about topics outside construction, politely redirect them to co
     # ============================================================
 
     async def generate_response(
-        self, user_message: str, conversation_history: Optional[List[Dict[str, str]]] = None
+        self,
+        user_message: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        latency_budget_ms: Optional[float] = None,
+        tenant: Optional[str] = None,
     ) -> str:
-        """Generate AI response using Gemini. Falls back to rule-based if unavailable."""
+        """Generate AI response using Gemini. Falls back to rule-based if unavailable.
+
+        conversation_history holds earlier turns as {"role", "content"} dicts
+        (oldest first); an entry with role "summary" carries the rolling
+        summary of turns before those. When a tenant is given, answers to
+        near-duplicate questions asked within that tenant are served from the
+        semantic cache. Only questions without prior context are looked up
+        or cached: a follow-up's meaning depends on the conversation.
+        """
+        if tenant is not None and not conversation_history:
+            cached = self.answer_cache.lookup(tenant, user_message)
+            if cached:
+                return cached
+
+        system_prompt, turns = self._chat_context(conversation_history)
         result = await self._call_gemini(
             prompt=user_message,
-            system_prompt=self.get_construction_system_prompt(),
+            system_prompt=system_prompt,
             temperature=0.7,
             max_output_tokens=1024,
+            route="chat",
+            latency_budget_ms=latency_budget_ms,
+            history=turns,
         )
         if result:
+            if tenant is not None and not conversation_history:
+                self.answer_cache.store(tenant, user_message, result)
             return result
         return self.get_rule_based_response(user_message)
 
+    async def stream_response(
+        self,
+        user_message: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        latency_budget_ms: Optional[float] = None,
+        tenant: Optional[str] = None,
+    ) -> AsyncIterator[str]:
+        """Streaming generate_response: yields the answer in pieces as Gemini produces it.
+
+        Cached answers and the rule-based fallback are yielded as a single piece.
+        If Gemini fails after part of the answer has been yielded the error is
+        raised and nothing is cached: the answer is incomplete.
+        """
+        if tenant is not None and not conversation_history:
+            cached = self.answer_cache.lookup(tenant, user_message)
+            if cached:
+                yield cached
+                return
+
+        pieces: List[str] = []
+        if self.api_key:
+            system_prompt, turns = self._chat_context(conversation_history)
+            payload = self._build_payload(user_message, system_prompt, 0.7, 1024, turns)
+            async for piece in self._generate_stream(payload, route="chat", latency_budget_ms=latency_budget_ms):
+                pieces.append(piece)
+                yield piece
+
+        result = "".join(pieces).strip()
+        if result:
+            if tenant is not None and not conversation_history:
+                self.answer_cache.store(tenant, user_message, result)
+            return
+        yield self.get_rule_based_response(user_message)
+
+    def _chat_context(
+        self, conversation_history: Optional[List[Dict[str, str]]]
+    ) -> Tuple[str, List[Dict[str, str]]]:
+        """System prompt (with any rolling summary folded in) and the prior turns."""
+        system_prompt = self.get_construction_system_prompt()
+        turns = []
+        for entry in conversation_history or []:
+            if entry["role"] == "summary":
+                system_prompt += f"\n\nSummary of the earlier conversation:\n{entry['content']}"
+            else:
+                turns.append(entry)
+        return system_prompt, turns
+
+    async def summarize_conversation(
+        self, previous_summary: str, turns: List[Dict[str, str]], max_tokens: int = 600
+    ) -> Optional[str]:
+        """Fold conversation turns into a running summary. None if unavailable."""
+        transcript = "\n".join(f"{turn['role']}: {turn['content']}" for turn in turns)
+        prompt = f"""Update the running summary of a construction management chat with the new turns below.
+Keep project names, figures, decisions, open questions and user preferences. Write plain prose, at most {max_tokens * 3 // 4} words.
+
+Current summary:
+{previous_summary or "(none)"}
+
+New turns:
+{transcript}"""
+
+        return await self._call_gemini(
+            prompt=prompt,
+            temperature=0.2,
+            max_output_tokens=max_tokens,
+            route="summary",
+        )
+
     # ============================================================
     # Vision Analysis
     # ============================================================
@@ -244,31 +609,21 @@ Identify:
 2. Estimated completion percentage
 3. Visible activities and equipment
 4. Any safety concerns or hazards visible
-5. Overall site organization score (1-10)
-
-Return your analysis as a JSON object with keys: stage, completion_percentage, activities, safety_concerns, site_organization_score, notes"""
+5. Overall site organization score (1-10)"""
 
         result = await self._call_gemini_vision(
             prompt=prompt,
             image_data=image_data,
             mime_type=mime_type,
             temperature=0.3,
+            response_model=VISION_ASPECTS["progress"]["model"],
         )
 
         if not result:
-            return {
-                "stage": "unknown",
-                "completion_percentage": 0,
-                "activities": [],
-                "safety_concerns": [],
-                "site_organization_score": 5,
-                "notes": "Could not analyze image",
-            }
+            return self._vision_default("progress")
 
-        try:
-            return json.loads(self._extract_json(result))
-        except (json.JSONDecodeError, ValueError):
-            return {"raw_analysis": result}
+        analysis = self._validate_structured(result, VISION_ASPECTS["progress"]["model"])
+        return analysis if analysis is not None else {"raw_analysis": result}
 
     async def analyze_safety(
         self, image_data: bytes, mime_type: str = "image/jpeg"
@@ -280,31 +635,21 @@ Identify:
 2. Any safety violations or hazards visible
 3. Housekeeping and site tidiness
 4. Overall safety score (1-10)
-5. Recommendations for improvement
-
-Return your analysis as a JSON object with keys: ppe_compliance (list of items), violations (list), hazards (list), housekeeping_score, overall_safety_score, recommendations"""
+5. Recommendations for improvement"""
 
         result = await self._call_gemini_vision(
             prompt=prompt,
             image_data=image_data,
             mime_type=mime_type,
             temperature=0.3,
+            response_model=VISION_ASPECTS["safety"]["model"],
         )
 
         if not result:
-            return {
-                "ppe_compliance": [],
-                "violations": [],
-                "hazards": [],
-                "housekeeping_score": 5,
-                "overall_safety_score": 5,
-                "recommendations": ["Could not analyze image"],
-            }
+            return self._vision_default("safety")
 
-        try:
-            return json.loads(self._extract_json(result))
-        except (json.JSONDecodeError, ValueError):
-            return {"raw_analysis": result}
+        analysis = self._validate_structured(result, VISION_ASPECTS["safety"]["model"])
+        return analysis if analysis is not None else {"raw_analysis": result}
 
     async def analyze_5s(
         self, image_data: bytes, mime_type: str = "image/jpeg"
@@ -316,33 +661,72 @@ Score each S from 1-10:
 2. Set in Order (Seiton) - Are tools and materials organized?
 3. Shine (Seiso) - Is the workplace clean?
 4. Standardize (Seiketsu) - Are standards visible?
-5. Sustain (Shitsuke) - Is discipline maintained?
+5. Sustain (Shitsuke) - Is discipline maintained?"""
 
-Return your analysis as a JSON object with keys: sort_score, set_in_order_score, shine_score, standardize_score, sustain_score, overall_score, observations, improvement_suggestions"""
+        result = await self._call_gemini_vision(
+            prompt=prompt,
+            image_data=image_data,
+            mime_type=mime_type,
+            temperature=0.3,
+            response_model=VISION_ASPECTS["5s"]["model"],
+        )
 
+        if not result:
+            return self._vision_default("5s")
+
+        analysis = self._validate_structured(result, VISION_ASPECTS["5s"]["model"])
+        return analysis if analysis is not None else {"raw_analysis": result}
+
+    async def analyze_site_combined(
+        self,
+        image_data: bytes,
+        mime_type: str = "image/jpeg",
+        aspects: Tuple[str, ...] = ("progress", "safety", "5s"),
+    ) -> Dict[str, Dict[str, Any]]:
+        """Analyze a site photo for several aspects in one Gemini call.
+
+        The image is uploaded once and the model returns a single JSON object
+        with one section per aspect. The result is split back into the same
+        shapes returned by analyze_site_progress, analyze_safety and analyze_5s,
+        keyed by aspect name.
+        """
+        unknown = [a for a in aspects if a not in VISION_ASPECTS]
+        if unknown:
+            raise ValueError(f"Unknown vision aspects: {', '.join(unknown)}")
+        aspects = tuple(dict.fromkeys(aspects))
+        if not aspects:
+            return {}
+
+        sections = "\n\n".join(
+            f'"{aspect}" section - {VISION_ASPECTS[aspect]["instructions"]}' for aspect in aspects
+        )
+        prompt = f"""Analyze this construction site image for the following aspects.
+
+{sections}
+
+Return one section per aspect."""
+
+        response_model = combined_vision_model(aspects)
         result = await self._call_gemini_vision(
             prompt=prompt,
             image_data=image_data,
             mime_type=mime_type,
             temperature=0.3,
+            max_output_tokens=2048 * len(aspects),
+            response_model=response_model,
         )
 
         if not result:
-            return {
-                "sort_score": 5,
-                "set_in_order_score": 5,
-                "shine_score": 5,
-                "standardize_score": 5,
-                "sustain_score": 5,
-                "overall_score": 5,
-                "observations": [],
-                "improvement_suggestions": [],
-            }
+            return {aspect: self._vision_default(aspect) for aspect in aspects}
 
-        try:
-            return json.loads(self._extract_json(result))
-        except (json.JSONDecodeError, ValueError):
-            return {"raw_analysis": result}
+        combined = self._validate_structured(result, response_model)
+        if combined is None:
+            return {aspect: {"raw_analysis": result} for aspect in aspects}
+        return combined
+
+    def _vision_default(self, aspect: str) -> Dict[str, Any]:
+        """Fallback result for a vision aspect when Gemini is unavailable."""
+        return copy.deepcopy(VISION_ASPECTS[aspect]["default"])
 
     # ============================================================
     # Waste Detection
@@ -356,22 +740,14 @@ Identify waste across all 8 DOWNTIME categories.
 Project Data:
 {json.dumps(project_data, indent=2)}
 
-For each waste type detected, provide:
-- detected: true/false
-- severity_score: 1-10
-- estimated_cost_impact: GBP
-- estimated_time_impact: days
-- root_causes: list of causes
-- recommendations: list of actions
-
-Return a JSON object with:
-waste_analysis: object with keys for each waste type (defects, overproduction, waiting, non_utilized_talent, transportation, inventory, motion, extra_processing)
-overall_waste_score: 1-100
-total_estimated_waste_cost: GBP
-priority_actions: list of top 5 priority recommendations"""
+Assess every DOWNTIME category, including those where no waste is detected."""
 
         result = await self._call_gemini_structured(
-            prompt=prompt, system_prompt="You are a lean construction waste detection expert.", temperature=0.3
+            prompt=prompt,
+            response_model=WasteDetectionResult,
+            system_prompt="You are a lean construction waste detection expert.",
+            temperature=0.3,
+            route="waste",
         )
 
         if not result:
@@ -395,30 +771,14 @@ priority_actions: list of top 5 priority recommendations"""
 Project Data:
 {json.dumps(project_data, indent=2)}
 
-Return a JSON forecast with:
-schedule_forecast:
-  predicted_completion_date: YYYY-MM-DD
-  confidence_level: high/medium/low
-  schedule_variance_days: number
-  risk_factors: list of risks
-  recommendations: list
-
-cost_forecast:
-  predicted_final_cost: GBP
-  original_budget: GBP
-  cost_variance_percentage: number
-  risk_factors: list
-  recommendations: list
-
-overall_risk_assessment:
-  risk_level: critical/high/medium/low
-  key_concerns: list
-  mitigation_strategies: list"""
+Forecast the schedule, the final cost and the overall project risk."""
 
         result = await self._call_gemini_structured(
             prompt=prompt,
+            response_model=ForecastResult,
             system_prompt="You are a construction project forecasting expert with 30 years of experience in cost and schedule prediction.",
             temperature=0.3,
+            route="forecast",
         )
 
         if not result:
@@ -434,39 +794,80 @@ overall_risk_assessment:
     # NLP Document Analysis
     # ============================================================
 
-    async def analyze_document(self, document_text: str, document_type: Optional[str] = None) -> Dict[str, Any]:
-        """Analyze a construction document using Gemini NLP."""
-        prompt = f"""Analyze this construction document.
+    async def analyze_document(
+        self, document_text: str, document_type: Optional[str] = None, route: str = "document"
+    ) -> Dict[str, Any]:
+        """Analyze a construction document using Gemini NLP.
+
+        Long documents are split on section boundaries and the chunks are
+        analyzed concurrently (at most DOC_CHUNK_CONCURRENCY at a time), then
+        merged into one result. Chunk results are cached by content, so
+        re-analyzing an edited document only calls the model for the chunks
+        that changed. route selects the model tier; contracts always use the
+        contract route.
+        """
+        if document_type == "contract":
+            route = "contract"
+        chunks = chunk_document(document_text)
+        if not chunks:
+            return self._document_default(document_type)
+
+        async def analyze_chunk(index: int, chunk: str) -> Optional[Dict[str, Any]]:
+            key = self.document_chunk_cache.key(chunk, route, document_type or "")
+            cached = self.document_chunk_cache.get(key)
+            if cached is not None:
+                return cached
+            part = f" (part {index + 1} of {len(chunks)})" if len(chunks) > 1 else ""
+            prompt = f"""Analyze this construction document{part}.
 
 Document Type: {document_type or "unknown"}
 Document Content:
-{document_text[:20000]}
-
-Return a JSON analysis with:
-document_type: classified type (RFI, submittal, change_order, safety_report, daily_log, meeting_minutes, contract, specification, other)
-summary: 2-3 sentence summary
-key_entities: list of people, organizations, locations, dates mentioned
-risks_and_issues: list of identified risks
-action_items: list of required actions
-sentiment: positive/negative/neutral
-priority: high/medium/low"""
+{chunk}
+
+Classify the document and extract its entities, risks and required actions."""
+            async with self.document_semaphore:
+                result = await self._call_gemini_structured(
+                    prompt=prompt,
+                    response_model=DocumentAnalysisResult,
+                    system_prompt="You are a construction document analysis expert specializing in contract review and risk assessment.",
+                    temperature=0.2,
+                    route=route,
+                )
+            if result:
+                self.document_chunk_cache.put(key, result)
+            return result
 
-        result = await self._call_gemini_structured(
-            prompt=prompt,
-            system_prompt="You are a construction document analysis expert specializing in contract review and risk assessment.",
+        results = await asyncio.gather(*(analyze_chunk(i, c) for i, c in enumerate(chunks)))
+        analyzed = [(r, len(c)) for r, c in zip(results, chunks) if r]
+        if not analyzed:
+            return self._document_default(document_type)
+        if len(chunks) == 1:
+            return copy.deepcopy(analyzed[0][0])
+
+        if len(analyzed) < len(chunks):
+            logger.warning(f"Document analysis: {len(chunks) - len(analyzed)} of {len(chunks)} chunks failed")
+        chunk_results = [r for r, _ in analyzed]
+        summary = await self._combine_summaries([r["summary"] for r in chunk_results])
+        return merge_chunk_results(chunk_results, [w for _, w in analyzed], document_type=document_type, summary=summary)
+
+    async def _combine_summaries(self, summaries: List[str]) -> Optional[str]:
+        """Merge per-chunk summaries into one 2-3 sentence summary (fast tier)."""
+        joined = "\n".join(f"- {s}" for s in summaries)
+        return await self._call_gemini(
+            prompt=f"Combine these section summaries of one construction document into a single 2-3 sentence summary:\n{joined}",
             temperature=0.2,
+            max_output_tokens=512,
+            route="summary",
         )
 
-        if not result:
-            return {
-                "document_type": document_type or "unknown",
-                "summary": "Could not analyze document",
-                "key_entities": [],
-                "risks_and_issues": [],
-                "action_items": [],
-            }
-
-        return result
+    def _document_default(self, document_type: Optional[str]) -> Dict[str, Any]:
+        return {
+            "document_type": document_type or "unknown",
+            "summary": "Could not analyze document",
+            "key_entities": [],
+            "risks_and_issues": [],
+            "action_items": [],
+        }
 
     # ============================================================
     # Report Generation
@@ -498,9 +899,10 @@ Provide the report in {output_format} format."""
             system_prompt=system,
             temperature=0.4,
             max_output_tokens=4096,
+            route="report",
         )
 
-        return result or "Report generation failed."
+        return result or REPORT_GENERATION_FAILED
 
     # ============================================================
     # Lean Tools
@@ -513,22 +915,14 @@ Provide the report in {output_format} format."""
 Process Data:
 {json.dumps(process_data, indent=2)}
 
-Return a JSON analysis with:
-current_state:
-  total_lead_time_days: number
-  total_value_added_time_days: number
-  total_non_value_added_time_days: number
-  process_efficiency_percentage: number
-  bottlenecks: list
-  wastes_identified: list
-
-improvement_opportunities: list of recommendations with expected impact
-future_state_projection: brief description of optimized process"""
+Map the current state, then list improvement opportunities with their expected impact."""
 
         result = await self._call_gemini_structured(
             prompt=prompt,
+            response_model=ValueStreamAnalysis,
             system_prompt="You are a lean construction value stream mapping expert.",
             temperature=0.3,
+            route="vsm",
         )
 
         return result or {
@@ -582,25 +976,6 @@ future_state_projection: brief description of optimized process"""
             "For construction efficiency, consider pull planning, daily huddles, and standardized work.",
         ])
 
-    def _extract_json(self, text: str) -> str:
-        """Extract JSON from text that may contain markdown or other content."""
-        text = text.strip()
-        # Remove markdown code fences
-        if text.startswith("```"):
-            lines = text.split("\n")
-            # Remove first line (```json or ```)
-            if len(lines) > 1:
-                text = "\n".join(lines[1:])
-            # Remove last line if it's ```
-            if text.endswith("```"):
-                text = text[:-3].strip()
-        # Find JSON object boundaries
-        start = text.find("{")
-        end = text.rfind("}")
-        if start >= 0 and end > start:
-            return text[start : end + 1]
-        return text
-
     async def close(self):
         """Close the HTTP client."""
         if self._http_client:
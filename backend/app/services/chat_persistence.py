@@ -0,0 +1,206 @@
+"""
+Write-Behind Chat Persistence
+Queues chat exchanges (the user message, the bot reply and the
+conversation's updated memory) in memory and writes them from a background
+task, so the WebSocket path never waits on the database. One writer drains
+the queue in order; exchanges that pile up while a write is in flight go out
+together in the next transaction.
+
+Message timestamps are taken when the exchange happens, not when it is
+written, so conversation history reads back in the order it was sent. The
+conversation's sidebar summary is updated in the same transaction as the
+messages.
+"""
+
+import os
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+CHAT_PERSIST_BATCH_SIZE = int(os.getenv("CHAT_PERSIST_BATCH_SIZE", "50"))
+CHAT_PERSIST_MAX_QUEUE = int(os.getenv("CHAT_PERSIST_MAX_QUEUE", "10000"))
+CHAT_PERSIST_MAX_ATTEMPTS = int(os.getenv("CHAT_PERSIST_MAX_ATTEMPTS", "3"))
+CHAT_PERSIST_RETRY_SECONDS = float(os.getenv("CHAT_PERSIST_RETRY_SECONDS", "1"))
+
+
+class ChatWriteBehind:
+    """In-memory queue of chat exchanges with a single ordered background writer."""
+
+    def __init__(
+        self,
+        batch_size: int = CHAT_PERSIST_BATCH_SIZE,
+        max_queue: int = CHAT_PERSIST_MAX_QUEUE,
+        max_attempts: int = CHAT_PERSIST_MAX_ATTEMPTS,
+        retry_seconds: float = CHAT_PERSIST_RETRY_SECONDS,
+    ):
+        self.batch_size = max(1, batch_size)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_seconds = retry_seconds
+        self.max_queue = max(1, max_queue)
+        # Bounded by hand rather than with maxlen, so every drop is counted
+        self.records: Deque[Dict[str, Any]] = deque()
+        self.written = 0
+        self.dropped = 0
+        self.failed_flushes = 0
+        self._attempts = 0
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def enqueue_exchange(
+        self,
+        conversation_id: int,
+        user_content: str,
+        bot_content: str,
+        user_timestamp: Optional[datetime] = None,
+        bot_timestamp: Optional[datetime] = None,
+        memory_columns: Optional[Union[Dict[str, Any], Callable[[], Dict[str, Any]]]] = None,
+        delivered: bool = True,
+    ) -> None:
+        """Queue one user/bot exchange. Never touches the database.
+
+        `memory_columns` are ChatConversation column values to store with
+        the exchange (see ConversationMemoryManager.columns), or a function
+        returning them. A function is called when the exchange is written,
+        so a memory shared by several sockets is stored in its latest state
+        rather than as a snapshot a later write could go back on. `delivered`
+        marks the reply as seen by the user; otherwise the conversation
+        shows as unread.
+        """
+        now = datetime.now(timezone.utc)
+        bot_timestamp = bot_timestamp or now
+        if len(self.records) >= self.max_queue:
+            self.records.popleft()
+            self.dropped += 1
+            logger.error("Chat write-behind queue full; dropping oldest exchange")
+        self.records.append({
+            "messages": [
+                {"conversation_id": conversation_id, "role": "user", "content": user_content,
+                 "timestamp": user_timestamp or now},
+                {"conversation_id": conversation_id, "role": "assistant", "content": bot_content,
+                 "timestamp": bot_timestamp},
+            ],
+            "conversation": {
+                "id": conversation_id,
+                "updated_at": bot_timestamp,
+                **({"last_read_at": bot_timestamp} if delivered else {}),
+                **(memory_columns if isinstance(memory_columns, dict) else {}),
+            },
+            **({"memory_columns": memory_columns} if callable(memory_columns) else {}),
+        })
+        self._ensure_started()
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _ensure_started(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return  # No loop (e.g. scripts); exchanges are written on the next flush()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            await self.flush()
+            if self.records and not self._stopping:
+                # The last write failed; back off before retrying
+                await asyncio.sleep(self.retry_seconds)
+                self._wakeup.set()
+
+    async def flush(self) -> int:
+        """Write queued exchanges, oldest first, off the event loop.
+
+        A failed batch is put back at the head of the queue so later
+        exchanges are never written before it; it is dropped after
+        max_attempts consecutive failures. If exchanges queued during the
+        write leave no room for all of it, its oldest exchanges are dropped,
+        as enqueueing onto a full queue does.
+        """
+        written = 0
+        while self.records:
+            batch: List[Dict[str, Any]] = []
+            while self.records and len(batch) < self.batch_size:
+                batch.append(self.records.popleft())
+            for record in batch:
+                columns = record.pop("memory_columns", None)
+                if columns is not None:
+                    record["conversation"].update(columns())
+            try:
+                await asyncio.to_thread(self._write, batch)
+                written += len(batch)
+                self._attempts = 0
+            except Exception as e:
+                self.failed_flushes += 1
+                self._attempts += 1
+                if self._attempts >= self.max_attempts:
+                    self._attempts = 0
+                    self.dropped += len(batch)
+                    logger.error(f"Chat persistence failed {self.max_attempts} times, dropped {len(batch)} exchanges: {e}")
+                else:
+                    overflow = len(self.records) + len(batch) - self.max_queue
+                    if overflow > 0:
+                        self.dropped += overflow
+                        batch = batch[overflow:]
+                        logger.error(f"Chat write-behind queue full; dropped {overflow} oldest exchanges on retry")
+                    self.records.extendleft(reversed(batch))
+                    logger.warning(f"Chat persistence failed, will retry {len(batch)} exchanges: {e}")
+                break
+        self.written += written
+        return written
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        from ..database import SessionLocal
+        from ..models import ChatConversation, ChatMessage
+        from .chat_summary import summary_params, summary_updates
+
+        messages = [message for record in batch for message in record["messages"]]
+        # Later exchanges carry the newer memory, so the last one per conversation wins
+        conversations = {record["conversation"]["id"]: record["conversation"] for record in batch}
+
+        db = SessionLocal()
+        try:
+            db.bulk_insert_mappings(ChatMessage, messages)
+            db.bulk_update_mappings(ChatConversation, list(conversations.values()))
+            db.execute(summary_updates(), summary_params(messages))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    async def stop(self) -> None:
+        """Stop the background writer and flush what is left.
+
+        The writer is allowed to finish a write in progress rather than
+        being cancelled, which would lose the batch it holds.
+        """
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+            self._stopping = False
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": len(self.records),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed_flushes": self.failed_flushes,
+            "batch_size": self.batch_size,
+        }
+
+
+# Global chat write-behind queue
+chat_write_behind = ChatWriteBehind()
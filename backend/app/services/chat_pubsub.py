@@ -0,0 +1,321 @@
+"""
+Chat WebSocket Fan-out
+Delivers chat frames to every socket for a session or user, whichever
+worker holds it. Frames are published to a pub/sub channel per session and
+per user; each worker subscribes to the channels of the sockets it holds and
+forwards what it receives. Redis pub/sub is used when CHAT_PUBSUB_URL (or
+REDIS_URL) is set and answers a ping when the first socket connects,
+otherwise an in-process broker, which is enough for a single worker and for
+tests.
+
+Each socket has a bounded outbound queue drained by its own writer task.
+Frames that are already queued are sent together as one batch frame, and a
+socket whose queue overflows or whose sends stall is disconnected instead
+of slowing everyone else down.
+"""
+
+import os
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+CHAT_PUBSUB_URL = os.getenv("CHAT_PUBSUB_URL", os.getenv("REDIS_URL", ""))
+CHAT_WS_SEND_QUEUE = int(os.getenv("CHAT_WS_SEND_QUEUE", "256"))
+CHAT_WS_BATCH_MAX = int(os.getenv("CHAT_WS_BATCH_MAX", "32"))
+CHAT_WS_SEND_TIMEOUT_SECONDS = float(os.getenv("CHAT_WS_SEND_TIMEOUT_SECONDS", "5"))
+CHAT_PUBSUB_CONNECT_TIMEOUT_SECONDS = float(os.getenv("CHAT_PUBSUB_CONNECT_TIMEOUT_SECONDS", "2"))
+
+# Close code sent to consumers that cannot keep up ("try again later")
+SLOW_CONSUMER_CLOSE_CODE = 1013
+# Close code sent when the socket cannot be subscribed ("internal error")
+SUBSCRIBE_FAILED_CLOSE_CODE = 1011
+
+Handler = Callable[[str, str], None]
+
+
+def session_channel(session_id: str) -> str:
+    return f"chat:session:{session_id}"
+
+
+def user_channel(user_id: int) -> str:
+    return f"chat:user:{user_id}"
+
+
+class InProcessBroker:
+    """Pub/sub within one process. Several managers may share one broker."""
+
+    def __init__(self):
+        self.handlers: Dict[str, Set[Handler]] = defaultdict(set)
+
+    async def subscribe(self, channel: str, handler: Handler) -> None:
+        self.handlers[channel].add(handler)
+
+    async def unsubscribe(self, channel: str, handler: Handler) -> None:
+        handlers = self.handlers.get(channel)
+        if handlers:
+            handlers.discard(handler)
+            if not handlers:
+                del self.handlers[channel]
+
+    async def publish(self, channel: str, message: str) -> None:
+        for handler in list(self.handlers.get(channel, ())):
+            handler(channel, message)
+
+    async def close(self) -> None:
+        self.handlers.clear()
+
+
+class RedisBroker:
+    """Redis pub/sub: one subscriber connection per worker, read by a background task."""
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+
+        self.client = redis.from_url(url, decode_responses=True)
+        self.pubsub = self.client.pubsub()
+        self.handlers: Dict[str, Set[Handler]] = defaultdict(set)
+        self._reader: Optional[asyncio.Task] = None
+
+    async def subscribe(self, channel: str, handler: Handler) -> None:
+        if not self.handlers[channel]:
+            await self.pubsub.subscribe(channel)
+        self.handlers[channel].add(handler)
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.create_task(self._read())
+
+    async def unsubscribe(self, channel: str, handler: Handler) -> None:
+        handlers = self.handlers.get(channel)
+        if not handlers:
+            return
+        handlers.discard(handler)
+        if not handlers:
+            del self.handlers[channel]
+            await self.pubsub.unsubscribe(channel)
+
+    async def publish(self, channel: str, message: str) -> None:
+        await self.client.publish(channel, message)
+
+    async def ping(self) -> None:
+        await self.client.ping()
+
+    async def _read(self) -> None:
+        while True:
+            try:
+                if not self.pubsub.subscribed:
+                    await asyncio.sleep(0.1)
+                    continue
+                message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message and message.get("type") == "message":
+                    channel = message["channel"]
+                    for handler in list(self.handlers.get(channel, ())):
+                        handler(channel, message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Chat pub/sub read error: {e}")
+                await asyncio.sleep(1.0)
+
+    async def close(self) -> None:
+        if self._reader:
+            self._reader.cancel()
+        await self.pubsub.close()
+        await self.client.close()
+
+
+async def create_broker(url: str = CHAT_PUBSUB_URL, timeout: float = CHAT_PUBSUB_CONNECT_TIMEOUT_SECONDS):
+    """Redis broker when configured, installed and answering a ping, otherwise in-process."""
+    if url:
+        broker = None
+        try:
+            broker = RedisBroker(url)
+            await asyncio.wait_for(broker.ping(), timeout)
+            return broker
+        except Exception as e:
+            logger.warning(f"Redis pub/sub unavailable ({e}); chat fan-out limited to this worker")
+            if broker is not None:
+                try:
+                    await broker.close()
+                except Exception:
+                    pass
+    return InProcessBroker()
+
+
+class ChatConnection:
+    """One WebSocket with a bounded outbound queue and a batching writer."""
+
+    def __init__(self, websocket, session_id: str, user_id: int,
+                 on_close: Callable[["ChatConnection"], Awaitable[None]],
+                 max_queue: int = CHAT_WS_SEND_QUEUE,
+                 batch_max: int = CHAT_WS_BATCH_MAX,
+                 send_timeout: float = CHAT_WS_SEND_TIMEOUT_SECONDS):
+        self.websocket = websocket
+        self.session_id = session_id
+        self.user_id = user_id
+        self.batch_max = max(1, batch_max)
+        self.send_timeout = send_timeout
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, max_queue))
+        self.closed = False
+        self.frames_sent = 0
+        self.batches_sent = 0
+        self._on_close = on_close
+        self._closing: Optional[asyncio.Task] = None
+        self._writer = asyncio.create_task(self._write())
+
+    def enqueue(self, frame: str) -> bool:
+        """Queue a frame without waiting; a full queue marks a slow consumer."""
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(frame)
+            return True
+        except asyncio.QueueFull:
+            logger.warning(f"Disconnecting slow chat consumer user={self.user_id} session={self.session_id}")
+            self._close_soon(SLOW_CONSUMER_CLOSE_CODE)
+            return False
+
+    def _close_soon(self, code: Optional[int] = None) -> None:
+        # Called from sync code and the writer; the task is kept so it is not
+        # garbage-collected before it runs
+        if self._closing is None:
+            self._closing = asyncio.create_task(self.close(code))
+
+    async def _write(self) -> None:
+        try:
+            while True:
+                frames = [await self.queue.get()]
+                while len(frames) < self.batch_max and not self.queue.empty():
+                    frames.append(self.queue.get_nowait())
+                # Frames are JSON text, so a batch can be assembled without re-encoding
+                payload = frames[0] if len(frames) == 1 else '{"type":"batch","messages":[' + ",".join(frames) + "]}"
+                await asyncio.wait_for(self.websocket.send_text(payload), self.send_timeout)
+                self.frames_sent += len(frames)
+                self.batches_sent += 1
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            logger.warning(f"Chat send stalled for user={self.user_id} session={self.session_id}")
+            self._close_soon(SLOW_CONSUMER_CLOSE_CODE)
+        except Exception:
+            # Socket already gone; the receive loop will notice and clean up
+            self._close_soon()
+
+    async def close(self, code: Optional[int] = None) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        if self._writer is not asyncio.current_task():
+            self._writer.cancel()
+        if code is not None:
+            try:
+                await self.websocket.close(code=code)
+            except Exception:
+                pass
+        await self._on_close(self)
+
+
+class ChatConnectionManager:
+    """Tracks this worker's chat sockets and fans frames out through a broker.
+
+    A user may hold many sockets, across sessions and workers, and a session
+    may be open in several tabs; every one receives the frames published to
+    its session or user channel.
+    """
+
+    def __init__(self, broker=None):
+        self._broker = broker
+        self._broker_lock = asyncio.Lock()
+        self.channels: Dict[str, Set[ChatConnection]] = defaultdict(set)
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    async def get_broker(self):
+        """The broker, created (and for Redis, probed) on first use."""
+        if self._broker is None:
+            async with self._broker_lock:
+                if self._broker is None:
+                    self._broker = await create_broker()
+        return self._broker
+
+    async def connect(self, websocket, session_id: str, user_id: int, accept: bool = True) -> ChatConnection:
+        """Register a socket on its session and user channels. If the broker
+        refuses the subscription the socket is closed with 1011 and the error
+        is raised."""
+        broker = await self.get_broker()
+        if accept:
+            await websocket.accept()
+        connection = ChatConnection(websocket, session_id, user_id, on_close=self._remove)
+        try:
+            for channel in (session_channel(session_id), user_channel(user_id)):
+                if not self.channels[channel]:
+                    await broker.subscribe(channel, self._deliver)
+                self.channels[channel].add(connection)
+        except Exception:
+            logger.error(f"Chat subscribe failed for user={user_id} session={session_id}")
+            await connection.close(SUBSCRIBE_FAILED_CLOSE_CODE)
+            raise
+        return connection
+
+    async def disconnect(self, connection: ChatConnection) -> None:
+        await connection.close()
+
+    async def _remove(self, connection: ChatConnection) -> None:
+        for channel in (session_channel(connection.session_id), user_channel(connection.user_id)):
+            connections = self.channels.get(channel)
+            if connections is None:
+                continue
+            connections.discard(connection)
+            if not connections:
+                del self.channels[channel]
+                try:
+                    await self._broker.unsubscribe(channel, self._deliver)
+                except Exception as e:
+                    logger.warning(f"Chat unsubscribe failed for {channel}: {e}")
+
+    def _deliver(self, channel: str, frame: str) -> None:
+        for connection in list(self.channels.get(channel, ())):
+            if connection.enqueue(frame):
+                self.delivered += 1
+            else:
+                self.dropped += 1
+
+    async def send_to_session(self, session_id: str, frame: str) -> None:
+        """Publish a JSON frame to every socket open on a session."""
+        self.published += 1
+        await (await self.get_broker()).publish(session_channel(session_id), frame)
+
+    async def send_to_user(self, user_id: int, frame: str) -> None:
+        """Publish a JSON frame to every socket the user holds."""
+        self.published += 1
+        await (await self.get_broker()).publish(user_channel(user_id), frame)
+
+    # Names kept from the original in-memory manager
+    async def send_personal_message(self, message: str, user_id: int) -> None:
+        await self.send_to_user(user_id, message)
+
+    async def broadcast_message(self, message: str, session_id: str) -> None:
+        await self.send_to_session(session_id, message)
+
+    def stats(self) -> Dict[str, Any]:
+        connections = {c for conns in self.channels.values() for c in conns}
+        return {
+            "broker": type(self._broker).__name__ if self._broker is not None else None,
+            "connections": len(connections),
+            "channels": len(self.channels),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+        }
+
+    async def close(self) -> None:
+        connections = {c for conns in self.channels.values() for c in conns}
+        await asyncio.gather(*(c.close(1001) for c in connections), return_exceptions=True)
+        if self._broker is not None:
+            await self._broker.close()
+
+
+# Global chat connection manager instance
+chat_connections = ChatConnectionManager()
@@ -0,0 +1,316 @@
+"""
+Chat Message Full-Text Search
+Maintains a full-text index over chat message content and runs ranked
+searches against it, grouped by conversation in SQL.
+
+- SQLite: an external-content FTS5 table (chat_messages_fts) kept in step
+  with chat_messages by triggers, ranked with bm25().
+- PostgreSQL: a stored generated tsvector column (content_tsv) with a GIN
+  index, ranked with ts_rank().
+
+Both indexes are maintained by the database on every insert, including the
+chat write-behind bulk inserts. Other databases, or a SQLite build without
+FTS5, fall back to a LIKE scan with the same result shape.
+
+Snippets are HTML: the message text is escaped and only the <mark> tags
+around matches are markup, so clients can render them as-is.
+"""
+
+import re
+import html
+import logging
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import DateTime, text
+
+logger = logging.getLogger(__name__)
+
+SNIPPET_START = "<mark>"
+SNIPPET_END = "</mark>"
+SNIPPET_WORDS = 16
+# The database marks matches with these control characters; they are turned
+# into SNIPPET_START/END after the snippet text has been HTML-escaped
+HIGHLIGHT_START = "\x02"
+HIGHLIGHT_END = "\x03"
+
+SQLITE_INDEX_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS chat_messages_fts USING fts5("
+    "content, content='chat_messages', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS chat_messages_fts_ai AFTER INSERT ON chat_messages BEGIN "
+    "INSERT INTO chat_messages_fts(rowid, content) VALUES (new.id, new.content); END",
+    "CREATE TRIGGER IF NOT EXISTS chat_messages_fts_ad AFTER DELETE ON chat_messages BEGIN "
+    "INSERT INTO chat_messages_fts(chat_messages_fts, rowid, content) VALUES ('delete', old.id, old.content); END",
+    "CREATE TRIGGER IF NOT EXISTS chat_messages_fts_au AFTER UPDATE OF content ON chat_messages BEGIN "
+    "INSERT INTO chat_messages_fts(chat_messages_fts, rowid, content) VALUES ('delete', old.id, old.content); "
+    "INSERT INTO chat_messages_fts(rowid, content) VALUES (new.id, new.content); END",
+]
+SQLITE_INDEX_REBUILD = "INSERT INTO chat_messages_fts(chat_messages_fts) VALUES ('rebuild')"
+SQLITE_INDEX_DROP = [
+    "DROP TRIGGER IF EXISTS chat_messages_fts_au",
+    "DROP TRIGGER IF EXISTS chat_messages_fts_ad",
+    "DROP TRIGGER IF EXISTS chat_messages_fts_ai",
+    "DROP TABLE IF EXISTS chat_messages_fts",
+]
+
+POSTGRES_INDEX_DDL = [
+    "ALTER TABLE chat_messages ADD COLUMN IF NOT EXISTS content_tsv tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('english', coalesce(content, ''))) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_chat_messages_content_tsv ON chat_messages USING GIN (content_tsv)",
+]
+POSTGRES_INDEX_DROP = [
+    "DROP INDEX IF EXISTS ix_chat_messages_content_tsv",
+    "ALTER TABLE chat_messages DROP COLUMN IF EXISTS content_tsv",
+]
+
+# One row per matching conversation: its best hit, how many of its messages
+# matched, and the total number of matching conversations
+SQLITE_SEARCH = f"""
+WITH hits AS (
+    SELECT m.id, m.conversation_id, m.timestamp AS sent_at, bm25(chat_messages_fts) AS relevance
+    FROM chat_messages_fts
+    JOIN chat_messages m ON m.id = chat_messages_fts.rowid
+    JOIN chat_conversations c ON c.id = m.conversation_id
+    WHERE chat_messages_fts MATCH :query AND c.user_id = :user_id
+), ranked AS (
+    SELECT hits.*,
+           ROW_NUMBER() OVER (PARTITION BY conversation_id ORDER BY relevance, sent_at DESC) AS hit_order,
+           COUNT(*) OVER (PARTITION BY conversation_id) AS match_count
+    FROM hits
+), best AS (
+    SELECT ranked.*, COUNT(*) OVER () AS total
+    FROM ranked WHERE hit_order = 1
+    ORDER BY relevance, sent_at DESC
+    LIMIT :limit OFFSET :offset
+)
+SELECT c.session_id, best.sent_at AS matched_at, best.match_count, -best.relevance AS score, best.total,
+       (SELECT snippet(chat_messages_fts, 0, char(2), char(3), '...', {SNIPPET_WORDS})
+        FROM chat_messages_fts WHERE chat_messages_fts MATCH :query AND rowid = best.id) AS snippet
+FROM best JOIN chat_conversations c ON c.id = best.conversation_id
+ORDER BY best.relevance, best.sent_at DESC
+"""
+
+POSTGRES_SEARCH = f"""
+WITH q AS (
+    SELECT websearch_to_tsquery('english', :query) AS query
+), hits AS (
+    SELECT m.id, m.conversation_id, m.timestamp AS sent_at, m.content, ts_rank(m.content_tsv, q.query) AS relevance
+    FROM chat_messages m
+    JOIN chat_conversations c ON c.id = m.conversation_id, q
+    WHERE c.user_id = :user_id AND m.content_tsv @@ q.query
+), ranked AS (
+    SELECT hits.*,
+           ROW_NUMBER() OVER (PARTITION BY conversation_id ORDER BY relevance DESC, sent_at DESC) AS hit_order,
+           COUNT(*) OVER (PARTITION BY conversation_id) AS match_count
+    FROM hits
+), best AS (
+    SELECT ranked.*, COUNT(*) OVER () AS total
+    FROM ranked WHERE hit_order = 1
+    ORDER BY relevance DESC, sent_at DESC
+    LIMIT :limit OFFSET :offset
+)
+SELECT c.session_id, best.sent_at AS matched_at, best.match_count, best.relevance AS score, best.total,
+       ts_headline('english', best.content, q.query,
+                   'StartSel=' || chr(2) || ', StopSel=' || chr(3) ||
+                   ', MaxFragments=1, MaxWords={SNIPPET_WORDS}, MinWords=4') AS snippet
+FROM best JOIN chat_conversations c ON c.id = best.conversation_id, q
+ORDER BY best.relevance DESC, best.sent_at DESC
+"""
+
+LIKE_SEARCH = """
+WITH hits AS (
+    SELECT m.id, m.conversation_id, m.timestamp AS sent_at, m.content
+    FROM chat_messages m
+    JOIN chat_conversations c ON c.id = m.conversation_id
+    WHERE c.user_id = :user_id AND lower(m.content) LIKE :pattern ESCAPE '\\'
+), ranked AS (
+    SELECT hits.*,
+           ROW_NUMBER() OVER (PARTITION BY conversation_id ORDER BY sent_at DESC) AS hit_order,
+           COUNT(*) OVER (PARTITION BY conversation_id) AS match_count
+    FROM hits
+), best AS (
+    SELECT ranked.*, COUNT(*) OVER () AS total
+    FROM ranked WHERE hit_order = 1
+    ORDER BY sent_at DESC
+    LIMIT :limit OFFSET :offset
+)
+SELECT c.session_id, best.sent_at AS matched_at, best.match_count, 0 AS score, best.total,
+       best.content AS snippet
+FROM best JOIN chat_conversations c ON c.id = best.conversation_id
+ORDER BY best.sent_at DESC
+"""
+
+
+def fts5_query(query: str) -> str:
+    """Turn free text into a safe FTS5 query: every word must appear, as a prefix.
+
+    Quoting each word keeps FTS5 operators and punctuation in user input
+    from being parsed as query syntax.
+    """
+    return " ".join(f'"{word}"*' for word in re.findall(r"\w+", query))
+
+
+def highlight(snippet: Optional[str]) -> str:
+    """HTML-escape a database snippet, then turn its match markers into <mark> tags."""
+    escaped = html.escape(snippet or "")
+    return escaped.replace(HIGHLIGHT_START, SNIPPET_START).replace(HIGHLIGHT_END, SNIPPET_END)
+
+
+def like_snippet(content: Optional[str], query: str, words: int = SNIPPET_WORDS) -> str:
+    """A highlighted snippet of about `words` words around the first
+    occurrence of `query`, for the LIKE fallback."""
+    content = content or ""
+    match = re.search(re.escape(query), content, re.IGNORECASE)
+    tokens = list(re.finditer(r"\S+", content))
+    if match is None or not tokens:
+        window = tokens[:words]
+        text_end = window[-1].end() if window else 0
+        return html.escape(content[:text_end]) + ("..." if text_end < len(content.rstrip()) else "")
+    # Tokens overlapping the match
+    first = next((i for i, t in enumerate(tokens) if t.end() > match.start()), len(tokens) - 1)
+    last = max([i for i, t in enumerate(tokens) if t.start() < match.end()] + [first])
+    lo = max(0, first - words // 2)
+    hi = min(len(tokens), last + 1 + words // 2)
+    start, end = tokens[lo].start(), tokens[hi - 1].end()
+    return "".join([
+        "..." if lo > 0 else "",
+        html.escape(content[start:match.start()]),
+        SNIPPET_START, html.escape(match.group(0)), SNIPPET_END,
+        html.escape(content[match.end():end]),
+        "..." if hi < len(tokens) else "",
+    ])
+
+
+class ChatSearchIndex:
+    """Creates the full-text index for the current database and searches it."""
+
+    def __init__(self):
+        # Whether the index exists, per database URL
+        self._available: Dict[str, bool] = {}
+
+    def ensure(self, engine) -> bool:
+        """Create the index if the database supports one and it is cheap to create.
+
+        On SQLite the FTS5 table and triggers are created (and backfilled)
+        here. On PostgreSQL adding the generated column rewrites
+        chat_messages, so that is left to migration 004 unless the table is
+        still empty, as on a new database whose tables create_all just made.
+        """
+        dialect = engine.dialect.name
+        try:
+            with engine.begin() as connection:
+                if dialect == "sqlite":
+                    created = not self._detect(connection)
+                    for statement in SQLITE_INDEX_DDL:
+                        connection.execute(text(statement))
+                    if created:
+                        connection.execute(text(SQLITE_INDEX_REBUILD))
+                elif dialect == "postgresql":
+                    if self._detect(connection):
+                        return self._mark(engine, True)
+                    if connection.execute(text("SELECT 1 FROM chat_messages LIMIT 1")).first():
+                        logger.warning("Chat full-text index missing; run migration 004. Search will scan until then")
+                        return self._mark(engine, False)
+                    for statement in POSTGRES_INDEX_DDL:
+                        connection.execute(text(statement))
+                else:
+                    return self._mark(engine, False)
+        except Exception as e:
+            logger.warning(f"Could not create the chat full-text index on {dialect}: {e}")
+            # Another worker may have created it concurrently
+            with engine.connect() as connection:
+                return self._mark(engine, self._detect(connection))
+        return self._mark(engine, True)
+
+    def _key(self, engine) -> str:
+        # The sync and async engines for one database share an entry
+        return engine.url.set(drivername=engine.dialect.name).render_as_string(hide_password=True)
+
+    def _mark(self, engine, available: bool) -> bool:
+        self._available[self._key(engine)] = available
+        return available
+
+    def available(self, engine) -> bool:
+        key = self._key(engine)
+        if key not in self._available:
+            with engine.connect() as connection:
+                self._available[key] = self._detect(connection)
+        return self._available[key]
+
+    def _detect(self, connection) -> bool:
+        dialect = connection.dialect.name
+        try:
+            if dialect == "sqlite":
+                return connection.execute(text(
+                    "SELECT 1 FROM sqlite_master WHERE name = 'chat_messages_fts'"
+                )).first() is not None
+            if dialect == "postgresql":
+                return connection.execute(text(
+                    "SELECT 1 FROM information_schema.columns "
+                    "WHERE table_name = 'chat_messages' AND column_name = 'content_tsv'"
+                )).first() is not None
+        except Exception:
+            pass
+        return False
+
+    def _statement(self, dialect: str, available: bool, user_id: int, query: str, limit: int, offset: int):
+        """(statement, params, is_like_scan) for a search, or None if the query
+        has no searchable words."""
+        params: Dict[str, Any] = {"user_id": user_id, "limit": limit, "offset": offset}
+        if available and dialect == "sqlite":
+            params["query"] = fts5_query(query)
+            if not params["query"]:
+                return None
+            statement = SQLITE_SEARCH
+        elif available and dialect == "postgresql":
+            params["query"] = query
+            statement = POSTGRES_SEARCH
+        else:
+            escaped = query.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            params["pattern"] = f"%{escaped}%"
+            return text(LIKE_SEARCH).columns(matched_at=DateTime), params, True
+        return text(statement).columns(matched_at=DateTime), params, False
+
+    def _results(self, rows, like_query: Optional[str] = None) -> Dict[str, Any]:
+        conversations: List[Dict[str, Any]] = [
+            {
+                "session_id": row["session_id"],
+                "snippet": like_snippet(row["snippet"], like_query) if like_query is not None else highlight(row["snippet"]),
+                "matched_at": row["matched_at"],
+                "message_count": row["match_count"],
+                "score": float(row["score"] or 0),
+            }
+            for row in rows
+        ]
+        return {"conversations": conversations, "total_found": rows[0]["total"] if rows else 0}
+
+    def search(self, db, user_id: int, query: str, limit: int = 10, offset: int = 0) -> Dict[str, Any]:
+        """Rank a user's conversations by how well their messages match `query`.
+
+        Returns {"conversations": [...], "total_found": n}: one entry per
+        matching conversation with its best snippet (HTML-escaped text with
+        matches wrapped in <mark>), the time of that message, the number of its messages that
+        matched and a relevance score; total_found counts all matching
+        conversations, not just this page.
+        """
+        engine = db.get_bind()
+        prepared = self._statement(engine.dialect.name, self.available(engine), user_id, query, limit, offset)
+        if prepared is None:
+            return self._results([])
+        statement, params, like = prepared
+        return self._results(db.execute(statement, params).mappings().all(), query if like else None)
+
+    async def search_async(self, db, user_id: int, query: str, limit: int = 10, offset: int = 0) -> Dict[str, Any]:
+        """search() for an AsyncSession."""
+        engine = db.get_bind()
+        key = self._key(engine)
+        if key not in self._available:
+            self._available[key] = await db.run_sync(lambda session: self._detect(session.connection()))
+        prepared = self._statement(engine.dialect.name, self._available[key], user_id, query, limit, offset)
+        if prepared is None:
+            return self._results([])
+        statement, params, like = prepared
+        return self._results((await db.execute(statement, params)).mappings().all(), query if like else None)
+
+
+# Global chat search index
+chat_search_index = ChatSearchIndex()
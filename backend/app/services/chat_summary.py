@@ -0,0 +1,61 @@
+"""
+Chat Conversation Summaries
+Denormalized fields on chat_conversations for the chat sidebar: a preview
+of the last message, the message count and when the last message was
+sent. Every path that inserts chat messages applies summary_updates() in
+the same transaction, so the sidebar reads one row per conversation
+instead of loading messages.
+
+Counts are incremented in SQL rather than written from Python, so
+concurrent writers to one conversation cannot lose each other's messages,
+and the preview only moves forward in time when exchanges are written out
+of order.
+"""
+
+from typing import Any, Dict, Iterable, List, Mapping
+
+from sqlalchemy import bindparam, case, func, or_, update
+
+# Characters of the last message kept for the sidebar preview
+PREVIEW_LENGTH = 120
+
+
+def preview(content: str) -> str:
+    return (content or "")[:PREVIEW_LENGTH]
+
+
+def summary_params(messages: Iterable[Mapping[str, Any]]) -> List[Dict[str, Any]]:
+    """Per-conversation parameters for summary_updates() from message mappings
+    (conversation_id, content, timestamp)."""
+    summaries: Dict[int, Dict[str, Any]] = {}
+    for message in messages:
+        summary = summaries.setdefault(message["conversation_id"], {
+            "b_id": message["conversation_id"], "b_added": 0, "b_preview": None, "b_at": None,
+        })
+        summary["b_added"] += 1
+        if summary["b_at"] is None or message["timestamp"] >= summary["b_at"]:
+            summary["b_preview"] = preview(message["content"])
+            summary["b_at"] = message["timestamp"]
+    return list(summaries.values())
+
+
+def summary_updates():
+    """UPDATE for chat_conversations, executed with summary_params() rows."""
+    from ..models import ChatConversation
+
+    table = ChatConversation.__table__
+    # Typed so the timestamp is bound as the column's naive UTC value
+    sent_at = bindparam("b_at", type_=table.c.last_message_at.type)
+    newer = or_(table.c.last_message_at.is_(None), table.c.last_message_at <= sent_at)
+    return update(table).where(table.c.id == bindparam("b_id")).values(
+        message_count=func.coalesce(table.c.message_count, 0) + bindparam("b_added"),
+        last_message_preview=case((newer, bindparam("b_preview")), else_=table.c.last_message_preview),
+        last_message_at=case((newer, sent_at), else_=table.c.last_message_at),
+    )
+
+
+def is_unread(conversation) -> bool:
+    """Whether the conversation has messages newer than the user last saw."""
+    if conversation.last_message_at is None:
+        return False
+    return conversation.last_read_at is None or conversation.last_message_at > conversation.last_read_at
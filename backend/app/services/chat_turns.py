@@ -0,0 +1,197 @@
+"""
+Ordered Chat Turn Processing
+Runs the send-message flow for a chat WebSocket off the socket's receive
+loop. Incoming messages are queued per connection and answered one at a
+time by a background task: the reply streams to the session as token frames
+while the AI generates it, then conversation memory is updated and the
+exchange is handed to the write-behind queue.
+
+Turns are answered strictly in the order they arrived, so each reply sees
+the previous exchange in its context and replies never interleave. The
+receive loop only parses and queues, so it can keep accepting messages (up
+to CHAT_WS_MAX_PENDING waiting per connection) while a reply is streaming.
+Memory is the worker's shared memory for the conversation (see
+ConversationMemoryManager.acquire), so every socket and REST request on a
+conversation adds to, and persists, the same context.
+"""
+
+import os
+import json
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CHAT_WS_MAX_PENDING = int(os.getenv("CHAT_WS_MAX_PENDING", "8"))
+# Appended to a reply whose stream failed part-way through
+TRUNCATED_NOTICE = " [response interrupted]"
+
+# (session_id, frame) -> None
+Publisher = Callable[[str, str], Awaitable[None]]
+# (user_message, history, tenant) -> async iterator of text pieces
+Streamer = Callable[..., AsyncIterator[str]]
+
+
+@dataclass
+class ChatTurn:
+    """One user message waiting for (or receiving) its reply."""
+    seq: int
+    content: str
+    client_id: Optional[str] = None
+    received_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class ChatTurnQueue:
+    """Answers one connection's messages in arrival order on a background task."""
+
+    def __init__(
+        self,
+        session_id: str,
+        user_id: int,
+        conversation_id: int,
+        memory,
+        publish: Publisher,
+        tenant: Optional[str] = None,
+        stream: Optional[Streamer] = None,
+        fallback: Optional[Callable[[str], str]] = None,
+        memory_manager=None,
+        persistence=None,
+        max_pending: int = CHAT_WS_MAX_PENDING,
+    ):
+        self.session_id = session_id
+        self.user_id = user_id
+        self.conversation_id = conversation_id
+        self.tenant = tenant
+        self.max_pending = max(1, max_pending)
+        self.pending: Deque[ChatTurn] = deque()
+        self.completed = 0
+        self.closed = False
+        self._publish = publish
+        self._stream = stream
+        self._fallback = fallback
+        self._memory_manager = memory_manager
+        self._persistence = persistence
+        self._next_seq = 1
+        self._task: Optional[asyncio.Task] = None
+        self._released = False
+        self.memory = self.memory_manager.acquire(conversation_id, memory)
+
+    @property
+    def stream(self) -> Streamer:
+        if self._stream is None:
+            from .ai_service import ai_service
+            self._stream = ai_service.stream_response
+        return self._stream
+
+    @property
+    def memory_manager(self):
+        if self._memory_manager is None:
+            from .conversation_memory import conversation_memory
+            self._memory_manager = conversation_memory
+        return self._memory_manager
+
+    @property
+    def persistence(self):
+        if self._persistence is None:
+            from .chat_persistence import chat_write_behind
+            self._persistence = chat_write_behind
+        return self._persistence
+
+    def submit(self, content: str, client_id: Optional[str] = None) -> Optional[ChatTurn]:
+        """Queue a message without waiting. None when closed or too many are already pending."""
+        if self.closed or len(self.pending) >= self.max_pending:
+            return None
+        turn = ChatTurn(seq=self._next_seq, content=content, client_id=client_id)
+        self._next_seq += 1
+        self.pending.append(turn)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return turn
+
+    async def _run(self) -> None:
+        # Runs while turns are pending; submit() starts a new run when it has exited
+        while self.pending:
+            turn = self.pending[0]
+            try:
+                await self._answer(turn)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Chat turn {turn.seq} failed for session {self.session_id}: {e}")
+                try:
+                    await self._send({"type": "error", "seq": turn.seq, "client_id": turn.client_id,
+                                      "detail": "Error sending message"})
+                except Exception:
+                    pass
+            finally:
+                if self.pending and self.pending[0] is turn:
+                    self.pending.popleft()
+        if self.closed:
+            self._release()
+
+    async def _answer(self, turn: ChatTurn) -> None:
+        ids = {"seq": turn.seq, "client_id": turn.client_id}
+        await self._send({"type": "message", "role": "user", "content": turn.content,
+                          "timestamp": turn.received_at.isoformat(), **ids})
+        await self._send({"type": "typing", "user_id": self.user_id, "is_typing": True})
+
+        pieces = []
+        failed = False
+        try:
+            async for piece in self.stream(turn.content, self.memory.history(), tenant=self.tenant):
+                pieces.append(piece)
+                await self._send({"type": "token", "delta": piece, **ids})
+        except Exception as e:
+            failed = True
+            logger.warning(f"AI stream failed for session {self.session_id}: {e}")
+        reply = "".join(pieces).strip()
+        # A reply cut off mid-stream is kept (the user has seen it) but marked
+        truncated = failed and bool(reply)
+        if truncated:
+            reply += TRUNCATED_NOTICE
+        if not reply:
+            reply = self._fallback(turn.content) if self._fallback else ""
+        replied_at = datetime.now(timezone.utc)
+
+        await self._send({"type": "message", "role": "assistant", "content": reply,
+                          "timestamp": replied_at.isoformat(), "truncated": truncated, **ids})
+        await self._send({"type": "typing", "user_id": self.user_id, "is_typing": False})
+
+        # Memory is updated before the next turn starts so it sees this exchange
+        await self.memory_manager.add_turn(self.memory, turn.content, reply)
+        self.persistence.enqueue_exchange(
+            self.conversation_id,
+            turn.content,
+            reply,
+            user_timestamp=turn.received_at,
+            bot_timestamp=replied_at,
+            # Resolved at write time, so the latest shared memory is stored
+            memory_columns=lambda: self.memory_manager.columns(self.memory),
+            # Replies finished after the socket closed were never seen
+            delivered=not self.closed,
+        )
+        self.completed += 1
+
+    async def _send(self, frame: Dict[str, Any]) -> None:
+        await self._publish(self.session_id, json.dumps(frame))
+
+    def close(self) -> None:
+        """Stop accepting messages. Turns already queued are still answered
+        and persisted, so a dropped socket does not lose what it sent."""
+        self.closed = True
+        if self._task is None or self._task.done():
+            self._release()
+
+    def _release(self) -> None:
+        if not self._released:
+            self._released = True
+            self.memory_manager.release(self.conversation_id)
+
+    async def wait_idle(self) -> None:
+        """Wait until every queued turn has been answered."""
+        if self._task is not None:
+            await asyncio.shield(self._task)
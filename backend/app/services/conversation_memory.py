@@ -0,0 +1,191 @@
+"""
+Token-Budgeted Conversation Memory
+Keeps a rolling summary plus a window of recent turns for each chat
+conversation, persisted on the conversation row. Turns that fall out of the
+window are folded into the summary, so prompt size and database reads stay
+flat however long the conversation gets.
+"""
+
+import os
+import json
+import math
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MEMORY_TOKEN_BUDGET = int(os.getenv("CHAT_MEMORY_TOKEN_BUDGET", "2000"))
+MEMORY_SUMMARY_SHARE = float(os.getenv("CHAT_MEMORY_SUMMARY_SHARE", "0.3"))
+MEMORY_MIN_RECENT_TURNS = int(os.getenv("CHAT_MEMORY_MIN_RECENT_TURNS", "2"))
+
+# Summariser signature: (previous_summary, evicted_turns, max_tokens) -> new summary or None
+Summarizer = Callable[[str, List[Dict[str, str]], int], Awaitable[Optional[str]]]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token)."""
+    return math.ceil(len(text or "") / 4)
+
+
+def format_turns(turns: List[Dict[str, str]]) -> str:
+    return "\n".join(f"{turn['role']}: {turn['content']}" for turn in turns)
+
+
+@dataclass
+class ConversationMemory:
+    """Rolling summary of older turns plus the most recent turns verbatim."""
+    summary: str = ""
+    recent: List[Dict[str, str]] = field(default_factory=list)
+    # One compaction at a time for the sockets and requests sharing this memory
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock, repr=False, compare=False)
+
+    @property
+    def recent_tokens(self) -> int:
+        return sum(estimate_tokens(turn["content"]) for turn in self.recent)
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.summary) + self.recent_tokens
+
+    def history(self) -> List[Dict[str, str]]:
+        """Prompt history: the summary (if any) as a `summary` entry, then recent turns."""
+        entries = [{"role": "summary", "content": self.summary}] if self.summary else []
+        return entries + [dict(turn) for turn in self.recent]
+
+
+class ConversationMemoryManager:
+    """Maintains ConversationMemory within a token budget.
+
+    The recent window may use the budget not reserved for the summary. When a
+    new turn pushes it over, the oldest turns are evicted down to half the
+    window and summarised in one call, so summarisation runs every few turns
+    rather than on every message.
+
+    A worker keeps one memory per open conversation (acquire/release), so
+    every socket and request on a conversation adds its turns to the same
+    memory instead of overwriting each other's.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = MEMORY_TOKEN_BUDGET,
+        summary_share: float = MEMORY_SUMMARY_SHARE,
+        min_recent_turns: int = MEMORY_MIN_RECENT_TURNS,
+        summarizer: Optional[Summarizer] = None,
+    ):
+        self.summary_budget = int(token_budget * summary_share)
+        self.recent_budget = token_budget - self.summary_budget
+        self.min_recent_turns = min_recent_turns
+        self.summarizer = summarizer
+        # conversation id -> [shared memory, number of holders]
+        self._shared: Dict[int, List[Any]] = {}
+
+    def acquire(self, conversation_id: int, loaded: ConversationMemory) -> ConversationMemory:
+        """The memory this worker shares for a conversation. `loaded` (just
+        read from the database) is used when no one holds it yet. Every
+        acquire must be paired with a release."""
+        entry = self._shared.get(conversation_id)
+        if entry is None:
+            entry = self._shared[conversation_id] = [loaded, 0]
+        entry[1] += 1
+        return entry[0]
+
+    def release(self, conversation_id: int) -> None:
+        entry = self._shared.get(conversation_id)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] <= 0:
+            del self._shared[conversation_id]
+
+    def load(self, conversation: Any) -> Optional[ConversationMemory]:
+        """Read memory persisted on a ChatConversation; None if it has none yet."""
+        if conversation.memory_turns is None:
+            return None
+        try:
+            recent = json.loads(conversation.memory_turns)
+        except json.JSONDecodeError:
+            logger.warning(f"Discarding unreadable memory for conversation {conversation.id}")
+            recent = []
+        return ConversationMemory(summary=conversation.memory_summary or "", recent=recent)
+
+    def save(self, conversation: Any, memory: ConversationMemory) -> None:
+        for column, value in self.columns(memory).items():
+            setattr(conversation, column, value)
+
+    def columns(self, memory: ConversationMemory) -> Dict[str, Any]:
+        """ChatConversation column values that persist the memory."""
+        return {"memory_summary": memory.summary or None, "memory_turns": json.dumps(memory.recent)}
+
+    def from_messages(self, messages: List[Any]) -> ConversationMemory:
+        """Seed memory from stored messages (oldest first) for conversations
+        created before memory was persisted. Older turns beyond the window are
+        dropped rather than summarised to keep the first request cheap."""
+        memory = ConversationMemory()
+        for message in messages:
+            memory.recent.append({"role": message.role, "content": message.content})
+        while memory.recent_tokens > self.recent_budget and len(memory.recent) > self.min_recent_turns:
+            memory.recent.pop(0)
+        return memory
+
+    async def add_turn(self, memory: ConversationMemory, user_message: str, assistant_message: str,
+                       compact: bool = True) -> ConversationMemory:
+        """Append a user/assistant exchange and compact the memory if needed.
+        With compact=False the caller runs compact() itself, e.g. after
+        responding, since summarising may take a model call."""
+        memory.recent.append({"role": "user", "content": user_message})
+        memory.recent.append({"role": "assistant", "content": assistant_message})
+        if compact:
+            await self.compact(memory)
+        return memory
+
+    def needs_compaction(self, memory: ConversationMemory) -> bool:
+        return memory.recent_tokens > self.recent_budget
+
+    async def compact(self, memory: ConversationMemory) -> bool:
+        """Summarise the oldest turns into the summary once the recent window
+        is over budget, evicting down to half of it. True if anything was
+        evicted. Turns added while the summariser runs are kept."""
+        async with memory.lock:
+            if not self.needs_compaction(memory):
+                return False
+            remaining = memory.recent_tokens
+            count = 0
+            while remaining > self.recent_budget // 2 and len(memory.recent) - count > self.min_recent_turns:
+                remaining -= estimate_tokens(memory.recent[count]["content"])
+                count += 1
+            if not count:
+                return False
+            memory.summary = await self._summarize(memory.summary, memory.recent[:count])
+            # Turns are only ever appended meanwhile, so the evicted ones are still first
+            del memory.recent[:count]
+        return True
+
+    async def _summarize(self, summary: str, turns: List[Dict[str, str]]) -> str:
+        if self.summarizer is not None:
+            try:
+                result = await self.summarizer(summary, turns, self.summary_budget)
+                if result:
+                    return self._trim(result.strip())
+            except Exception as e:
+                logger.warning(f"Conversation summary failed, using extractive fallback: {e}")
+        # Extractive fallback: append the evicted turns and keep the newest part
+        combined = "\n".join(part for part in (summary, format_turns(turns)) if part)
+        return self._trim(combined, keep_end=True)
+
+    def _trim(self, text: str, keep_end: bool = False) -> str:
+        max_chars = self.summary_budget * 4
+        if len(text) <= max_chars:
+            return text
+        return text[-max_chars:] if keep_end else text[:max_chars]
+
+
+async def _summarize_with_ai(summary: str, turns: List[Dict[str, str]], max_tokens: int) -> Optional[str]:
+    from .ai_service import ai_service
+    return await ai_service.summarize_conversation(summary, turns, max_tokens)
+
+
+# Global memory manager backed by the AI service summariser
+conversation_memory = ConversationMemoryManager(summarizer=_summarize_with_ai)
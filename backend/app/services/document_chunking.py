@@ -0,0 +1,216 @@
+"""
+Chunking Helpers for Long Document Analysis
+Splits construction documents on section boundaries, caches per-chunk
+analysis results by content hash, and merges chunk results back into a
+single analyze_document-shaped result.
+"""
+
+import os
+import re
+import hashlib
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+DOC_CHUNK_CHARS = int(os.getenv("DOC_CHUNK_CHARS", "12000"))
+DOC_CHUNK_CONCURRENCY = int(os.getenv("DOC_CHUNK_CONCURRENCY", "4"))
+DOC_CHUNK_CACHE_SIZE = int(os.getenv("DOC_CHUNK_CACHE_SIZE", "2000"))
+# Upper bound on model calls per document; larger documents get larger chunks
+DOC_MAX_CHUNKS = int(os.getenv("DOC_MAX_CHUNKS", "40"))
+
+# Lines that start a new section: ARTICLE/SECTION/PART/SCHEDULE headings,
+# numbered clauses ("12.", "3.2.1 Payment"), markdown headings and short
+# all-caps titles.
+SECTION_HEADING = re.compile(
+    r"^[ \t]*(?:"
+    r"(?i:article|section|part|clause|schedule|appendix|annex|exhibit)[ \t]+[\w.\-]+"
+    r"|\d+(?:\.\d+)*\.?[ \t]+[A-Z]"
+    r"|#{1,6}[ \t]+\S"
+    r"|[A-Z][A-Z0-9 ,&/\-]{3,80}$"
+    r")",
+    re.MULTILINE,
+)
+
+PRIORITY_ORDER = {"low": 0, "medium": 1, "high": 2}
+
+
+def split_sections(text: str) -> List[str]:
+    """Split text at section headings, keeping each heading with its body."""
+    starts = sorted({0} | {m.start() for m in SECTION_HEADING.finditer(text)})
+    sections = [text[a:b] for a, b in zip(starts, starts[1:] + [len(text)])]
+    return [s for s in sections if s.strip()]
+
+
+def _split_oversized(text: str, max_chars: int, separators=("\n\n", "\n")) -> List[str]:
+    """Break one long section on paragraph, then line, then hard boundaries."""
+    if len(text) <= max_chars:
+        return [text]
+    for i, separator in enumerate(separators):
+        parts = text.split(separator)
+        if len(parts) > 1:
+            pieces = [p + separator for p in parts[:-1]] + [parts[-1]]
+            return _pack(pieces, max_chars, separators[i + 1:])
+    return [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
+
+
+def _pack(pieces: Iterable[str], max_chars: int, separators=("\n\n", "\n")) -> List[str]:
+    """Greedily concatenate pieces into chunks of at most max_chars."""
+    chunks: List[str] = []
+    current = ""
+    for piece in pieces:
+        for part in _split_oversized(piece, max_chars, separators):
+            if current and len(current) + len(part) > max_chars:
+                chunks.append(current)
+                current = ""
+            current += part
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+
+def _ends_chunk(section: str, target_chars: int) -> bool:
+    """Whether a chunk boundary follows this section.
+
+    Decided by the section alone: a hash of its heading line against its
+    share of the target chunk size, so on average a boundary falls every
+    target_chars. Body edits never move a boundary, except that a section
+    growing can only make a boundary after it more likely.
+    """
+    heading = section.lstrip().split("\n", 1)[0].strip()
+    digest = hashlib.blake2b(heading.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") / 2 ** 64 < len(section) / target_chars
+
+
+def _pack_sections(sections: List[str], max_chars: int) -> List[str]:
+    """Pack whole sections into chunks at content-defined boundaries.
+
+    Greedy packing would let one section growing shift every boundary after
+    it. Here boundaries come from the sections themselves (_ends_chunk), and
+    a chunk is also closed early when the next section would not fit. An
+    early close only affects chunks up to the next content-defined
+    boundary, where both versions of the document line up again.
+    """
+    target_chars = max(1, max_chars // 2)
+    chunks: List[str] = []
+    current = ""
+    for section in sections:
+        if len(section) > max_chars:
+            # Oversized sections stand alone, split on paragraphs and lines
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.extend(_split_oversized(section, max_chars))
+            continue
+        if current and len(current) + len(section) > max_chars:
+            chunks.append(current)
+            current = ""
+        current += section
+        if _ends_chunk(section, target_chars):
+            chunks.append(current)
+            current = ""
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+
+def chunk_document(text: str, max_chars: int = DOC_CHUNK_CHARS, max_chunks: int = DOC_MAX_CHUNKS) -> List[str]:
+    """Split a document into chunks of at most max_chars on section boundaries.
+
+    Chunk boundaries are anchored to section headings (see _pack_sections),
+    so an edit inside one section, including one that makes it longer,
+    changes only the chunk that contains it; a chunk that outgrows
+    max_chars is split in two. Documents that would need more than
+    max_chunks chunks are chunked with a proportionally larger max_chars.
+    """
+    if len(text) <= max_chars:
+        return [text] if text.strip() else []
+    sections = split_sections(text)
+    chunks = _pack_sections(sections, max_chars)
+    while len(chunks) > max_chunks:
+        max_chars *= 2
+        chunks = _pack_sections(sections, max_chars)
+    return chunks
+
+
+class ChunkResultCache:
+    """LRU cache of per-chunk analysis results keyed by content hash."""
+
+    def __init__(self, max_entries: int = DOC_CHUNK_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(chunk: str, *context: str) -> str:
+        digest = hashlib.sha256()
+        for part in context:
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        digest.update(chunk.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        result = self.entries.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return result
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        self.entries[key] = result
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+def _merge_unique(lists: Iterable[List[str]]) -> List[str]:
+    seen = set()
+    merged = []
+    for items in lists:
+        for item in items:
+            key = " ".join(item.lower().split()).rstrip(".")
+            if key and key not in seen:
+                seen.add(key)
+                merged.append(item)
+    return merged
+
+
+def merge_chunk_results(
+    results: List[Dict[str, Any]],
+    weights: List[int],
+    document_type: Optional[str] = None,
+    summary: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Reduce per-chunk DocumentAnalysisResult dicts into one.
+
+    Entities, risks and action items are merged in document order without
+    duplicates. The document type and sentiment are the length-weighted
+    majority across chunks, and priority is the highest any chunk reported.
+    """
+    types: Counter = Counter()
+    sentiments: Counter = Counter()
+    for result, weight in zip(results, weights):
+        types[result["document_type"]] += weight
+        sentiments[result["sentiment"]] += weight
+    specific_types = [t for t, _ in types.most_common() if t != "other"]
+
+    return {
+        "document_type": document_type or (specific_types[0] if specific_types else "other"),
+        "summary": summary or " ".join(r["summary"] for r in results),
+        "key_entities": _merge_unique(r["key_entities"] for r in results),
+        "risks_and_issues": _merge_unique(r["risks_and_issues"] for r in results),
+        "action_items": _merge_unique(r["action_items"] for r in results),
+        "sentiment": sentiments.most_common(1)[0][0],
+        "priority": max((r["priority"] for r in results), key=lambda p: PRIORITY_ORDER.get(p, 0)),
+    }
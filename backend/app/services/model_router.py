@@ -0,0 +1,230 @@
+"""
+Latency-Budget Model Router
+Chooses a Gemini model tier per call type and falls back to the faster tier
+when a request's latency budget or the upstream error rate would be exceeded.
+Per-route latency, token usage and estimated cost are tracked and logged.
+"""
+
+import os
+import json
+import math
+import time
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+GEMINI_FAST_MODEL = os.getenv("GEMINI_FAST_MODEL", "gemini-2.5-flash")
+GEMINI_PRO_MODEL = os.getenv("GEMINI_PRO_MODEL") or os.getenv("GEMINI_MODEL", "gemini-2.5-pro")
+
+# Call type -> tier. Override with GEMINI_ROUTING_POLICY='{"vision": "fast"}'
+DEFAULT_ROUTING_POLICY: Dict[str, str] = {
+    "chat": "fast",
+    "classification": "fast",
+    "sentiment": "fast",
+    "summary": "fast",
+    "vision": "pro",
+    "waste": "pro",
+    "forecast": "pro",
+    "document": "pro",
+    "contract": "pro",
+    "report": "pro",
+    "vsm": "pro",
+}
+
+# USD per 1M tokens (input, output). Override with GEMINI_TIER_PRICING JSON.
+DEFAULT_TIER_PRICING: Dict[str, Dict[str, float]] = {
+    "fast": {"input": 0.30, "output": 2.50},
+    "pro": {"input": 1.25, "output": 10.00},
+}
+
+ROUTER_ERROR_RATE_THRESHOLD = float(os.getenv("GEMINI_ROUTER_ERROR_RATE", "0.5"))
+ROUTER_WINDOW_SIZE = int(os.getenv("GEMINI_ROUTER_WINDOW", "50"))
+ROUTER_MIN_SAMPLES = int(os.getenv("GEMINI_ROUTER_MIN_SAMPLES", "5"))
+ROUTER_PROBE_INTERVAL_SECONDS = float(os.getenv("GEMINI_ROUTER_PROBE_INTERVAL", "30"))
+
+
+def _load_json_env(name: str, default: Dict[str, Any]) -> Dict[str, Any]:
+    raw = os.getenv(name)
+    if not raw:
+        return dict(default)
+    try:
+        return {**default, **json.loads(raw)}
+    except json.JSONDecodeError:
+        logger.warning(f"Ignoring invalid {name}: {raw[:100]}")
+        return dict(default)
+
+
+def percentile(values, pct: float) -> float:
+    """Nearest-rank percentile of a sequence of numbers (0 when empty)."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = math.ceil(pct / 100 * len(ordered))
+    return float(ordered[min(len(ordered), max(rank, 1)) - 1])
+
+
+def parse_usage(usage: Optional[Dict[str, Any]]) -> Tuple[int, int]:
+    """(input, output) token counts from a Gemini usageMetadata block.
+
+    Thinking tokens are billed as output, so they are counted with it.
+    """
+    usage = usage or {}
+    tokens_input = int(usage.get("promptTokenCount", 0) or 0)
+    tokens_output = int(usage.get("candidatesTokenCount", 0) or 0) + int(usage.get("thoughtsTokenCount", 0) or 0)
+    return tokens_input, tokens_output
+
+
+@dataclass
+class RouteStats:
+    """Rolling latency/error window plus running totals for one route+model."""
+    window: int = ROUTER_WINDOW_SIZE
+    latencies_ms: Deque[float] = field(default_factory=deque)
+    errors: Deque[bool] = field(default_factory=deque)
+    calls: int = 0
+    error_count: int = 0
+    tokens_input: int = 0
+    tokens_output: int = 0
+    cost_usd: float = 0.0
+    last_call_at: float = 0.0
+    # When select() last sent a probe call to this (degraded) model
+    last_probe_at: float = 0.0
+
+    def record(self, latency_ms: float, error: bool, tokens_input: int, tokens_output: int, cost_usd: float,
+               now: Optional[float] = None) -> None:
+        self.latencies_ms.append(latency_ms)
+        self.errors.append(error)
+        while len(self.latencies_ms) > self.window:
+            self.latencies_ms.popleft()
+            self.errors.popleft()
+        self.calls += 1
+        self.error_count += int(error)
+        self.tokens_input += tokens_input
+        self.tokens_output += tokens_output
+        self.cost_usd += cost_usd
+        self.last_call_at = time.monotonic() if now is None else now
+
+    @property
+    def error_rate(self) -> float:
+        return sum(self.errors) / len(self.errors) if self.errors else 0.0
+
+    def p50(self) -> float:
+        return percentile(self.latencies_ms, 50)
+
+    def p95(self) -> float:
+        return percentile(self.latencies_ms, 95)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.error_count,
+            "recent_error_rate": round(self.error_rate, 3),
+            "p50_latency_ms": round(self.p50(), 1),
+            "p95_latency_ms": round(self.p95(), 1),
+            "tokens_input": self.tokens_input,
+            "tokens_output": self.tokens_output,
+            "estimated_cost_usd": round(self.cost_usd, 6),
+        }
+
+
+class ModelRouter:
+    """Routes each AI call type to a model tier.
+
+    A route uses its configured tier unless that tier's recent p95 latency is
+    above the request's latency budget or its recent error rate is above the
+    threshold, in which case the fast tier is used instead. While falling back,
+    one call per probe interval still goes to the configured tier so its stats
+    can recover; the probe is stamped when it is sent, so concurrent requests
+    do not all probe at once.
+    """
+
+    def __init__(
+        self,
+        tiers: Optional[Dict[str, str]] = None,
+        policy: Optional[Dict[str, str]] = None,
+        pricing: Optional[Dict[str, Dict[str, float]]] = None,
+        error_rate_threshold: float = ROUTER_ERROR_RATE_THRESHOLD,
+        min_samples: int = ROUTER_MIN_SAMPLES,
+        probe_interval_seconds: float = ROUTER_PROBE_INTERVAL_SECONDS,
+        clock=time.monotonic,
+    ):
+        self.tiers = tiers or {"fast": GEMINI_FAST_MODEL, "pro": GEMINI_PRO_MODEL}
+        self.policy = policy or _load_json_env("GEMINI_ROUTING_POLICY", DEFAULT_ROUTING_POLICY)
+        self.pricing = pricing or _load_json_env("GEMINI_TIER_PRICING", DEFAULT_TIER_PRICING)
+        self.error_rate_threshold = error_rate_threshold
+        self.min_samples = min_samples
+        self.probe_interval_seconds = probe_interval_seconds
+        self._clock = clock
+        self.stats: Dict[str, Dict[str, RouteStats]] = {}
+
+    def tier_for(self, route: str) -> str:
+        return self.policy.get(route, "pro")
+
+    def select(self, route: str, latency_budget_ms: Optional[float] = None) -> str:
+        """Return the model name to use for a call on this route."""
+        tier = self.tier_for(route)
+        model = self.tiers.get(tier, self.tiers["pro"])
+        fast_model = self.tiers["fast"]
+        if model == fast_model:
+            return model
+
+        stats = self.stats.get(route, {}).get(model)
+        if stats is None or len(stats.latencies_ms) < self.min_samples:
+            return model
+
+        if stats.error_rate > self.error_rate_threshold:
+            reason = f"error rate {stats.error_rate:.0%}"
+        elif latency_budget_ms is not None and stats.p95() > latency_budget_ms:
+            reason = f"p95 {stats.p95():.0f}ms over budget {latency_budget_ms:.0f}ms"
+        else:
+            return model
+
+        now = self._clock()
+        if now - max(stats.last_call_at, stats.last_probe_at) >= self.probe_interval_seconds:
+            stats.last_probe_at = now
+            logger.info(f"Probing {model} on {route} ({reason})")
+            return model
+        logger.info(f"Routing {route} to {fast_model}: {model} {reason}")
+        return fast_model
+
+    def record(
+        self,
+        route: str,
+        model: str,
+        latency_ms: float,
+        usage: Optional[Dict[str, Any]] = None,
+        error: bool = False,
+    ) -> None:
+        """Record the outcome of a call and log its latency and cost."""
+        tokens_input, tokens_output = parse_usage(usage)
+        cost = self.estimate_cost(model, tokens_input, tokens_output)
+
+        stats = self.stats.setdefault(route, {}).setdefault(model, RouteStats())
+        stats.record(latency_ms, error, tokens_input, tokens_output, cost, now=self._clock())
+
+        logger.info(
+            f"Gemini route={route} model={model} latency_ms={latency_ms:.0f} "
+            f"tokens_in={tokens_input} tokens_out={tokens_output} cost_usd={cost:.6f} error={error}"
+        )
+
+    def estimate_cost(self, model: str, tokens_input: int, tokens_output: int) -> float:
+        tier = next((t for t, m in self.tiers.items() if m == model), "pro")
+        prices = self.pricing.get(tier, {})
+        return (tokens_input * prices.get("input", 0) + tokens_output * prices.get("output", 0)) / 1_000_000
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "tiers": self.tiers,
+            "policy": self.policy,
+            "error_rate_threshold": self.error_rate_threshold,
+            "routes": {
+                route: {model: stats.summary() for model, stats in models.items()}
+                for route, models in self.stats.items()
+            },
+        }
+
+
+# Global router instance
+model_router = ModelRouter()
@@ -0,0 +1,54 @@
+"""
+Keyset Pagination
+Opaque cursors over a (timestamp, id) sort key. A page is fetched with a
+range condition on the key instead of OFFSET, so with an index on the key
+every page costs the same however deep into the list it is.
+"""
+
+import base64
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, or_
+
+# Response header carrying the cursor for the next page (absent on the last page)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+Cursor = Tuple[datetime, int]
+
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    raw = f"{timestamp.isoformat()}|{row_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    """Parse a cursor from encode_cursor. Raises ValueError if it is malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, row_id = base64.urlsafe_b64decode(padded).decode("utf-8").rsplit("|", 1)
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+def keyset_after(timestamp_column, id_column, cursor: Optional[Cursor], descending: bool = True):
+    """Condition selecting rows that come after `cursor` in (timestamp, id) order.
+
+    Returns None when there is no cursor (first page).
+    """
+    if cursor is None:
+        return None
+    timestamp, row_id = cursor
+    if descending:
+        return or_(timestamp_column < timestamp, and_(timestamp_column == timestamp, id_column < row_id))
+    return or_(timestamp_column > timestamp, and_(timestamp_column == timestamp, id_column > row_id))
+
+
+def page_with_cursor(rows: Sequence[Any], limit: int, timestamp_attr: str) -> Tuple[List[Any], Optional[str]]:
+    """Split a result fetched with LIMIT limit + 1 into the page and the next cursor."""
+    page = list(rows[:limit])
+    if len(rows) <= limit or not page:
+        return page, None
+    last = page[-1]
+    return page, encode_cursor(getattr(last, timestamp_attr), last.id)
@@ -0,0 +1,237 @@
+"""
+Distributed Rate Limiting
+GCRA (generic cell rate algorithm) limits per client and route class,
+shared by every worker through Redis when RATE_LIMIT_REDIS_URL (or
+REDIS_URL) is set and reachable, otherwise kept in process.
+
+GCRA stores one timestamp per key, the theoretical arrival time (TAT) of
+the next request, and admits a request if it is no earlier than TAT minus
+the burst allowance. That is a sliding window: there is no window boundary
+where a client can send two windows' worth of requests back to back, and
+nothing has to be swept when a window rolls over. The Redis check is one
+atomic Lua script (one round trip) using the Redis clock, so workers on
+different hosts agree.
+
+Limits come from a policy of requests per minute by tenant tier and route
+class. The tier is the `tier` claim of a valid bearer token (see
+auth.token_claims), or "anonymous"; clients are identified by token subject,
+falling back to their IP address.
+"""
+
+import os
+import json
+import time
+import logging
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", os.getenv("REDIS_URL", ""))
+# Seconds to use the in-process limiter after Redis fails before trying it again
+RATE_LIMIT_REDIS_RETRY_SECONDS = float(os.getenv("RATE_LIMIT_REDIS_RETRY_SECONDS", "30"))
+RATE_LIMIT_KEY_PREFIX = "ratelimit"
+
+# Requests per minute by tier and route class. Override or extend with
+# RATE_LIMIT_POLICY='{"enterprise": {"ai": 300}}'
+DEFAULT_POLICY: Dict[str, Dict[str, int]] = {
+    "anonymous": {"auth": 20, "ai": 10, "default": 100},
+    "demo": {"auth": 30, "ai": 20, "default": 300},
+    "small": {"auth": 30, "ai": 30, "default": 300},
+    "medium": {"auth": 30, "ai": 60, "default": 600},
+    "enterprise": {"auth": 60, "ai": 120, "default": 1200},
+}
+
+# Path prefix -> route class; the first match wins, anything else is "default"
+ROUTE_CLASSES = (
+    ("/token", "auth"),
+    ("/auth/login", "auth"),
+    ("/auth/token", "auth"),
+    ("/auth/signup", "auth"),
+    ("/auth/forgot-password", "auth"),
+    ("/auth/reset-password", "auth"),
+    ("/api/v1/onboarding/register", "auth"),
+    ("/api/v1/chat/messages", "ai"),
+    ("/api/v1/ml/analyze", "ai"),
+    ("/api/v1/ml/forecast", "ai"),
+    ("/api/v1/ml/nlp", "ai"),
+)
+
+# KEYS[1] = bucket key; ARGV = emission interval (us), burst allowance (us).
+# Returns {allowed, retry_after_us, remaining}
+GCRA_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000000 + tonumber(t[2])
+local interval = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then tat = now end
+local allow_at = tat - burst
+if allow_at > now then
+    return {0, allow_at - now, 0}
+end
+local new_tat = tat + interval
+redis.call('SET', KEYS[1], new_tat, 'PX', math.ceil((new_tat - now) / 1000) + 1)
+return {1, 0, math.floor((now + burst - tat) / interval)}
+"""
+
+
+def load_policy() -> Dict[str, Dict[str, int]]:
+    policy = {tier: dict(limits) for tier, limits in DEFAULT_POLICY.items()}
+    raw = os.getenv("RATE_LIMIT_POLICY", "")
+    if raw:
+        try:
+            for tier, limits in json.loads(raw).items():
+                policy.setdefault(tier, {}).update(limits)
+        except (ValueError, AttributeError) as e:
+            logger.error(f"Ignoring invalid RATE_LIMIT_POLICY: {e}")
+    return policy
+
+
+def route_class(path: str) -> str:
+    for prefix, name in ROUTE_CLASSES:
+        if path.startswith(prefix):
+            return name
+    return "default"
+
+
+@lru_cache(maxsize=10_000)
+def _token_identity(token: str) -> Optional[Tuple[str, str, float]]:
+    """(subject, tier, expiry) of a valid access token, cached so a client's
+    repeat requests skip signature verification."""
+    from jose import JWTError, jwt
+    from ..auth import ALGORITHM, SECRET_KEY
+
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    if not payload.get("sub"):
+        return None
+    return payload["sub"], payload.get("tier", "small"), float(payload.get("exp", float("inf")))
+
+
+def identify(authorization: Optional[str], client_host: Optional[str]) -> Tuple[str, str]:
+    """(client identity, tier) from the Authorization header, or the client
+    address with the anonymous tier when there is no valid token."""
+    if authorization and authorization[:7].lower() == "bearer ":
+        claims = _token_identity(authorization[7:].strip())
+        if claims and claims[2] > time.time():
+            return f"user:{claims[0]}", claims[1]
+    return f"ip:{client_host or 'unknown'}", "anonymous"
+
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: float = 0.0  # seconds
+
+
+def _gcra_params(per_minute: int) -> Tuple[int, int]:
+    """(emission interval, burst allowance) in microseconds for a per-minute limit.
+
+    The whole minute's allowance may be used as a burst; after that requests
+    are admitted at the steady rate.
+    """
+    interval = max(1, 60_000_000 // max(1, per_minute))
+    return interval, interval * (max(1, per_minute) - 1)
+
+
+class LocalGCRA:
+    """GCRA state for one process."""
+
+    def __init__(self, max_keys: int = 100_000, clock=time.monotonic):
+        self.max_keys = max_keys
+        self._clock = clock
+        self._tat: Dict[str, int] = {}
+
+    def hit(self, key: str, per_minute: int) -> RateLimitResult:
+        interval, burst = _gcra_params(per_minute)
+        now = int(self._clock() * 1_000_000)
+        tat = max(self._tat.get(key, now), now)
+        allow_at = tat - burst
+        if allow_at > now:
+            return RateLimitResult(False, per_minute, 0, (allow_at - now) / 1_000_000)
+        self._tat[key] = tat + interval
+        if len(self._tat) > self.max_keys:
+            self._evict(now)
+        return RateLimitResult(True, per_minute, (now + burst - tat) // interval)
+
+    def _evict(self, now: int) -> None:
+        # Keys whose TAT has passed are back to a full allowance and carry no state
+        expired = [key for key, tat in self._tat.items() if tat <= now]
+        for key in expired:
+            del self._tat[key]
+        if len(self._tat) > self.max_keys:
+            self._tat.clear()
+
+
+class RateLimiter:
+    """Per-client, per-route-class GCRA limiter with a Redis backend and an
+    in-process fallback (limits then apply per worker)."""
+
+    def __init__(self, redis_url: str = RATE_LIMIT_REDIS_URL, policy: Optional[Dict[str, Dict[str, int]]] = None,
+                 local: Optional[LocalGCRA] = None):
+        self.redis_url = redis_url
+        self.policy = policy or load_policy()
+        self.local = local or LocalGCRA()
+        self.allowed = 0
+        self.limited = 0
+        self.fallbacks = 0
+        self._script = None
+        self._redis_down_until = 0.0
+
+    def limit_for(self, tier: str, route: str) -> int:
+        limits = self.policy.get(tier) or self.policy["anonymous"]
+        return limits.get(route, limits.get("default", self.policy["anonymous"]["default"]))
+
+    @property
+    def script(self):
+        if self._script is None and self.redis_url:
+            import redis.asyncio as redis
+
+            client = redis.from_url(self.redis_url, socket_timeout=0.05, socket_connect_timeout=0.2)
+            self._script = client.register_script(GCRA_SCRIPT)
+        return self._script
+
+    async def hit(self, identity: str, tier: str, route: str) -> RateLimitResult:
+        limit = self.limit_for(tier, route)
+        key = f"{RATE_LIMIT_KEY_PREFIX}:{route}:{identity}"
+        result = None
+        if self.redis_url and time.monotonic() >= self._redis_down_until:
+            result = await self._hit_redis(key, limit)
+        if result is None:
+            result = self.local.hit(key, limit)
+        if result.allowed:
+            self.allowed += 1
+        else:
+            self.limited += 1
+        return result
+
+    async def _hit_redis(self, key: str, limit: int) -> Optional[RateLimitResult]:
+        interval, burst = _gcra_params(limit)
+        try:
+            allowed, retry_us, remaining = await self.script(keys=[key], args=[interval, burst])
+        except Exception as e:
+            self.fallbacks += 1
+            self._redis_down_until = time.monotonic() + RATE_LIMIT_REDIS_RETRY_SECONDS
+            logger.warning(f"Redis rate limiting unavailable ({e}); limiting per worker for "
+                           f"{RATE_LIMIT_REDIS_RETRY_SECONDS:.0f}s")
+            return None
+        return RateLimitResult(bool(allowed), limit, int(remaining), int(retry_us) / 1_000_000)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "redis" if self.redis_url and time.monotonic() >= self._redis_down_until else "local",
+            "allowed": self.allowed,
+            "limited": self.limited,
+            "redis_fallbacks": self.fallbacks,
+            "policy": self.policy,
+        }
+
+
+# Global rate limiter
+rate_limiter = RateLimiter()
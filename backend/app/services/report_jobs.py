@@ -0,0 +1,706 @@
+"""
+Report Generation Jobs
+Generates project reports on a small pool of async workers instead of inside
+the request. Outputs are stored as numbered versions per (project, report
+type, format) and keyed by a hash of the project data, so resubmitting
+unchanged data returns the stored report without another Gemini call.
+Scheduled reports are enqueued by a background scheduler during an off-peak
+window.
+
+The global manager keeps report versions and schedules in the database, so
+they survive restarts and are shared by every worker; a due schedule is
+claimed with a conditional update, so only one worker runs it. Jobs (and
+their progress) are held by the worker that accepted them, so a job id
+polled on another worker is not found.
+"""
+
+import os
+import json
+import uuid
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "2"))
+REPORT_MAX_JOBS = int(os.getenv("REPORT_MAX_JOBS", "500"))
+REPORT_MAX_VERSIONS = int(os.getenv("REPORT_MAX_VERSIONS", "10"))
+# Projects whose latest submitted data is kept for schedules without their own
+REPORT_MAX_LATEST_DATA = int(os.getenv("REPORT_MAX_LATEST_DATA", "200"))
+# How long a request that asks to wait for its report holds the connection
+REPORT_WAIT_SECONDS = float(os.getenv("REPORT_WAIT_SECONDS", "120"))
+# Scheduled reports run between these UTC hours (the window may wrap midnight)
+REPORT_OFFPEAK_START_HOUR = int(os.getenv("REPORT_OFFPEAK_START_HOUR", "1"))
+REPORT_OFFPEAK_END_HOUR = int(os.getenv("REPORT_OFFPEAK_END_HOUR", "5"))
+REPORT_SCHEDULER_INTERVAL_SECONDS = float(os.getenv("REPORT_SCHEDULER_INTERVAL_SECONDS", "300"))
+
+SCHEDULE_PERIODS = {
+    "daily": timedelta(days=1),
+    "weekly": timedelta(days=7),
+    "monthly": timedelta(days=30),
+}
+
+# (project_id, report_type, output_format)
+ReportKey = Tuple[str, str, str]
+ReportGenerator = Callable[[Dict[str, Any], str, str], Awaitable[Dict[str, Any]]]
+
+
+def project_data_hash(project_data: Dict[str, Any]) -> str:
+    """Stable hash of project data; key order does not matter."""
+    canonical = json.dumps(project_data, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def in_offpeak_window(now: datetime, start_hour: int = REPORT_OFFPEAK_START_HOUR,
+                      end_hour: int = REPORT_OFFPEAK_END_HOUR) -> bool:
+    if start_hour <= end_hour:
+        return start_hour <= now.hour < end_hour
+    return now.hour >= start_hour or now.hour < end_hour
+
+
+def next_offpeak_start(now: datetime, start_hour: int = REPORT_OFFPEAK_START_HOUR) -> datetime:
+    start = now.replace(hour=start_hour, minute=0, second=0, microsecond=0)
+    return start if start > now else start + timedelta(days=1)
+
+
+async def generate_with_ai(project_data: Dict[str, Any], report_type: str, output_format: str) -> Dict[str, Any]:
+    """Default generator: one Gemini report generation."""
+    from ..ml.gemini_wrapper import generate_project_report
+    from .ai_service import REPORT_GENERATION_FAILED
+
+    report = await generate_project_report(project_data, report_type=report_type, output_format=output_format)
+    if report.get("content") == REPORT_GENERATION_FAILED:
+        raise RuntimeError(REPORT_GENERATION_FAILED)
+    return report
+
+
+@dataclass
+class ReportVersion:
+    version: int
+    data_hash: str
+    report: Dict[str, Any]
+    generated_at: datetime = field(default_factory=datetime.utcnow)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "data_hash": self.data_hash,
+            "generated_at": self.generated_at.isoformat(),
+        }
+
+
+class ReportStore:
+    """Versioned report outputs per (project, report type, format)."""
+
+    def __init__(self, max_versions: int = REPORT_MAX_VERSIONS):
+        self.max_versions = max(1, max_versions)
+        self.versions: Dict[ReportKey, List[ReportVersion]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def find(self, key: ReportKey, data_hash: str) -> Optional[ReportVersion]:
+        """The stored version generated from exactly this data, if any."""
+        for version in reversed(self.versions.get(key, [])):
+            if version.data_hash == data_hash:
+                self.hits += 1
+                return version
+        self.misses += 1
+        return None
+
+    def put(self, key: ReportKey, data_hash: str, report: Dict[str, Any]) -> ReportVersion:
+        versions = self.versions.setdefault(key, [])
+        stored = ReportVersion(
+            version=versions[-1].version + 1 if versions else 1,
+            data_hash=data_hash,
+            report=report,
+        )
+        versions.append(stored)
+        del versions[:-self.max_versions]
+        return stored
+
+    def get(self, key: ReportKey, version: Optional[int] = None) -> Optional[ReportVersion]:
+        """A specific version, or the latest when version is None."""
+        versions = self.versions.get(key, [])
+        if version is None:
+            return versions[-1] if versions else None
+        return next((v for v in versions if v.version == version), None)
+
+    def history(self, project_id: Optional[str] = None, report_type: Optional[str] = None,
+                limit: int = 50) -> List[Dict[str, Any]]:
+        """Stored version summaries, newest first."""
+        entries = [
+            {"project_id": key[0], "report_type": key[1], "output_format": key[2], **v.summary()}
+            for key, versions in self.versions.items()
+            if (not project_id or key[0] == project_id) and (not report_type or key[1] == report_type)
+            for v in versions
+        ]
+        entries.sort(key=lambda e: e["generated_at"], reverse=True)
+        return entries[:limit]
+
+    def counts(self) -> Tuple[int, int]:
+        """(reports, versions) held."""
+        return len(self.versions), sum(len(v) for v in self.versions.values())
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        reports, versions = self.counts()
+        return {
+            "reports": reports,
+            "versions": versions,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class DatabaseReportStore(ReportStore):
+    """ReportStore kept in the generated_reports table."""
+
+    def __init__(self, max_versions: int = REPORT_MAX_VERSIONS, session_factory=None):
+        super().__init__(max_versions)
+        self._session_factory = session_factory
+
+    def _session(self):
+        if self._session_factory is None:
+            from ..database import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory()
+
+    @staticmethod
+    def _match(key: ReportKey) -> list:
+        from ..models import GeneratedReport
+
+        return [GeneratedReport.project_id == key[0], GeneratedReport.report_type == key[1],
+                GeneratedReport.output_format == key[2]]
+
+    @staticmethod
+    def _version(row) -> ReportVersion:
+        return ReportVersion(version=row.version, data_hash=row.data_hash,
+                             report=json.loads(row.report), generated_at=row.generated_at)
+
+    def find(self, key: ReportKey, data_hash: str) -> Optional[ReportVersion]:
+        from ..models import GeneratedReport
+
+        with self._session() as db:
+            row = (db.query(GeneratedReport)
+                   .filter(*self._match(key), GeneratedReport.data_hash == data_hash)
+                   .order_by(GeneratedReport.version.desc()).first())
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self._version(row)
+
+    def put(self, key: ReportKey, data_hash: str, report: Dict[str, Any]) -> ReportVersion:
+        from sqlalchemy import func
+        from sqlalchemy.exc import IntegrityError
+        from ..models import GeneratedReport
+
+        with self._session() as db:
+            # Another worker may take the same version number; the unique
+            # constraint rejects the loser, which retries with the next one
+            for attempt in range(3):
+                latest = db.query(func.max(GeneratedReport.version)).filter(*self._match(key)).scalar() or 0
+                row = GeneratedReport(
+                    project_id=key[0], report_type=key[1], output_format=key[2], version=latest + 1,
+                    data_hash=data_hash, report=json.dumps(report, default=str), generated_at=datetime.utcnow(),
+                )
+                db.add(row)
+                try:
+                    db.commit()
+                    break
+                except IntegrityError:
+                    db.rollback()
+                    if attempt == 2:
+                        raise
+            stored = self._version(row)
+            db.query(GeneratedReport).filter(
+                *self._match(key), GeneratedReport.version <= stored.version - self.max_versions
+            ).delete(synchronize_session=False)
+            db.commit()
+        return stored
+
+    def get(self, key: ReportKey, version: Optional[int] = None) -> Optional[ReportVersion]:
+        from ..models import GeneratedReport
+
+        with self._session() as db:
+            query = db.query(GeneratedReport).filter(*self._match(key))
+            if version is None:
+                row = query.order_by(GeneratedReport.version.desc()).first()
+            else:
+                row = query.filter(GeneratedReport.version == version).first()
+        return self._version(row) if row else None
+
+    def history(self, project_id: Optional[str] = None, report_type: Optional[str] = None,
+                limit: int = 50) -> List[Dict[str, Any]]:
+        from ..models import GeneratedReport
+
+        with self._session() as db:
+            # Summaries only: the report bodies are not loaded
+            query = db.query(GeneratedReport.project_id, GeneratedReport.report_type,
+                             GeneratedReport.output_format, GeneratedReport.version,
+                             GeneratedReport.data_hash, GeneratedReport.generated_at)
+            if project_id:
+                query = query.filter(GeneratedReport.project_id == project_id)
+            if report_type:
+                query = query.filter(GeneratedReport.report_type == report_type)
+            rows = query.order_by(GeneratedReport.generated_at.desc(), GeneratedReport.id.desc()).limit(limit).all()
+        return [
+            {"project_id": r.project_id, "report_type": r.report_type, "output_format": r.output_format,
+             "version": r.version, "data_hash": r.data_hash, "generated_at": r.generated_at.isoformat()}
+            for r in rows
+        ]
+
+    def counts(self) -> Tuple[int, int]:
+        from sqlalchemy import func
+        from ..models import GeneratedReport
+
+        with self._session() as db:
+            versions = db.query(func.count(GeneratedReport.id)).scalar() or 0
+            reports = db.query(GeneratedReport.project_id, GeneratedReport.report_type,
+                               GeneratedReport.output_format).distinct().count()
+        return reports, versions
+
+
+@dataclass
+class ReportJob:
+    id: str
+    project_id: str
+    report_type: str
+    output_format: str
+    data_hash: str
+    source: str = "request"  # 'request', 'schedule'
+    status: str = "queued"  # 'queued', 'running', 'completed', 'failed'
+    cached: bool = False
+    version: Optional[int] = None
+    error: Optional[str] = None
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    done: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    @property
+    def key(self) -> ReportKey:
+        return (self.project_id, self.report_type, self.output_format)
+
+    def progress(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "project_id": self.project_id,
+            "report_type": self.report_type,
+            "output_format": self.output_format,
+            "source": self.source,
+            "status": self.status,
+            "cached": self.cached,
+            "version": self.version,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "completed_at": self.completed_at.isoformat() if self.completed_at else None,
+        }
+
+
+@dataclass
+class ReportSchedule:
+    id: str
+    project_id: str
+    report_type: str
+    output_format: str
+    schedule: str
+    next_run_at: datetime
+    recipients: List[str] = field(default_factory=list)
+    project_data: Optional[Dict[str, Any]] = None
+    active: bool = True
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    last_run_at: Optional[datetime] = None
+    last_job_id: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "schedule_id": self.id,
+            "project_id": self.project_id,
+            "report_type": self.report_type,
+            "output_format": self.output_format,
+            "schedule": self.schedule,
+            "recipients": self.recipients,
+            "active": self.active,
+            "scheduled_at": self.created_at.isoformat(),
+            "next_run_at": self.next_run_at.isoformat(),
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "last_job_id": self.last_job_id,
+        }
+
+
+class ScheduleStore:
+    """Report schedules held in process memory."""
+
+    def __init__(self):
+        self.entries: Dict[str, ReportSchedule] = {}
+
+    def add(self, entry: ReportSchedule) -> None:
+        self.entries[entry.id] = entry
+
+    def remove(self, schedule_id: str) -> bool:
+        return self.entries.pop(schedule_id, None) is not None
+
+    def list(self, project_id: Optional[str] = None) -> List[ReportSchedule]:
+        return [e for e in self.entries.values() if not project_id or e.project_id == project_id]
+
+    def due(self, now: datetime) -> List[ReportSchedule]:
+        return [e for e in self.entries.values() if e.active and e.next_run_at <= now]
+
+    def claim(self, entry: ReportSchedule, next_run_at: datetime) -> bool:
+        """Move a due schedule to its next run; False if someone else already did."""
+        entry.next_run_at = next_run_at
+        return True
+
+    def record_run(self, entry: ReportSchedule, run_at: datetime, job_id: str) -> None:
+        entry.last_run_at = run_at
+        entry.last_job_id = job_id
+
+    def count(self) -> int:
+        return len(self.entries)
+
+
+class DatabaseScheduleStore(ScheduleStore):
+    """ScheduleStore kept in the scheduled_reports table, shared by every worker."""
+
+    def __init__(self, session_factory=None):
+        super().__init__()
+        self._session_factory = session_factory
+
+    def _session(self):
+        if self._session_factory is None:
+            from ..database import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory()
+
+    @staticmethod
+    def _entry(row) -> ReportSchedule:
+        return ReportSchedule(
+            id=row.id, project_id=row.project_id, report_type=row.report_type,
+            output_format=row.output_format, schedule=row.schedule, next_run_at=row.next_run_at,
+            recipients=json.loads(row.recipients) if row.recipients else [],
+            project_data=json.loads(row.project_data) if row.project_data is not None else None,
+            active=bool(row.active), created_at=row.created_at,
+            last_run_at=row.last_run_at, last_job_id=row.last_job_id,
+        )
+
+    def add(self, entry: ReportSchedule) -> None:
+        from ..models import ScheduledReport
+
+        with self._session() as db:
+            db.add(ScheduledReport(
+                id=entry.id, project_id=entry.project_id, report_type=entry.report_type,
+                output_format=entry.output_format, schedule=entry.schedule,
+                recipients=json.dumps(entry.recipients),
+                project_data=json.dumps(entry.project_data, default=str) if entry.project_data is not None else None,
+                active=entry.active, created_at=entry.created_at, next_run_at=entry.next_run_at,
+            ))
+            db.commit()
+
+    def remove(self, schedule_id: str) -> bool:
+        from ..models import ScheduledReport
+
+        with self._session() as db:
+            removed = db.query(ScheduledReport).filter(ScheduledReport.id == schedule_id).delete()
+            db.commit()
+        return removed > 0
+
+    def list(self, project_id: Optional[str] = None) -> List[ReportSchedule]:
+        from ..models import ScheduledReport
+
+        with self._session() as db:
+            query = db.query(ScheduledReport)
+            if project_id:
+                query = query.filter(ScheduledReport.project_id == project_id)
+            return [self._entry(row) for row in query.order_by(ScheduledReport.created_at).all()]
+
+    def due(self, now: datetime) -> List[ReportSchedule]:
+        from ..models import ScheduledReport
+
+        with self._session() as db:
+            rows = db.query(ScheduledReport).filter(
+                ScheduledReport.active == True, ScheduledReport.next_run_at <= now
+            ).all()
+            return [self._entry(row) for row in rows]
+
+    def claim(self, entry: ReportSchedule, next_run_at: datetime) -> bool:
+        from ..models import ScheduledReport
+
+        # Conditional on the run time we read, so of several workers that
+        # found the schedule due only one moves it on
+        with self._session() as db:
+            claimed = db.query(ScheduledReport).filter(
+                ScheduledReport.id == entry.id, ScheduledReport.next_run_at == entry.next_run_at
+            ).update({ScheduledReport.next_run_at: next_run_at}, synchronize_session=False)
+            db.commit()
+        if claimed:
+            entry.next_run_at = next_run_at
+        return claimed > 0
+
+    def record_run(self, entry: ReportSchedule, run_at: datetime, job_id: str) -> None:
+        from ..models import ScheduledReport
+
+        super().record_run(entry, run_at, job_id)
+        with self._session() as db:
+            db.query(ScheduledReport).filter(ScheduledReport.id == entry.id).update(
+                {ScheduledReport.last_run_at: run_at, ScheduledReport.last_job_id: job_id},
+                synchronize_session=False,
+            )
+            db.commit()
+
+    def count(self) -> int:
+        from sqlalchemy import func
+        from ..models import ScheduledReport
+
+        with self._session() as db:
+            return db.query(func.count(ScheduledReport.id)).scalar() or 0
+
+
+class ReportJobManager:
+    """Queues report jobs, runs them on a worker pool and serves stored versions.
+
+    Submitting data that already produced a stored report completes the job
+    immediately from the store. Identical submissions while a job is still
+    queued or running share that job. Schedules enqueue their project's
+    latest data once per period, inside the off-peak window. The latest data
+    is kept for the REPORT_MAX_LATEST_DATA most recently submitted projects.
+    """
+
+    def __init__(self, generator: Optional[ReportGenerator] = None,
+                 workers: int = REPORT_WORKERS,
+                 max_jobs: int = REPORT_MAX_JOBS,
+                 store: Optional[ReportStore] = None,
+                 schedules: Optional[ScheduleStore] = None,
+                 max_latest_data: int = REPORT_MAX_LATEST_DATA,
+                 offpeak_hours: Tuple[int, int] = (REPORT_OFFPEAK_START_HOUR, REPORT_OFFPEAK_END_HOUR),
+                 scheduler_interval: float = REPORT_SCHEDULER_INTERVAL_SECONDS):
+        self.generator = generator or generate_with_ai
+        self.workers = max(1, workers)
+        self.max_jobs = max_jobs
+        self.store = store or ReportStore()
+        self.offpeak_hours = offpeak_hours
+        self.scheduler_interval = scheduler_interval
+        self.jobs: Dict[str, ReportJob] = {}
+        self.schedules = schedules or ScheduleStore()
+        self.max_latest_data = max(1, max_latest_data)
+        self.latest_data: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._in_flight: Dict[Tuple[ReportKey, str], ReportJob] = {}
+        self._payloads: Dict[str, Dict[str, Any]] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_tasks: List[asyncio.Task] = []
+        self._scheduler_task: Optional[asyncio.Task] = None
+
+    @property
+    def queue(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        return self._queue
+
+    def submit(self, project_data: Dict[str, Any], project_id: str,
+               report_type: str = "daily", output_format: str = "json",
+               source: str = "request") -> ReportJob:
+        """Return a completed job for unchanged data, otherwise enqueue one."""
+        data_hash = project_data_hash(project_data)
+        job = ReportJob(
+            id=str(uuid.uuid4()), project_id=project_id, report_type=report_type,
+            output_format=output_format, data_hash=data_hash, source=source,
+        )
+        self.latest_data[project_id] = project_data
+        self.latest_data.move_to_end(project_id)
+        while len(self.latest_data) > self.max_latest_data:
+            self.latest_data.popitem(last=False)
+
+        stored = self.store.find(job.key, data_hash)
+        if stored:
+            job.status = "completed"
+            job.cached = True
+            job.version = stored.version
+            job.completed_at = datetime.utcnow()
+            job.done.set()
+            self._track(job)
+            return job
+
+        in_flight = self._in_flight.get((job.key, data_hash))
+        if in_flight:
+            return in_flight
+
+        self._track(job)
+        self._in_flight[(job.key, data_hash)] = job
+        self._payloads[job.id] = project_data
+        self.queue.put_nowait(job)
+        self._ensure_workers()
+        return job
+
+    async def wait(self, job: ReportJob, timeout: Optional[float] = None) -> bool:
+        """Wait for a job to finish; False if the timeout expired first."""
+        try:
+            await asyncio.wait_for(job.done.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def get_job(self, job_id: str) -> Optional[ReportJob]:
+        return self.jobs.get(job_id)
+
+    def list_jobs(self, project_id: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        jobs = self.jobs.values()
+        if project_id:
+            jobs = [j for j in jobs if j.project_id == project_id]
+        return [j.progress() for j in sorted(jobs, key=lambda j: j.created_at, reverse=True)[:limit]]
+
+    def get_report(self, job: ReportJob) -> Optional[ReportVersion]:
+        if job.version is None:
+            return None
+        return self.store.get(job.key, job.version)
+
+    def history(self, project_id: Optional[str] = None, report_type: Optional[str] = None,
+                limit: int = 50) -> List[Dict[str, Any]]:
+        """Stored report versions, newest first."""
+        return self.store.history(project_id=project_id, report_type=report_type, limit=limit)
+
+    def _track(self, job: ReportJob) -> None:
+        self.jobs[job.id] = job
+        excess = len(self.jobs) - self.max_jobs
+        if excess <= 0:
+            return
+        finished = sorted(
+            (j for j in self.jobs.values() if j.status in ("completed", "failed")),
+            key=lambda j: j.created_at,
+        )
+        for old in finished[:excess]:
+            del self.jobs[old.id]
+
+    def _ensure_workers(self) -> None:
+        self._worker_tasks = [t for t in self._worker_tasks if not t.done()]
+        while len(self._worker_tasks) < self.workers:
+            self._worker_tasks.append(asyncio.create_task(self._work()))
+
+    async def _work(self) -> None:
+        while True:
+            job = await self.queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self.queue.task_done()
+
+    async def _run(self, job: ReportJob) -> None:
+        job.status = "running"
+        job.started_at = datetime.utcnow()
+        project_data = self._payloads.pop(job.id, {})
+        try:
+            report = await self.generator(project_data, job.report_type, job.output_format)
+            stored = await asyncio.to_thread(self.store.put, job.key, job.data_hash, report)
+            job.version = stored.version
+            job.status = "completed"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e) or type(e).__name__
+            logger.error(f"Report job {job.id} failed: {job.error}")
+        finally:
+            job.completed_at = datetime.utcnow()
+            self._in_flight.pop((job.key, job.data_hash), None)
+            job.done.set()
+
+    # ------------------------------------------------------------------
+    # Schedules
+    # ------------------------------------------------------------------
+
+    def schedule(self, project_id: str, report_type: str, output_format: str = "json",
+                 schedule: str = "daily", recipients: Optional[List[str]] = None,
+                 project_data: Optional[Dict[str, Any]] = None) -> ReportSchedule:
+        """Register a recurring report, first produced in the next off-peak window.
+
+        Without project_data each run uses the latest data submitted for the
+        project, so an unchanged project is served from the store.
+        """
+        if schedule not in SCHEDULE_PERIODS:
+            raise ValueError(f"Unknown schedule: {schedule} (expected one of {', '.join(SCHEDULE_PERIODS)})")
+        entry = ReportSchedule(
+            id=str(uuid.uuid4()), project_id=project_id, report_type=report_type,
+            output_format=output_format, schedule=schedule, recipients=recipients or [],
+            project_data=project_data,
+            next_run_at=next_offpeak_start(datetime.utcnow(), self.offpeak_hours[0]),
+        )
+        self.schedules.add(entry)
+        self._ensure_scheduler()
+        return entry
+
+    def cancel_schedule(self, schedule_id: str) -> bool:
+        return self.schedules.remove(schedule_id)
+
+    def list_schedules(self, project_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        return [s.to_dict() for s in self.schedules.list(project_id)]
+
+    def run_due_schedules(self, now: Optional[datetime] = None) -> List[ReportJob]:
+        """Enqueue every schedule that is due, if now is inside the off-peak window."""
+        now = now or datetime.utcnow()
+        if not in_offpeak_window(now, *self.offpeak_hours):
+            return []
+
+        jobs = []
+        for entry in self.schedules.due(now):
+            period = SCHEDULE_PERIODS[entry.schedule]
+            next_run_at = entry.next_run_at
+            while next_run_at <= now:
+                next_run_at += period
+            # Checked before claiming, so a worker without the project's
+            # latest data leaves the run to one that has it
+            data = entry.project_data if entry.project_data is not None else self.latest_data.get(entry.project_id)
+            if data is None:
+                logger.warning(f"Skipping scheduled report {entry.id}: no data for project {entry.project_id}")
+                continue
+            if not self.schedules.claim(entry, next_run_at):
+                continue  # Another worker is running it
+            job = self.submit(data, entry.project_id, entry.report_type, entry.output_format, source="schedule")
+            self.schedules.record_run(entry, now, job.id)
+            jobs.append(job)
+        return jobs
+
+    def start(self) -> None:
+        """Start the scheduler, e.g. for schedules stored before a restart."""
+        self._ensure_scheduler()
+
+    def _ensure_scheduler(self) -> None:
+        if self._scheduler_task is None or self._scheduler_task.done():
+            self._scheduler_task = asyncio.create_task(self._schedule_loop())
+
+    async def _schedule_loop(self) -> None:
+        while True:
+            try:
+                self.run_due_schedules()
+            except Exception as e:
+                logger.error(f"Report scheduler error: {e}")
+            await asyncio.sleep(self.scheduler_interval)
+
+    async def stop(self) -> None:
+        """Cancel the workers and the scheduler (queued jobs are dropped)."""
+        tasks = self._worker_tasks + ([self._scheduler_task] if self._scheduler_task else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._worker_tasks = []
+        self._scheduler_task = None
+
+    def stats(self) -> Dict[str, Any]:
+        statuses: Dict[str, int] = {}
+        for job in self.jobs.values():
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "jobs": statuses,
+            "schedules": self.schedules.count(),
+            "latest_data": len(self.latest_data),
+            "store": self.store.stats(),
+        }
+
+
+# Global report job manager instance
+report_job_manager = ReportJobManager(store=DatabaseReportStore(), schedules=DatabaseScheduleStore())
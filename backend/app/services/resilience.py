@@ -0,0 +1,175 @@
+"""
+Resilience Helpers for Upstream AI Calls
+Per-endpoint circuit breakers (error-rate and latency based) and hedged
+requests for idempotent calls.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+BREAKER_FAILURE_RATE = float(os.getenv("GEMINI_BREAKER_FAILURE_RATE", "0.5"))
+BREAKER_SLOW_CALL_MS = float(os.getenv("GEMINI_BREAKER_SLOW_CALL_MS", "20000"))
+BREAKER_SLOW_CALL_RATE = float(os.getenv("GEMINI_BREAKER_SLOW_CALL_RATE", "0.8"))
+BREAKER_WINDOW = int(os.getenv("GEMINI_BREAKER_WINDOW", "20"))
+BREAKER_MIN_CALLS = int(os.getenv("GEMINI_BREAKER_MIN_CALLS", "5"))
+BREAKER_OPEN_SECONDS = float(os.getenv("GEMINI_BREAKER_OPEN_SECONDS", "30"))
+
+
+class CircuitBreaker:
+    """Closed / open / half-open circuit breaker for one upstream endpoint.
+
+    The circuit opens when, over the last `window` calls, the failure rate or
+    the share of calls slower than `slow_call_ms` crosses its threshold. After
+    `open_seconds` a single trial call is let through; its outcome closes or
+    re-opens the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate_threshold: float = BREAKER_FAILURE_RATE,
+        slow_call_ms: float = BREAKER_SLOW_CALL_MS,
+        slow_call_rate_threshold: float = BREAKER_SLOW_CALL_RATE,
+        window: int = BREAKER_WINDOW,
+        min_calls: int = BREAKER_MIN_CALLS,
+        open_seconds: float = BREAKER_OPEN_SECONDS,
+    ):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_ms = slow_call_ms
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.outcomes: Deque[Tuple[bool, bool]] = deque(maxlen=window)  # (failed, slow)
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self.times_opened = 0
+        self.rejected_calls = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = self.HALF_OPEN
+            self._trial_in_flight = False
+        return self._state
+
+    def allow_request(self) -> bool:
+        """Return True if a call may be made now."""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        self.rejected_calls += 1
+        return False
+
+    def record(self, latency_ms: float, failed: bool) -> None:
+        """Record the outcome of a call that allow_request() let through."""
+        slow = latency_ms >= self.slow_call_ms
+        if self._state == self.HALF_OPEN:
+            self._trial_in_flight = False
+            if failed or slow:
+                self._open()
+            else:
+                self._state = self.CLOSED
+                self.outcomes.clear()
+                logger.info(f"Circuit {self.name} closed")
+            return
+
+        self.outcomes.append((failed, slow))
+        if self._state == self.CLOSED and len(self.outcomes) >= self.min_calls:
+            failure_rate = sum(1 for f, _ in self.outcomes if f) / len(self.outcomes)
+            slow_rate = sum(1 for _, s in self.outcomes if s) / len(self.outcomes)
+            if failure_rate >= self.failure_rate_threshold or slow_rate >= self.slow_call_rate_threshold:
+                self._open()
+
+    def release(self) -> None:
+        """Forget a call allow_request() let through that never finished (it
+        was cancelled); it counts as neither a success nor a failure."""
+        if self._state == self.HALF_OPEN:
+            self._trial_in_flight = False
+
+    def _open(self) -> None:
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self.times_opened += 1
+        logger.warning(f"Circuit {self.name} opened for {self.open_seconds:.0f}s")
+
+    def snapshot(self) -> Dict[str, Any]:
+        calls = len(self.outcomes)
+        return {
+            "state": self.state,
+            "recent_calls": calls,
+            "recent_failure_rate": round(sum(1 for f, _ in self.outcomes if f) / calls, 3) if calls else 0.0,
+            "recent_slow_rate": round(sum(1 for _, s in self.outcomes if s) / calls, 3) if calls else 0.0,
+            "times_opened": self.times_opened,
+            "rejected_calls": self.rejected_calls,
+        }
+
+
+class CircuitBreakerRegistry:
+    """Lazily creates one circuit breaker per upstream endpoint name."""
+
+    def __init__(self, **breaker_kwargs):
+        self.breaker_kwargs = breaker_kwargs
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, name: str) -> CircuitBreaker:
+        if name not in self.breakers:
+            self.breakers[name] = CircuitBreaker(name, **self.breaker_kwargs)
+        return self.breakers[name]
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {name: breaker.snapshot() for name, breaker in self.breakers.items()}
+
+
+async def hedged_call(call: Callable[[], Awaitable[Any]], delay_seconds: float) -> Tuple[Any, bool]:
+    """Run call(); if it has not finished after delay_seconds, start a second
+    attempt and return whichever succeeds first.
+
+    Only use for idempotent calls. Returns (result, hedged) where hedged says
+    whether a second attempt was started. Raises the last error if every
+    attempt fails. Attempts still running when it returns, raises or is
+    cancelled are cancelled and waited for.
+    """
+    tasks = [asyncio.create_task(call())]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay_seconds)
+        if done:
+            return tasks[0].result(), False
+
+        tasks.append(asyncio.create_task(call()))
+        pending = set(tasks)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.cancelled():
+                    error = asyncio.CancelledError()
+                elif task.exception() is None:
+                    return task.result(), True
+                else:
+                    error = task.exception()
+        raise error
+    finally:
+        unfinished = [task for task in tasks if not task.done()]
+        for task in unfinished:
+            task.cancel()
+        if unfinished:
+            await asyncio.gather(*unfinished, return_exceptions=True)
+
+
+# Global breaker registry, keyed by model endpoint
+circuit_breakers = CircuitBreakerRegistry()
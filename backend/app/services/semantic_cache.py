@@ -0,0 +1,244 @@
+"""
+Semantic Cache for Chat Answers
+Serves a stored answer when a new chat question is close enough to one already
+answered for the same tenant. Questions are embedded in-process with a signed
+hashing vectorizer (word unigrams and bigrams), so no embedding service or
+extra dependency is needed.
+"""
+
+import os
+import re
+import math
+import time
+import zlib
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.82"))
+SEMANTIC_CACHE_TTL_SECONDS = float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "86400"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2000"))
+# Entries across all tenants; tenants are per user, so this bounds the cache
+SEMANTIC_CACHE_MAX_TOTAL_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_TOTAL_ENTRIES", "50000"))
+SEMANTIC_CACHE_DIMENSIONS = int(os.getenv("SEMANTIC_CACHE_DIMENSIONS", "4096"))
+# Very short questions are usually follow-ups that depend on the conversation
+SEMANTIC_CACHE_MIN_TERMS = int(os.getenv("SEMANTIC_CACHE_MIN_TERMS", "2"))
+
+STOP_WORDS = frozenset(
+    "a an and are as at be can could do does for from how i in is it me my of on or our "
+    "please should so tell that the this to we what when where which who why with would you your".split()
+)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def question_terms(text: str) -> List[str]:
+    """Lowercased content words with a light plural/-ing strip."""
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOP_WORDS:
+            continue
+        if len(token) > 4 and token.endswith("ing"):
+            token = token[:-3]
+        elif len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        terms.append(token)
+    return terms
+
+
+class HashingEmbedder:
+    """Sparse L2-normalised embedding via the signed hashing trick."""
+
+    def __init__(self, dimensions: int = SEMANTIC_CACHE_DIMENSIONS, bigram_weight: float = 0.7):
+        self.dimensions = dimensions
+        self.bigram_weight = bigram_weight
+
+    def _bucket(self, feature: str) -> Tuple[int, float]:
+        h = zlib.crc32(feature.encode("utf-8"))
+        return h % self.dimensions, (1.0 if h & 0x80000000 else -1.0)
+
+    def embed(self, text: str) -> Dict[int, float]:
+        terms = question_terms(text)
+        features: List[Tuple[str, float]] = [(t, 1.0) for t in terms]
+        features += [(f"{a} {b}", self.bigram_weight) for a, b in zip(terms, terms[1:])]
+
+        vector: Dict[int, float] = {}
+        for feature, weight in features:
+            index, sign = self._bucket(feature)
+            vector[index] = vector.get(index, 0.0) + sign * weight
+        norm = math.sqrt(sum(v * v for v in vector.values()))
+        if not norm:
+            return {}
+        return {i: v / norm for i, v in vector.items() if v}
+
+
+def cosine(a: Dict[int, float], b: Dict[int, float]) -> float:
+    """Dot product of two normalised sparse vectors."""
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(i, 0.0) for i, v in a.items())
+
+
+@dataclass
+class CacheEntry:
+    question: str
+    answer: str
+    vector: Dict[int, float]
+    created_at: float
+    hits: int = 0
+
+
+@dataclass
+class TenantIndex:
+    """Entries for one tenant plus an inverted index from dimension to entry ids."""
+    entries: "OrderedDict[int, CacheEntry]" = field(default_factory=OrderedDict)
+    postings: Dict[int, Set[int]] = field(default_factory=dict)
+
+    def add(self, entry_id: int, entry: CacheEntry) -> None:
+        self.entries[entry_id] = entry
+        for index in entry.vector:
+            self.postings.setdefault(index, set()).add(entry_id)
+
+    def remove(self, entry_id: int) -> None:
+        entry = self.entries.pop(entry_id, None)
+        if entry is None:
+            return
+        for index in entry.vector:
+            ids = self.postings.get(index)
+            if ids is not None:
+                ids.discard(entry_id)
+                if not ids:
+                    del self.postings[index]
+
+    def candidates(self, vector: Dict[int, float]) -> Set[int]:
+        ids: Set[int] = set()
+        for index in vector:
+            ids |= self.postings.get(index, set())
+        return ids
+
+
+class SemanticCache:
+    """Per-tenant nearest-neighbour cache of question/answer pairs.
+
+    A lookup returns the stored answer whose question has the highest cosine
+    similarity with the new question, if it is at least `threshold` and the
+    entry is younger than `ttl_seconds`. Each tenant keeps at most
+    `max_entries` answers, evicting the least recently used; once all tenants
+    together hold more than `max_total_entries`, the least recently used
+    tenants are dropped whole.
+    """
+
+    def __init__(
+        self,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        ttl_seconds: float = SEMANTIC_CACHE_TTL_SECONDS,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+        max_total_entries: int = SEMANTIC_CACHE_MAX_TOTAL_ENTRIES,
+        min_terms: int = SEMANTIC_CACHE_MIN_TERMS,
+        embedder: Optional[HashingEmbedder] = None,
+        enabled: bool = SEMANTIC_CACHE_ENABLED,
+    ):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_total_entries = max_total_entries
+        self.min_terms = min_terms
+        self.embedder = embedder or HashingEmbedder()
+        self.enabled = enabled
+        # Least recently used tenant first
+        self.tenants: "OrderedDict[str, TenantIndex]" = OrderedDict()
+        self.entry_count = 0
+        self.hits = 0
+        self.misses = 0
+        self._next_id = 0
+
+    def cacheable(self, question: str) -> bool:
+        return self.enabled and len(set(question_terms(question))) >= self.min_terms
+
+    def lookup(self, tenant: str, question: str) -> Optional[str]:
+        """Return a cached answer for a similar question, or None."""
+        if not self.cacheable(question):
+            return None
+        index = self.tenants.get(tenant)
+        if index is None:
+            self.misses += 1
+            return None
+        self.tenants.move_to_end(tenant)
+        vector = self.embedder.embed(question)
+        now = time.monotonic()
+
+        best_id, best_score = None, 0.0
+        for entry_id in index.candidates(vector):
+            entry = index.entries[entry_id]
+            if now - entry.created_at > self.ttl_seconds:
+                index.remove(entry_id)
+                self.entry_count -= 1
+                continue
+            score = cosine(vector, entry.vector)
+            if score > best_score:
+                best_id, best_score = entry_id, score
+        if not index.entries:
+            del self.tenants[tenant]
+
+        if best_id is None or best_score < self.threshold:
+            self.misses += 1
+            return None
+
+        entry = index.entries[best_id]
+        entry.hits += 1
+        self.hits += 1
+        index.entries.move_to_end(best_id)
+        logger.info(f"Semantic cache hit tenant={tenant} similarity={best_score:.3f}")
+        return entry.answer
+
+    def store(self, tenant: str, question: str, answer: str) -> None:
+        """Cache the answer to a question for this tenant."""
+        if not answer or not self.cacheable(question):
+            return
+        vector = self.embedder.embed(question)
+        if not vector:
+            return
+        index = self.tenants.setdefault(tenant, TenantIndex())
+        self.tenants.move_to_end(tenant)
+        self._next_id += 1
+        index.add(self._next_id, CacheEntry(question, answer, vector, time.monotonic()))
+        self.entry_count += 1
+        while len(index.entries) > self.max_entries:
+            index.remove(next(iter(index.entries)))
+            self.entry_count -= 1
+        # The tenant just stored to is the most recent, so it goes last
+        while self.entry_count > self.max_total_entries and len(self.tenants) > 1:
+            _, evicted = self.tenants.popitem(last=False)
+            self.entry_count -= len(evicted.entries)
+
+    def invalidate(self, tenant: Optional[str] = None) -> None:
+        """Drop cached answers for one tenant, or for all tenants."""
+        if tenant is None:
+            self.tenants.clear()
+            self.entry_count = 0
+        else:
+            index = self.tenants.pop(tenant, None)
+            if index is not None:
+                self.entry_count -= len(index.entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Aggregate size and hit rate; no per-tenant (per-user) figures."""
+        return {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "ttl_seconds": self.ttl_seconds,
+            "entries": self.entry_count,
+            "max_total_entries": self.max_total_entries,
+            "tenants": len(self.tenants),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / (self.hits + self.misses), 4) if self.hits + self.misses else 0.0,
+        }
+
+
+# Global chat answer cache
+semantic_cache = SemanticCache()
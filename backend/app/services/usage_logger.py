@@ -0,0 +1,154 @@
+"""
+Batched ML Usage Logging
+Queues one MLUsageLog record per AI call in memory and bulk-inserts them from
+a background task every N records or T seconds, so logging never adds
+database latency to the request path.
+"""
+
+import os
+import asyncio
+import logging
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional
+
+from fastapi.requests import HTTPConnection
+
+logger = logging.getLogger(__name__)
+
+USAGE_LOG_BATCH_SIZE = int(os.getenv("ML_USAGE_LOG_BATCH_SIZE", "100"))
+USAGE_LOG_FLUSH_SECONDS = float(os.getenv("ML_USAGE_LOG_FLUSH_SECONDS", "5"))
+USAGE_LOG_MAX_BUFFER = int(os.getenv("ML_USAGE_LOG_MAX_BUFFER", "10000"))
+
+# Request path and user of the API call that triggered the AI call, if any.
+# The user is set by auth.get_current_active_user
+usage_endpoint: ContextVar[Optional[str]] = ContextVar("usage_endpoint", default=None)
+usage_user_id: ContextVar[Optional[int]] = ContextVar("usage_user_id", default=None)
+
+
+async def track_usage_endpoint(connection: HTTPConnection) -> None:
+    """Router dependency: attribute AI calls made while serving a request to its path."""
+    usage_endpoint.set(connection.url.path)
+
+
+class UsageLogBuffer:
+    """In-memory buffer of MLUsageLog rows with a background bulk writer."""
+
+    def __init__(
+        self,
+        batch_size: int = USAGE_LOG_BATCH_SIZE,
+        flush_seconds: float = USAGE_LOG_FLUSH_SECONDS,
+        max_buffer: int = USAGE_LOG_MAX_BUFFER,
+    ):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.records: Deque[Dict[str, Any]] = deque(maxlen=max_buffer)
+        self.written = 0
+        self.dropped = 0
+        self.failed_flushes = 0
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def log(
+        self,
+        model_name: str,
+        endpoint: str,
+        latency_ms: float,
+        tokens_input: int = 0,
+        tokens_output: int = 0,
+        error_message: Optional[str] = None,
+    ) -> None:
+        """Queue a usage record. Never touches the database."""
+        if len(self.records) == self.records.maxlen:
+            self.dropped += 1
+        self.records.append({
+            "model_name": model_name,
+            "endpoint": usage_endpoint.get() or endpoint,
+            "tokens_input": tokens_input,
+            "tokens_output": tokens_output,
+            "latency_ms": latency_ms,
+            "error_occurred": error_message is not None,
+            "error_message": error_message[:1000] if error_message else None,
+            "created_at": datetime.now(timezone.utc),
+            "user_id": usage_user_id.get(),
+        })
+        self._ensure_started()
+        if len(self.records) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    def _ensure_started(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return  # No loop (e.g. scripts); records are written on the next flush()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> int:
+        """Write all queued records in bulk inserts off the event loop."""
+        written = 0
+        while self.records:
+            batch: List[Dict[str, Any]] = []
+            while self.records and len(batch) < self.batch_size:
+                batch.append(self.records.popleft())
+            try:
+                await asyncio.to_thread(self._write, batch)
+                written += len(batch)
+            except Exception as e:
+                self.failed_flushes += 1
+                self.dropped += len(batch)
+                logger.error(f"ML usage log flush failed, dropped {len(batch)} records: {e}")
+                break
+        self.written += written
+        return written
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        from ..database import SessionLocal
+        from ..models import MLUsageLog
+
+        db = SessionLocal()
+        try:
+            db.bulk_insert_mappings(MLUsageLog, batch)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    async def stop(self) -> None:
+        """Cancel the background writer and flush what is left."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": len(self.records),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed_flushes": self.failed_flushes,
+            "batch_size": self.batch_size,
+            "flush_seconds": self.flush_seconds,
+        }
+
+
+# Global usage log buffer
+usage_log_buffer = UsageLogBuffer()
@@ -0,0 +1,451 @@
+"""
+Bulk Site-Photo Analysis Jobs
+Runs Gemini vision analysis over many images with a bounded async worker pool.
+Jobs are tracked with per-image results and progress counters.
+
+The global manager keeps jobs and per-image results in the database, so any
+worker can report progress and results, and they survive restarts. The image
+bytes are only held by the worker that accepted the batch, which runs it; a
+job interrupted by a restart stays 'running' with its remaining images
+'pending'. Each worker runs at most VISION_BATCH_MAX_RUNNING_JOBS batches at a
+time and refuses further submissions until one finishes.
+"""
+
+import os
+import io
+import json
+import uuid
+import asyncio
+import logging
+import zipfile
+import mimetypes
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+VISION_BATCH_CONCURRENCY = int(os.getenv("VISION_BATCH_CONCURRENCY", "4"))
+VISION_BATCH_MAX_IMAGES = int(os.getenv("VISION_BATCH_MAX_IMAGES", "500"))
+VISION_BATCH_MAX_JOBS = int(os.getenv("VISION_BATCH_MAX_JOBS", "100"))
+# Batches one worker runs at once; each holds its images in memory
+VISION_BATCH_MAX_RUNNING_JOBS = int(os.getenv("VISION_BATCH_MAX_RUNNING_JOBS", "2"))
+# Uncompressed size limits while reading uploads and zip archives
+VISION_BATCH_MAX_IMAGE_BYTES = int(os.getenv("VISION_BATCH_MAX_IMAGE_BYTES", str(20 * 1024 * 1024)))
+VISION_BATCH_MAX_BYTES = int(os.getenv("VISION_BATCH_MAX_BYTES", str(500 * 1024 * 1024)))
+VISION_UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".heic", ".heif")
+
+
+@dataclass
+class ImageResult:
+    index: int
+    filename: str
+    status: str = "pending"  # 'pending', 'processing', 'completed', 'failed'
+    analysis: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+
+
+@dataclass
+class VisionBatchJob:
+    id: str
+    project_id: str
+    aspects: Tuple[str, ...]
+    images: List[ImageResult] = field(default_factory=list)
+    status: str = "queued"  # 'queued', 'running', 'completed', 'failed'
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+
+    @property
+    def total(self) -> int:
+        return len(self.images)
+
+    @property
+    def completed(self) -> int:
+        return sum(1 for img in self.images if img.status == "completed")
+
+    @property
+    def failed(self) -> int:
+        return sum(1 for img in self.images if img.status == "failed")
+
+    def progress(self, counts: Optional[Tuple[int, int, int]] = None) -> Dict[str, Any]:
+        """Progress summary; `counts` (total, completed, failed) stand in for
+        the images when they were not loaded."""
+        total, completed, failed = counts or (self.total, self.completed, self.failed)
+        done = completed + failed
+        return {
+            "job_id": self.id,
+            "project_id": self.project_id,
+            "status": self.status,
+            "aspects": list(self.aspects),
+            "total": total,
+            "completed": completed,
+            "failed": failed,
+            "progress_percentage": round(done / total * 100, 1) if total else 100.0,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "completed_at": self.completed_at.isoformat() if self.completed_at else None,
+        }
+
+    def results(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "index": img.index,
+                "filename": img.filename,
+                "status": img.status,
+                "analysis": img.analysis,
+                "error": img.error,
+            }
+            for img in self.images
+        ]
+
+
+def extract_images_from_zip(archive: bytes, max_images: int = VISION_BATCH_MAX_IMAGES,
+                            max_bytes: int = VISION_BATCH_MAX_BYTES,
+                            max_image_bytes: int = VISION_BATCH_MAX_IMAGE_BYTES) -> List[Tuple[str, bytes]]:
+    """Return (filename, data) pairs for every image file inside a zip archive.
+
+    Raises ValueError as soon as the archive holds more than max_images
+    images, one image inflates to more than max_image_bytes, or all of them
+    together to more than max_bytes. Sizes are enforced while decompressing,
+    not taken from the archive's (forgeable) headers, so a zip bomb is
+    rejected without being expanded.
+    """
+    images = []
+    total = 0
+    with zipfile.ZipFile(io.BytesIO(archive)) as zf:
+        for info in zf.infolist():
+            if info.is_dir():
+                continue
+            name = os.path.basename(info.filename)
+            if name.startswith(".") or not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            if len(images) >= max_images:
+                raise ValueError(f"Too many images (max {max_images})")
+            limit = min(max_image_bytes, max_bytes - total)
+            if info.file_size > limit:
+                raise ValueError(_size_error(info.filename, max_image_bytes, max_bytes))
+            with zf.open(info) as entry:
+                data = entry.read(limit + 1)
+            if len(data) > limit:
+                raise ValueError(_size_error(info.filename, max_image_bytes, max_bytes))
+            total += len(data)
+            images.append((info.filename, data))
+    return images
+
+
+def _size_error(filename: str, max_image_bytes: int, max_bytes: int) -> str:
+    return (f"{filename} is too large (max {max_image_bytes // (1024 * 1024)} MB per image, "
+            f"{max_bytes // (1024 * 1024)} MB per batch)")
+
+
+async def read_upload(upload, limit: int, chunk_size: int = VISION_UPLOAD_CHUNK_BYTES) -> bytes:
+    """Read an UploadFile in chunks, raising ValueError once it passes limit bytes."""
+    chunks = []
+    size = 0
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            return b"".join(chunks)
+        size += len(chunk)
+        if size > limit:
+            raise ValueError(f"{upload.filename or 'upload'} is too large")
+        chunks.append(chunk)
+
+
+def guess_image_mime_type(filename: str) -> str:
+    """Guess an image MIME type from its filename, defaulting to JPEG."""
+    mime_type, _ = mimetypes.guess_type(filename)
+    if mime_type and mime_type.startswith("image/"):
+        return mime_type
+    return "image/jpeg"
+
+
+class VisionJobStore:
+    """Vision batch jobs held in process memory, up to max_jobs of them."""
+
+    def __init__(self, max_jobs: int = VISION_BATCH_MAX_JOBS):
+        self.max_jobs = max_jobs
+        self.jobs: Dict[str, VisionBatchJob] = {}
+
+    def add(self, job: VisionBatchJob) -> None:
+        self.jobs[job.id] = job
+        self._evict_finished_jobs()
+
+    def get(self, job_id: str, with_results: bool = True) -> Optional[VisionBatchJob]:
+        return self.jobs.get(job_id)
+
+    def list(self, project_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        jobs = self.jobs.values()
+        if project_id:
+            jobs = [j for j in jobs if j.project_id == project_id]
+        return [j.progress() for j in sorted(jobs, key=lambda j: j.created_at, reverse=True)]
+
+    def save_job(self, job: VisionBatchJob) -> None:
+        """Store the job's status and timestamps (held objects are already current)."""
+
+    def save_image(self, job_id: str, result: ImageResult) -> None:
+        """Store one image's result (held objects are already current)."""
+
+    def _evict_finished_jobs(self) -> None:
+        """Drop the oldest finished jobs once more than max_jobs are retained."""
+        excess = len(self.jobs) - self.max_jobs
+        if excess <= 0:
+            return
+        finished = sorted(
+            (j for j in self.jobs.values() if j.status in ("completed", "failed")),
+            key=lambda j: j.created_at,
+        )
+        for job in finished[:excess]:
+            del self.jobs[job.id]
+
+
+class DatabaseVisionJobStore(VisionJobStore):
+    """VisionJobStore kept in the vision_batch_jobs and vision_batch_images
+    tables, shared by every worker."""
+
+    def __init__(self, max_jobs: int = VISION_BATCH_MAX_JOBS, session_factory=None):
+        super().__init__(max_jobs)
+        self._session_factory = session_factory
+
+    def _session(self):
+        if self._session_factory is None:
+            from ..database import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory()
+
+    @staticmethod
+    def _job(row) -> VisionBatchJob:
+        return VisionBatchJob(
+            id=row.id, project_id=row.project_id, aspects=tuple(json.loads(row.aspects)),
+            status=row.status, created_at=row.created_at, started_at=row.started_at,
+            completed_at=row.completed_at,
+        )
+
+    def add(self, job: VisionBatchJob) -> None:
+        from ..models import VisionJob, VisionJobImage
+
+        with self._session() as db:
+            db.add(VisionJob(
+                id=job.id, project_id=job.project_id, aspects=json.dumps(list(job.aspects)),
+                status=job.status, created_at=job.created_at,
+            ))
+            db.flush()
+            db.bulk_insert_mappings(VisionJobImage, [
+                {"job_id": job.id, "position": img.index, "filename": img.filename, "status": img.status}
+                for img in job.images
+            ])
+            db.commit()
+            self._prune(db)
+
+    def get(self, job_id: str, with_results: bool = True) -> Optional[VisionBatchJob]:
+        from ..models import VisionJob, VisionJobImage
+
+        with self._session() as db:
+            row = db.get(VisionJob, job_id)
+            if row is None:
+                return None
+            job = self._job(row)
+            # Progress polls skip the analysis bodies
+            columns = [VisionJobImage.position, VisionJobImage.filename, VisionJobImage.status,
+                       VisionJobImage.error, VisionJobImage.started_at, VisionJobImage.completed_at]
+            if with_results:
+                columns.append(VisionJobImage.analysis)
+            images = (db.query(*columns).filter(VisionJobImage.job_id == job_id)
+                      .order_by(VisionJobImage.position).all())
+        job.images = [
+            ImageResult(
+                index=img.position, filename=img.filename, status=img.status, error=img.error,
+                analysis=json.loads(img.analysis) if with_results and img.analysis else {},
+                started_at=img.started_at, completed_at=img.completed_at,
+            )
+            for img in images
+        ]
+        return job
+
+    def list(self, project_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        from sqlalchemy import case, func
+        from ..models import VisionJob, VisionJobImage
+
+        with self._session() as db:
+            query = db.query(VisionJob)
+            if project_id:
+                query = query.filter(VisionJob.project_id == project_id)
+            rows = query.order_by(VisionJob.created_at.desc()).limit(self.max_jobs).all()
+            counts = {
+                r.job_id: (r.total, r.completed or 0, r.failed or 0)
+                for r in db.query(
+                    VisionJobImage.job_id,
+                    func.count(VisionJobImage.id).label("total"),
+                    func.sum(case((VisionJobImage.status == "completed", 1), else_=0)).label("completed"),
+                    func.sum(case((VisionJobImage.status == "failed", 1), else_=0)).label("failed"),
+                ).filter(VisionJobImage.job_id.in_([row.id for row in rows])).group_by(VisionJobImage.job_id)
+            }
+        return [self._job(row).progress(counts.get(row.id, (0, 0, 0))) for row in rows]
+
+    def save_job(self, job: VisionBatchJob) -> None:
+        from ..models import VisionJob
+
+        with self._session() as db:
+            db.query(VisionJob).filter(VisionJob.id == job.id).update({
+                VisionJob.status: job.status,
+                VisionJob.started_at: job.started_at,
+                VisionJob.completed_at: job.completed_at,
+            }, synchronize_session=False)
+            db.commit()
+
+    def save_image(self, job_id: str, result: ImageResult) -> None:
+        from ..models import VisionJobImage
+
+        with self._session() as db:
+            db.query(VisionJobImage).filter(
+                VisionJobImage.job_id == job_id, VisionJobImage.position == result.index
+            ).update({
+                VisionJobImage.status: result.status,
+                VisionJobImage.analysis: json.dumps(result.analysis, default=str) if result.analysis else None,
+                VisionJobImage.error: result.error,
+                VisionJobImage.started_at: result.started_at,
+                VisionJobImage.completed_at: result.completed_at,
+            }, synchronize_session=False)
+            db.commit()
+
+    def _prune(self, db) -> None:
+        """Delete the oldest finished jobs once more than max_jobs are stored."""
+        from sqlalchemy import func
+        from ..models import VisionJob, VisionJobImage
+
+        excess = (db.query(func.count(VisionJob.id)).scalar() or 0) - self.max_jobs
+        if excess <= 0:
+            return
+        finished = [row.id for row in db.query(VisionJob.id)
+                    .filter(VisionJob.status.in_(("completed", "failed")))
+                    .order_by(VisionJob.created_at).limit(excess)]
+        if finished:
+            db.query(VisionJobImage).filter(VisionJobImage.job_id.in_(finished)).delete(synchronize_session=False)
+            db.query(VisionJob).filter(VisionJob.id.in_(finished)).delete(synchronize_session=False)
+            db.commit()
+
+
+class VisionBatchBusyError(RuntimeError):
+    """This worker is already running its maximum number of batch jobs."""
+
+
+class VisionBatchJobManager:
+    """Creates and runs bulk vision jobs with a shared concurrency limit.
+
+    All jobs share one semaphore, so wall-clock time for a batch grows with
+    N / concurrency rather than N. Jobs and per-image results are written to
+    the store as they progress; finished jobs keep their results for later
+    retrieval until the store's retention limit evicts the oldest ones.
+    """
+
+    def __init__(self, concurrency: int = VISION_BATCH_CONCURRENCY,
+                 max_images: int = VISION_BATCH_MAX_IMAGES,
+                 max_jobs: int = VISION_BATCH_MAX_JOBS,
+                 max_running_jobs: int = VISION_BATCH_MAX_RUNNING_JOBS,
+                 store: Optional[VisionJobStore] = None):
+        self.concurrency = max(1, concurrency)
+        self.max_images = max_images
+        self.max_running_jobs = max(1, max_running_jobs)
+        self.store = store if store is not None else VisionJobStore(max_jobs)
+        # Jobs running in this worker; None while a submitted job is being stored
+        self._tasks: Dict[str, Optional[asyncio.Task]] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    async def submit(self, images: List[Tuple[str, bytes]], project_id: str = "default",
+                     aspects: Tuple[str, ...] = ("progress", "safety", "5s")) -> VisionBatchJob:
+        """Store a job for the given images and start processing it.
+
+        Raises VisionBatchBusyError when this worker is already running
+        max_running_jobs batches.
+        """
+        if not images:
+            raise ValueError("No images provided")
+        if len(images) > self.max_images:
+            raise ValueError(f"Too many images: {len(images)} (max {self.max_images})")
+        if self.busy:
+            raise VisionBatchBusyError(
+                f"{len(self._tasks)} batch jobs are already running (max {self.max_running_jobs}); retry later"
+            )
+
+        job = VisionBatchJob(id=str(uuid.uuid4()), project_id=project_id, aspects=tuple(aspects))
+        job.images = [ImageResult(index=i, filename=name) for i, (name, _) in enumerate(images)]
+        self._tasks[job.id] = None  # Hold the slot while the job is stored
+        try:
+            await asyncio.to_thread(self.store.add, job)
+        except BaseException:
+            del self._tasks[job.id]
+            raise
+
+        self._tasks[job.id] = asyncio.create_task(self._run(job, images))
+        return job
+
+    @property
+    def busy(self) -> bool:
+        """Whether this worker is running as many batch jobs as it may."""
+        return len(self._tasks) >= self.max_running_jobs
+
+    async def get_job(self, job_id: str, with_results: bool = True) -> Optional[VisionBatchJob]:
+        return await asyncio.to_thread(self.store.get, job_id, with_results)
+
+    async def list_jobs(self, project_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self.store.list, project_id)
+
+    async def _save(self, write, *args) -> None:
+        try:
+            await asyncio.to_thread(write, *args)
+        except Exception as e:
+            logger.error(f"Vision batch job store error: {e}")
+
+    async def _run(self, job: VisionBatchJob, images: List[Tuple[str, bytes]]) -> None:
+        from .ai_service import ai_service
+
+        job.status = "running"
+        job.started_at = datetime.utcnow()
+        await self._save(self.store.save_job, job)
+
+        async def process(result: ImageResult, data: bytes) -> None:
+            async with self.semaphore:
+                result.status = "processing"
+                result.started_at = datetime.utcnow()
+                try:
+                    result.analysis = await ai_service.analyze_site_combined(
+                        data,
+                        mime_type=guess_image_mime_type(result.filename),
+                        aspects=job.aspects,
+                    )
+                    result.status = "completed"
+                except Exception as e:
+                    result.status = "failed"
+                    result.error = str(e)
+                finally:
+                    result.completed_at = datetime.utcnow()
+            await self._save(self.store.save_image, job.id, result)
+
+        try:
+            await asyncio.gather(*(
+                process(result, data) for result, (_, data) in zip(job.images, images)
+            ))
+            job.status = "completed" if job.completed or not job.total else "failed"
+        except Exception:
+            job.status = "failed"
+        finally:
+            job.completed_at = datetime.utcnow()
+            try:
+                await self._save(self.store.save_job, job)
+            finally:
+                self._tasks.pop(job.id, None)
+
+
+# Global batch job manager instance
+vision_job_manager = VisionBatchJobManager(store=DatabaseVisionJobStore())
@@ -0,0 +1,264 @@
+"""
+End-to-end load test for the AI-backed API endpoints.
+
+Drives chat messages, waste analysis, forecasting and the vision endpoints at
+a fixed arrival rate and reports throughput and latency percentiles per
+scenario. Requests are scheduled on an open-loop clock, so a slow backend
+shows up as queueing latency instead of silently lowering the offered load.
+
+A login storm alongside chat shows whether password hashing holds up other
+requests (compare chat latency with and without the login scenario):
+    python load_test.py --rps 40 --scenarios chat_message=1,login=3 --email demo@leanconstruction.ai --password demo123
+
+Pair with mock_gemini_server.py to test without network access:
+    python mock_gemini_server.py &
+    GEMINI_BASE_URL=http://localhost:8090/v1beta GEMINI_API_KEY=mock RATE_LIMIT_ENABLED=false uvicorn app.main:app &
+    python load_test.py --rps 20 --duration 60 --email demo@leanconstruction.ai --password demo123
+
+Run the API with the rate limiter off (RATE_LIMIT_ENABLED=false, the
+default): every request comes from one client, so with it on most requests
+are answered 429 and the run measures the limiter rather than the backend.
+The report warns when any request was rate limited.
+
+Run: cd backend && python load_test.py --help
+"""
+
+import sys
+import json
+import math
+import time
+import zlib
+import struct
+import random
+import asyncio
+import argparse
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+API_PREFIX = "/api/v1"
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile (0 when empty)."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = math.ceil(pct / 100 * len(ordered))
+    return ordered[min(len(ordered), max(rank, 1)) - 1]
+
+
+def tiny_png() -> bytes:
+    """A valid 1x1 PNG so vision endpoints accept the upload."""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    header = struct.pack(">IIBBBBB", 1, 1, 8, 2, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", zlib.compress(b"\x00\x80\x80\x80"))
+        + chunk(b"IEND", b"")
+    )
+
+
+CHAT_QUESTIONS = [
+    "How do I reduce waiting waste between trades?",
+    "What is the Last Planner System?",
+    "How should we run a daily huddle?",
+    "What are the 8 wastes in construction?",
+    "How do I set up a kanban for material deliveries?",
+]
+
+WASTE_PAYLOAD = {
+    "project_id": "loadtest",
+    "data": {
+        "tasks": [{"name": "Framing", "planned_hours": 120, "actual_hours": 150, "rework_hours": 12}],
+        "idle_time_hours": 18,
+        "material_waste_percent": 7.5,
+    },
+    "include_recommendations": True,
+}
+
+FORECAST_PAYLOAD = {
+    "project_id": "loadtest",
+    "project_info": {"budget": 2500000, "spent": 1100000, "percent_complete": 42, "planned_duration_days": 300},
+}
+
+
+def build_scenarios(image: bytes, email: Optional[str] = None, password: Optional[str] = None) -> Dict[str, Callable[[httpx.AsyncClient], Any]]:
+    """Scenario name -> coroutine function issuing one request."""
+    scenarios = {
+        "chat_message": lambda c: c.post(
+            f"{API_PREFIX}/chat/messages", json={"content": random.choice(CHAT_QUESTIONS), "role": "user"}
+        ),
+        "analyze_waste": lambda c: c.post(f"{API_PREFIX}/ml/analyze-waste", json=WASTE_PAYLOAD),
+        "forecast": lambda c: c.post(f"{API_PREFIX}/ml/forecast", json=FORECAST_PAYLOAD),
+        "analyze_progress": lambda c: c.post(
+            f"{API_PREFIX}/ml/analyze-progress", files={"file": ("site.png", image, "image/png")}
+        ),
+        "analyze_site": lambda c: c.post(
+            f"{API_PREFIX}/ml/analyze-site", files={"file": ("site.png", image, "image/png")}
+        ),
+    }
+    if email and password:
+        scenarios["login"] = lambda c: c.post("/token", data={"username": email, "password": password})
+    return scenarios
+
+
+async def login(client: httpx.AsyncClient, email: str, password: str) -> str:
+    response = await client.post("/token", data={"username": email, "password": password})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def run_load(
+    base_url: str,
+    rps: float,
+    duration: float,
+    weights: Dict[str, float],
+    token: Optional[str] = None,
+    max_in_flight: int = 200,
+    timeout: float = 120.0,
+    email: Optional[str] = None,
+    password: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Issue requests at `rps` for `duration` seconds and collect per-scenario results."""
+    scenarios = build_scenarios(tiny_png(), email, password)
+    unknown = set(weights) - set(scenarios)
+    if unknown:
+        raise ValueError(f"Unknown scenarios: {sorted(unknown)}")
+    names = [n for n in weights if weights[n] > 0]
+    scenario_weights = [weights[n] for n in names]
+
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    dropped = 0
+    pending = [0]
+    in_flight = asyncio.Semaphore(max_in_flight)
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, timeout=timeout, limits=limits) as client:
+
+        async def fire(name: str, scheduled_at: float) -> None:
+            async with in_flight:
+                try:
+                    response = await scenarios[name](client)
+                    outcome = str(response.status_code)
+                except httpx.HTTPError as e:
+                    outcome = type(e).__name__
+                # Measured from the scheduled send time to include client-side queueing
+                latencies[name].append((time.perf_counter() - scheduled_at) * 1000)
+                statuses[name][outcome] += 1
+                pending[0] -= 1
+
+        tasks = []
+        started = time.perf_counter()
+        total = int(rps * duration)
+        for i in range(total):
+            scheduled_at = started + i / rps
+            delay = scheduled_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            # Shed load once the client-side backlog is far beyond what can be in flight
+            if pending[0] >= max_in_flight * 10:
+                dropped += 1
+                continue
+            pending[0] += 1
+            name = random.choices(names, scenario_weights)[0]
+            tasks.append(asyncio.create_task(fire(name, scheduled_at)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    report: Dict[str, Any] = {
+        "target_rps": rps,
+        "duration_s": round(elapsed, 2),
+        "requests": sum(len(v) for v in latencies.values()),
+        "dropped": dropped,
+        "scenarios": {},
+    }
+    report["throughput_rps"] = round(report["requests"] / elapsed, 2) if elapsed else 0
+    for name in names:
+        values = latencies[name]
+        ok = sum(count for status, count in statuses[name].items() if status.startswith("2"))
+        report["scenarios"][name] = {
+            "requests": len(values),
+            "success_rate": round(ok / len(values), 4) if values else 0,
+            "throughput_rps": round(len(values) / elapsed, 2) if elapsed else 0,
+            "p50_ms": round(percentile(values, 50), 1),
+            "p90_ms": round(percentile(values, 90), 1),
+            "p95_ms": round(percentile(values, 95), 1),
+            "p99_ms": round(percentile(values, 99), 1),
+            "max_ms": round(max(values), 1) if values else 0,
+            "statuses": dict(statuses[name]),
+        }
+    return report
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(
+        f"\n{report['requests']} requests in {report['duration_s']}s "
+        f"({report['throughput_rps']} rps achieved, {report['target_rps']} target, {report['dropped']} dropped)\n"
+    )
+    print(f"{'scenario':<18}{'reqs':>7}{'ok%':>8}{'rps':>8}{'p50':>9}{'p90':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for name, s in report["scenarios"].items():
+        print(
+            f"{name:<18}{s['requests']:>7}{s['success_rate'] * 100:>7.1f}%{s['throughput_rps']:>8}"
+            f"{s['p50_ms']:>9}{s['p90_ms']:>9}{s['p95_ms']:>9}{s['p99_ms']:>9}{s['max_ms']:>9}"
+        )
+    limited = sum(s["statuses"].get("429", 0) for s in report["scenarios"].values())
+    if limited:
+        print(f"\nWarning: {limited} requests were rate limited (429); "
+              f"run the API with RATE_LIMIT_ENABLED=false to measure the backend")
+
+
+def parse_weights(raw: str) -> Dict[str, float]:
+    weights = {}
+    for item in raw.split(","):
+        name, _, weight = item.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+async def main(args: argparse.Namespace) -> int:
+    token = args.token
+    if not token and args.email:
+        async with httpx.AsyncClient(base_url=args.base_url) as client:
+            token = await login(client, args.email, args.password)
+    weights = parse_weights(args.scenarios)
+    if "chat_message" in weights and not token:
+        print("chat_message needs --token or --email/--password; skipping it")
+        weights.pop("chat_message")
+    if "login" in weights and not (args.email and args.password):
+        print("login needs --email/--password; skipping it")
+        weights.pop("login")
+
+    report = await run_load(
+        args.base_url, args.rps, args.duration, weights, token, args.max_in_flight,
+        email=args.email, password=args.password,
+    )
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the AI-backed API endpoints")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--rps", type=float, default=10)
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument(
+        "--scenarios",
+        default="chat_message=4,analyze_waste=2,forecast=2,analyze_progress=1,analyze_site=1",
+        help="comma separated name=weight pairs (login needs --email/--password)",
+    )
+    parser.add_argument("--token", help="bearer token for chat endpoints")
+    parser.add_argument("--email")
+    parser.add_argument("--password")
+    parser.add_argument("--max-in-flight", type=int, default=200)
+    parser.add_argument("--json", help="also write the report to this file")
+    sys.exit(asyncio.run(main(parser.parse_args())))
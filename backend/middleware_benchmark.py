@@ -0,0 +1,188 @@
+"""
+Microbenchmark the security middleware stack.
+
+Calls a trivial FastAPI route directly through ASGI (no network or HTTP
+client in the way) under three middleware setups and reports the mean and
+p99 time per request:
+
+- none: the bare app
+- legacy: the previous stack of three BaseHTTPMiddleware layers (security
+  headers, request logging, fixed-window rate limiting), reproduced here
+- asgi: SecurityMiddleware from app.middleware.security, the single pure
+  ASGI layer that replaced them (headers, logging, in-process GCRA limiter)
+
+The difference from "none" is the middleware overhead per request.
+
+Run: cd backend && python middleware_benchmark.py --help
+"""
+
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+from typing import Any, Dict, List
+
+from load_test import percentile
+
+
+def legacy_middleware():
+    """The BaseHTTPMiddleware stack SecurityMiddleware replaced, as it was."""
+    from starlette.middleware.base import BaseHTTPMiddleware
+    from starlette.responses import Response
+
+    from app.middleware.security import DEFAULT_CSP_POLICY
+
+    logger = logging.getLogger("app.middleware.security")
+
+    class SecurityHeaders(BaseHTTPMiddleware):
+        async def dispatch(self, request, call_next):
+            start_time = time.time()
+            response = await call_next(request)
+            response.headers["X-Frame-Options"] = "SAMEORIGIN"
+            response.headers["X-Content-Type-Options"] = "nosniff"
+            response.headers["X-XSS-Protection"] = "1; mode=block"
+            response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
+            response.headers["Content-Security-Policy"] = DEFAULT_CSP_POLICY
+            response.headers["Permissions-Policy"] = "accelerometer=(), camera=(), geolocation=(), gyroscope=(), magnetometer=(), microphone=(), payment=(), usb=()"
+            response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, proxy-revalidate"
+            response.headers["Pragma"] = "no-cache"
+            response.headers["Expires"] = "0"
+            response.headers["Cross-Origin-Embedder-Policy"] = "require-corp"
+            response.headers["Cross-Origin-Opener-Policy"] = "same-origin"
+            response.headers["Cross-Origin-Resource-Policy"] = "same-origin"
+            response.headers["X-Process-Time"] = str(time.time() - start_time)
+            if "server" in response.headers:
+                del response.headers["server"]
+            return response
+
+    class RequestLogging(BaseHTTPMiddleware):
+        async def dispatch(self, request, call_next):
+            client_host = request.client.host if request.client else "unknown"
+            user_agent = request.headers.get("user-agent", "unknown")
+            logger.info(f"Request: {request.method} {request.url.path} Client: {client_host} User-Agent: {user_agent}")
+            start_time = time.time()
+            response = await call_next(request)
+            process_time = time.time() - start_time
+            logger.info(f"Response: {request.method} {request.url.path} Status: {response.status_code} Duration: {process_time:.3f}s")
+            return response
+
+    class RateLimit(BaseHTTPMiddleware):
+        def __init__(self, app, requests_per_minute: int = 60):
+            super().__init__(app)
+            self.requests_per_minute = requests_per_minute
+            self.requests = {}
+
+        async def dispatch(self, request, call_next):
+            client_ip = request.client.host if request.client else "unknown"
+            current_minute = int(time.time() / 60)
+            key = f"{client_ip}:{current_minute}"
+            if key not in self.requests:
+                self.requests[key] = 0
+                old_keys = [k for k in self.requests if not k.endswith(f":{current_minute}")]
+                for old_key in old_keys:
+                    del self.requests[old_key]
+            self.requests[key] += 1
+            if self.requests[key] > self.requests_per_minute:
+                return Response(content='{"error": "Rate limit exceeded"}', status_code=429, media_type="application/json")
+            response = await call_next(request)
+            response.headers["X-RateLimit-Limit"] = str(self.requests_per_minute)
+            response.headers["X-RateLimit-Remaining"] = str(max(0, self.requests_per_minute - self.requests[key]))
+            return response
+
+    return [(SecurityHeaders, {}), (RequestLogging, {}), (RateLimit, {"requests_per_minute": 10**9})]
+
+
+def build_app(stack: str):
+    from fastapi import FastAPI
+
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    if stack == "legacy":
+        for cls, kwargs in legacy_middleware():
+            app.add_middleware(cls, **kwargs)
+    elif stack == "asgi":
+        from app.middleware.security import SecurityMiddleware
+        from app.services.rate_limiter import RateLimiter
+
+        limiter = RateLimiter(redis_url="", policy={"anonymous": {"default": 10**9}})
+        app.add_middleware(SecurityMiddleware, limiter=limiter)
+    return app
+
+
+async def measure(app, requests: int) -> Dict[str, Any]:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/ping", "raw_path": b"/ping", "root_path": "", "query_string": b"",
+        "headers": [(b"host", b"bench"), (b"user-agent", b"middleware-benchmark")],
+        "client": ("127.0.0.1", 50000), "server": ("bench", 80),
+    }
+
+    statuses: List[int] = []
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+
+    def receiver():
+        # Deliver the (empty) body once, then wait for a disconnect like a server would
+        messages = [{"type": "http.request", "body": b"", "more_body": False}]
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await asyncio.Event().wait()
+
+        return receive
+
+    for _ in range(200):  # Warm up
+        await app(scope, receiver(), send)
+    statuses.clear()
+
+    timings: List[float] = []
+    for _ in range(requests):
+        receive = receiver()
+        started = time.perf_counter()
+        await app(scope, receive, send)
+        timings.append((time.perf_counter() - started) * 1_000_000)
+
+    return {
+        "mean_us": round(sum(timings) / len(timings), 1),
+        "p50_us": round(percentile(timings, 50), 1),
+        "p99_us": round(percentile(timings, 99), 1),
+        "non_200": sum(1 for s in statuses if s != 200),
+    }
+
+
+async def main(args: argparse.Namespace) -> int:
+    logging.basicConfig(level=logging.INFO if args.log_info else logging.WARNING, stream=sys.stderr)
+    if args.log_info:
+        # Keep the handler cost out of the numbers; only record creation counts
+        logging.getLogger("app.middleware.security").propagate = False
+
+    report = {"requests": args.requests, "log_level": "INFO" if args.log_info else "WARNING"}
+    for stack in ("none", "legacy", "asgi"):
+        report[stack] = await measure(build_app(stack), args.requests)
+
+    base = report["none"]["mean_us"]
+    print(f"{'stack':<8} {'mean us':>9} {'p50 us':>9} {'p99 us':>9} {'overhead us':>12}")
+    for stack in ("none", "legacy", "asgi"):
+        r = report[stack]
+        print(f"{stack:<8} {r['mean_us']:>9} {r['p50_us']:>9} {r['p99_us']:>9} {round(r['mean_us'] - base, 1):>12}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0 if not any(report[s]["non_200"] for s in ("none", "legacy", "asgi")) else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Microbenchmark the security middleware stack")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--log-info", action="store_true", help="enable INFO request logging")
+    parser.add_argument("--json", help="also write the report to this file")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,242 @@
+"""
+Offline mock of the Gemini REST API for load tests and CI.
+
+Implements `models/{model}:generateContent` and `models/{model}:streamGenerateContent`
+(JSON array or `alt=sse`) with configurable latency, error injection and
+canned or schema-shaped responses, so AIService can be exercised without
+network access or API quota.
+
+Run:
+    cd backend && python mock_gemini_server.py            # listens on :8090
+    GEMINI_BASE_URL=http://localhost:8090/v1beta GEMINI_API_KEY=mock uvicorn app.main:app
+
+Configuration (environment, or POST /mock/config at runtime):
+    MOCK_GEMINI_LATENCY_DIST      fixed | uniform | normal | lognormal (default lognormal)
+    MOCK_GEMINI_LATENCY_MS        median latency in ms (default 800)
+    MOCK_GEMINI_LATENCY_SPREAD    spread: sigma for lognormal, stddev ms for normal,
+                                  +/- ms for uniform (default 0.5)
+    MOCK_GEMINI_ERROR_RATE        share of calls that fail (default 0)
+    MOCK_GEMINI_ERROR_STATUSES    comma separated statuses to pick from (default 429,500,503)
+    MOCK_GEMINI_CANNED_FILE       JSON file of {"keyword": "reply"} pairs for text replies
+    MOCK_GEMINI_STREAM_CHUNKS     number of chunks a streamed reply is split into (default 8)
+"""
+
+import os
+import sys
+import json
+import math
+import random
+import asyncio
+from typing import Any, Dict, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+DEFAULT_REPLY = (
+    "To reduce waste on site, start by mapping the value stream for the current phase, "
+    "identify waiting and rework hotspots, and review them in the daily huddle with the "
+    "Last Planner commitments for the week."
+)
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal")
+
+
+def _load_canned(path: Optional[str]) -> Dict[str, str]:
+    if not path:
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+class MockConfig:
+    """Runtime-adjustable behaviour of the mock server."""
+
+    def __init__(self):
+        self.latency_dist = os.getenv("MOCK_GEMINI_LATENCY_DIST", "lognormal")
+        self.latency_ms = float(os.getenv("MOCK_GEMINI_LATENCY_MS", "800"))
+        self.latency_spread = float(os.getenv("MOCK_GEMINI_LATENCY_SPREAD", "0.5"))
+        self.error_rate = float(os.getenv("MOCK_GEMINI_ERROR_RATE", "0"))
+        self.error_statuses = [
+            int(s) for s in os.getenv("MOCK_GEMINI_ERROR_STATUSES", "429,500,503").split(",") if s.strip()
+        ]
+        self.canned = _load_canned(os.getenv("MOCK_GEMINI_CANNED_FILE"))
+        self.stream_chunks = int(os.getenv("MOCK_GEMINI_STREAM_CHUNKS", "8"))
+
+    def update(self, values: Dict[str, Any]) -> None:
+        for key, value in values.items():
+            if not hasattr(self, key):
+                raise ValueError(f"Unknown mock setting: {key}")
+            setattr(self, key, value)
+        if self.latency_dist not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"latency_dist must be one of {LATENCY_DISTRIBUTIONS}")
+
+    def as_dict(self) -> Dict[str, Any]:
+        settings = {k: v for k, v in vars(self).items() if k != "canned"}
+        return {**settings, "canned_keywords": list(self.canned)}
+
+
+def sample_latency_ms(config: MockConfig, rng: random.Random = random) -> float:
+    """Draw one response latency from the configured distribution."""
+    median, spread = config.latency_ms, config.latency_spread
+    if config.latency_dist == "fixed":
+        value = median
+    elif config.latency_dist == "uniform":
+        value = rng.uniform(median - spread, median + spread)
+    elif config.latency_dist == "normal":
+        value = rng.gauss(median, spread)
+    else:
+        value = median * math.exp(rng.gauss(0, spread))
+    return max(value, 0.0)
+
+
+def sample_from_schema(schema: Dict[str, Any], rng: random.Random = random) -> Any:
+    """Build a value matching a Gemini responseSchema (OBJECT/ARRAY/STRING/...)."""
+    if "enum" in schema:
+        return rng.choice(schema["enum"])
+    kind = schema.get("type", "STRING").upper()
+    if kind == "OBJECT":
+        properties = schema.get("properties", {})
+        order = schema.get("propertyOrdering") or list(properties)
+        return {name: sample_from_schema(properties[name], rng) for name in order}
+    if kind == "ARRAY":
+        return [sample_from_schema(schema.get("items", {}), rng) for _ in range(rng.randint(1, 3))]
+    if kind == "INTEGER":
+        return rng.randint(int(schema.get("minimum", 1)), int(schema.get("maximum", 10)))
+    if kind == "NUMBER":
+        return round(rng.uniform(float(schema.get("minimum", 0)), float(schema.get("maximum", 100))), 2)
+    if kind == "BOOLEAN":
+        return rng.random() < 0.5
+    if schema.get("format") == "date":
+        return "2026-12-31"
+    return "mock value"
+
+
+def _prompt_text(payload: Dict[str, Any]) -> str:
+    return " ".join(
+        part.get("text", "")
+        for content in payload.get("contents", [])
+        for part in content.get("parts", [])
+    )
+
+
+def build_reply(payload: Dict[str, Any], config: MockConfig, rng: random.Random = random) -> str:
+    """Reply text: schema-shaped JSON for structured calls, else a canned answer."""
+    generation_config = payload.get("generationConfig", {})
+    schema = generation_config.get("responseSchema")
+    if schema:
+        return json.dumps(sample_from_schema(schema, rng))
+    if generation_config.get("responseMimeType") == "application/json":
+        return "{}"
+
+    prompt = _prompt_text(payload).lower()
+    for keyword, reply in config.canned.items():
+        if keyword.lower() in prompt:
+            return reply
+    return DEFAULT_REPLY
+
+
+def _usage(payload: Dict[str, Any], text: str) -> Dict[str, int]:
+    # Roughly 4 characters per token; images count as a flat 258 tokens. The
+    # REST API accepts both inlineData (sent by AIService) and inline_data
+    images = sum(
+        1 for content in payload.get("contents", []) for part in content.get("parts", [])
+        if "inlineData" in part or "inline_data" in part
+    )
+    prompt_tokens = len(_prompt_text(payload)) // 4 + 258 * images
+    output_tokens = max(len(text) // 4, 1)
+    return {
+        "promptTokenCount": prompt_tokens,
+        "candidatesTokenCount": output_tokens,
+        "totalTokenCount": prompt_tokens + output_tokens,
+    }
+
+
+def _response(payload: Dict[str, Any], text: str, finish: bool = True) -> Dict[str, Any]:
+    candidate: Dict[str, Any] = {"content": {"role": "model", "parts": [{"text": text}]}, "index": 0}
+    if finish:
+        candidate["finishReason"] = "STOP"
+    return {"candidates": [candidate], "usageMetadata": _usage(payload, text), "modelVersion": "mock"}
+
+
+def _error(status: int) -> JSONResponse:
+    messages = {429: "RESOURCE_EXHAUSTED", 500: "INTERNAL", 503: "UNAVAILABLE"}
+    return JSONResponse(
+        status_code=status,
+        content={"error": {"code": status, "message": "Injected mock error", "status": messages.get(status, "UNKNOWN")}},
+    )
+
+
+def create_app(config: Optional[MockConfig] = None) -> FastAPI:
+    config = config or MockConfig()
+    stats = {"requests": 0, "errors": 0, "streamed": 0}
+    app = FastAPI(title="Mock Gemini API")
+
+    @app.post("/v1beta/models/{model_action}")
+    async def models_action(model_action: str, request: Request):
+        model, _, action = model_action.partition(":")
+        if action not in ("generateContent", "streamGenerateContent"):
+            return JSONResponse(status_code=404, content={"error": {"code": 404, "message": f"Unknown action {action}"}})
+
+        payload = await request.json()
+        stats["requests"] += 1
+        latency_s = sample_latency_ms(config) / 1000
+
+        if config.error_statuses and random.random() < config.error_rate:
+            stats["errors"] += 1
+            await asyncio.sleep(latency_s)
+            return _error(random.choice(config.error_statuses))
+
+        text = build_reply(payload, config)
+        if action == "generateContent":
+            await asyncio.sleep(latency_s)
+            return _response(payload, text)
+
+        stats["streamed"] += 1
+        chunk_count = max(1, config.stream_chunks)
+        size = math.ceil(len(text) / chunk_count)
+        chunks = [text[i:i + size] for i in range(0, len(text), size)] or [""]
+        sse = request.query_params.get("alt") == "sse"
+
+        async def stream():
+            # Time to first token is half the latency; the rest is spread over the chunks
+            await asyncio.sleep(latency_s / 2)
+            if not sse:
+                yield "["
+            for i, chunk in enumerate(chunks):
+                last = i == len(chunks) - 1
+                body = json.dumps(_response(payload, chunk, finish=last))
+                if sse:
+                    yield f"data: {body}\r\n\r\n"
+                else:
+                    yield body + ("" if last else ",\r\n")
+                if not last:
+                    await asyncio.sleep(latency_s / 2 / len(chunks))
+            if not sse:
+                yield "]"
+
+        media_type = "text/event-stream" if sse else "application/json"
+        return StreamingResponse(stream(), media_type=media_type)
+
+    @app.get("/mock/config")
+    async def get_config():
+        return {"config": config.as_dict(), "stats": stats}
+
+    @app.post("/mock/config")
+    async def set_config(values: Dict[str, Any]):
+        try:
+            config.update(values)
+        except ValueError as e:
+            return JSONResponse(status_code=400, content={"detail": str(e)})
+        return {"config": config.as_dict()}
+
+    return app
+
+
+app = create_app()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else int(os.getenv("MOCK_GEMINI_PORT", "8090"))
+    uvicorn.run(app, host="0.0.0.0", port=port, log_level="warning")
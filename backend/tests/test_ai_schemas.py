@@ -0,0 +1,77 @@
+"""
+Unit tests for AIService structured output schemas
+"""
+
+import pytest
+
+from app.services.ai_schemas import (
+    ForecastResult,
+    DocumentAnalysisResult,
+    WasteDetectionResult,
+    combined_vision_model,
+    gemini_response_schema,
+)
+
+
+class TestGeminiResponseSchema:
+    """Tests for Pydantic -> Gemini responseSchema conversion"""
+
+    def test_nested_models_are_inlined(self):
+        """Test $ref definitions are resolved into nested objects"""
+        schema = gemini_response_schema(ForecastResult)
+
+        assert schema["type"] == "OBJECT"
+        schedule = schema["properties"]["schedule_forecast"]
+        assert schedule["type"] == "OBJECT"
+        assert "predicted_completion_date" in schedule["properties"]
+        assert "$ref" not in str(schema)
+        assert "$defs" not in schema
+
+    def test_unsupported_keywords_removed(self):
+        """Test JSON Schema keywords Gemini rejects are stripped"""
+        schema = gemini_response_schema(WasteDetectionResult)
+
+        assert "title" not in schema
+        assert "title" not in schema["properties"]["waste_analysis"]
+
+    def test_literal_becomes_enum(self):
+        """Test Literal fields are sent as string enums"""
+        schema = gemini_response_schema(DocumentAnalysisResult)
+
+        sentiment = schema["properties"]["sentiment"]
+        assert sentiment["type"] == "STRING"
+        assert set(sentiment["enum"]) == {"positive", "negative", "neutral"}
+
+    def test_property_ordering_follows_fields(self):
+        """Test property order matches model field order"""
+        schema = gemini_response_schema(DocumentAnalysisResult)
+
+        assert schema["propertyOrdering"] == list(DocumentAnalysisResult.model_fields)
+
+
+class TestCombinedVisionModel:
+    """Tests for the merged multi-aspect vision model"""
+
+    def test_aspect_keys_use_aliases(self):
+        """Test combined schema is keyed by aspect name"""
+        schema = gemini_response_schema(combined_vision_model(("progress", "5s")))
+
+        assert list(schema["properties"]) == ["progress", "5s"]
+
+    def test_validation_splits_by_aspect(self):
+        """Test a combined response validates back into per-aspect dicts"""
+        model = combined_vision_model(("safety",))
+        payload = """{"safety": {"ppe_compliance": ["helmets"], "violations": [], "hazards": [],
+                      "housekeeping_score": 7, "overall_safety_score": 8, "recommendations": []}}"""
+
+        result = model.model_validate_json(payload).model_dump(by_alias=True)
+
+        assert result["safety"]["overall_safety_score"] == 8
+        assert result["safety"]["ppe_compliance"] == ["helmets"]
+
+    def test_invalid_payload_rejected(self):
+        """Test responses missing required fields fail validation"""
+        model = combined_vision_model(("safety",))
+
+        with pytest.raises(Exception):
+            model.model_validate_json('{"safety": {"violations": []}}')
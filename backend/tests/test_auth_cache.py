@@ -0,0 +1,121 @@
+"""
+Unit tests for the authenticated-user cache and password hashing pool
+"""
+
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import app.auth as auth
+from app.auth import AuthUserCache, create_access_token, get_current_user
+from app.models import Base, User
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestAuthUserCache:
+    """Tests for get_current_user's user cache"""
+
+    @pytest.fixture(autouse=True)
+    def database(self, monkeypatch):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        self.Session = sessionmaker(bind=engine)
+        self.lookups = 0
+
+        def counting_session():
+            self.lookups += 1
+            return self.Session()
+
+        self.clock = FakeClock()
+        monkeypatch.setattr(auth, "SessionLocal", counting_session)
+        monkeypatch.setattr(auth, "user_cache", AuthUserCache(ttl_seconds=30, clock=self.clock))
+
+        db = self.Session()
+        db.add(User(email="pm@example.com", hashed_password="x", full_name="PM", company="Acme", role="manager"))
+        db.commit()
+        db.close()
+        self.token = create_access_token({"sub": "pm@example.com"})
+
+    def test_repeat_requests_skip_the_database(self):
+        """Test the user is read once per TTL"""
+        first = get_current_user(self.token)
+        second = get_current_user(self.token)
+
+        assert self.lookups == 1
+        assert second.id == first.id and second.role == "manager"
+        # Each request gets its own instance
+        second.role = "admin"
+        assert get_current_user(self.token).role == "manager"
+
+        self.clock.now = 31
+        get_current_user(self.token)
+        assert self.lookups == 2
+
+    def test_orm_update_invalidates(self):
+        """Test changing the user row drops the cached entry"""
+        get_current_user(self.token)
+
+        db = self.Session()
+        user = db.query(User).filter(User.email == "pm@example.com").first()
+        user.is_active = 0
+        db.commit()
+        db.close()
+
+        assert get_current_user(self.token).is_active == 0
+        assert self.lookups == 2
+
+    def test_explicit_invalidation(self):
+        """Test invalidate_user after a bulk UPDATE"""
+        get_current_user(self.token)
+        auth.invalidate_user("pm@example.com")
+        get_current_user(self.token)
+
+        assert self.lookups == 2
+
+
+class TestPasswordHasher:
+    """Tests for the password hashing pool"""
+
+    def test_outdated_cost_is_rehashed(self):
+        """Test a hash made with another bcrypt cost is replaced on verify"""
+        from passlib.context import CryptContext
+
+        old_hash = CryptContext(schemes=["bcrypt"], bcrypt__default_rounds=4).hash("secret")
+        hasher = auth.PasswordHasher(workers=1)
+
+        valid, new_hash = asyncio.run(hasher.verify("secret", old_hash))
+        assert valid and new_hash and new_hash != old_hash
+        assert asyncio.run(hasher.verify("secret", new_hash)) == (True, None)
+        assert asyncio.run(hasher.verify("wrong", new_hash))[0] is False
+        assert hasher.stats()["rehashed"] == 1
+        hasher.shutdown()
+
+    def test_full_queue_is_rejected(self):
+        """Test calls beyond the workers and queue fail fast with 503"""
+        hasher = auth.PasswordHasher(workers=1, max_queue=0)
+        release = threading.Event()
+
+        async def run():
+            busy = asyncio.ensure_future(hasher._run(release.wait, 5))
+            await asyncio.sleep(0.05)
+            with pytest.raises(HTTPException) as rejected:
+                await hasher.hash("secret")
+            assert hasher.stats()["running"] == 1
+            release.set()
+            await busy
+            return rejected.value
+
+        assert asyncio.run(run()).status_code == 503
+        assert hasher.stats()["rejected"] == 1
+        hasher.shutdown()
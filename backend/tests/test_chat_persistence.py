@@ -0,0 +1,81 @@
+"""
+Unit tests for write-behind chat persistence
+"""
+
+import asyncio
+
+from app.services.chat_persistence import ChatWriteBehind
+
+
+class TestChatWriteBehind:
+    """Tests for the chat write-behind queue"""
+
+    def test_batch_keeps_order_and_latest_memory(self):
+        """Test messages are written in order and the newest memory wins"""
+        queue = ChatWriteBehind()
+        batches = []
+        queue._write = batches.append
+
+        queue.enqueue_exchange(1, "q1", "a1", memory_columns={"memory_turns": "[1]"})
+        queue.enqueue_exchange(1, "q2", "a2", memory_columns={"memory_turns": "[2]"})
+
+        assert asyncio.run(queue.flush()) == 2
+        batch = batches[0]
+        contents = [m["content"] for record in batch for m in record["messages"]]
+        assert contents == ["q1", "a1", "q2", "a2"]
+        assert batch[-1]["conversation"]["memory_turns"] == "[2]"
+
+    def test_failed_write_is_retried_before_newer_exchanges(self):
+        """Test a failed batch goes back to the head of the queue"""
+        queue = ChatWriteBehind(batch_size=1, max_attempts=2)
+        written = []
+        calls = {"n": 0}
+
+        def flaky(batch):
+            calls["n"] += 1
+            if calls["n"] == 1:
+                raise RuntimeError("database unavailable")
+            written.append(batch[0]["messages"][0]["content"])
+
+        queue._write = flaky
+        queue.enqueue_exchange(1, "first", "a")
+        queue.enqueue_exchange(1, "second", "b")
+
+        assert asyncio.run(queue.flush()) == 0
+        assert asyncio.run(queue.flush()) == 2
+        assert written == ["first", "second"]
+        assert queue.dropped == 0
+
+    def test_drops_after_max_attempts(self):
+        """Test a batch that keeps failing is eventually dropped"""
+        queue = ChatWriteBehind(max_attempts=2)
+
+        def fail(batch):
+            raise RuntimeError("database unavailable")
+
+        queue._write = fail
+        queue.enqueue_exchange(1, "q", "a")
+
+        asyncio.run(queue.flush())
+        asyncio.run(queue.flush())
+
+        assert queue.dropped == 1
+        assert queue.stats()["queued"] == 0
+
+    def test_retry_onto_full_queue_counts_drops(self):
+        """Test re-queueing a failed batch drops (and counts) its oldest exchanges when the queue filled up"""
+        queue = ChatWriteBehind(batch_size=2, max_queue=3, max_attempts=3)
+        for i in range(3):
+            queue.enqueue_exchange(1, f"q{i}", f"a{i}")
+
+        def fail_while_busy(batch):
+            # Two more exchanges arrive while the write is in flight
+            queue.enqueue_exchange(1, "q3", "a3")
+            queue.enqueue_exchange(1, "q4", "a4")
+            raise RuntimeError("database unavailable")
+
+        queue._write = fail_while_busy
+        asyncio.run(queue.flush())
+
+        assert queue.dropped == 2
+        assert [r["messages"][0]["content"] for r in queue.records] == ["q2", "q3", "q4"]
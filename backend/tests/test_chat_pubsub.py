@@ -0,0 +1,148 @@
+"""
+Unit tests for chat WebSocket fan-out
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from app.services.chat_pubsub import ChatConnectionManager, InProcessBroker, create_broker
+
+
+class FakeWebSocket:
+    def __init__(self, delay=0.0):
+        self.sent = []
+        self.closed_with = None
+        self.delay = delay
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        await asyncio.sleep(self.delay)
+        self.sent.append(text)
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+    def frames(self):
+        frames = []
+        for text in self.sent:
+            data = json.loads(text)
+            frames.extend(data["messages"] if data.get("type") == "batch" else [data])
+        return frames
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class TestChatFanOut:
+    """Tests for pub/sub-backed chat connections"""
+
+    def test_session_frames_reach_sockets_on_other_workers(self):
+        """Test two workers sharing a broker both deliver a session frame"""
+        async def scenario():
+            broker = InProcessBroker()
+            worker_a, worker_b = ChatConnectionManager(broker), ChatConnectionManager(broker)
+            ws_a, ws_b, ws_other = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+            await worker_a.connect(ws_a, "s1", user_id=1)
+            await worker_b.connect(ws_b, "s1", user_id=1)
+            await worker_b.connect(ws_other, "s2", user_id=2)
+
+            await worker_a.send_to_session("s1", json.dumps({"type": "message", "content": "hi"}))
+            await settle()
+            return ws_a, ws_b, ws_other
+
+        ws_a, ws_b, ws_other = asyncio.run(scenario())
+
+        assert ws_a.frames() == [{"type": "message", "content": "hi"}]
+        assert ws_b.frames() == [{"type": "message", "content": "hi"}]
+        assert ws_other.sent == []
+
+    def test_user_may_hold_many_sockets(self):
+        """Test a user frame reaches every socket the user has open"""
+        async def scenario():
+            manager = ChatConnectionManager(InProcessBroker())
+            sockets = [FakeWebSocket() for _ in range(3)]
+            for i, ws in enumerate(sockets):
+                await manager.connect(ws, f"s{i}", user_id=7)
+            await manager.send_to_user(7, json.dumps({"type": "notice"}))
+            await settle()
+            return sockets, manager.stats()
+
+        sockets, stats = asyncio.run(scenario())
+
+        assert all(ws.frames() == [{"type": "notice"}] for ws in sockets)
+        assert stats["connections"] == 3
+
+    def test_queued_frames_are_batched(self):
+        """Test frames queued while a send is in progress go out as one batch"""
+        async def scenario():
+            manager = ChatConnectionManager(InProcessBroker())
+            ws = FakeWebSocket(delay=0.01)
+            connection = await manager.connect(ws, "s1", user_id=1)
+            for i in range(5):
+                await manager.send_to_session("s1", json.dumps({"n": i}))
+            await asyncio.sleep(0.05)
+            return ws, connection
+
+        ws, connection = asyncio.run(scenario())
+
+        assert [f["n"] for f in ws.frames()] == [0, 1, 2, 3, 4]
+        assert connection.batches_sent < 5
+
+    def test_slow_consumer_is_disconnected(self):
+        """Test a socket whose queue overflows is closed and unsubscribed"""
+        async def scenario():
+            broker = InProcessBroker()
+            manager = ChatConnectionManager(broker)
+            ws = FakeWebSocket(delay=1.0)
+            connection = await manager.connect(ws, "s1", user_id=1)
+            for i in range(300):
+                await manager.send_to_session("s1", json.dumps({"n": i}))
+            await settle()
+            return ws, connection, manager, broker
+
+        ws, connection, manager, broker = asyncio.run(scenario())
+
+        assert connection.closed
+        assert ws.closed_with == 1013
+        assert manager.channels == {}
+        assert broker.handlers == {}
+
+    def test_unreachable_redis_falls_back_to_in_process(self):
+        """Test a configured Redis that does not answer is replaced by the in-process broker"""
+        async def scenario():
+            broker = await create_broker("redis://127.0.0.1:9", timeout=1.0)
+            manager = ChatConnectionManager(broker)
+            ws = FakeWebSocket()
+            await manager.connect(ws, "s1", user_id=1)
+            await manager.send_to_session("s1", json.dumps({"type": "message"}))
+            await settle()
+            return broker, ws
+
+        broker, ws = asyncio.run(scenario())
+
+        assert isinstance(broker, InProcessBroker)
+        assert ws.frames() == [{"type": "message"}]
+
+    def test_failed_subscribe_closes_with_1011(self):
+        """Test a socket the broker cannot subscribe is closed and forgotten"""
+        class FailingBroker(InProcessBroker):
+            async def subscribe(self, channel, handler):
+                raise ConnectionError("broker down")
+
+        async def scenario():
+            manager = ChatConnectionManager(FailingBroker())
+            ws = FakeWebSocket()
+            with pytest.raises(ConnectionError):
+                await manager.connect(ws, "s1", user_id=1)
+            return ws, manager
+
+        ws, manager = asyncio.run(scenario())
+
+        assert ws.closed_with == 1011
+        assert manager.channels == {}
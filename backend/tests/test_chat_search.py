@@ -0,0 +1,120 @@
+"""
+Unit tests for chat full-text search
+"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.models import Base, ChatConversation, ChatMessage
+from app.services.chat_search import ChatSearchIndex, fts5_query
+
+
+def make_db(index):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    # Messages written before the index exists are backfilled by ensure()
+    db.add_all([
+        ChatConversation(id=1, user_id=1, session_id="pour"),
+        ChatConversation(id=2, user_id=1, session_id="budget"),
+        ChatConversation(id=3, user_id=2, session_id="other-user"),
+    ])
+    db.add(ChatMessage(conversation_id=1, role="user", content="The concrete pour is delayed by rain",
+                       timestamp=datetime(2026, 1, 1)))
+    db.commit()
+    index.ensure(engine)
+    # ...and later inserts are indexed by the triggers
+    start = datetime(2026, 1, 2)
+    db.add_all([
+        ChatMessage(conversation_id=1, role="assistant", content="Reschedule the concrete pour after the rain",
+                    timestamp=start),
+        ChatMessage(conversation_id=2, role="user", content="Concrete costs are over budget",
+                    timestamp=start + timedelta(minutes=1)),
+        ChatMessage(conversation_id=3, role="user", content="concrete pour at the other site",
+                    timestamp=start + timedelta(minutes=2)),
+    ])
+    db.commit()
+    return db
+
+
+class TestChatSearchIndex:
+    """Tests for ranked, grouped full-text search"""
+
+    def test_results_are_grouped_ranked_and_scoped(self):
+        """Test matches group by conversation, best first, for one user only"""
+        index = ChatSearchIndex()
+        db = make_db(index)
+
+        results = index.search(db, user_id=1, query="concrete pour")
+
+        assert results["total_found"] == 1
+        [hit] = results["conversations"]
+        assert hit["session_id"] == "pour"
+        assert hit["message_count"] == 2
+        assert "<mark>concrete</mark>" in hit["snippet"].lower()
+        assert isinstance(hit["matched_at"], datetime)
+
+        broad = index.search(db, user_id=1, query="concrete")
+        assert broad["total_found"] == 2
+        assert {c["session_id"] for c in broad["conversations"]} == {"pour", "budget"}
+
+    def test_prefix_and_stemming(self):
+        """Test partial words and word forms match"""
+        index = ChatSearchIndex()
+        db = make_db(index)
+
+        assert index.search(db, 1, "budg")["total_found"] == 1
+        assert index.search(db, 1, "delays")["total_found"] == 1
+
+    def test_pagination_keeps_total(self):
+        """Test limit/offset page over conversations without changing the total"""
+        index = ChatSearchIndex()
+        db = make_db(index)
+
+        page = index.search(db, 1, "concrete", limit=1, offset=1)
+
+        assert len(page["conversations"]) == 1
+        assert page["total_found"] == 2
+
+    def test_query_syntax_is_escaped(self):
+        """Test FTS operators and punctuation in user input are treated as text"""
+        assert fts5_query('pour" OR (budget') == '"pour"* "OR"* "budget"*'
+        index = ChatSearchIndex()
+        db = make_db(index)
+
+        assert index.search(db, 1, '"concrete" (')["total_found"] == 2
+        assert index.search(db, 1, "?!")["total_found"] == 0
+
+    def test_like_fallback_has_same_shape(self):
+        """Test search still works when no full-text index is available"""
+        index = ChatSearchIndex()
+        db = make_db(index)
+        index._mark(db.get_bind(), False)
+
+        results = index.search(db, 1, "over_budget%")
+        assert results["total_found"] == 0
+
+        results = index.search(db, 1, "Concrete")
+        assert results["total_found"] == 2
+        assert results["conversations"][0]["session_id"] == "budget"
+        assert results["conversations"][0]["snippet"] == "<mark>Concrete</mark> costs are over budget"
+
+    def test_snippets_are_escaped(self):
+        """Test message content is HTML-escaped and only the highlights are markup"""
+        index = ChatSearchIndex()
+        db = make_db(index)
+        db.add(ChatMessage(conversation_id=2, role="assistant", timestamp=datetime(2026, 2, 1),
+                           content='Use <img src=x onerror="alert(1)"> for the rebar schedule'))
+        db.commit()
+
+        [hit] = index.search(db, 1, "rebar")["conversations"]
+        assert "<img" not in hit["snippet"]
+        assert "&lt;img src=x onerror=&quot;alert(1)&quot;&gt;" in hit["snippet"]
+        assert "<mark>rebar</mark>" in hit["snippet"]
+
+        index._mark(db.get_bind(), False)
+        [hit] = index.search(db, 1, "rebar")["conversations"]
+        assert "<img" not in hit["snippet"] and "<mark>rebar</mark>" in hit["snippet"]
@@ -0,0 +1,129 @@
+"""
+Unit tests for denormalized chat conversation summaries
+"""
+
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.dialects.postgresql import asyncpg
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.api.chat import router as chat_router
+from app.auth import get_current_active_user
+from app.database import get_async_db
+from app.models import Base, ChatConversation, ChatMessage, User
+from app.services.chat_summary import PREVIEW_LENGTH, is_unread, summary_params, summary_updates
+
+
+def message(conversation_id, content, minute):
+    return {"conversation_id": conversation_id, "content": content,
+            "timestamp": datetime(2026, 1, 1, 12, minute)}
+
+
+class TestChatSummary:
+    """Tests for the chat sidebar summary"""
+
+    def setup_method(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=engine)
+        self.db = sessionmaker(bind=engine)()
+        self.db.add_all([ChatConversation(id=1, session_id="a"), ChatConversation(id=2, session_id="b")])
+        self.db.commit()
+
+    def teardown_method(self):
+        self.db.close()
+
+    def test_params_group_by_conversation(self):
+        """Test each conversation gets its count and newest message"""
+        params = summary_params([
+            message(1, "q1", 0), message(2, "other", 1), message(1, "a1", 2), message(1, "x" * 500, 1),
+        ])
+
+        by_id = {p["b_id"]: p for p in params}
+        assert by_id[1]["b_added"] == 3
+        assert by_id[1]["b_preview"] == "a1"
+        assert by_id[2]["b_added"] == 1
+        assert len(summary_params([message(1, "x" * 500, 0)])[0]["b_preview"]) == PREVIEW_LENGTH
+
+    def test_updates_accumulate_and_keep_newest_preview(self):
+        """Test counts add up and an older late write does not replace the preview"""
+        self.db.execute(summary_updates(), summary_params([message(1, "q2", 10), message(1, "a2", 11)]))
+        self.db.execute(summary_updates(), summary_params([message(1, "q1", 5), message(1, "a1", 6)]))
+        self.db.commit()
+
+        conversation = self.db.get(ChatConversation, 1)
+        assert conversation.message_count == 4
+        assert conversation.last_message_preview == "a2"
+        assert conversation.last_message_at == datetime(2026, 1, 1, 12, 11)
+        assert self.db.get(ChatConversation, 2).message_count == 0
+
+    def test_aware_timestamps_are_stored_as_naive_utc(self):
+        """Test aware datetimes are bound as naive UTC, as asyncpg requires for these columns"""
+        sent = datetime(2026, 1, 1, 14, 30, tzinfo=timezone(timedelta(hours=2)))
+        self.db.add(ChatMessage(conversation_id=1, content="q", role="user", timestamp=sent))
+        self.db.execute(summary_updates(), summary_params([
+            {"conversation_id": 1, "content": "q", "timestamp": sent},
+        ]))
+        self.db.commit()
+
+        conversation = self.db.get(ChatConversation, 1)
+        assert conversation.last_message_at == datetime(2026, 1, 1, 12, 30)
+        assert self.db.query(ChatMessage).one().timestamp == datetime(2026, 1, 1, 12, 30)
+        bound = ChatConversation.__table__.c.last_read_at.type.process_bind_param(sent, asyncpg.dialect())
+        assert bound == datetime(2026, 1, 1, 12, 30) and bound.tzinfo is None
+
+    def test_unread(self):
+        """Test a conversation is unread until its last message has been seen"""
+        sent = datetime(2026, 1, 1, 12, 0)
+
+        assert not is_unread(SimpleNamespace(last_message_at=None, last_read_at=None))
+        assert is_unread(SimpleNamespace(last_message_at=sent, last_read_at=None))
+        assert is_unread(SimpleNamespace(last_message_at=sent, last_read_at=sent - timedelta(seconds=1)))
+        assert not is_unread(SimpleNamespace(last_message_at=sent, last_read_at=sent))
+
+
+class TestMarkRead:
+    """Tests for marking a conversation read when it is opened"""
+
+    def test_reading_does_not_reorder_conversations(self, tmp_path):
+        """Test opening an unread conversation keeps its place in the sidebar"""
+        url = f"sqlite:///{tmp_path / 'chat.db'}"
+        engine = create_engine(url)
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        db.add(User(id=1, email="pm@example.com", hashed_password="x", full_name="PM", company="Acme"))
+        for i, session_id in enumerate(["older", "newer"]):
+            sent = datetime(2026, 1, 1, 12, i)
+            db.add(ChatConversation(id=i + 1, session_id=session_id, user_id=1, created_at=sent, updated_at=sent,
+                                    message_count=1, last_message_at=sent, last_message_preview="hi"))
+            db.add(ChatMessage(conversation_id=i + 1, content="hi", role="bot", timestamp=sent))
+        db.commit()
+        user = db.get(User, 1)
+        db.expunge(user)
+        db.close()
+
+        async_engine = create_async_engine(url.replace("sqlite://", "sqlite+aiosqlite://"), poolclass=NullPool)
+        AsyncSession = async_sessionmaker(async_engine, expire_on_commit=False)
+
+        async def override_get_async_db():
+            async with AsyncSession() as session:
+                yield session
+
+        app = FastAPI()
+        app.include_router(chat_router, prefix="/api/v1")
+        app.dependency_overrides[get_async_db] = override_get_async_db
+        app.dependency_overrides[get_current_active_user] = lambda: user
+        client = TestClient(app)
+
+        assert client.get("/api/v1/chat/conversations/older/messages").status_code == 200
+        conversations = client.get("/api/v1/chat/conversations").json()
+
+        assert [c["session_id"] for c in conversations] == ["newer", "older"]
+        older = conversations[1]
+        assert older["unread"] is False
+        assert older["updated_at"].startswith("2026-01-01T12:00")
@@ -0,0 +1,208 @@
+"""
+Unit tests for ordered chat turn processing
+"""
+
+import json
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.ai_service import AIService
+from app.services.chat_persistence import ChatWriteBehind
+from app.services.chat_turns import TRUNCATED_NOTICE, ChatTurnQueue
+from app.services.conversation_memory import ConversationMemory, ConversationMemoryManager
+
+
+def make_queue(stream, frames, persistence=None, memory_manager=None, session_id="session-1", **kwargs):
+    async def publish(session_id, frame):
+        frames.append(json.loads(frame))
+
+    persistence = persistence or ChatWriteBehind()
+    persistence._write = lambda batch: None
+    return ChatTurnQueue(
+        session_id, 7, 42, ConversationMemory(), publish, stream=stream,
+        memory_manager=memory_manager or ConversationMemoryManager(), persistence=persistence, **kwargs
+    )
+
+
+class TestChatTurnQueue:
+    """Tests for the per-connection turn queue"""
+
+    def test_replies_stream_in_arrival_order(self):
+        """Test turns submitted together are answered one after another"""
+        frames = []
+        seen_history = []
+
+        async def stream(message, history, tenant=None):
+            seen_history.append(len(history))
+            for word in f"re: {message}".split():
+                await asyncio.sleep(0)
+                yield word + " "
+
+        async def run():
+            queue = make_queue(stream, frames)
+            first = queue.submit("first", "a")
+            second = queue.submit("second", "b")
+            await queue.wait_idle()
+            return queue, first, second
+
+        queue, first, second = asyncio.run(run())
+
+        assert (first.seq, second.seq) == (1, 2)
+        seqs = [f["seq"] for f in frames if f["type"] in ("message", "token")]
+        assert seqs == sorted(seqs)
+        replies = [f["content"] for f in frames if f["type"] == "message" and f["role"] == "assistant"]
+        assert replies == ["re: first", "re: second"]
+        # The second reply saw the first exchange in its context
+        assert seen_history == [0, 2]
+        assert queue.completed == 2
+
+    def test_exchange_is_persisted_with_memory(self):
+        """Test each answered turn is queued for write-behind with the memory columns"""
+        frames = []
+        persistence = ChatWriteBehind()
+
+        async def stream(message, history, tenant=None):
+            yield "Use pull planning."
+
+        async def run():
+            queue = make_queue(stream, frames, persistence=persistence)
+            queue.submit("How do I reduce waiting?")
+            await queue.wait_idle()
+            await persistence.stop()
+
+        asyncio.run(run())
+
+        assert persistence.written == 1
+        assert persistence.stats()["queued"] == 0
+
+    def test_empty_stream_uses_fallback(self):
+        """Test a reply is still sent when the model returns nothing"""
+        frames = []
+
+        async def stream(message, history, tenant=None):
+            raise RuntimeError("model unavailable")
+            yield  # pragma: no cover
+
+        async def run():
+            queue = make_queue(stream, frames, fallback=lambda message: "fallback answer")
+            queue.submit("hello")
+            await queue.wait_idle()
+
+        asyncio.run(run())
+
+        final = [f for f in frames if f["type"] == "message" and f["role"] == "assistant"]
+        assert final[0]["content"] == "fallback answer"
+
+    def test_interrupted_stream_is_marked_truncated(self):
+        """Test a reply cut off mid-stream is kept but not stored as complete"""
+        frames = []
+        written = []
+        persistence = ChatWriteBehind()
+
+        async def stream(message, history, tenant=None):
+            yield "Start with"
+            raise RuntimeError("connection reset")
+
+        async def run():
+            queue = make_queue(stream, frames, persistence=persistence, fallback=lambda message: "fallback answer")
+            persistence._write = written.extend
+            queue.submit("hello")
+            await queue.wait_idle()
+            await persistence.stop()
+
+        asyncio.run(run())
+
+        final = [f for f in frames if f["type"] == "message" and f["role"] == "assistant"][0]
+        assert final["truncated"] is True
+        assert final["content"] == "Start with" + TRUNCATED_NOTICE
+        assert written[0]["messages"][1]["content"] == final["content"]
+
+    def test_gemini_failure_mid_stream_is_truncated_and_not_cached(self):
+        """Test a Gemini stream dropped after one chunk surfaces as truncated and skips the answer cache"""
+        async def body():
+            chunk = {"candidates": [{"content": {"parts": [{"text": "Pull planning starts"}]}}]}
+            yield f"data: {json.dumps(chunk)}\n\n".encode()
+            raise httpx.ReadError("connection reset")
+
+        service = AIService()
+        service.api_key = "test-key"
+        service._http_client = httpx.AsyncClient(
+            transport=httpx.MockTransport(lambda request: httpx.Response(200, content=body()))
+        )
+        frames = []
+
+        async def consume():
+            pieces = []
+            with pytest.raises(httpx.ReadError):
+                async for piece in service.stream_response("What is pull planning?", tenant="user:1"):
+                    pieces.append(piece)
+            return pieces
+
+        async def run():
+            queue = make_queue(service.stream_response, frames, fallback=lambda message: "fallback answer")
+            queue.submit("What is pull planning?")
+            await queue.wait_idle()
+
+        assert asyncio.run(consume()) == ["Pull planning starts"]
+        asyncio.run(run())
+
+        assert service.answer_cache.lookup("user:1", "What is pull planning?") is None
+        final = [f for f in frames if f["type"] == "message" and f["role"] == "assistant"][0]
+        assert final["truncated"] is True
+        assert final["content"] == "Pull planning starts" + TRUNCATED_NOTICE
+
+    def test_sockets_on_one_conversation_share_memory(self):
+        """Test two sockets on a conversation add to one memory and both exchanges are stored"""
+        frames = []
+        written = []
+        manager = ConversationMemoryManager()
+        persistence = ChatWriteBehind()
+
+        async def stream(message, history, tenant=None):
+            yield f"re: {message}"
+
+        async def run():
+            first = make_queue(stream, frames, persistence=persistence, memory_manager=manager)
+            second = make_queue(stream, frames, persistence=persistence, memory_manager=manager, session_id="session-2")
+            persistence._write = written.extend
+            first.submit("from tab one")
+            await first.wait_idle()
+            second.submit("from tab two")
+            await second.wait_idle()
+            first.close()
+            second.close()
+            await persistence.stop()
+            return first, second
+
+        first, second = asyncio.run(run())
+
+        assert first.memory is second.memory
+        assert [turn["content"] for turn in first.memory.recent] == [
+            "from tab one", "re: from tab one", "from tab two", "re: from tab two"]
+        # Whichever exchange is written last carries the whole memory
+        stored = json.loads(written[-1]["conversation"]["memory_turns"])
+        assert len(stored) == 4
+        assert manager._shared == {}
+
+    def test_pending_turns_are_bounded(self):
+        """Test submit refuses messages beyond max_pending and after close"""
+        frames = []
+
+        async def stream(message, history, tenant=None):
+            yield "ok"
+
+        async def run():
+            queue = make_queue(stream, frames, max_pending=2)
+            accepted = [queue.submit(str(i)) for i in range(3)]
+            queue.close()
+            after_close = queue.submit("late")
+            await queue.wait_idle()
+            return queue, accepted, after_close
+
+        queue, accepted, after_close = asyncio.run(run())
+
+        assert accepted[2] is None and after_close is None
+        # Turns accepted before close are still answered
+        assert queue.completed == 2
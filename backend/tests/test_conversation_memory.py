@@ -0,0 +1,184 @@
+"""
+Unit tests for token-budgeted conversation memory
+"""
+
+import asyncio
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.api import chat
+from app.auth import get_current_active_user
+from app.database import get_async_db
+from app.models import Base, ChatConversation, User
+from app.services.ai_service import ai_service
+from app.services.conversation_memory import ConversationMemory, ConversationMemoryManager, conversation_memory
+
+
+def run_turns(manager, memory, count, size=200):
+    for i in range(count):
+        asyncio.run(manager.add_turn(memory, f"question {i} " + "q" * size, f"answer {i} " + "a" * size))
+    return memory
+
+
+class TestConversationMemory:
+    """Tests for rolling summary and recent-turn window"""
+
+    def test_recent_window_stays_within_budget(self):
+        """Test memory size stays bounded however many turns are added"""
+        manager = ConversationMemoryManager(token_budget=400, summary_share=0.25)
+        memory = run_turns(manager, ConversationMemory(), 50)
+
+        assert memory.recent_tokens <= manager.recent_budget
+        assert memory.tokens <= 400
+        assert memory.recent[-1]["content"].startswith("answer 49")
+
+    def test_evicted_turns_are_summarized(self):
+        """Test evicted turns go to the summariser with the previous summary"""
+        calls = []
+
+        async def summarizer(summary, turns, max_tokens):
+            calls.append((summary, [t["content"][:10] for t in turns]))
+            return f"summary after {len(calls)} updates"
+
+        manager = ConversationMemoryManager(token_budget=400, summary_share=0.25, summarizer=summarizer)
+        memory = run_turns(manager, ConversationMemory(), 10)
+
+        assert calls
+        assert calls[0][0] == ""
+        assert calls[0][1][0].startswith("question 0")
+        assert memory.summary == f"summary after {len(calls)} updates"
+        assert memory.history()[0] == {"role": "summary", "content": memory.summary}
+
+    def test_summarizer_failure_falls_back_to_extract(self):
+        """Test a failing summariser keeps a trimmed extract instead"""
+        async def summarizer(summary, turns, max_tokens):
+            raise RuntimeError("upstream down")
+
+        manager = ConversationMemoryManager(token_budget=400, summary_share=0.25, summarizer=summarizer)
+        memory = run_turns(manager, ConversationMemory(), 10)
+
+        assert memory.summary
+        assert len(memory.summary) <= manager.summary_budget * 4
+
+    def test_compaction_can_be_deferred(self):
+        """Test add_turn(compact=False) only appends and compact() brings the window back in budget"""
+        calls = []
+
+        async def summarizer(summary, turns, max_tokens):
+            calls.append(len(turns))
+            return "summary"
+
+        manager = ConversationMemoryManager(token_budget=400, summary_share=0.25, summarizer=summarizer)
+        memory = ConversationMemory()
+        for i in range(6):
+            asyncio.run(manager.add_turn(memory, "q" * 200, "a" * 200, compact=False))
+
+        assert calls == [] and manager.needs_compaction(memory)
+        assert asyncio.run(manager.compact(memory)) is True
+        assert memory.recent_tokens <= manager.recent_budget // 2
+        assert asyncio.run(manager.compact(memory)) is False
+
+    def test_turns_added_while_summarizing_are_kept(self):
+        """Test a turn appended during a slow summary survives the eviction"""
+        manager = ConversationMemoryManager(token_budget=400, summary_share=0.25)
+        memory = run_turns(manager, ConversationMemory(), 3)
+
+        async def scenario():
+            release = asyncio.Event()
+
+            async def summarizer(summary, turns, max_tokens):
+                await release.wait()
+                return "summary"
+
+            manager.summarizer = summarizer
+            await manager.add_turn(memory, "q" * 400, "a" * 400, compact=False)
+            compaction = asyncio.create_task(manager.compact(memory))
+            await asyncio.sleep(0)
+            await manager.add_turn(memory, "late question", "late answer", compact=False)
+            release.set()
+            await compaction
+
+        asyncio.run(scenario())
+
+        assert memory.summary == "summary"
+        assert memory.recent[-2:] == [{"role": "user", "content": "late question"},
+                                      {"role": "assistant", "content": "late answer"}]
+
+    def test_round_trip_through_conversation(self):
+        """Test memory persists on and reloads from a conversation row"""
+        manager = ConversationMemoryManager()
+        conversation = SimpleNamespace(id=1, memory_summary=None, memory_turns=None)
+
+        assert manager.load(conversation) is None
+
+        memory = ConversationMemory(summary="Pour scheduled Friday", recent=[{"role": "user", "content": "hi"}])
+        manager.save(conversation, memory)
+        loaded = manager.load(conversation)
+
+        assert loaded.summary == "Pour scheduled Friday"
+        assert loaded.recent == [{"role": "user", "content": "hi"}]
+
+
+class TestSendMessageMemory:
+    """Tests for conversation memory on the REST send-message path"""
+
+    def test_summary_runs_after_the_reply_is_stored(self, tmp_path, monkeypatch):
+        """Test send_message stores the new turn, then compacts and stores the memory in the background"""
+        url = f"sqlite:///{tmp_path / 'chat.db'}"
+        engine = create_engine(url)
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        db.add(User(id=1, email="pm@example.com", hashed_password="x", full_name="PM", company="Acme"))
+        sent = datetime(2026, 1, 1, 12, 0)
+        db.add(ChatConversation(id=1, session_id="s1", user_id=1, created_at=sent, updated_at=sent,
+                                memory_turns=json.dumps([{"role": "user", "content": "q" * 400}] * 4)))
+        db.commit()
+        user = db.get(User, 1)
+        db.expunge(user)
+        db.close()
+
+        async_engine = create_async_engine(url.replace("sqlite://", "sqlite+aiosqlite://"), poolclass=NullPool)
+        AsyncSession = async_sessionmaker(async_engine, expire_on_commit=False)
+
+        async def override_get_async_db():
+            async with AsyncSession() as session:
+                yield session
+
+        summarized = []
+
+        async def summarizer(summary, turns, max_tokens):
+            summarized.append(len(turns))
+            return "Earlier: pour planning"
+
+        async def generate_response(message, history, tenant=None):
+            return "Pour on Friday."
+
+        monkeypatch.setattr(chat, "AsyncSessionLocal", AsyncSession)
+        monkeypatch.setattr(ai_service, "generate_response", generate_response)
+        monkeypatch.setattr(conversation_memory, "summarizer", summarizer)
+        monkeypatch.setattr(conversation_memory, "recent_budget", 400)
+
+        app = FastAPI()
+        app.include_router(chat.router, prefix="/api/v1")
+        app.dependency_overrides[get_async_db] = override_get_async_db
+        app.dependency_overrides[get_current_active_user] = lambda: user
+
+        response = TestClient(app).post("/api/v1/chat/messages", json={"content": "When do we pour?", "session_id": "s1"})
+
+        assert response.status_code == 200
+        assert response.json()["bot_message"]["content"] == "Pour on Friday."
+        assert summarized
+        db = sessionmaker(bind=engine)()
+        stored = db.get(ChatConversation, 1)
+        assert stored.memory_summary == "Earlier: pour planning"
+        assert json.loads(stored.memory_turns)[-1] == {"role": "assistant", "content": "Pour on Friday."}
+        db.close()
+        assert conversation_memory._shared == {}
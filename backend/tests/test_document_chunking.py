@@ -0,0 +1,145 @@
+"""
+Unit tests for long-document chunking and result merging
+"""
+
+from app.services.document_chunking import (
+    ChunkResultCache,
+    chunk_document,
+    merge_chunk_results,
+    split_sections,
+)
+
+
+def contract(articles=12, body_repeats=30):
+    return "".join(
+        f"ARTICLE {i} OBLIGATIONS\n" + "The contractor shall complete the works on time. " * body_repeats + "\n\n"
+        for i in range(1, articles + 1)
+    )
+
+
+def chunk_result(**overrides):
+    result = {
+        "document_type": "contract",
+        "summary": "Section summary.",
+        "key_entities": [],
+        "risks_and_issues": [],
+        "action_items": [],
+        "sentiment": "neutral",
+        "priority": "low",
+    }
+    result.update(overrides)
+    return result
+
+
+class TestChunking:
+    """Tests for section-boundary chunking"""
+
+    def test_short_document_is_one_chunk(self):
+        """Test documents under the limit are not split"""
+        assert chunk_document("RFI 12: confirm rebar spacing.", max_chars=1000) == ["RFI 12: confirm rebar spacing."]
+
+    def test_chunks_start_at_section_headings(self):
+        """Test chunks respect the size limit and begin at a heading"""
+        text = contract()
+        chunks = chunk_document(text, max_chars=4000)
+
+        assert len(chunks) > 1
+        assert "".join(chunks) == text
+        assert all(len(c) <= 4000 for c in chunks)
+        assert all(c.startswith("ARTICLE") for c in chunks)
+
+    def test_edit_changes_only_one_chunk(self):
+        """Test a small edit inside one section leaves other chunks unchanged"""
+        text = contract()
+        edited = text.replace("ARTICLE 7 OBLIGATIONS\nThe contractor", "ARTICLE 7 OBLIGATIONS\nThe builder")
+
+        before, after = chunk_document(text, 4000), chunk_document(edited, 4000)
+
+        assert len(before) == len(after)
+        assert sum(a != b for a, b in zip(before, after)) == 1
+
+    def test_growing_a_section_keeps_other_chunks(self):
+        """Test an edit that lengthens one section leaves every other chunk unchanged"""
+        text = contract(body_repeats=38)
+        before = chunk_document(text, 4000)
+
+        for article in (1, 7, 12):
+            heading = f"ARTICLE {article} OBLIGATIONS\n"
+            edited = text.replace(heading, heading + "Additional clause text. " * 8)
+            after = chunk_document(edited, 4000)
+
+            assert "".join(after) == edited
+            assert all(len(c) <= 4000 for c in after)
+            # The edited chunk may split in two; nothing else changes
+            assert len(set(before) - set(after)) == 1
+            assert len(set(after) - set(before)) <= 2
+
+    def test_chunk_count_is_capped(self):
+        """Test huge documents get larger chunks instead of more of them"""
+        text = contract(articles=60)
+
+        assert len(chunk_document(text, 4000)) > 10
+        chunks = chunk_document(text, 4000, max_chunks=10)
+        assert len(chunks) <= 10
+        assert "".join(chunks) == text
+
+    def test_oversized_section_is_split(self):
+        """Test a single section longer than the limit is still bounded"""
+        chunks = chunk_document("x" * 10000, max_chars=3000)
+
+        assert [len(c) for c in chunks] == [3000, 3000, 3000, 1000]
+
+    def test_numbered_clauses_are_headings(self):
+        """Test numbered clauses start new sections"""
+        sections = split_sections("Intro text\n1. Scope of works\nDetails\n2. Payment\nMonthly\n")
+
+        assert [s.split("\n")[0] for s in sections] == ["Intro text", "1. Scope of works", "2. Payment"]
+
+
+class TestMerge:
+    """Tests for reducing chunk results"""
+
+    def test_lists_are_merged_without_duplicates(self):
+        """Test entities, risks and actions are de-duplicated in order"""
+        merged = merge_chunk_results(
+            [
+                chunk_result(key_entities=["Acme Ltd", "London"], risks_and_issues=["Late payment"]),
+                chunk_result(key_entities=["acme ltd", "Bristol"], risks_and_issues=["Late payment."]),
+            ],
+            [100, 100],
+        )
+
+        assert merged["key_entities"] == ["Acme Ltd", "London", "Bristol"]
+        assert merged["risks_and_issues"] == ["Late payment"]
+
+    def test_priority_is_highest_and_type_is_weighted(self):
+        """Test priority escalates and document type follows the larger chunks"""
+        merged = merge_chunk_results(
+            [
+                chunk_result(document_type="specification", priority="high"),
+                chunk_result(document_type="contract"),
+                chunk_result(document_type="other"),
+            ],
+            [100, 500, 900],
+        )
+
+        assert merged["priority"] == "high"
+        assert merged["document_type"] == "contract"
+
+
+class TestChunkResultCache:
+    """Tests for the per-chunk result cache"""
+
+    def test_key_depends_on_context(self):
+        """Test the same chunk analyzed on a different route gets its own entry"""
+        assert ChunkResultCache.key("text", "document") != ChunkResultCache.key("text", "contract")
+
+    def test_lru_eviction(self):
+        """Test the least recently used result is evicted"""
+        cache = ChunkResultCache(max_entries=1)
+        cache.put("a", {"n": 1})
+        cache.put("b", {"n": 2})
+
+        assert cache.get("a") is None
+        assert cache.get("b") == {"n": 2}
+        assert cache.stats()["hit_rate"] == 0.5
@@ -0,0 +1,187 @@
+"""
+Unit tests for the local NLP fast path
+"""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.ml_routes import router as ml_router
+from app.ml.gemini_wrapper import (
+    NLP_KEYWORDS, IndustryCustomizationSystem, IndustrySector, NLPKeywordScanners,
+    industry_customization_system, nlp_keyword_scanners,
+)
+from app.ml.local_nlp import KeywordScanner, LinearTextClassifier, LocalNLP, PatternMatcher
+
+
+class TestLocalClassifier:
+    """Tests for local document classification"""
+
+    def test_obvious_documents_are_confident(self):
+        """Test routine documents are classified locally above the threshold"""
+        nlp = LocalNLP()
+        cases = {
+            "RFI 221: please clarify the beam depth on drawing S-300.": "rfi",
+            "Daily log: weather rain, crew on site 10, poured footings.": "daily_log",
+            "Change order 12 adds $40,000 and a 5 day time extension.": "change_order",
+        }
+
+        for text, expected in cases.items():
+            result = nlp.classify(text)
+            assert result["document_type"] == expected
+            assert nlp.is_confident("classify", result["confidence"])
+
+    def test_ambiguous_text_escalates(self):
+        """Test text without document signals falls below the threshold"""
+        nlp = LocalNLP()
+
+        result, escalate = nlp.timed("classify", nlp.classify, "Hey, lunch is at noon today")
+
+        assert escalate
+        assert nlp.get_stats()["tasks"]["classify"]["escalation_rate"] == 1.0
+
+    def test_threshold_is_configurable(self):
+        """Test a zero threshold keeps everything local"""
+        nlp = LocalNLP(classify_threshold=0.0)
+
+        _, escalate = nlp.timed("classify", nlp.classify, "Hey, lunch is at noon today")
+
+        assert not escalate
+
+    def test_linear_model_trains(self):
+        """Test the linear model separates a toy corpus"""
+        model = LinearTextClassifier.train([
+            ("pour concrete slab", "daily_log"),
+            ("concrete pour today", "daily_log"),
+            ("request for information beam", "rfi"),
+            ("rfi beam clarification", "rfi"),
+        ], epochs=30)
+
+        logits = model.logits(["beam", "rfi"])
+        assert logits["rfi"] > logits["daily_log"]
+
+
+class TestPatternMatcher:
+    """Tests for the compiled multi-pattern matcher"""
+
+    def test_single_pass_labels(self):
+        """Test matches are grouped by label without duplicates"""
+        matcher = PatternMatcher({"a": [r"\bfoo\b"], "b": [r"\bbar\b", r"\bbaz\b"]})
+
+        hits = matcher.scan("foo bar FOO baz")
+
+        assert hits == {"a": ["foo"], "b": ["bar", "baz"]}
+
+
+class TestKeywordScanner:
+    """Tests for the compiled category keyword scanner"""
+
+    def test_hits_have_positions(self):
+        """Test every hit reports its category, keyword and span"""
+        scanner = KeywordScanner({"negative": ["delay"], "urgent": ["urgent"]})
+        text = "URGENT: pour delayed"
+
+        hits = scanner.scan(text)
+
+        assert [(h.category, h.keyword) for h in hits] == [("urgent", "urgent"), ("negative", "delay")]
+        assert text[hits[1].start:hits[1].end] == "delay"
+
+    def test_overlapping_keywords_all_hit(self):
+        """Test prefix keywords and shared keywords are reported for one span"""
+        scanner = KeywordScanner({
+            "positive": ["completed", "on track"],
+            "action": ["complete"],
+            "risk": ["issue"],
+            "negative": ["issue"],
+        })
+
+        found = scanner.categorize("Level 3 completed and on  track; one issue remains")
+
+        assert found == {
+            "positive": ["completed", "on track"],
+            "action": ["complete"],
+            "risk": ["issue"],
+            "negative": ["issue"],
+        }
+
+    def test_keywords_match_at_word_start(self):
+        """Test keywords do not match inside other words"""
+        scanner = KeywordScanner({"positive": ["safe"]})
+
+        assert scanner.categorize("unsafe scaffold")["positive"] == []
+        assert scanner.categorize("Safety is good, area is safe")["positive"] == ["safe"]
+
+    def test_extend_adds_categories(self):
+        """Test extending returns a new scanner and leaves the original alone"""
+        base = KeywordScanner({"risk": ["hazard"]})
+        sector = base.extend({"risk": ["arc flash"], "urgent": ["outage"]})
+
+        assert sector.categorize("Arc flash hazard during outage") == {
+            "risk": ["arc flash", "hazard"],
+            "urgent": ["outage"],
+        }
+        assert base.categorize("arc flash") == {"risk": []}
+
+    def test_blank_keywords_are_ignored(self):
+        """Test a blank keyword does not compile to a pattern matching everywhere"""
+        scanner = KeywordScanner({"risk": ["hazard", "", "   "]})
+
+        assert scanner.keywords == {"risk": ["hazard"]}
+        assert scanner.scan("nothing to see here") == []
+
+
+class TestSectorKeywords:
+    """Tests for per-sector keyword registration"""
+
+    def test_invalid_keywords_are_rejected(self):
+        """Test unknown categories and blank keywords raise instead of being registered"""
+        scanners = NLPKeywordScanners(NLP_KEYWORDS)
+
+        with pytest.raises(ValueError, match="Unknown keyword categories"):
+            scanners.register("energy", {"rsik": ["outage"]})
+        with pytest.raises(ValueError, match="blank"):
+            scanners.register("energy", {"risk": ["outage", " "]})
+        assert scanners.get("energy") is scanners.base
+
+    def test_sector_keywords_are_registered_once(self):
+        """Test creating more customization systems does not grow the sector lexicon"""
+        before = industry_customization_system.get_keywords(IndustrySector.ENERGY)["risk"]
+        IndustryCustomizationSystem()
+        IndustryCustomizationSystem()
+
+        assert industry_customization_system.get_keywords(IndustrySector.ENERGY)["risk"] == before
+        assert nlp_keyword_scanners._sector_keywords["energy"]["risk"].count("arc flash") == 1
+
+    def test_route_rejects_invalid_keywords(self):
+        """Test the keywords endpoint answers 400 for invalid input"""
+        app = FastAPI()
+        app.include_router(ml_router, prefix="/api/v1")
+        client = TestClient(app)
+
+        assert client.post("/api/v1/ml/industry/keywords/energy", json={"risk": [""]}).status_code == 400
+        assert client.post("/api/v1/ml/industry/keywords/energy", json={"bogus": ["x"]}).status_code == 400
+
+
+class TestLocalEntities:
+    """Tests for local entity extraction"""
+
+    def test_typed_entities(self):
+        """Test costs, dates, organizations and equipment are typed"""
+        result = LocalNLP().extract_entities(
+            "Acme Construction Ltd confirmed the £25,000 payment on 12 March 2026; the tower crane arrives in 2 weeks."
+        )
+        found = {(e["text"], e["type"]) for e in result["entities"]}
+
+        assert ("Acme Construction Ltd", "organization") in found
+        assert ("£25,000", "cost") in found
+        assert ("12 March 2026", "date") in found
+        assert ("tower crane", "equipment") in found
+        assert ("2 weeks", "schedule") in found
+
+    def test_unexplained_names_lower_confidence(self):
+        """Test unknown proper nouns reduce coverage so the text escalates"""
+        nlp = LocalNLP()
+
+        result = nlp.extract_entities("The inspection was done by Bob from Skyline and Harbour Partners.")
+
+        assert not nlp.is_confident("extract_entities", result["confidence"])
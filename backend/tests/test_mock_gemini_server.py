@@ -0,0 +1,61 @@
+"""
+Unit tests for the offline mock Gemini server
+"""
+
+import json
+import random
+
+from app.services.ai_schemas import ForecastResult, WasteDetectionResult, gemini_response_schema
+from mock_gemini_server import MockConfig, _usage, build_reply, sample_latency_ms
+
+
+class TestMockReplies:
+    """Tests for mock response generation"""
+
+    def test_structured_reply_matches_schema(self):
+        """Test schema-shaped replies validate against the response models"""
+        rng = random.Random(7)
+        for model in (ForecastResult, WasteDetectionResult):
+            payload = {"generationConfig": {"responseSchema": gemini_response_schema(model)}}
+
+            reply = build_reply(payload, MockConfig(), rng)
+
+            model.model_validate(json.loads(reply))
+
+    def test_canned_reply_by_keyword(self):
+        """Test text prompts get the canned reply for a matching keyword"""
+        config = MockConfig()
+        config.canned = {"last planner": "Last Planner is a pull-based planning system."}
+        payload = {"contents": [{"role": "user", "parts": [{"text": "What is the Last Planner System?"}]}]}
+
+        assert build_reply(payload, config) == "Last Planner is a pull-based planning system."
+
+    def test_images_are_counted_in_either_key_style(self):
+        """Test inlineData (as AIService sends it) and inline_data parts both count as images"""
+        text_only = {"contents": [{"parts": [{"text": "x" * 40}]}]}
+
+        for key in ("inlineData", "inline_data"):
+            payload = {"contents": [{"parts": [{"text": "x" * 40}, {key: {"mimeType": "image/png", "data": ""}}]}]}
+            assert _usage(payload, "ok")["promptTokenCount"] == _usage(text_only, "ok")["promptTokenCount"] + 258
+
+
+class TestMockLatency:
+    """Tests for latency sampling"""
+
+    def test_fixed_latency(self):
+        """Test the fixed distribution always returns the median"""
+        config = MockConfig()
+        config.update({"latency_dist": "fixed", "latency_ms": 250})
+
+        assert sample_latency_ms(config) == 250
+
+    def test_lognormal_latency_is_positive(self):
+        """Test lognormal samples are positive and centred near the median"""
+        config = MockConfig()
+        config.update({"latency_dist": "lognormal", "latency_ms": 500, "latency_spread": 0.5})
+        rng = random.Random(1)
+
+        samples = sorted(sample_latency_ms(config, rng) for _ in range(2000))
+
+        assert samples[0] > 0
+        assert 400 < samples[len(samples) // 2] < 600
@@ -0,0 +1,74 @@
+"""
+Unit tests for the latency-budget model router
+"""
+
+from app.services.model_router import ModelRouter, parse_usage
+
+TIERS = {"fast": "flash", "pro": "pro"}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_router(clock):
+    return ModelRouter(tiers=dict(TIERS), policy={"chat": "fast", "document": "pro"},
+                       error_rate_threshold=0.5, min_samples=5, probe_interval_seconds=30, clock=clock)
+
+
+class TestModelRouter:
+    """Tests for model tier selection"""
+
+    def test_policy_tier(self):
+        """Test routes use their configured tier while it is healthy"""
+        router = make_router(FakeClock())
+
+        assert router.select("chat") == "flash"
+        assert router.select("document") == "pro"
+        assert router.select("unknown-route") == "pro"
+
+    def test_error_rate_downgrades(self):
+        """Test a failing pro model sends calls to the fast tier"""
+        router = make_router(FakeClock())
+        for error in (True, True, True, False, False):
+            router.record("document", "pro", 1000, error=error)
+
+        assert router.select("document") == "flash"
+
+    def test_latency_budget_downgrades(self):
+        """Test a request whose budget the pro model's p95 exceeds goes to the fast tier"""
+        router = make_router(FakeClock())
+        for _ in range(5):
+            router.record("document", "pro", 8000)
+
+        assert router.select("document", latency_budget_ms=5000) == "flash"
+        assert router.select("document", latency_budget_ms=10000) == "pro"
+        assert router.select("document") == "pro"
+
+    def test_single_probe_per_interval(self):
+        """Test only one of many concurrent requests probes a degraded model"""
+        clock = FakeClock()
+        router = make_router(clock)
+        for _ in range(5):
+            router.record("document", "pro", 1000, error=True)
+
+        clock.now += 31
+        selected = [router.select("document") for _ in range(10)]
+        assert selected.count("pro") == 1
+
+        # Still degraded while the probe is in flight and until the next interval
+        clock.now += 10
+        assert router.select("document") == "flash"
+        clock.now += 21
+        assert router.select("document") == "pro"
+
+    def test_usage_and_cost(self):
+        """Test thinking tokens count as output and cost follows the tier price"""
+        router = make_router(FakeClock())
+
+        assert parse_usage({"promptTokenCount": 10, "candidatesTokenCount": 5, "thoughtsTokenCount": 3}) == (10, 8)
+        assert router.estimate_cost("pro", 1_000_000, 0) == router.pricing["pro"]["input"]
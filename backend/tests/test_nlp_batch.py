@@ -0,0 +1,100 @@
+"""
+Unit tests for batch NLP analysis
+"""
+
+import asyncio
+
+from app.ml.nlp_batch import NLPBatchRunner
+
+
+def collect(runner, documents, operations=None, sector=None):
+    async def run():
+        return [result async for result in runner.run(documents, operations, sector=sector)]
+    return asyncio.run(run())
+
+
+class TestNLPBatchRunner:
+    """Tests for the streaming batch runner"""
+
+    def test_every_document_gets_one_result(self):
+        """Test local analyses cover every document across chunks"""
+        documents = [
+            {"id": f"log-{i}", "text": "Concrete pour delayed, urgent safety concern on level 2."}
+            for i in range(25)
+        ]
+
+        results = collect(NLPBatchRunner(chunk_size=10), documents, ["sentiment", "risks"])
+
+        assert sorted(r["index"] for r in results) == list(range(25))
+        assert {r["id"] for r in results} == {d["id"] for d in documents}
+        first = results[0]
+        assert first["sentiment"]["level"] == "negative"
+        assert first["urgency"] == "medium"
+        assert first["risks"] and first["action_items"]
+
+    def test_confident_classification_stays_local(self):
+        """Test routine documents are classified without escalating"""
+        documents = [{"text": "RFI 221: please clarify the beam depth on drawing S-300."}]
+
+        results = collect(NLPBatchRunner(), documents, ["classify"])
+
+        assert results[0]["classification"]["document_type"] == "rfi"
+        assert "sentiment" not in results[0]
+
+    def test_failures_are_reported_per_document(self):
+        """Test one failing document does not abort the batch"""
+        from app.ml.gemini_wrapper import nlp_system
+
+        class FailingClassifier:
+            async def classify(self, text):
+                if "fail" in text:
+                    raise RuntimeError("upstream down")
+                return await nlp_system.classifier.classify(text)
+
+        class System:
+            classifier = FailingClassifier()
+            ner = nlp_system.ner
+            sentiment_analyzer = nlp_system.sentiment_analyzer
+            risk_extractor = nlp_system.risk_extractor
+
+        documents = [
+            {"text": "please fail"},
+            {"text": "Change order 12 adds $40,000 and a 5 day time extension."},
+        ]
+
+        results = {r["index"]: r for r in collect(NLPBatchRunner(system=System()), documents, ["classify"])}
+
+        assert results[0]["error"] == "upstream down"
+        assert results[1]["classification"]["document_type"] == "change_order"
+
+    def test_sector_keywords_extend_risks(self):
+        """Test a sector's keywords are used by the local risk pass"""
+        documents = [{"text": "Arc flash boundary not marked at the switchboard."}]
+
+        general = collect(NLPBatchRunner(), documents, ["risks"])[0]
+        energy = collect(NLPBatchRunner(), documents, ["risks"], sector="energy")[0]
+
+        assert general["risks"][0]["severity"] == "low"
+        assert energy["risks"][0]["description"] == "Identified arc flash in document analysis"
+
+    def test_fan_out_is_bounded(self):
+        """Test no more than the configured number of documents run at once"""
+        active = {"now": 0, "peak": 0}
+
+        class SlowClassifier:
+            async def classify(self, text):
+                active["now"] += 1
+                active["peak"] = max(active["peak"], active["now"])
+                await asyncio.sleep(0.01)
+                active["now"] -= 1
+                from app.ml.gemini_wrapper import ClassificationResult
+                return ClassificationResult()
+
+        class System:
+            classifier = SlowClassifier()
+
+        results = collect(NLPBatchRunner(system=System(), concurrency=3), [{"text": "x"}] * 12, ["classify"])
+
+        assert len(results) == 12
+        assert not any("error" in r for r in results)
+        assert active["peak"] == 3
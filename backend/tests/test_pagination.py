@@ -0,0 +1,55 @@
+"""
+Unit tests for keyset pagination
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Base, ChatMessage
+from app.services.pagination import decode_cursor, encode_cursor, keyset_after, page_with_cursor
+
+
+class TestKeysetPagination:
+    """Tests for cursor encoding and keyset page walks"""
+
+    def test_cursor_round_trip(self):
+        """Test a cursor decodes to the key it was built from"""
+        timestamp = datetime(2026, 10, 18, 9, 30, 15, 123456)
+
+        assert decode_cursor(encode_cursor(timestamp, 42)) == (timestamp, 42)
+
+    def test_malformed_cursor_is_rejected(self):
+        """Test garbage cursors raise ValueError"""
+        with pytest.raises(ValueError):
+            decode_cursor("not-a-cursor")
+
+    def test_walk_visits_every_row_once(self):
+        """Test paging newest-first covers all rows, including timestamp ties"""
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        start = datetime(2026, 1, 1)
+        # Pairs of messages share a timestamp, so the id tie-breaker matters
+        db.add_all([
+            ChatMessage(conversation_id=1, role="user", content=str(i), timestamp=start + timedelta(seconds=i // 2))
+            for i in range(11)
+        ])
+        db.commit()
+
+        seen, cursor = [], None
+        while True:
+            query = db.query(ChatMessage).filter(ChatMessage.conversation_id == 1)
+            condition = keyset_after(ChatMessage.timestamp, ChatMessage.id, cursor and decode_cursor(cursor))
+            if condition is not None:
+                query = query.filter(condition)
+            rows = query.order_by(ChatMessage.timestamp.desc(), ChatMessage.id.desc()).limit(4 + 1).all()
+            page, cursor = page_with_cursor(rows, 4, "timestamp")
+            seen.extend(int(m.content) for m in page)
+            if cursor is None:
+                break
+
+        assert seen == list(range(10, -1, -1))
+        db.close()
@@ -0,0 +1,80 @@
+"""
+Unit tests for the GCRA rate limiter and its middleware
+"""
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.auth import create_access_token
+from app.middleware.security import RateLimitMiddleware
+from app.services.rate_limiter import LocalGCRA, RateLimiter, identify, route_class
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRateLimiter:
+    """Tests for the rate limiter"""
+
+    def test_burst_then_steady_rate(self):
+        """Test a full minute's allowance as a burst, then one request per interval"""
+        clock = FakeClock()
+        limiter = LocalGCRA(clock=clock)
+
+        results = [limiter.hit("k", 6) for _ in range(7)]
+        assert [r.allowed for r in results] == [True] * 6 + [False]
+        assert [r.remaining for r in results[:6]] == [5, 4, 3, 2, 1, 0]
+        assert results[-1].retry_after == 10
+
+        clock.now += 10
+        assert limiter.hit("k", 6).allowed
+        assert not limiter.hit("k", 6).allowed
+
+    def test_no_burst_across_window_boundary(self):
+        """Test the window slides: spending the limit does not reset at a minute boundary"""
+        clock = FakeClock()
+        clock.now = 59.9  # Just before a fixed-window boundary
+        limiter = LocalGCRA(clock=clock)
+
+        assert all(limiter.hit("k", 60).allowed for _ in range(60))
+        clock.now = 60.1
+        assert sum(limiter.hit("k", 60).allowed for _ in range(60)) == 0
+
+    def test_identity_and_route_class(self):
+        """Test clients are keyed by token subject with their tier, else by address"""
+        token = create_access_token({"sub": "pm@example.com", "tier": "enterprise"})
+
+        assert identify(f"Bearer {token}", "10.0.0.1") == ("user:pm@example.com", "enterprise")
+        assert identify("Bearer not-a-token", "10.0.0.1") == ("ip:10.0.0.1", "anonymous")
+        assert identify(None, None) == ("ip:unknown", "anonymous")
+        assert route_class("/api/v1/chat/messages") == "ai"
+        assert route_class("/token") == "auth"
+        assert route_class("/api/v1/chat/conversations") == "default"
+
+    def test_middleware_limits_per_route_class(self):
+        """Test the middleware answers 429 once a route class is exhausted"""
+        app = FastAPI()
+
+        @app.get("/token")
+        def token():
+            return {}
+
+        @app.get("/projects/")
+        def projects():
+            return {}
+
+        limiter = RateLimiter(redis_url="", policy={"anonymous": {"auth": 2, "default": 100}})
+        app.add_middleware(RateLimitMiddleware, limiter=limiter)
+        client = TestClient(app)
+
+        statuses = [client.get("/token").status_code for _ in range(3)]
+        assert statuses == [200, 200, 429]
+        response = client.get("/projects/")
+        assert response.status_code == 200
+        assert response.headers["X-RateLimit-Limit"] == "100"
+        assert limiter.stats()["limited"] == 1
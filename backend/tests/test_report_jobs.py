@@ -0,0 +1,224 @@
+"""
+Unit tests for report generation jobs
+"""
+
+import asyncio
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models import GeneratedReport, ScheduledReport
+from app.services.report_jobs import (
+    DatabaseReportStore, DatabaseScheduleStore, ReportJobManager, in_offpeak_window, project_data_hash,
+)
+
+
+class FakeGenerator:
+    def __init__(self, fail=False, delay=0.0):
+        self.calls = []
+        self.fail = fail
+        self.delay = delay
+
+    async def __call__(self, project_data, report_type, output_format):
+        self.calls.append((project_data, report_type, output_format))
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("Report generation failed.")
+        return {"report_type": report_type, "format": output_format, "content": f"report {len(self.calls)}"}
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class TestReportJobs:
+    """Tests for queued, cached and versioned report generation"""
+
+    def test_unchanged_data_is_served_from_store(self):
+        """Test resubmitting the same data completes instantly without generating"""
+        generator = FakeGenerator()
+        manager = ReportJobManager(generator=generator)
+
+        async def scenario():
+            first = manager.submit({"progress": 40, "budget": 100}, "p1", "daily", "json")
+            await manager.wait(first, timeout=1)
+            second = manager.submit({"budget": 100, "progress": 40}, "p1", "daily", "json")
+            await manager.stop()
+            return first, second
+
+        first, second = run(scenario())
+
+        assert first.status == "completed" and not first.cached
+        assert second.status == "completed" and second.cached
+        assert second.version == first.version == 1
+        assert len(generator.calls) == 1
+
+    def test_changed_data_creates_new_version(self):
+        """Test new data produces the next version and keeps the old one"""
+        manager = ReportJobManager(generator=FakeGenerator())
+
+        async def scenario():
+            for progress in (40, 55):
+                job = manager.submit({"progress": progress}, "p1", "weekly", "markdown")
+                await manager.wait(job, timeout=1)
+            await manager.stop()
+            return job
+
+        job = run(scenario())
+        key = ("p1", "weekly", "markdown")
+
+        assert job.version == 2
+        assert manager.store.get(key).report["content"] == "report 2"
+        assert manager.store.get(key, version=1).report["content"] == "report 1"
+        assert [h["version"] for h in manager.history(project_id="p1")] == [2, 1]
+
+    def test_identical_in_flight_jobs_are_shared(self):
+        """Test duplicate submissions while generating return the same job"""
+        generator = FakeGenerator(delay=0.05)
+        manager = ReportJobManager(generator=generator)
+
+        async def scenario():
+            a = manager.submit({"progress": 10}, "p1")
+            b = manager.submit({"progress": 10}, "p1")
+            await manager.wait(a, timeout=1)
+            await manager.stop()
+            return a, b
+
+        a, b = run(scenario())
+
+        assert a is b
+        assert len(generator.calls) == 1
+
+    def test_failures_are_not_stored(self):
+        """Test a failed generation is reported and retried on resubmission"""
+        generator = FakeGenerator(fail=True)
+        manager = ReportJobManager(generator=generator)
+
+        async def scenario():
+            job = manager.submit({"progress": 10}, "p1")
+            await manager.wait(job, timeout=1)
+            retry = manager.submit({"progress": 10}, "p1")
+            await manager.wait(retry, timeout=1)
+            await manager.stop()
+            return job, retry
+
+        job, retry = run(scenario())
+
+        assert job.status == "failed"
+        assert job.error == "Report generation failed."
+        assert retry is not job and len(generator.calls) == 2
+
+    def test_schedules_run_off_peak_with_latest_data(self):
+        """Test due schedules enqueue only inside the off-peak window"""
+        generator = FakeGenerator()
+        manager = ReportJobManager(generator=generator, offpeak_hours=(1, 5))
+
+        async def scenario():
+            first = manager.submit({"progress": 70}, "p1", "daily", "json")
+            await manager.wait(first, timeout=1)
+            entry = manager.schedule("p1", "daily", "json", schedule="daily")
+            due = entry.next_run_at
+
+            peak = manager.run_due_schedules(now=due.replace(hour=12))
+            jobs = manager.run_due_schedules(now=due)
+            again = manager.run_due_schedules(now=due)
+            await manager.stop()
+            return entry, due, peak, jobs, again
+
+        entry, due, peak, jobs, again = run(scenario())
+
+        assert peak == []
+        assert len(jobs) == 1 and jobs[0].source == "schedule"
+        assert jobs[0].cached
+        assert again == []
+        assert entry.next_run_at > due
+        assert len(generator.calls) == 1
+
+    def test_latest_data_is_bounded(self):
+        """Test only the most recently submitted projects keep their data"""
+        manager = ReportJobManager(generator=FakeGenerator(), max_latest_data=2)
+
+        async def scenario():
+            for project in ("p1", "p2", "p1", "p3"):
+                manager.submit({"project": project}, project)
+            await manager.stop()
+
+        run(scenario())
+
+        assert list(manager.latest_data) == ["p1", "p3"]
+
+
+def make_session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'reports.db'}")
+    GeneratedReport.__table__.create(engine)
+    ScheduledReport.__table__.create(engine)
+    return sessionmaker(bind=engine)
+
+
+class TestDatabaseStores:
+    """Tests for report versions and schedules kept in the database"""
+
+    def test_versions_survive_a_restart(self, tmp_path):
+        """Test a new manager serves reports stored by an earlier one and prunes old versions"""
+        sessions = make_session_factory(tmp_path)
+        generator = FakeGenerator()
+
+        async def generate(manager, progress):
+            job = manager.submit({"progress": progress}, "p1", "daily", "json")
+            await manager.wait(job, timeout=1)
+            await manager.stop()
+            return job
+
+        first = ReportJobManager(generator=generator, store=DatabaseReportStore(max_versions=2, session_factory=sessions))
+        for progress in (10, 20, 30):
+            run(generate(first, progress))
+
+        restarted = ReportJobManager(generator=generator, store=DatabaseReportStore(max_versions=2, session_factory=sessions))
+        job = run(generate(restarted, 30))
+
+        assert job.cached and job.version == 3
+        assert len(generator.calls) == 3
+        assert restarted.get_report(job).report["content"] == "report 3"
+        assert [h["version"] for h in restarted.history(project_id="p1")] == [3, 2]
+        assert restarted.store.get(("p1", "daily", "json"), version=1) is None
+
+    def test_due_schedule_runs_on_one_worker(self, tmp_path):
+        """Test two workers sharing the schedule table enqueue a due schedule once"""
+        sessions = make_session_factory(tmp_path)
+        workers = [
+            ReportJobManager(generator=FakeGenerator(), offpeak_hours=(1, 5),
+                             schedules=DatabaseScheduleStore(session_factory=sessions))
+            for _ in range(2)
+        ]
+
+        async def scenario():
+            entry = workers[0].schedule("p1", "daily", "json", project_data={"progress": 5})
+            jobs = [job for worker in workers for job in worker.run_due_schedules(now=entry.next_run_at)]
+            for worker in workers:
+                await worker.stop()
+            return entry, jobs
+
+        entry, jobs = run(scenario())
+
+        assert len(jobs) == 1
+        listed = workers[1].list_schedules("p1")
+        assert [s["schedule_id"] for s in listed] == [entry.id]
+        assert listed[0]["last_job_id"] == jobs[0].id
+        assert workers[1].cancel_schedule(entry.id)
+        assert workers[0].list_schedules() == []
+
+
+class TestReportHelpers:
+    """Tests for report job helpers"""
+
+    def test_hash_ignores_key_order(self):
+        """Test equal data hashes equally regardless of key order"""
+        assert project_data_hash({"a": 1, "b": [1, 2]}) == project_data_hash({"b": [1, 2], "a": 1})
+        assert project_data_hash({"a": 1}) != project_data_hash({"a": 2})
+
+    def test_offpeak_window_wraps_midnight(self):
+        """Test a window such as 22:00-04:00 spans midnight"""
+        assert in_offpeak_window(datetime(2026, 1, 1, 23), 22, 4)
+        assert in_offpeak_window(datetime(2026, 1, 1, 3), 22, 4)
+        assert not in_offpeak_window(datetime(2026, 1, 1, 12), 22, 4)
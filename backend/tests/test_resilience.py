@@ -0,0 +1,161 @@
+"""
+Unit tests for AI call resilience helpers (circuit breaker, hedged requests)
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.ai_service import AIService
+from app.services.resilience import CircuitBreaker, CircuitBreakerRegistry, hedged_call
+
+
+class TestCircuitBreaker:
+    """Tests for the error-rate / latency circuit breaker"""
+
+    def test_opens_on_failure_rate(self):
+        """Test circuit opens once the failure rate crosses the threshold"""
+        breaker = CircuitBreaker("test", failure_rate_threshold=0.5, min_calls=4, open_seconds=60)
+
+        for failed in (False, True, False, True):
+            assert breaker.allow_request()
+            breaker.record(100, failed=failed)
+
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker.allow_request()
+        assert breaker.rejected_calls == 1
+
+    def test_opens_on_slow_calls(self):
+        """Test circuit opens when most calls exceed the slow-call threshold"""
+        breaker = CircuitBreaker("test", slow_call_ms=1000, slow_call_rate_threshold=0.75, min_calls=4)
+
+        for _ in range(4):
+            breaker.record(5000, failed=False)
+
+        assert breaker.state == CircuitBreaker.OPEN
+
+    def test_stays_closed_below_min_calls(self):
+        """Test a few early failures do not trip the breaker"""
+        breaker = CircuitBreaker("test", min_calls=5)
+
+        for _ in range(4):
+            breaker.record(100, failed=True)
+
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_half_open_trial_closes_on_success(self):
+        """Test a successful trial call after the open period closes the circuit"""
+        breaker = CircuitBreaker("test", min_calls=1, open_seconds=0)
+        breaker.record(100, failed=True)
+
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert breaker.allow_request()
+        assert not breaker.allow_request()  # only one trial at a time
+
+        breaker.record(100, failed=False)
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_half_open_trial_reopens_on_failure(self):
+        """Test a failed trial call re-opens the circuit"""
+        breaker = CircuitBreaker("test", min_calls=1, open_seconds=0)
+        breaker.record(100, failed=True)
+        breaker.allow_request()
+
+        breaker.open_seconds = 60
+        breaker.record(100, failed=True)
+
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.times_opened == 2
+
+
+class TestHedgedCall:
+    """Tests for hedged requests"""
+
+    def test_fast_call_is_not_hedged(self):
+        """Test no second attempt is made when the first finishes in time"""
+        calls = []
+
+        async def call():
+            calls.append(1)
+            return "ok"
+
+        result, hedged = asyncio.run(hedged_call(call, 0.5))
+
+        assert result == "ok"
+        assert not hedged
+        assert len(calls) == 1
+
+    def test_slow_call_is_hedged(self):
+        """Test the second attempt wins when the first is slow"""
+        delays = [1.0, 0.0]
+
+        async def call():
+            delay = delays.pop(0)
+            await asyncio.sleep(delay)
+            return delay
+
+        result, hedged = asyncio.run(hedged_call(call, 0.05))
+
+        assert hedged
+        assert result == 0.0
+
+    def test_all_attempts_fail(self):
+        """Test the error is raised when both attempts fail"""
+        async def call():
+            await asyncio.sleep(0.1)
+            raise RuntimeError("upstream down")
+
+        with pytest.raises(RuntimeError):
+            asyncio.run(hedged_call(call, 0.01))
+
+    def test_cancelled_caller_stops_every_attempt(self):
+        """Test cancelling the caller, before or after the hedge starts, cancels and awaits the attempts"""
+        async def scenario(cancel_after):
+            started, finished = [], []
+
+            async def call():
+                started.append(1)
+                try:
+                    await asyncio.sleep(10)
+                finally:
+                    finished.append(1)
+
+            task = asyncio.create_task(hedged_call(call, 0.02))
+            await asyncio.sleep(cancel_after)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            return len(started), len(finished)
+
+        assert asyncio.run(scenario(0.005)) == (1, 1)
+        assert asyncio.run(scenario(0.05)) == (2, 2)
+
+
+class TestCancelledCalls:
+    """Tests for how cancelled upstream calls reach the circuit breaker"""
+
+    def test_cancelled_call_is_not_an_outcome(self):
+        """Test a cancelled call is neither a success nor a failure and frees the half-open trial"""
+        async def hang(request):
+            await asyncio.sleep(10)
+
+        service = AIService()
+        service.api_key = "test-key"
+        service.breakers = CircuitBreakerRegistry()
+        service._http_client = httpx.AsyncClient(transport=httpx.MockTransport(hang))
+        breaker = service.breakers.get(service.router.select("chat", None))
+        breaker._state = CircuitBreaker.HALF_OPEN
+
+        async def run():
+            task = asyncio.create_task(service._generate({}, route="chat", hedge=False))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(run())
+
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert len(breaker.outcomes) == 0
+        assert breaker.allow_request()
@@ -0,0 +1,72 @@
+"""
+Unit tests for the pure ASGI security middleware
+"""
+
+import logging
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.middleware.security import SecurityMiddleware, add_security_middleware
+from app.services.rate_limiter import RateLimiter
+
+
+def make_app(policy=None):
+    app = FastAPI()
+
+    @app.get("/ping")
+    def ping():
+        return {"ok": True}
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse((f"chunk {i}\n" for i in range(3)), media_type="text/plain",
+                                 headers={"Server": "uvicorn", "Cache-Control": "public"})
+
+    limiter = RateLimiter(redis_url="", policy=policy or {"anonymous": {"default": 100}})
+    app.add_middleware(SecurityMiddleware, limiter=limiter)
+    return app
+
+
+class TestSecurityMiddleware:
+    """Tests for SecurityMiddleware"""
+
+    def test_headers_on_plain_and_streaming_responses(self, caplog):
+        """Test the security headers replace the app's own and streams pass through"""
+        client = TestClient(make_app())
+
+        with caplog.at_level(logging.INFO, logger="app.middleware.security"):
+            response = client.get("/stream")
+
+        assert response.text == "chunk 0\nchunk 1\nchunk 2\n"
+        assert response.headers["X-Frame-Options"] == "SAMEORIGIN"
+        assert response.headers["Cache-Control"].startswith("no-store")
+        assert "server" not in response.headers
+        assert response.headers["X-RateLimit-Remaining"] == "99"
+        assert float(response.headers["X-Process-Time"]) >= 0
+
+        record = next(r for r in caplog.records if r.name == "app.middleware.security")
+        assert record.http["path"] == "/stream" and record.http["status"] == 200
+
+    def test_rejection_carries_security_and_cors_headers(self):
+        """Test a 429 is answered before routing, with CORS still applied outside it"""
+        app = FastAPI()
+
+        @app.get("/ping")
+        def ping():
+            return {"ok": True}
+
+        add_security_middleware(app, rate_limit=1)
+        client = TestClient(app)
+        origin = {"Origin": "http://localhost:3000"}
+
+        assert client.get("/ping", headers=origin).status_code == 200
+        response = client.get("/ping", headers=origin)
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
+        assert response.headers["Content-Security-Policy"]
+        assert response.headers["Access-Control-Allow-Origin"] == "http://localhost:3000"
+        # Preflights are answered by CORS and never count against the limit
+        preflight = client.options("/ping", headers={**origin, "Access-Control-Request-Method": "GET"})
+        assert preflight.status_code == 200
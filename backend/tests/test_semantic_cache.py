@@ -0,0 +1,124 @@
+"""
+Unit tests for the chat semantic cache
+"""
+
+import asyncio
+
+from app.services.ai_service import AIService
+from app.services.semantic_cache import HashingEmbedder, SemanticCache, cosine
+
+
+class TestHashingEmbedder:
+    """Tests for the hashing-trick question embedding"""
+
+    def test_paraphrases_are_close(self):
+        """Test rephrased questions score above unrelated ones"""
+        embedder = HashingEmbedder()
+        base = embedder.embed("How do I reduce waiting waste?")
+
+        assert cosine(base, embedder.embed("How can we reduce waiting wastes on site")) > 0.8
+        assert cosine(base, embedder.embed("What is value stream mapping?")) < 0.2
+
+    def test_empty_question(self):
+        """Test stop-word-only text embeds to an empty vector"""
+        assert HashingEmbedder().embed("what is it?") == {}
+
+
+class TestSemanticCache:
+    """Tests for the per-tenant answer cache"""
+
+    def test_hit_for_similar_question(self):
+        """Test a near-duplicate question returns the cached answer"""
+        cache = SemanticCache(threshold=0.8)
+        cache.store("acme", "How do I reduce waiting waste?", "Level the workflow.")
+
+        assert cache.lookup("acme", "how do i reduce waiting wastes") == "Level the workflow."
+        assert cache.stats()["hit_rate"] == 1.0
+
+    def test_miss_for_different_question(self):
+        """Test dissimilar questions are not served from the cache"""
+        cache = SemanticCache(threshold=0.8)
+        cache.store("acme", "How do I reduce waiting waste?", "Level the workflow.")
+
+        assert cache.lookup("acme", "How do I increase crew productivity?") is None
+        assert cache.stats()["misses"] == 1
+
+    def test_tenants_are_isolated(self):
+        """Test answers cached for one tenant are not served to another"""
+        cache = SemanticCache(threshold=0.8)
+        cache.store("acme", "What is the last planner system?", "Acme's answer")
+
+        assert cache.lookup("globex", "What is the last planner system?") is None
+
+    def test_expired_entries_are_dropped(self):
+        """Test entries older than the TTL are not returned"""
+        cache = SemanticCache(threshold=0.8, ttl_seconds=0)
+        cache.store("acme", "What is the last planner system?", "answer")
+
+        assert cache.lookup("acme", "What is the last planner system?") is None
+        assert cache.stats()["entries"] == 0
+
+    def test_lru_eviction(self):
+        """Test the least recently used answer is evicted at capacity"""
+        cache = SemanticCache(threshold=0.8, max_entries=2)
+        cache.store("acme", "reduce waiting waste", "a")
+        cache.store("acme", "daily huddle agenda", "b")
+        cache.lookup("acme", "reduce waiting waste")
+        cache.store("acme", "kanban material delivery", "c")
+
+        assert cache.lookup("acme", "daily huddle agenda") is None
+        assert cache.lookup("acme", "reduce waiting waste") == "a"
+
+    def test_total_entries_evict_least_recent_tenant(self):
+        """Test the cache-wide bound drops whole tenants, least recently used first"""
+        cache = SemanticCache(threshold=0.8, max_entries=2, max_total_entries=3)
+        cache.store("user:1", "reduce waiting waste", "a")
+        cache.store("user:1", "daily huddle agenda", "b")
+        cache.store("user:2", "reduce waiting waste", "c")
+        cache.lookup("user:1", "reduce waiting waste")
+        cache.store("user:3", "kanban material delivery", "d")
+
+        assert list(cache.tenants) == ["user:1", "user:3"]
+        assert cache.stats()["entries"] == 3
+        assert cache.lookup("user:2", "reduce waiting waste") is None
+
+    def test_stats_are_aggregate_only(self):
+        """Test stats do not list tenants, which identify users"""
+        cache = SemanticCache(threshold=0.8, ttl_seconds=0)
+        cache.store("user:1", "What is the last planner system?", "answer")
+        cache.lookup("user:1", "What is the last planner system?")
+
+        stats = cache.stats()
+        assert stats["tenants"] == 0 and stats["entries"] == 0 and stats["misses"] == 1
+        assert "user:1" not in str(stats)
+
+    def test_short_follow_ups_bypass_cache(self):
+        """Test questions with too few content words are never cached"""
+        cache = SemanticCache(threshold=0.8, min_terms=2)
+        cache.store("acme", "why?", "Because.")
+
+        assert cache.stats()["entries"] == 0
+        assert cache.lookup("acme", "why?") is None
+
+    def test_lookup_does_not_create_tenant(self):
+        """Test a miss for a tenant with nothing cached leaves no index behind"""
+        cache = SemanticCache(threshold=0.8)
+
+        assert cache.lookup("acme", "What is the last planner system?") is None
+        assert cache.tenants == {}
+        assert cache.stats()["misses"] == 1
+
+
+class TestAnswerCacheInAIService:
+    """Tests for how AIService uses the answer cache"""
+
+    def test_follow_ups_skip_the_cache(self):
+        """Test a question asked with conversation history is never answered from the cache"""
+        service = AIService()
+        service.api_key = None
+        service.answer_cache = SemanticCache(threshold=0.8)
+        service.answer_cache.store("user:1", "What is the last planner system?", "cached answer")
+        history = [{"role": "user", "content": "Tell me about pull planning"}]
+
+        assert asyncio.run(service.generate_response("What is the last planner system?", tenant="user:1")) == "cached answer"
+        assert asyncio.run(service.generate_response("What is the last planner system?", history, tenant="user:1")) != "cached answer"
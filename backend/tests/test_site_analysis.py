@@ -0,0 +1,155 @@
+"""
+Unit tests for combined multi-aspect site photo analysis
+"""
+
+import asyncio
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.ml_routes import router as ml_router
+from app.ml.gemini_wrapper import CombinedSiteAnalyzer
+from app.services.ai_schemas import gemini_response_schema
+from app.services.ai_service import VISION_ASPECTS, ai_service
+
+SECTIONS = {
+    "progress": {
+        "stage": "framing", "completion_percentage": 35, "activities": ["crane lift"],
+        "safety_concerns": [], "site_organization_score": 7, "notes": "Steel frame to level 3",
+    },
+    "safety": {
+        "ppe_compliance": ["helmets", "vests"], "violations": ["no harness at edge"], "hazards": ["open edge"],
+        "housekeeping_score": 6, "overall_safety_score": 5, "recommendations": ["install edge protection"],
+    },
+    "5s": {
+        "sort_score": 6, "set_in_order_score": 5, "shine_score": 7, "standardize_score": 4,
+        "sustain_score": 5, "overall_score": 5.4, "observations": ["loose pallets"],
+        "improvement_suggestions": ["mark laydown areas"],
+    },
+}
+
+
+class FakeVision:
+    def __init__(self, response):
+        self.response = response
+        self.calls = []
+
+    async def __call__(self, prompt, image_data, mime_type="image/jpeg", response_model=None, **kwargs):
+        self.calls.append({"prompt": prompt, "mime_type": mime_type, "response_model": response_model, **kwargs})
+        return self.response
+
+
+class TestAnalyzeSiteCombined:
+    """Tests for AIService.analyze_site_combined"""
+
+    def test_sections_match_single_aspect_shapes(self, monkeypatch):
+        """Test each section is validated into the shape its single-aspect method returns"""
+        vision = FakeVision(json.dumps(SECTIONS))
+        monkeypatch.setattr(ai_service, "_call_gemini_vision", vision)
+
+        combined = asyncio.run(ai_service.analyze_site_combined(b"image", mime_type="image/png"))
+
+        assert list(combined) == ["progress", "safety", "5s"]
+        assert len(vision.calls) == 1 and vision.calls[0]["mime_type"] == "image/png"
+        for aspect, section in SECTIONS.items():
+            single = ai_service._validate_structured(json.dumps(section), VISION_ASPECTS[aspect]["model"])
+            assert combined[aspect] == single
+        assert combined["progress"]["completion_percentage"] == 35.0
+
+        # The single-aspect method returns the same dict for the same section
+        monkeypatch.setattr(ai_service, "_call_gemini_vision", FakeVision(json.dumps(SECTIONS["safety"])))
+        assert asyncio.run(ai_service.analyze_safety(b"image")) == combined["safety"]
+
+    def test_only_requested_aspects_are_asked_for(self, monkeypatch):
+        """Test the schema and result cover only the requested aspects, without duplicates"""
+        vision = FakeVision(json.dumps({"5s": SECTIONS["5s"]}))
+        monkeypatch.setattr(ai_service, "_call_gemini_vision", vision)
+
+        combined = asyncio.run(ai_service.analyze_site_combined(b"image", aspects=("5s", "5s")))
+
+        assert list(combined) == ["5s"]
+        assert list(gemini_response_schema(vision.calls[0]["response_model"])["properties"]) == ["5s"]
+        assert '"5s" section' in vision.calls[0]["prompt"]
+        assert '"safety" section' not in vision.calls[0]["prompt"]
+
+    def test_unknown_aspect_is_rejected(self):
+        """Test an unknown aspect raises before any model call"""
+        with pytest.raises(ValueError, match="Unknown vision aspects: roofing"):
+            asyncio.run(ai_service.analyze_site_combined(b"image", aspects=("progress", "roofing")))
+        assert asyncio.run(ai_service.analyze_site_combined(b"image", aspects=())) == {}
+
+    def test_unavailable_model_returns_defaults(self, monkeypatch):
+        """Test every requested aspect falls back to its default result"""
+        monkeypatch.setattr(ai_service, "_call_gemini_vision", FakeVision(None))
+
+        combined = asyncio.run(ai_service.analyze_site_combined(b"image", aspects=("progress", "safety")))
+
+        assert combined == {aspect: VISION_ASPECTS[aspect]["default"] for aspect in ("progress", "safety")}
+        # Defaults are copies, so callers may change them freely
+        combined["safety"]["recommendations"] = ["changed"]
+        assert VISION_ASPECTS["safety"]["default"] != combined["safety"]
+
+    def test_invalid_response_is_returned_raw(self, monkeypatch):
+        """Test a response failing validation is kept as raw_analysis for every aspect"""
+        payload = json.dumps({"progress": SECTIONS["progress"], "safety": {"violations": []}})
+        monkeypatch.setattr(ai_service, "_call_gemini_vision", FakeVision(payload))
+
+        combined = asyncio.run(ai_service.analyze_site_combined(b"image", aspects=("progress", "safety")))
+
+        assert combined == {"progress": {"raw_analysis": payload}, "safety": {"raw_analysis": payload}}
+
+    def test_analyzer_passes_aspects_through(self, monkeypatch):
+        """Test CombinedSiteAnalyzer delegates to the AI service"""
+        seen = []
+
+        async def analyze(image_data, aspects=()):
+            seen.append((image_data, aspects))
+            return {}
+
+        monkeypatch.setattr(ai_service, "analyze_site_combined", analyze)
+
+        asyncio.run(CombinedSiteAnalyzer().analyze(b"image", aspects=("safety",)))
+
+        assert seen == [(b"image", ("safety",))]
+
+
+class TestAnalyzeSiteRoute:
+    """Tests for POST /ml/analyze-site"""
+
+    def setup_method(self):
+        app = FastAPI()
+        app.include_router(ml_router, prefix="/api/v1")
+        self.client = TestClient(app)
+
+    def post(self, **params):
+        return self.client.post("/api/v1/ml/analyze-site", params=params,
+                                files={"file": ("site.jpg", b"image", "image/jpeg")})
+
+    def test_sections_map_to_single_endpoint_keys(self, monkeypatch):
+        """Test progress, safety and 5S come back under the single-aspect endpoints' keys"""
+        monkeypatch.setattr(ai_service, "_call_gemini_vision", FakeVision(json.dumps(SECTIONS)))
+
+        body = self.post(project_id="p1").json()
+
+        assert body["status"] == "success" and body["project_id"] == "p1"
+        assert body["analysis"]["stage"] == "framing"
+        assert body["safety_analysis"]["violations"] == ["no harness at edge"]
+        assert body["workplace_analysis"]["overall_score"] == 5.4
+
+    def test_excluded_aspects_are_omitted(self, monkeypatch):
+        """Test only the requested sections are returned"""
+        vision = FakeVision(json.dumps({"safety": SECTIONS["safety"]}))
+        monkeypatch.setattr(ai_service, "_call_gemini_vision", vision)
+
+        body = self.post(include_progress=False, include_5s=False).json()
+
+        assert "safety_analysis" in body
+        assert "analysis" not in body and "workplace_analysis" not in body
+
+    def test_no_aspects_is_a_bad_request(self):
+        """Test asking for nothing is rejected without a model call"""
+        response = self.post(include_progress=False, include_safety=False, include_5s=False)
+
+        assert response.status_code == 400
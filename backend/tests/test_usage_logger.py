@@ -0,0 +1,135 @@
+"""
+Unit tests for batched ML usage logging
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.api.ml_routes import get_db as ml_get_db, router as ml_router
+from app.auth import get_current_active_user, get_current_user
+from app.models import MLUsageLog
+from app.services.usage_logger import UsageLogBuffer, usage_endpoint
+
+
+class TestUsageLogBuffer:
+    """Tests for the in-memory usage log buffer"""
+
+    def test_flush_writes_in_batches(self):
+        """Test queued records are bulk-written in batch_size chunks"""
+        buffer = UsageLogBuffer(batch_size=2)
+        batches = []
+        buffer._write = batches.append
+
+        for i in range(5):
+            buffer.log("gemini-2.5-flash", "ai:chat", latency_ms=100 + i, tokens_input=10, tokens_output=5)
+
+        assert asyncio.run(buffer.flush()) == 5
+        assert [len(b) for b in batches] == [2, 2, 1]
+        assert buffer.stats()["queued"] == 0
+
+    def test_request_endpoint_overrides_route(self):
+        """Test the request path context variable takes precedence"""
+        buffer = UsageLogBuffer()
+        token = usage_endpoint.set("/api/v1/ml/forecast")
+        try:
+            buffer.log("gemini-2.5-pro", "ai:forecast", latency_ms=250, error_message="timeout")
+        finally:
+            usage_endpoint.reset(token)
+
+        record = buffer.records[0]
+        assert record["endpoint"] == "/api/v1/ml/forecast"
+        assert record["error_occurred"] is True
+
+    def test_failed_flush_drops_batch(self):
+        """Test a database error drops the batch instead of blocking callers"""
+        buffer = UsageLogBuffer(batch_size=10)
+
+        def fail(batch):
+            raise RuntimeError("database unavailable")
+
+        buffer._write = fail
+        buffer.log("gemini-2.5-flash", "ai:chat", latency_ms=100)
+
+        assert asyncio.run(buffer.flush()) == 0
+        assert buffer.dropped == 1
+        assert buffer.failed_flushes == 1
+
+    def test_background_writer_flushes_on_stop(self):
+        """Test records logged inside the event loop are written by stop()"""
+        buffer = UsageLogBuffer(batch_size=100, flush_seconds=60)
+        batches = []
+        buffer._write = batches.append
+
+        async def run():
+            buffer.log("gemini-2.5-flash", "ai:chat", latency_ms=100)
+            assert buffer._task is not None
+            await buffer.stop()
+
+        asyncio.run(run())
+        assert sum(len(b) for b in batches) == 1
+
+
+class TestUsageAttribution:
+    """Tests for attributing AI calls to the authenticated user"""
+
+    def test_authenticated_user_is_recorded(self, monkeypatch):
+        """Test calls made while serving an authenticated request carry its user id"""
+        buffer = UsageLogBuffer()
+        app = FastAPI()
+
+        @app.get("/ask")
+        def ask(user=Depends(get_current_active_user)):
+            buffer.log("gemini-2.5-flash", "ai:chat", latency_ms=100)
+            return {}
+
+        app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(id=7, is_active=True)
+        TestClient(app).get("/ask")
+
+        assert buffer.records[0]["user_id"] == 7
+
+
+class TestModelUsageRoute:
+    """Tests for the /ml/models/usage aggregates"""
+
+    def test_aggregates_per_model_and_endpoint(self, tmp_path):
+        """Test totals, error rate and nearest-rank percentiles are computed in SQL"""
+        engine = create_engine(f"sqlite:///{tmp_path / 'usage.db'}")
+        MLUsageLog.__table__.create(engine)
+        Session = sessionmaker(bind=engine)
+        now = datetime.now(timezone.utc)
+        with Session() as db:
+            db.add_all([
+                MLUsageLog(model_name="flash", endpoint="/chat", latency_ms=float(ms), tokens_input=10,
+                           tokens_output=5, error_occurred=ms == 100, created_at=now - timedelta(minutes=1))
+                for ms in range(10, 110, 10)
+            ] + [
+                MLUsageLog(model_name="pro", endpoint="/chat", latency_ms=500.0, created_at=now - timedelta(minutes=1)),
+                MLUsageLog(model_name="pro", endpoint="/report", latency_ms=900.0, created_at=now - timedelta(days=2)),
+            ])
+            db.commit()
+
+        app = FastAPI()
+        app.include_router(ml_router, prefix="/api/v1")
+
+        def get_test_db():
+            with Session() as db:
+                yield db
+
+        app.dependency_overrides[ml_get_db] = get_test_db
+        body = TestClient(app).get("/api/v1/ml/models/usage").json()
+
+        flash = body["by_model"]["flash"]
+        assert (flash["total_calls"], flash["error_rate"]) == (10, 0.1)
+        assert (flash["p50_latency_ms"], flash["p95_latency_ms"]) == (50.0, 100.0)
+        assert (flash["tokens_input"], flash["tokens_output"]) == (100, 50)
+        # The call from two days ago is outside the default window
+        assert body["by_model"]["pro"]["total_calls"] == 1
+        assert body["by_endpoint"]["/chat"]["total_calls"] == 11
+        assert body["by_endpoint"]["/chat"]["p95_latency_ms"] == 500.0
+        assert "/report" not in body["by_endpoint"]
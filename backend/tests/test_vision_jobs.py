@@ -0,0 +1,250 @@
+"""
+Unit tests for bulk site-photo analysis jobs
+"""
+
+import io
+import asyncio
+import zipfile
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.api.ml_routes import router as ml_router
+from app.models import VisionJob, VisionJobImage
+from app.services import vision_jobs
+from app.services.ai_service import ai_service
+from app.services.vision_jobs import (
+    DatabaseVisionJobStore,
+    VisionBatchBusyError,
+    VisionBatchJobManager,
+    VisionJobStore,
+    extract_images_from_zip,
+    read_upload,
+)
+
+
+def make_zip(entries):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in entries:
+            zf.writestr(name, data)
+    return buffer.getvalue()
+
+
+class TestZipExtraction:
+    """Tests for reading images out of uploaded archives"""
+
+    def test_only_images_are_extracted(self):
+        """Test directories, hidden files and non-images are skipped"""
+        archive = make_zip([("site/a.jpg", b"a"), ("site/.b.jpg", b"b"), ("notes.txt", b"c"), ("site/c.PNG", b"d")])
+
+        assert extract_images_from_zip(archive) == [("site/a.jpg", b"a"), ("site/c.PNG", b"d")]
+
+    def test_zip_bomb_is_rejected(self):
+        """Test an entry that inflates past the per-image limit is refused"""
+        archive = make_zip([("bomb.jpg", b"\0" * 5_000_000)])
+        assert len(archive) < 50_000
+
+        with pytest.raises(ValueError, match="too large"):
+            extract_images_from_zip(archive, max_image_bytes=1_000_000)
+
+    def test_batch_byte_budget(self):
+        """Test images that fit individually but not together are refused"""
+        archive = make_zip([(f"{i}.jpg", b"x" * 600) for i in range(3)])
+
+        with pytest.raises(ValueError, match="too large"):
+            extract_images_from_zip(archive, max_bytes=1000, max_image_bytes=1000)
+
+    def test_image_count_is_checked_while_reading(self):
+        """Test extraction stops at max_images instead of reading the whole archive"""
+        archive = make_zip([(f"{i}.jpg", b"x") for i in range(10)])
+
+        with pytest.raises(ValueError, match="Too many images"):
+            extract_images_from_zip(archive, max_images=3)
+
+
+class TestVisionBatchJobManager:
+    """Tests for running batch jobs"""
+
+    def test_job_runs_every_image(self, monkeypatch):
+        """Test per-image results and progress, with failures recorded per image"""
+        async def analyze(data, mime_type="image/jpeg", aspects=()):
+            if data == b"bad":
+                raise RuntimeError("unreadable image")
+            return {"aspects": list(aspects), "mime_type": mime_type}
+
+        monkeypatch.setattr(ai_service, "analyze_site_combined", analyze)
+        manager = VisionBatchJobManager(concurrency=2)
+
+        async def run():
+            job = await manager.submit([("a.png", b"ok"), ("b.jpg", b"bad"), ("c.jpg", b"ok")], aspects=("safety",))
+            await manager._tasks[job.id]
+            return job
+
+        job = asyncio.run(run())
+        progress = job.progress()
+        assert (progress["status"], progress["completed"], progress["failed"]) == ("completed", 2, 1)
+        assert progress["progress_percentage"] == 100.0
+        results = job.results()
+        assert results[0]["analysis"] == {"aspects": ["safety"], "mime_type": "image/png"}
+        assert results[1]["error"] == "unreadable image"
+
+    def test_submit_limits(self):
+        """Test empty and oversized batches are refused"""
+        manager = VisionBatchJobManager(max_images=2)
+
+        with pytest.raises(ValueError):
+            asyncio.run(manager.submit([]))
+        with pytest.raises(ValueError, match="Too many images"):
+            asyncio.run(manager.submit([("a.jpg", b""), ("b.jpg", b""), ("c.jpg", b"")]))
+
+    def test_running_jobs_are_capped(self, monkeypatch):
+        """Test a worker refuses new batches while it runs max_running_jobs of them"""
+        release = None
+
+        async def analyze(data, mime_type="image/jpeg", aspects=()):
+            await release.wait()
+            return {}
+
+        monkeypatch.setattr(ai_service, "analyze_site_combined", analyze)
+        manager = VisionBatchJobManager(max_running_jobs=1)
+
+        async def run():
+            nonlocal release
+            release = asyncio.Event()
+            job = await manager.submit([("a.jpg", b"x")])
+            with pytest.raises(VisionBatchBusyError):
+                await manager.submit([("b.jpg", b"x")])
+            assert manager.busy
+            release.set()
+            await manager._tasks[job.id]
+            await manager._tasks[(await manager.submit([("c.jpg", b"x")])).id]
+
+        asyncio.run(run())
+
+        assert not manager.busy
+        assert [j["total"] for j in manager.store.list()] == [1, 1]
+
+
+def make_session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'vision.db'}")
+    VisionJob.__table__.create(engine)
+    VisionJobImage.__table__.create(engine)
+    return sessionmaker(bind=engine)
+
+
+class TestDatabaseVisionJobStore:
+    """Tests for vision batch jobs kept in the database"""
+
+    def test_other_workers_see_progress_and_results(self, tmp_path, monkeypatch):
+        """Test a job run by one worker is served by another, with per-image results"""
+        async def analyze(data, mime_type="image/jpeg", aspects=()):
+            if data == b"bad":
+                raise RuntimeError("unreadable image")
+            return {"stage": "framing"}
+
+        monkeypatch.setattr(ai_service, "analyze_site_combined", analyze)
+        sessions = make_session_factory(tmp_path)
+        runner = VisionBatchJobManager(store=DatabaseVisionJobStore(session_factory=sessions))
+        other = VisionBatchJobManager(store=DatabaseVisionJobStore(session_factory=sessions))
+
+        async def run():
+            job = await runner.submit([("a.jpg", b"ok"), ("b.jpg", b"bad")], project_id="p1")
+            queued = await other.get_job(job.id, with_results=False)
+            await runner._tasks[job.id]
+            return job, queued, await other.get_job(job.id), await other.list_jobs(project_id="p1")
+
+        job, queued, finished, listed = asyncio.run(run())
+
+        assert queued.progress()["total"] == 2
+        assert finished.progress() == job.progress()
+        assert finished.results() == job.results()
+        assert finished.results()[0]["analysis"] == {"stage": "framing"}
+        assert finished.results()[1]["error"] == "unreadable image"
+        assert listed == [job.progress()]
+
+    def test_oldest_finished_jobs_are_pruned(self, tmp_path, monkeypatch):
+        """Test only max_jobs jobs and their images are kept"""
+        async def analyze(data, mime_type="image/jpeg", aspects=()):
+            return {}
+
+        monkeypatch.setattr(ai_service, "analyze_site_combined", analyze)
+        sessions = make_session_factory(tmp_path)
+        manager = VisionBatchJobManager(store=DatabaseVisionJobStore(max_jobs=2, session_factory=sessions))
+
+        async def run():
+            ids = []
+            for name in ("a.jpg", "b.jpg", "c.jpg"):
+                job = await manager.submit([(name, b"x")])
+                await manager._tasks[job.id]
+                ids.append(job.id)
+            return ids
+
+        ids = asyncio.run(run())
+
+        with sessions() as db:
+            assert {row.id for row in db.query(VisionJob)} == set(ids[1:])
+            assert db.query(VisionJobImage).count() == 2
+
+
+class FakeUpload:
+    def __init__(self, data, filename="photo.jpg"):
+        self.data = io.BytesIO(data)
+        self.filename = filename
+        self.reads = 0
+
+    async def read(self, size=-1):
+        self.reads += 1
+        return self.data.read(size)
+
+
+class TestReadUpload:
+    """Tests for reading uploads against a byte limit"""
+
+    def test_reading_stops_at_the_limit(self):
+        """Test an upload is read in chunks and refused once it passes the limit"""
+        upload = FakeUpload(b"x" * 100)
+
+        with pytest.raises(ValueError, match="photo.jpg is too large"):
+            asyncio.run(read_upload(upload, limit=25, chunk_size=10))
+        assert upload.reads == 3
+
+        assert asyncio.run(read_upload(FakeUpload(b"x" * 25), limit=25, chunk_size=10)) == b"x" * 25
+
+
+class TestVisionBatchRoutes:
+    """Tests for the /ml/vision/batch endpoints"""
+
+    def setup_method(self):
+        app = FastAPI()
+        app.include_router(ml_router, prefix="/api/v1")
+        self.client = TestClient(app)
+
+    def test_oversized_archive_is_a_bad_request(self, monkeypatch):
+        """Test a zip bomb is answered with 400 before any job is created"""
+        monkeypatch.setattr(vision_jobs.vision_job_manager, "store", VisionJobStore())
+        archive = make_zip([("bomb.jpg", b"\0" * (vision_jobs.VISION_BATCH_MAX_IMAGE_BYTES + 1))])
+
+        response = self.client.post("/api/v1/ml/vision/batch",
+                                    files=[("files", ("photos.zip", archive, "application/zip"))])
+
+        assert response.status_code == 400
+        assert vision_jobs.vision_job_manager.store.jobs == {}
+
+    def test_busy_worker_is_too_many_requests(self, monkeypatch):
+        """Test submissions are refused with 429 while the worker is at its job cap"""
+        monkeypatch.setattr(vision_jobs.vision_job_manager, "_tasks", {"running": None})
+        monkeypatch.setattr(vision_jobs.vision_job_manager, "max_running_jobs", 1)
+
+        response = self.client.post("/api/v1/ml/vision/batch", files=[("files", ("a.jpg", b"x", "image/jpeg"))])
+
+        assert response.status_code == 429
+
+    def test_unknown_job(self, monkeypatch):
+        """Test polling an unknown job is a 404"""
+        monkeypatch.setattr(vision_jobs.vision_job_manager, "store", VisionJobStore())
+        assert self.client.get("/api/v1/ml/vision/batch/missing").status_code == 404
+        assert self.client.get("/api/v1/ml/vision/batch/missing/results").status_code == 404
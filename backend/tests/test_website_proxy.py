@@ -0,0 +1,102 @@
+"""
+Unit tests for the website reverse proxy
+"""
+
+import httpx
+from fastapi import FastAPI, Request, Response
+from fastapi.testclient import TestClient
+
+from app.middleware.website_proxy import ReverseProxy, StaticAssetCache, WebsiteProxyMiddleware
+
+
+def make_upstream():
+    upstream = FastAPI()
+    upstream.state.calls = 0
+
+    @upstream.api_route("/echo", methods=["GET", "POST", "PUT", "DELETE"])
+    async def echo(request: Request):
+        upstream.state.calls += 1
+        body = await request.body()
+        return {
+            "method": request.method,
+            "query": request.url.query,
+            "body": body.decode(),
+            "cookie": request.headers.get("cookie"),
+            "forwarded_for": request.headers.get("x-forwarded-for"),
+            "keep_alive": request.headers.get("keep-alive"),
+        }
+
+    @upstream.get("/_next/static/chunks/app-1a2b.js")
+    async def chunk():
+        upstream.state.calls += 1
+        return Response("console.log(1)", media_type="application/javascript",
+                        headers={"ETag": '"abc"', "Cache-Control": "no-store"})
+
+    @upstream.get("/about")
+    async def page():
+        upstream.state.calls += 1
+        return Response("<h1>About</h1>", media_type="text/html", headers={"Set-Cookie": "s=1"})
+
+    return upstream
+
+
+def make_client(upstream):
+    app = FastAPI()
+
+    @app.get("/api/v1/ping")
+    def ping():
+        return {"api": True}
+
+    proxy = ReverseProxy("http://website", cache=StaticAssetCache(max_bytes=1024),
+                         transport=httpx.ASGITransport(app=upstream))
+    app.add_middleware(WebsiteProxyMiddleware, proxy=proxy)
+    return TestClient(app), proxy
+
+
+class TestWebsiteProxy:
+    """Tests for the website reverse proxy"""
+
+    def test_forwards_methods_bodies_and_headers(self):
+        """Test every method is forwarded with its body, query and end-to-end headers"""
+        client, proxy = make_client(make_upstream())
+
+        response = client.put("/echo?x=1", content=b"payload",
+                              headers={"Cookie": "session=abc", "Keep-Alive": "timeout=5"})
+        assert response.status_code == 200
+        assert response.json() == {
+            "method": "PUT", "query": "x=1", "body": "payload", "cookie": "session=abc",
+            "forwarded_for": "testclient", "keep_alive": None,
+        }
+        assert client.delete("/echo").json()["method"] == "DELETE"
+        assert client.get("/api/v1/ping").json() == {"api": True}
+        assert proxy.stats()["requests"] == 2
+
+    def test_static_assets_are_cached(self):
+        """Test hashed Next.js assets are served from cache as immutable, pages are not"""
+        upstream = make_upstream()
+        client, proxy = make_client(upstream)
+
+        first = client.get("/_next/static/chunks/app-1a2b.js")
+        second = client.get("/_next/static/chunks/app-1a2b.js")
+        assert first.headers["X-Cache"] == "MISS" and second.headers["X-Cache"] == "HIT"
+        assert second.text == "console.log(1)"
+        assert second.headers["Cache-Control"] == "public, max-age=31536000, immutable"
+        assert upstream.state.calls == 1
+
+        revalidated = client.get("/_next/static/chunks/app-1a2b.js", headers={"If-None-Match": '"abc"'})
+        assert revalidated.status_code == 304 and upstream.state.calls == 1
+
+        client.get("/about")
+        client.get("/about")
+        assert upstream.state.calls == 3
+        assert proxy.cache.stats()["entries"] == 1
+
+    def test_website_down(self):
+        """Test an unreachable website answers 503"""
+        app = FastAPI()
+        proxy = ReverseProxy("http://127.0.0.1:9", cache=StaticAssetCache(max_bytes=0))
+        app.add_middleware(WebsiteProxyMiddleware, proxy=proxy)
+
+        response = TestClient(app).get("/")
+        assert response.status_code == 503
+        assert proxy.stats()["upstream_errors"] == 1